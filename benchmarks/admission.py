@@ -0,0 +1,140 @@
+"""
+Load test of the gateway's admission control at twice its capacity.
+
+A stand-in app serves the gateway's `/nearby` and `/recognize` routes from a
+shared pool of workers (like the DB/threadpool the real handlers compete
+for): `/nearby` holds a worker for a few milliseconds, `/recognize` for the
+length of an ML call. The same open-loop mix runs against the app with and
+without AdmissionMiddleware; without it the worker queue grows for the whole
+run and every route's p99 grows with it, with it the excess is shed with
+429/503 and accepted requests keep a bounded p99.
+
+    python benchmarks/admission.py --overload 2.0 --duration 15
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import socket
+import sys
+import time
+from typing import Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "server"))
+from loadgen import RequestFactory, run_scenario  # noqa: E402
+from app.admission import AdmissionController, AdmissionMiddleware, RouteClass  # noqa: E402
+
+
+def build_app(workers: int, nearby_ms: float, recognize_ms: float, admission: bool) -> FastAPI:
+    app = FastAPI()
+    pool = {}
+
+    async def work(seconds: float):
+        # Created lazily so it binds to the server's event loop
+        semaphore = pool.setdefault("workers", asyncio.Semaphore(workers))
+        async with semaphore:
+            await asyncio.sleep(seconds)
+
+    @app.get("/api/restaurants/nearby")
+    async def nearby():
+        await work(nearby_ms / 1000)
+        return {"restaurants": []}
+
+    @app.post("/api/food/recognize")
+    async def recognize(request: Request):
+        await request.body()
+        await work(recognize_ms / 1000)
+        return {"predictions": []}
+
+    if admission:
+        # Never admit more than the pool can run; the expensive class leaves room for cheap requests
+        controller = AdmissionController([
+            RouteClass("cheap", 0, workers, 256, 0.25),
+            RouteClass("expensive", 2, max(1, workers - 1), 2 * workers, 0.5),
+        ], total_limit=workers)
+        app.add_middleware(AdmissionMiddleware, routes=app.router.routes, controller=controller,
+                           route_classes={"/api/restaurants/nearby": "cheap", "/api/food/recognize": "expensive"},
+                           enabled=True)
+    return app
+
+
+def run_server(port: int, app_args):
+    uvicorn.run(build_app(*app_args), host="127.0.0.1", port=port, log_level="error", backlog=4096)
+
+
+def serve(app_args) -> Tuple[multiprocessing.Process, str]:
+    """Run the app in its own process so the load generator does not share its event loop or GIL"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = multiprocessing.Process(target=run_server, args=(port, app_args), daemon=True)
+    process.start()
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def summarize(result):
+    rows = {}
+    for kind, stats in result["endpoints"].items():
+        total = stats.get("count", 0) + sum(stats["errors"].values())
+        rows[kind] = {
+            "ok": stats.get("count", 0),
+            "shed": stats["errors"],
+            "p50_ms": stats.get("p50_ms"),
+            "p99_ms": stats.get("p99_ms"),
+            "ok_rate": round(stats.get("count", 0) / total, 3) if total else None,
+        }
+    return rows
+
+
+async def main(args):
+    # Capacity: the pool's worker-seconds per second, split as the mix asks
+    recognize_capacity = (args.workers - args.nearby_rps * args.nearby_ms / 1000) / (args.recognize_ms / 1000)
+    scenario = {
+        "name": "overload",
+        "mix": {"nearby": args.nearby_rps, "recognize": recognize_capacity * args.overload},
+        "rps": args.nearby_rps + recognize_capacity * args.overload,
+        "duration": args.duration,
+        "concurrency": 4096,
+    }
+    print(f"workers={args.workers}: recognize capacity {recognize_capacity:.0f} rps, "
+          f"offering {recognize_capacity * args.overload:.0f} rps plus {args.nearby_rps} rps /nearby")
+
+    report = {"scenario": scenario}
+    for label, admission in (("without_admission", False), ("with_admission", True)):
+        process, base_url = serve((args.workers, args.nearby_ms, args.recognize_ms, admission))
+        factory = RequestFactory({}, image_bytes=b"\xff" * 2048, seed=0)
+        try:
+            result = await run_scenario(base_url, scenario, factory, {}, timeout=120.0)
+        finally:
+            process.terminate()
+        report[label] = {"throughput_rps": result["throughput_rps"], "endpoints": summarize(result)}
+        for kind, row in report[label]["endpoints"].items():
+            print(f"  {label:18s} {kind:10s} ok={row['ok']:5d} shed={row['shed']} "
+                  f"p50={row['p50_ms']} ms p99={row['p99_ms']} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Admission control under overload")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--nearby_ms", type=float, default=5.0)
+    parser.add_argument("--recognize_ms", type=float, default=100.0)
+    parser.add_argument("--nearby_rps", type=float, default=50.0)
+    parser.add_argument("--overload", type=float, default=2.0, help="Offered /recognize load as a multiple of capacity")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--output", type=str, default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,121 @@
+"""
+Lookup latency, recall and size of the similar-dish IVF-PQ index.
+
+Builds an index of synthetic L2-normalised vectors in chunks: dish clusters
+plus variation along a few shared directions, since real embeddings have a
+low intrinsic dimension (isotropic noise in 1280-d would make every
+neighbour equally far). The index is built in chunks, compacts it, then measures single-query
+k-NN latency and recall@k against an exact search streamed over the same
+chunks. Nothing but NumPy is needed.
+
+    python benchmarks/ann_index.py --vectors 1000000 --dim 1280 --nlist 1024 --m 32
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ml"))
+from ann_index import IVFPQIndex, normalize  # noqa: E402
+
+
+def chunk(space, index: int, size: int, noise: float) -> np.ndarray:
+    """Deterministic chunk of the dataset, so exact search can regenerate it"""
+    centers, basis = space
+    rng = np.random.default_rng(1000 + index)
+    cluster = rng.integers(0, len(centers), size)
+    latent = rng.standard_normal((size, len(basis)), dtype=np.float32)
+    return normalize(centers[cluster] + noise * latent @ basis)
+
+
+def exact_neighbors(queries: np.ndarray, space, chunks: int, chunk_size: int, noise: float, k: int) -> np.ndarray:
+    best_d = np.full((len(queries), k), np.inf, dtype=np.float32)
+    best_i = np.zeros((len(queries), k), dtype=np.int64)
+    for c in range(chunks):
+        x = chunk(space, c, chunk_size, noise)
+        d = 2 - 2 * queries @ x.T
+        d = np.concatenate([best_d, d], 1)
+        i = np.concatenate([best_i, np.arange(c * chunk_size, (c + 1) * chunk_size)[None].repeat(len(queries), 0)], 1)
+        top = np.argsort(d, 1)[:, :k]
+        best_d, best_i = np.take_along_axis(d, top, 1), np.take_along_axis(i, top, 1)
+    return best_i
+
+
+def main(args):
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((args.clusters, args.dim), dtype=np.float32)
+    # Unit-variance directions of variation within a dish
+    basis = rng.standard_normal((args.intrinsic_dim, args.dim), dtype=np.float32) * np.sqrt(args.dim / args.intrinsic_dim)
+    space = (centers, basis)
+    chunks = max(1, args.vectors // args.chunk_size)
+    report = {"vectors": chunks * args.chunk_size, "dim": args.dim, "nlist": args.nlist, "m": args.m,
+              "refine": args.refine}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        index = IVFPQIndex.create(workdir, chunk(space, 0, args.train_size, args.noise), args.nlist, args.m,
+                                  keep_vectors=args.refine > 0, iterations=args.iterations)
+        report["train_s"] = round(time.perf_counter() - start, 1)
+
+        start = time.perf_counter()
+        for c in range(chunks):
+            # refs carry the original row so results can be compared with exact search after compaction
+            index.add(chunk(space, c, args.chunk_size, args.noise),
+                      refs=[str(i) for i in range(c * args.chunk_size, (c + 1) * args.chunk_size)])
+            print(f"  {index.count:,} vectors added")
+        report["add_vectors_per_s"] = round(index.count / (time.perf_counter() - start))
+        index.compact()
+        report["code_mb"] = round(index.count * args.m / 2**20, 1)
+        report["raw_float32_mb"] = round(index.count * args.dim * 4 / 2**20, 1)
+
+        # Queries: new photos from the same distribution
+        queries = chunk(space, 10**6, args.queries, args.noise)
+        index.search(queries[0], args.k, args.nprobe)
+        for nprobe in args.nprobe_sweep or [args.nprobe]:
+            latencies, found = [], []
+            for query in queries:
+                start = time.perf_counter()
+                results = index.search(query, args.k, nprobe, args.refine)
+                latencies.append((time.perf_counter() - start) * 1000)
+                found.append([int(r["ref"]) for r in results])
+            report.setdefault("search", {})[nprobe] = {
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                "found": found,
+            }
+
+    exact = exact_neighbors(queries, space, chunks, args.chunk_size, args.noise, args.k)
+    for nprobe, row in report["search"].items():
+        found = row.pop("found")
+        row[f"recall@{args.k}"] = round(float(np.mean([len(set(f) & set(e)) / args.k for f, e in zip(found, exact)])), 3)
+        print(f"nprobe={nprobe:4d}  p50={row['p50_ms']:.2f} ms  p99={row['p99_ms']:.2f} ms  "
+              f"recall@{args.k}={row[f'recall@{args.k}']}")
+    print(json.dumps({k: v for k, v in report.items() if k != "search"}))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the similar-dish IVF-PQ index")
+    parser.add_argument("--vectors", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=1280)
+    parser.add_argument("--clusters", type=int, default=2000, help="Synthetic dish clusters")
+    parser.add_argument("--noise", type=float, default=0.6, help="Spread within a dish cluster")
+    parser.add_argument("--intrinsic_dim", type=int, default=32, help="Directions the spread follows")
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--m", type=int, default=32)
+    parser.add_argument("--nprobe", type=int, default=32)
+    parser.add_argument("--refine", type=int, default=16, help="Re-rank k * refine candidates exactly (0 = PQ only)")
+    parser.add_argument("--nprobe_sweep", type=int, nargs="*", default=None)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--train_size", type=int, default=50000)
+    parser.add_argument("--iterations", type=int, default=8)
+    parser.add_argument("--chunk_size", type=int, default=50000)
+    parser.add_argument("--output", type=str, default=None)
+    main(parser.parse_args())
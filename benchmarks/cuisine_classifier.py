@@ -0,0 +1,96 @@
+"""
+Cuisine classification throughput: the old per-category keyword scans
+against the compiled classifier, cold (empty memo) and warm.
+
+Runs on a directory of recorded Yandex responses (--corpus), or on a
+synthetic corpus built with the mock server's feature generator.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "server"))
+from app.services.cuisine import CUISINE_TAXONOMY, CuisineClassifier  # noqa: E402
+from mock_yandex import CATEGORIES, make_features  # noqa: E402
+
+EXTRA_CATEGORIES = [
+    "Паназиатская кухня", "Белорусская кухня", "Тайская кухня", "Кавказская кухня", "Шаурма",
+    "Стейк-хаус", "Вегетарианское кафе", "Бар, паб", "Кондитерская", "Европейская кухня",
+    "Узбекская кухня", "Французская кухня", "Рыбный ресторан", "Мексиканская кухня", "Столовая",
+]
+
+
+def legacy_classify(categories):
+    """The classification rules that used to live inline in search_yandex_restaurants"""
+    cuisine = "Various"
+    for category_name in categories:
+        category_name = category_name.lower()
+        if any(word in category_name for word in ['итальянск', 'pizza', 'pasta']):
+            cuisine = "Italian"
+        elif any(word in category_name for word in ['японск', 'суши', 'sushi']):
+            cuisine = "Japanese"
+        elif any(word in category_name for word in ['китайск', 'chinese']):
+            cuisine = "Chinese"
+        elif any(word in category_name for word in ['русск', 'russian']):
+            cuisine = "Russian"
+        elif any(word in category_name for word in ['бургер', 'burger']):
+            cuisine = "American"
+    return cuisine
+
+
+def load_corpus(directory):
+    businesses = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for feature in data.get("features", []):
+            meta = feature.get("properties", {}).get("CompanyMetaData", {})
+            businesses.append([c.get("name", "") for c in meta.get("Categories", [])])
+    return businesses
+
+
+def synthetic_corpus(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    pool = CATEGORIES + EXTRA_CATEGORIES
+    businesses = []
+    while len(businesses) < size:
+        for feature in make_features(rng.choice(["пицца", "суши", "бургер", "плов"]), 37.6, 55.75, 0.1, 0.1, 50):
+            names = [c["name"] for c in feature["properties"]["CompanyMetaData"]["Categories"]]
+            # Mix in categories the mock does not produce
+            names.append(rng.choice(pool))
+            businesses.append(names)
+    return businesses[:size]
+
+
+def timed(fn, businesses):
+    start = time.perf_counter()
+    labels = [fn(categories) for categories in businesses]
+    return time.perf_counter() - start, labels
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark cuisine classification")
+    parser.add_argument("--corpus", type=str, default=None, help="Directory of recorded Yandex JSON responses")
+    parser.add_argument("--size", type=int, default=200000, help="Synthetic corpus size (businesses)")
+    args = parser.parse_args()
+
+    businesses = load_corpus(args.corpus) if args.corpus else synthetic_corpus(args.size)
+    distinct = len({c for categories in businesses for c in categories})
+    print(f"Corpus: {len(businesses)} businesses, {distinct} distinct category strings")
+
+    classifier = CuisineClassifier(CUISINE_TAXONOMY)
+    legacy_time, legacy_labels = timed(legacy_classify, businesses)
+    cold_time, labels = timed(classifier.classify, businesses)
+    warm_time, _ = timed(classifier.classify, businesses)
+
+    for name, seconds in [("legacy scans", legacy_time), ("compiled (cold memo)", cold_time),
+                          ("compiled (warm memo)", warm_time)]:
+        print(f"{name:22s} {seconds * 1000:9.1f} ms  {len(businesses) / seconds:12,.0f} businesses/s")
+    changed = sum(1 for a, b in zip(legacy_labels, labels) if a != b)
+    print(f"Labels differing from the legacy rules: {changed} ({changed / max(1, len(businesses)):.1%})")
+    print(f"Memo: {classifier.match_category.cache_info()}")
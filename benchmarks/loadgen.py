@@ -0,0 +1,184 @@
+"""Open-loop load generator: fixed request rate with a concurrency cap"""
+import asyncio
+import random
+import threading
+import time
+from typing import Dict, List
+
+import httpx
+import psutil
+
+
+def percentiles(samples: List[float]) -> Dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+        "p50_ms": pick(50),
+        "p95_ms": pick(95),
+        "p99_ms": pick(99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+class ResourceMonitor:
+    """Samples CPU time and RSS of a process (and its children) in a background thread"""
+
+    def __init__(self, pid: int, interval: float = 0.25):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _processes(self):
+        try:
+            return [self.process] + self.process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    def _cpu_seconds(self):
+        total = 0.0
+        for proc in self._processes():
+            try:
+                times = proc.cpu_times()
+                total += times.user + times.system
+            except psutil.NoSuchProcess:
+                pass
+        return total
+
+    def _rss(self):
+        total = 0
+        for proc in self._processes():
+            try:
+                total += proc.memory_info().rss
+            except psutil.NoSuchProcess:
+                pass
+        return total
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.rss_peak = max(self.rss_peak, self._rss())
+
+    def start(self):
+        self.cpu_start = self._cpu_seconds()
+        self.rss_peak = self._rss()
+        self.wall_start = time.perf_counter()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self, completed_requests: int) -> Dict:
+        self._stop.set()
+        self._thread.join()
+        cpu = self._cpu_seconds() - self.cpu_start
+        wall = time.perf_counter() - self.wall_start
+        return {
+            "cpu_seconds": round(cpu, 3),
+            "cpu_percent": round(100 * cpu / wall, 1) if wall else None,
+            "cpu_ms_per_request": round(1000 * cpu / completed_requests, 3) if completed_requests else None,
+            "rss_peak_mb": round(self.rss_peak / 2**20, 1),
+            "rss_end_mb": round(self._rss() / 2**20, 1),
+        }
+
+
+class RequestFactory:
+    """Builds the HTTP request for each endpoint kind in a mix"""
+
+    def __init__(self, config: Dict, image_bytes: bytes, seed: int = 0):
+        self.center = config.get("center", {"lat": 55.7558, "lon": 37.6173})
+        self.jitter = config.get("jitter_deg", 0.02)
+        self.dishes = config.get("dishes", ["pizza"])
+        self.image_bytes = image_bytes
+        self.rng = random.Random(seed)
+
+    def _point(self):
+        return (self.center["lat"] + self.rng.uniform(-self.jitter, self.jitter),
+                self.center["lon"] + self.rng.uniform(-self.jitter, self.jitter))
+
+    def build(self, kind: str) -> Dict:
+        if kind == "recognize":
+            return {"method": "POST", "url": "/api/food/recognize",
+                    "files": {"image": ("bench.jpg", self.image_bytes, "image/jpeg")}}
+        if kind == "predict":
+            # Straight to the ML service
+            return {"method": "POST", "url": "/predict",
+                    "files": {"image": ("bench.jpg", self.image_bytes, "image/jpeg")}}
+        if kind == "search":
+            lat, lon = self._point()
+            return {"method": "GET", "url": "/api/restaurants/search",
+                    "params": {"dish": self.rng.choice(self.dishes), "lat": lat, "lon": lon}}
+        if kind == "nearby":
+            lat, lon = self._point()
+            return {"method": "GET", "url": "/api/restaurants/nearby",
+                    "params": {"lat": lat, "lon": lon, "radius": 2000}}
+        if kind == "stats":
+            return {"method": "GET", "url": "/api/restaurants/database/stats"}
+        raise ValueError(f"Unknown request kind: {kind}")
+
+
+async def run_scenario(base_url: str, scenario: Dict, factory: RequestFactory,
+                       monitors: Dict[str, ResourceMonitor], timeout: float = 30.0) -> Dict:
+    """
+    Fire requests at scenario['rps'] for scenario['duration'] seconds.
+    Latency is measured from each request's scheduled start, so time spent
+    waiting for a free concurrency slot counts against the service.
+    """
+    rps, duration = scenario["rps"], scenario["duration"]
+    kinds, weights = zip(*scenario["mix"].items())
+    semaphore = asyncio.Semaphore(scenario.get("concurrency", 16))
+    latencies = {kind: [] for kind in kinds}
+    errors = {kind: {} for kind in kinds}
+
+    limits = httpx.Limits(max_connections=scenario.get("concurrency", 16))
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def fire(kind: str, scheduled: float):
+            async with semaphore:
+                request = factory.build(kind)
+                try:
+                    response = await client.request(**request)
+                    status = response.status_code
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+            elapsed = time.perf_counter() - scheduled
+            if status == 200:
+                latencies[kind].append(elapsed)
+            else:
+                errors[kind][str(status)] = errors[kind].get(str(status), 0) + 1
+
+        for monitor in monitors.values():
+            monitor.start()
+        start = time.perf_counter()
+        tasks = []
+        total = int(rps * duration)
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            kind = factory.rng.choices(kinds, weights=weights)[0]
+            tasks.append(asyncio.create_task(fire(kind, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    completed = sum(len(v) for v in latencies.values())
+    failed = sum(sum(e.values()) for e in errors.values())
+    return {
+        "name": scenario["name"],
+        "target_rps": rps,
+        "concurrency": scenario.get("concurrency", 16),
+        "duration_s": round(elapsed, 2),
+        "requests": total,
+        "errors": failed,
+        "throughput_rps": round(completed / elapsed, 2),
+        "latency": percentiles([x for v in latencies.values() for x in v]),
+        "endpoints": {
+            kind: {**percentiles(latencies[kind]), "errors": errors[kind]} for kind in kinds
+        },
+        "resources": {name: monitor.stop(completed) for name, monitor in monitors.items()},
+    }
@@ -0,0 +1,33 @@
+"""Write a random-weight checkpoint the ML service can load, for benchmarking"""
+import argparse
+import os
+import sys
+
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ml"))
+from architectures import ARCHITECTURES, build_model  # noqa: E402
+
+
+def make_checkpoint(path: str, arch: str = "mobilenet_v3_small", num_classes: int = 101, image_size: int = None):
+    torch.manual_seed(0)
+    model = build_model(arch, num_classes=num_classes)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    torch.save({
+        'epoch': 0,
+        'model_state_dict': model.state_dict(),
+        'accuracy': 0.0,
+        'class_names': [f"class_{i}" for i in range(num_classes)],
+        'arch': arch,
+        'image_size': image_size or ARCHITECTURES[arch]['image_size'],
+    }, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a random-weight benchmark checkpoint")
+    parser.add_argument("--output", type=str, default="bench_models/random.pth")
+    parser.add_argument("--arch", type=str, default="mobilenet_v3_small", choices=list(ARCHITECTURES))
+    parser.add_argument("--image_size", type=int, default=None)
+    args = parser.parse_args()
+    print(f"Checkpoint written: {make_checkpoint(args.output, args.arch, image_size=args.image_size)}")
@@ -0,0 +1,90 @@
+"""
+Bytes on the wire and end-to-end latency of the gateway -> ML service call.
+
+Starts the ML service with a checkpoint and sends the same phone-sized photo
+through each ML_TRANSPORT: `multipart` uploads the original file to /predict,
+`jpeg` and `raw` downscale in the client and post to /predict/raw. Latency
+includes the client-side downscale, as in the gateway.
+
+    python benchmarks/ml_transport.py --requests 200 --width 4032 --height 3024
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from make_checkpoint import make_checkpoint
+from run import ROOT, free_port, make_image, wait_until_ready
+
+sys.path.insert(0, os.path.join(ROOT, "server"))
+from app.services import ml_client  # noqa: E402
+
+
+async def measure(transport: str, image_bytes: bytes, requests: int, concurrency: int) -> dict:
+    ml_client.ML_BYTES.labels("sent")._value.set(0)
+    ml_client.ML_BYTES.labels("received")._value.set(0)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await ml_client.recognize(image_bytes, "photo.jpg", "image/jpeg", top_k=5, transport=transport)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await one()  # warm the connection and the cached input size
+    latencies.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "bytes_sent_per_request": int(ml_client.ML_BYTES.labels("sent")._value.get() / (requests + 1)),
+        "bytes_received_per_request": int(ml_client.ML_BYTES.labels("received")._value.get() / (requests + 1)),
+        "p50_ms": round(statistics.median(latencies), 1),
+        "p99_ms": round(latencies[int(0.99 * (len(latencies) - 1))], 1),
+        "throughput_rps": round(requests / elapsed, 1),
+    }
+
+
+async def main(args):
+    image_bytes = make_image(args.width, args.height)
+    print(f"Upload: {args.width}x{args.height} JPEG, {len(image_bytes)} bytes")
+    with tempfile.TemporaryDirectory() as workdir:
+        checkpoint = args.checkpoint or make_checkpoint(os.path.join(workdir, "model.pth"), args.arch)
+        port = free_port()
+        process = subprocess.Popen([sys.executable, "serve.py", "--workers", "1", "--port", str(port)], cwd=os.path.join(ROOT, "ml"),
+                                   env={**os.environ, "MODEL_PATH": checkpoint},
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+        ml_client.ML_SERVICE_URL = f"http://127.0.0.1:{port}"
+        report = {}
+        try:
+            wait_until_ready(f"{ml_client.ML_SERVICE_URL}/health")
+            for transport in args.transports:
+                report[transport] = await measure(transport, image_bytes, args.requests, args.concurrency)
+                print(f"  {transport:10s} {report[transport]}")
+        finally:
+            await ml_client.close_client()
+            process.terminate()
+            process.wait(timeout=30)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare gateway -> ML service transports")
+    parser.add_argument("--transports", nargs="+", default=["multipart", "jpeg", "raw"])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--width", type=int, default=4032)
+    parser.add_argument("--height", type=int, default=3024)
+    parser.add_argument("--arch", type=str, default="efficientnet_v2_s")
+    parser.add_argument("--checkpoint", type=str, default=None)
+    parser.add_argument("--output", type=str, default=None)
+    asyncio.run(main(parser.parse_args()))
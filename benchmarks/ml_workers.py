@@ -0,0 +1,95 @@
+"""
+Memory and throughput of the ML service with 1..N worker processes.
+
+Starts ml/serve.py with each worker count, once with memory-mapped weights
+and once with a private copy per worker, then reports the summed RSS and PSS
+(RSS counts shared pages once per process, PSS splits them) and the /predict
+throughput of a saturating load.
+
+    python benchmarks/ml_workers.py --workers 1 2 4 --arch efficientnet_v2_s
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import psutil
+
+from loadgen import RequestFactory, run_scenario
+from make_checkpoint import make_checkpoint
+from run import ROOT, free_port, make_image, wait_until_ready
+
+
+def memory(pid: int) -> dict:
+    """Summed RSS and PSS (MB) of a process tree"""
+    rss = pss = 0
+    parent = psutil.Process(pid)
+    for proc in [parent] + parent.children(recursive=True):
+        try:
+            info = proc.memory_full_info()
+        except psutil.NoSuchProcess:
+            continue
+        rss += info.rss
+        pss += getattr(info, "pss", info.rss)
+    return {"rss_mb": round(rss / 2**20, 1), "pss_mb": round(pss / 2**20, 1)}
+
+
+async def measure(checkpoint: str, workers: int, mmap: bool, image_bytes: bytes, duration: float, workdir: str) -> dict:
+    port = free_port()
+    cmd = [sys.executable, "serve.py", "--workers", str(workers), "--port", str(port)]
+    if not mmap:
+        cmd.append("--no_mmap")
+    log = open(os.path.join(workdir, f"serve_{workers}_{int(mmap)}.log"), "w")
+    process = subprocess.Popen(cmd, cwd=os.path.join(ROOT, "ml"), env={**os.environ, "MODEL_PATH": checkpoint},
+                               stdout=log, stderr=subprocess.STDOUT)
+    try:
+        url = f"http://127.0.0.1:{port}"
+        wait_until_ready(f"{url}/health")
+        # Every worker must have loaded the model before memory is sampled
+        await asyncio.sleep(2 + workers)
+        idle = memory(process.pid)
+        scenario = {"name": f"{workers}w", "mix": {"predict": 1}, "rps": 1000, "duration": duration,
+                    "concurrency": 4 * workers}
+        result = await run_scenario(url, scenario, RequestFactory({}, image_bytes), {}, timeout=60.0)
+        loaded = memory(process.pid)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {
+        "workers": workers,
+        "weights": "mmap" if mmap else "private",
+        "idle": idle,
+        "under_load": loaded,
+        "throughput_rps": result["throughput_rps"],
+        "p50_ms": result["latency"].get("p50_ms"),
+        "p99_ms": result["latency"].get("p99_ms"),
+        "errors": result["errors"],
+    }
+
+
+async def main(args):
+    image_bytes = make_image()
+    rows = []
+    with tempfile.TemporaryDirectory(prefix="foodfinder-workers-") as workdir:
+        checkpoint = make_checkpoint(os.path.join(workdir, "random.pth"), arch=args.arch)
+        for workers in args.workers:
+            for mmap in (True, False):
+                row = await measure(checkpoint, workers, mmap, image_bytes, args.duration, workdir)
+                rows.append(row)
+                print(f"  {workers} workers, {row['weights']:7s} weights: PSS {row['under_load']['pss_mb']} MB "
+                      f"(RSS {row['under_load']['rss_mb']} MB), {row['throughput_rps']} rps, p99 {row['p99_ms']} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ML service memory and throughput per worker count")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--arch", type=str, default="efficientnet_v2_s")
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--output", type=str, default=None)
+    asyncio.run(main(parser.parse_args()))
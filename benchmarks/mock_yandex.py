@@ -0,0 +1,127 @@
+"""
+Local stand-in for the Yandex Places search API.
+
+Answers GET requests with a deterministic FeatureCollection of fake
+businesses inside the requested `ll`/`spn` box, so the API server can be
+benchmarked without network access or quota. Businesses are fixed per map
+cell, so overlapping tiles and query variants return the same places.
+"""
+import argparse
+import json
+import math
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CATEGORIES = [
+    "Итальянская кухня", "Пиццерия", "Японская кухня", "Суши-бар", "Китайская кухня",
+    "Русская кухня", "Бургерная", "Кафе", "Ресторан", "Грузинская кухня", "Кофейня",
+]
+
+
+CELL_DEG = 0.01
+PLACES_PER_CELL = 4
+
+
+def cell_places(cell_lat: int, cell_lon: int):
+    """The fixed businesses of one 0.01 degree cell: overlapping searches see the same places"""
+    rng = random.Random(f"{cell_lat}|{cell_lon}")
+    places = []
+    for _ in range(PLACES_PER_CELL):
+        name = f"Place #{rng.randint(1, 10**6)}"
+        places.append({
+            "id": f"mock-{rng.getrandbits(48):x}",
+            "name": name,
+            "point": [(cell_lon + rng.random()) * CELL_DEG, (cell_lat + rng.random()) * CELL_DEG],
+            "categories": [rng.choice(CATEGORIES) for _ in range(rng.randint(1, 3))],
+            "street": rng.randint(1, 300),
+            "phone": f"+7 (495) {rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(10, 99)}",
+        })
+    return places
+
+
+def make_features(text: str, lon: float, lat: float, span_lon: float, span_lat: float, count: int):
+    # Businesses inside the box that "match" the text (a stable ~60% per query), nearest first
+    lat_range = range(math.floor((lat - span_lat / 2) / CELL_DEG), math.floor((lat + span_lat / 2) / CELL_DEG) + 1)
+    lon_range = range(math.floor((lon - span_lon / 2) / CELL_DEG), math.floor((lon + span_lon / 2) / CELL_DEG) + 1)
+    matches = []
+    for cell_lat in lat_range:
+        for cell_lon in lon_range:
+            for place in cell_places(cell_lat, cell_lon):
+                p_lon, p_lat = place["point"]
+                if abs(p_lon - lon) > span_lon / 2 or abs(p_lat - lat) > span_lat / 2:
+                    continue
+                if random.Random(f"{text}|{place['id']}").random() < 0.6:
+                    matches.append(place)
+    matches.sort(key=lambda place: (place["point"][0] - lon) ** 2 + (place["point"][1] - lat) ** 2)
+
+    features = []
+    for place in matches[:count]:
+        features.append({
+            "type": "Feature",
+            "id": place["id"],
+            "geometry": {"type": "Point", "coordinates": place["point"]},
+            "properties": {
+                "name": place["name"],
+                "CompanyMetaData": {
+                    "name": place["name"],
+                    "address": f"Mock street {place['street']}, Moscow",
+                    "Categories": [{"name": category} for category in place["categories"]],
+                    "Phones": [{"formatted": place["phone"]}],
+                    "Hours": {"text": "ежедневно, 10:00–23:00"},
+                    "url": "https://example.com",
+                },
+            },
+        })
+    return features
+
+
+class MockYandexHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    requests_served = 0
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        try:
+            lon, lat = (float(x) for x in params.get("ll", "37.6173,55.7558").split(","))
+            span_lon, span_lat = (float(x) for x in params.get("spn", "0.05,0.05").split(","))
+            count = int(params.get("results", 20))
+        except ValueError:
+            self.send_error(400, "Bad ll/spn/results")
+            return
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        body = json.dumps({
+            "type": "FeatureCollection",
+            "features": make_features(params.get("text", "food"), lon, lat, span_lon, span_lat, count),
+        }).encode()
+        MockYandexHandler.requests_served += 1
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # the client gave up (deadline cut-off)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, latency_ms: float = 0.0):
+    MockYandexHandler.latency = latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockYandexHandler)
+    print(f"Mock Yandex API listening on http://127.0.0.1:{port}/")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Yandex Places API")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency_ms", type=float, default=50.0, help="Artificial response delay")
+    args = parser.parse_args()
+    serve(args.port, args.latency_ms)
@@ -0,0 +1,126 @@
+"""
+Memory, build time and query latency of the in-process restaurant bitmap
+index at gateway scale.
+
+Generates synthetic restaurants around a few dozen city centres, each
+serving a handful of dishes drawn from a Zipf-like popularity curve, loads
+them into RestaurantIndex the way the startup build does (rows grouped by
+restaurant), and times local searches against a NumPy full scan (haversine
+over every restaurant plus a membership test) that also checks the results.
+
+    python benchmarks/restaurant_index.py --restaurants 1000000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+from app.services.restaurant_index import RestaurantIndex, distances_km  # noqa: E402
+
+
+def dataset(args):
+    rng = np.random.default_rng(0)
+    cities = np.column_stack([rng.uniform(43, 60, args.cities), rng.uniform(30, 60, args.cities)])
+    weights = rng.pareto(1.2, args.cities) + 1
+    city = rng.choice(args.cities, args.restaurants, p=weights / weights.sum())
+    # Restaurants thin out away from the centre (~8 km scale)
+    lat = cities[city, 0] + rng.normal(0, 0.07, args.restaurants)
+    lon = cities[city, 1] + rng.normal(0, 0.12, args.restaurants)
+    popularity = 1 / np.arange(1, args.dishes + 1) ** 0.9
+    sizes = rng.integers(1, 2 * args.menu, args.restaurants)
+    drawn = rng.choice(args.dishes, sizes.sum(), p=popularity / popularity.sum())
+    menus = [np.unique(m) for m in np.split(drawn, np.cumsum(sizes)[:-1])]
+    cuisines = rng.integers(0, args.cuisines, args.restaurants)
+    return cities, lat, lon, menus, cuisines
+
+
+def rows(ids, lat, lon, menus, cuisines):
+    for i, menu in enumerate(menus):
+        for dish in menu:
+            yield ids[i], float(lat[i]), float(lon[i]), f"cuisine {cuisines[i]}", f"dish {dish}", f"dish_{dish}"
+
+
+def main(args):
+    print(f"Generating {args.restaurants:,} restaurants...")
+    cities, lat, lon, menus, cuisines = dataset(args)
+    ids = [str(uuid.UUID(int=i)) for i in range(args.restaurants)]
+    links = sum(len(m) for m in menus)
+    report = {"restaurants": args.restaurants, "links": links, "dishes": args.dishes, "cell_deg": args.cell_deg}
+
+    start = time.perf_counter()
+    index = RestaurantIndex(cell_deg=args.cell_deg)
+    index.load(rows(ids, lat, lon, menus, cuisines))
+    report["build_s"] = round(time.perf_counter() - start, 1)
+    # Again under tracemalloc (which slows it down several times) for the memory it keeps
+    del index
+    tracemalloc.start()
+    index = RestaurantIndex(cell_deg=args.cell_deg)
+    index.load(rows(ids, lat, lon, menus, cuisines))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    described = index.describe()
+    report["index_mb"] = round(current / 2**20, 1)
+    report["build_peak_mb"] = round(peak / 2**20, 1)
+    report["bitmap_mb"] = {k: round(v / 2**20, 1) for k, v in described["bitmap_bytes"].items()}
+    report["id_mb"] = round(described["id_bytes"] / 2**20, 1)
+    report["cells"] = described["cells"]
+
+    # Baseline: per-dish member arrays and a full haversine scan
+    members = {}
+    for i, menu in enumerate(menus):
+        for dish in menu:
+            members.setdefault(dish, []).append(i)
+    members = {dish: np.array(m) for dish, m in members.items()}
+
+    rng = np.random.default_rng(1)
+    popularity = 1 / np.arange(1, args.dishes + 1) ** 0.9
+    latencies, scan_latencies, found = [], [], []
+    for q in range(args.queries):
+        city = cities[rng.integers(len(cities))]
+        qlat, qlon = city[0] + rng.normal(0, 0.05), city[1] + rng.normal(0, 0.08)
+        dish = int(rng.choice(args.dishes, p=popularity / popularity.sum()))
+        radius = int(rng.choice(args.radii))
+
+        start = time.perf_counter()
+        hits = index.search(f"dish {dish}", f"dish_{dish}", qlat, qlon, radius)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        distance = distances_km(qlat, qlon, lat, lon)
+        mask = distance <= radius / 1000
+        mask[np.setdiff1d(np.arange(args.restaurants), members.get(dish, []), assume_unique=True)] = False
+        expected = np.flatnonzero(mask)
+        scan_latencies.append((time.perf_counter() - start) * 1000)
+
+        assert sorted(int(uuid.UUID(h)) for h, _ in hits) == expected.tolist(), f"query {q}: index and scan disagree"
+        found.append(len(hits))
+
+    for name, values in (("index", latencies), ("full_scan", scan_latencies)):
+        report[name] = {"p50_ms": round(float(np.percentile(values, 50)), 3),
+                        "p99_ms": round(float(np.percentile(values, 99)), 3)}
+    report["mean_results"] = round(float(np.mean(found)), 1)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the restaurant bitmap index")
+    parser.add_argument("--restaurants", type=int, default=1000000)
+    parser.add_argument("--cities", type=int, default=40)
+    parser.add_argument("--dishes", type=int, default=2000, help="Distinct dishes")
+    parser.add_argument("--menu", type=int, default=6, help="Average dishes per restaurant")
+    parser.add_argument("--cuisines", type=int, default=30)
+    parser.add_argument("--cell_deg", type=float, default=0.02)
+    parser.add_argument("--radii", type=int, nargs="+", default=[1000, 3000, 5000, 10000])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--output", type=str, default=None)
+    main(parser.parse_args())
@@ -0,0 +1,188 @@
+"""
+End-to-end benchmark harness for the ML service and the API server.
+
+Starts a mock Yandex API, the ML service on a random-weight checkpoint and
+the API server against SQLite (or a given DATABASE_URL), then replays the
+request mixes from a JSON file and writes a JSON report:
+
+    python benchmarks/run.py --mix benchmarks/mixes/default.json --output bench_output.json
+
+Use --api_url to benchmark an API server that is already running.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import httpx
+
+from loadgen import RequestFactory, ResourceMonitor, run_scenario
+from make_checkpoint import make_checkpoint
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, timeout: float = 180.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} did not become ready in {timeout:.0f}s")
+
+
+def make_image(width: int = 640, height: int = 480) -> bytes:
+    from PIL import Image
+    import random
+    rng = random.Random(0)
+    image = Image.frombytes("RGB", (width, height), bytes(rng.getrandbits(8) for _ in range(width * height * 3)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+class Services:
+    """Launches and tears down the processes under test"""
+
+    def __init__(self, args, workdir: str):
+        self.args = args
+        self.workdir = workdir
+        self.processes = {}
+
+    def spawn(self, name, cmd, cwd, env=None):
+        log = open(os.path.join(self.workdir, f"{name}.log"), "w")
+        self.processes[name] = subprocess.Popen(cmd, cwd=cwd, env={**os.environ, **(env or {})},
+                                                stdout=log, stderr=subprocess.STDOUT)
+        return self.processes[name]
+
+    def start(self):
+        args = self.args
+        yandex_port, ml_port, api_port = free_port(), free_port(), free_port()
+
+        self.spawn("mock_yandex", [sys.executable, "mock_yandex.py", "--port", str(yandex_port),
+                                   "--latency_ms", str(args.yandex_latency_ms)], cwd=BENCH_DIR)
+
+        checkpoint = make_checkpoint(os.path.join(self.workdir, "random.pth"), arch=args.arch)
+        self.spawn("ml", [sys.executable, "-m", "uvicorn", "inference:app", "--port", str(ml_port),
+                          "--log-level", "warning"],
+                   cwd=os.path.join(ROOT, "ml"), env={"MODEL_PATH": checkpoint})
+
+        database_url = args.database_url or f"sqlite:///{os.path.join(self.workdir, 'bench.db')}"
+        server_env = {
+            "DATABASE_URL": database_url,
+            "ML_SERVICE_URL": f"http://127.0.0.1:{ml_port}",
+            "YANDEX_SEARCH_API": f"http://127.0.0.1:{yandex_port}/",
+            "YANDEX_API_KEY": "benchmark",
+            # The mock has no quota: don't let the rate limiter shape the load unless asked to
+            "YANDEX_RATE_PER_SEC": os.environ.get("YANDEX_RATE_PER_SEC", "1000"),
+            "YANDEX_BURST": os.environ.get("YANDEX_BURST", "1000"),
+        }
+        if args.seed_restaurants:
+            subprocess.check_call([sys.executable, "seed_db.py", "--count", str(args.seed_restaurants)],
+                                  cwd=BENCH_DIR, env={**os.environ, **server_env})
+        self.spawn("api", [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(api_port),
+                           "--log-level", "warning"],
+                   cwd=os.path.join(ROOT, "server"), env=server_env)
+
+        self.ml_url = f"http://127.0.0.1:{ml_port}"
+        self.api_url = f"http://127.0.0.1:{api_port}"
+        wait_until_ready(f"{self.ml_url}/health")
+        wait_until_ready(f"{self.api_url}/health")
+
+    def stop(self):
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def run_all(api_url: str, mix: dict, monitors: dict, image_bytes: bytes, only=None):
+    results = []
+    for scenario in mix["scenarios"]:
+        if only and scenario["name"] not in only:
+            continue
+        print(f"Running scenario '{scenario['name']}': {scenario['rps']} rps for {scenario['duration']}s")
+        factory = RequestFactory(mix, image_bytes)
+        result = await run_scenario(api_url, scenario, factory, monitors)
+        print(f"  throughput {result['throughput_rps']} rps, p50 {result['latency'].get('p50_ms')} ms, "
+              f"p99 {result['latency'].get('p99_ms')} ms, errors {result['errors']}")
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FoodFinder load and latency benchmark")
+    parser.add_argument("--mix", type=str, default=os.path.join(BENCH_DIR, "mixes", "default.json"))
+    parser.add_argument("--output", type=str, default=os.path.join(ROOT, "bench_output.json"))
+    parser.add_argument("--scenarios", type=str, default=None, help="Comma-separated subset to run")
+    parser.add_argument("--arch", type=str, default="mobilenet_v3_small", help="Random checkpoint backbone")
+    parser.add_argument("--database_url", type=str, default=None, help="Defaults to a temporary SQLite file")
+    parser.add_argument("--seed_restaurants", type=int, default=5000)
+    parser.add_argument("--yandex_latency_ms", type=float, default=50.0)
+    parser.add_argument("--api_url", type=str, default=None, help="Benchmark an already running API server")
+    args = parser.parse_args()
+
+    with open(args.mix) as f:
+        mix = json.load(f)
+    only = set(args.scenarios.split(",")) if args.scenarios else None
+    image_bytes = make_image()
+
+    with tempfile.TemporaryDirectory(prefix="foodfinder-bench-") as workdir:
+        services = None
+        monitors = {}
+        try:
+            if args.api_url:
+                api_url = args.api_url
+            else:
+                services = Services(args, workdir)
+                services.start()
+                api_url = services.api_url
+                monitors = {name: ResourceMonitor(services.processes[name].pid) for name in ("api", "ml")}
+
+            scenarios = asyncio.run(run_all(api_url, mix, monitors, image_bytes, only))
+        finally:
+            if services:
+                services.stop()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "mix": os.path.basename(args.mix),
+        "checkpoint_arch": None if args.api_url else args.arch,
+        "database": args.database_url or "sqlite",
+        "scenarios": scenarios,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
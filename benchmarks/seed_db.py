@@ -0,0 +1,55 @@
+"""Fill the benchmark database with synthetic restaurants through the server's own models"""
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models.restaurant import Restaurant, RestaurantDish  # noqa: E402
+from app.services.dish_vocabulary import get_vocabulary  # noqa: E402
+
+CUISINES = ["Italian", "Japanese", "Chinese", "Russian", "American", "Various"]
+
+
+def seed(count: int, dishes, lat: float, lon: float, spread: float, seed: int = 0):
+    rng = random.Random(seed)
+    vocabulary = get_vocabulary()
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        for i in range(count):
+            restaurant = Restaurant(
+                external_id=f"seed-{i}",
+                name=f"Seed Restaurant {i}",
+                address=f"Seed street {i}, Moscow",
+                latitude=lat + rng.uniform(-spread, spread),
+                longitude=lon + rng.uniform(-spread, spread),
+                cuisine_type=rng.choice(CUISINES),
+                rating=round(rng.uniform(3.0, 5.0), 1),
+                price_range="$" * rng.randint(1, 3),
+                source="seed",
+            )
+            db.add(restaurant)
+            db.flush()
+            for dish in rng.sample(dishes, k=min(len(dishes), rng.randint(1, 3))):
+                db.add(RestaurantDish(restaurant_id=restaurant.id, dish_name=dish,
+                                      dish_id=vocabulary.resolve(dish), geo_cell=restaurant.geo_cell,
+                                      confidence_score=0.8))
+            if i % 1000 == 999:
+                db.commit()
+        db.commit()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the benchmark database")
+    parser.add_argument("--count", type=int, default=5000)
+    parser.add_argument("--dishes", type=str, default="pizza,sushi,burger,pasta,salad,steak,ramen,tacos")
+    parser.add_argument("--lat", type=float, default=55.7558)
+    parser.add_argument("--lon", type=float, default=37.6173)
+    parser.add_argument("--spread", type=float, default=0.1, help="Max offset from the center in degrees")
+    args = parser.parse_args()
+    seed(args.count, args.dishes.split(","), args.lat, args.lon, args.spread)
+    print(f"Seeded {args.count} restaurants")
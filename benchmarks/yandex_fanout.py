@@ -0,0 +1,78 @@
+"""
+Single Yandex query against the tiled fan-out, run on the local mock server.
+
+For each radius it reports how many unique restaurants within the radius
+each mode finds, how many upstream calls it made and how long it took; the
+last run uses a slow mock and a tight deadline to show partial results.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, "..", "server"))
+from mock_yandex import MockYandexHandler  # noqa: E402
+
+
+def start_mock(port: int):
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockYandexHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def measure(label, coro_fn):
+    served = MockYandexHandler.requests_served
+    start = time.perf_counter()
+    try:
+        restaurants = await coro_fn()
+        outcome = f"{len(restaurants):4d} unique"
+    except Exception as e:
+        outcome = f"failed: {e}"
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"  {label:28s} {outcome:14s} {MockYandexHandler.requests_served - served:3d} calls {elapsed:8.1f} ms")
+
+
+async def main(args):
+    from app.services import yandex
+    from app.services.geo import calculate_distance
+
+    lat, lon = 55.7558, 37.6173
+    MockYandexHandler.latency = args.latency_ms / 1000
+
+    async def single(radius):
+        # The single query ignores the radius; count only what lies inside it
+        found = await yandex.search("пицца", lat, lon)
+        return [r for r in found
+                if calculate_distance(lat, lon, r['coordinates']['lat'], r['coordinates']['lon']) <= radius / 1000]
+
+    for radius in args.radii:
+        print(f"radius {radius} m (mock latency {args.latency_ms:.0f} ms)")
+        await measure("single query", lambda: single(radius))
+        await measure("fan-out", lambda: yandex.search_fanout("пицца", lat, lon, radius))
+
+    MockYandexHandler.latency = args.slow_latency_ms / 1000
+    radius = max(args.radii)
+    print(f"radius {radius} m, mock latency {args.slow_latency_ms:.0f} ms, deadline {args.deadline * 1000:.0f} ms")
+    await measure("fan-out (deadline)", lambda: yandex.search_fanout("пицца", lat, lon, radius, deadline=args.deadline))
+    await yandex.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Yandex fan-out against the mock server")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--radii", type=int, nargs="+", default=[1000, 5000, 15000])
+    parser.add_argument("--latency_ms", type=float, default=50.0)
+    parser.add_argument("--slow_latency_ms", type=float, default=400.0)
+    parser.add_argument("--deadline", type=float, default=0.6, help="Seconds, for the partial-results run")
+    args = parser.parse_args()
+
+    start_mock(args.port)
+    # The client reads its endpoint at import time
+    os.environ["YANDEX_SEARCH_API"] = f"http://127.0.0.1:{args.port}/"
+    os.environ.setdefault("YANDEX_RATE_PER_SEC", "1000")
+    os.environ.setdefault("YANDEX_BURST", "1000")
+    asyncio.run(main(args))
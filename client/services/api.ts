@@ -32,6 +32,12 @@ export interface RestaurantSearchResponse {
   restaurants: Restaurant[];
 }
 
+export type RecognizeAndFindEvent =
+  | { event: 'recognition'; data: RecognitionResponse & { request_id: string; searching: string[] } }
+  | { event: 'restaurants'; data: RestaurantSearchResponse }
+  | { event: 'cancelled' | 'error'; data: { dish: string; detail?: string } }
+  | { event: 'done'; data: { request_id: string } };
+
 class ApiService {
   private async request<T>(endpoint: string, options: RequestInit = {}): Promise<T> {
     const url = `${API_BASE_URL}${endpoint}`;
@@ -75,6 +81,53 @@ class ApiService {
     return await response.json();
   }
 
+  // Recognition plus concurrent restaurant searches for the top predictions,
+  // streamed as NDJSON events
+  async recognizeAndFind(
+    imageFile: File,
+    onEvent: (event: RecognizeAndFindEvent) => void,
+    location?: { lat: number; lon: number },
+  ): Promise<void> {
+    const formData = new FormData();
+    formData.append('image', imageFile);
+    const params = new URLSearchParams({
+      ...(location && {
+        lat: location.lat.toString(),
+        lon: location.lon.toString(),
+      }),
+    });
+
+    const response = await fetch(`${API_BASE_URL}/api/food/recognize-and-find?${params}`, {
+      method: 'POST',
+      body: formData,
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`Recognition failed: ${response.statusText}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const lines = buffer.split('\n');
+      buffer = lines.pop() ?? '';
+      for (const line of lines) {
+        if (line.trim()) onEvent(JSON.parse(line));
+      }
+    }
+  }
+
+  // Stop speculative searches that are no longer needed
+  async cancelSpeculativeSearches(requestId: string, keep: string[]): Promise<{ cancelled: string[] }> {
+    const params = new URLSearchParams();
+    keep.forEach((dish) => params.append('keep', dish));
+    return this.request(`/api/food/recognize-and-find/${requestId}/cancel?${params}`, { method: 'POST' });
+  }
+
   // Restaurant Search
   async searchRestaurants(dish: string, location?: { lat: number; lon: number }): Promise<RestaurantSearchResponse> {
     const params = new URLSearchParams({
@@ -0,0 +1,412 @@
+"""
+On-disk IVF-PQ index of dish-photo embeddings for similar-dish lookups.
+
+Vectors are L2-normalised backbone embeddings. A coarse k-means splits them
+into `nlist` inverted lists; each vector is stored as its list plus an
+`m`-byte product-quantised code of its residual to the list centroid, so a
+million 1280-d vectors take ~m MB of codes instead of 5 GB of floats. A query
+scans only the `nprobe` closest lists with a per-list lookup table
+(asymmetric distance), which keeps it in the low milliseconds.
+
+Files in the index directory (all appended on insert, codes memory-mapped):
+    meta.json       dim, nlist, m, label names, model the vectors came from
+    centroids.npy   (nlist, dim) coarse centroids
+    codebooks.npy   (m, 256, dim / m) PQ codebooks
+    codes.u8        (n, m) PQ codes
+    lists.i32       (n,) inverted list of each vector
+    labels.i32      (n,) class id of each vector (-1 = unlabelled)
+    refs.txt        one reference (photo path or URL) per line
+
+`compact()` rewrites the files grouped by list so a probe reads one
+contiguous slice; run it after large inserts.
+
+Several processes (serve.py workers, the CLI) may open the same index.
+Inserts and compaction hold an exclusive flock on `.lock`. Each process
+notices rows appended by the others, or a compaction (a new lists.i32 inode),
+from the size and inode of lists.i32 before it adds or searches, and reads
+them in under a shared lock.
+
+    python ann_index.py build --images refs/ --index index/ --nlist 1024 --m 32
+    python ann_index.py add --images more_refs/ --index index/
+    python ann_index.py compact --index index/
+"""
+import argparse
+import contextlib
+import json
+import os
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+CODEBOOK_SIZE = 256
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def squared_distances(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """(n, k) squared L2 distances, without materialising x - centroids"""
+    return (x * x).sum(1, keepdims=True) - 2 * x @ centroids.T + (centroids * centroids).sum(1)
+
+
+def assign(x: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+    return np.concatenate([squared_distances(x[i:i + chunk], centroids).argmin(1)
+                           for i in range(0, len(x), chunk)]) if len(x) else np.zeros(0, dtype=np.int64)
+
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Plain Lloyd's k-means; empty clusters are re-seeded from random points"""
+    rng = np.random.default_rng(seed)
+    centroids = x[rng.choice(len(x), k, replace=len(x) < k)].copy()
+    for _ in range(iterations):
+        labels = assign(x, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, x)
+        empty = counts == 0
+        centroids[~empty] = sums[~empty] / counts[~empty, None]
+        centroids[empty] = x[rng.choice(len(x), int(empty.sum()))]
+    return centroids
+
+
+class IVFPQIndex:
+    def __init__(self, path: str):
+        """Open an index created by `IVFPQIndex.create`"""
+        self.path = path
+        with open(self._file("meta.json")) as f:
+            self.meta = json.load(f)
+        self.dim, self.nlist, self.m = self.meta["dim"], self.meta["nlist"], self.meta["m"]
+        self.dsub = self.dim // self.m
+        self.label_names: List[str] = self.meta.get("label_names", [])
+        self.centroids = np.load(self._file("centroids.npy"))
+        self.codebooks = np.load(self._file("codebooks.npy"))
+        # Precomputed for the per-query distance tables
+        self.codebooks_t = np.ascontiguousarray(self.codebooks.transpose(0, 2, 1))
+        self.codebook_norms = (self.codebooks ** 2).sum(2)[:, None, :]
+        self.code_offsets = np.arange(self.m) * CODEBOOK_SIZE
+        self.centroid_norms = (self.centroids ** 2).sum(1)
+        self.lock = threading.Lock()
+        self._load()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @contextlib.contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Lock shared by every process that has the index open"""
+        with open(self._file(".lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield  # closing the file releases it
+
+    def _stamp(self):
+        stat = os.stat(self._file("lists.i32"))
+        return stat.st_ino, stat.st_size
+
+    def _load(self):
+        self.stamp = self._stamp()
+        self.count = self.stamp[1] // 4
+        self._remap()
+        list_ids = np.fromfile(self._file("lists.i32"), dtype=np.int32, count=self.count)
+        order = np.argsort(list_ids, kind="stable")
+        bounds = np.cumsum(np.bincount(list_ids, minlength=self.nlist))[:-1]
+        self.lists = np.split(order.astype(np.int64), bounds)
+        with open(self._file("refs.txt"), "rb") as f:
+            data = np.frombuffer(f.read(), dtype=np.uint8)
+        self.ref_offsets = np.concatenate([[0], np.flatnonzero(data == 10) + 1]).astype(np.int64)[:self.count + 1]
+
+    def _remap(self):
+        self.codes = self._map("codes.u8", np.uint8, (self.count, self.m))
+        self.labels = self._map("labels.i32", np.int32, (self.count,))
+        self.vectors = self._map("vectors.f16", np.float16, (self.count, self.dim)) \
+            if self.meta.get("keep_vectors") else None
+
+    def _sync(self):
+        """Catch up with rows other processes appended, or reload after their compaction (hold both locks)"""
+        stamp = self._stamp()
+        if stamp == self.stamp:
+            return
+        if stamp[0] != self.stamp[0] or stamp[1] < self.stamp[1]:
+            self._load()
+            return
+        start, self.count = self.count, stamp[1] // 4
+        list_ids = np.fromfile(self._file("lists.i32"), dtype=np.int32, count=self.count - start, offset=start * 4)
+        self._remap()
+        with open(self._file("refs.txt"), "rb") as f:
+            f.seek(self.ref_offsets[-1])
+            data = np.frombuffer(f.read(), dtype=np.uint8)
+        ends = np.flatnonzero(data == 10)[:self.count - start] + 1 + self.ref_offsets[-1]
+        self.ref_offsets = np.concatenate([self.ref_offsets, ends])
+        ids = np.arange(start, self.count, dtype=np.int64)
+        for list_id in np.unique(list_ids):
+            self.lists[list_id] = np.concatenate([self.lists[list_id], ids[list_ids == list_id]])
+        self.stamp = stamp
+
+    def refresh(self):
+        """Pick up rows added (or a compaction run) by other processes"""
+        with self.lock:
+            if self._stamp() != self.stamp:
+                with self._file_lock(exclusive=False):
+                    self._sync()
+
+    def _map(self, name: str, dtype, shape) -> np.ndarray:
+        if self.count == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode="r", shape=shape)
+
+    @classmethod
+    def create(cls, path: str, training: np.ndarray, nlist: int = 1024, m: int = 32,
+               label_names: Sequence[str] = (), model: Optional[Dict] = None,
+               keep_vectors: bool = True, iterations: int = 10, seed: int = 0) -> "IVFPQIndex":
+        """Train the coarse centroids and PQ codebooks on `training` and write an empty index"""
+        training = normalize(training)
+        dim = training.shape[1]
+        if dim % m:
+            raise ValueError(f"Embedding size {dim} is not divisible by m={m}")
+        nlist = min(nlist, len(training))
+        print(f"Training {nlist} coarse centroids on {len(training):,} vectors...")
+        centroids = kmeans(training, nlist, iterations, seed)
+        residuals = training - centroids[assign(training, centroids)]
+        dsub = dim // m
+        print(f"Training {m} PQ codebooks of {CODEBOOK_SIZE} x {dsub}...")
+        codebooks = np.stack([kmeans(residuals[:, j * dsub:(j + 1) * dsub], CODEBOOK_SIZE, iterations, seed + j)
+                              for j in range(m)]).astype(np.float32)
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "centroids.npy"), centroids.astype(np.float32))
+        np.save(os.path.join(path, "codebooks.npy"), codebooks)
+        for name in ("codes.u8", "lists.i32", "labels.i32", "refs.txt", "vectors.f16"):
+            open(os.path.join(path, name), "wb").close()
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"dim": dim, "nlist": nlist, "m": m, "label_names": list(label_names),
+                       "keep_vectors": keep_vectors, "model": model or {}}, f, indent=2)
+        return cls(path)
+
+    def encode(self, vectors: np.ndarray):
+        """(list ids, PQ codes) for normalised vectors"""
+        list_ids = assign(vectors, self.centroids)
+        residuals = vectors - self.centroids[list_ids]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = assign(residuals[:, j * self.dsub:(j + 1) * self.dsub], self.codebooks[j])
+        return list_ids.astype(np.int32), codes
+
+    def add(self, vectors: np.ndarray, labels: Sequence[int] = None, refs: Sequence[str] = None) -> np.ndarray:
+        """Append vectors (with class ids and reference strings); returns their ids"""
+        vectors = normalize(np.atleast_2d(vectors))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d vectors, got {vectors.shape[1]}-d")
+        labels = np.full(len(vectors), -1, np.int32) if labels is None else np.asarray(labels, np.int32)
+        refs = [""] * len(vectors) if refs is None else [str(r).replace("\n", " ") for r in refs]
+        list_ids, codes = self.encode(vectors)
+
+        with self.lock, self._file_lock(exclusive=True):
+            # Another worker may have appended since we last looked: new rows go after its rows
+            self._sync()
+            start = self.count
+            with open(self._file("codes.u8"), "ab") as f:
+                f.write(codes.tobytes())
+            with open(self._file("lists.i32"), "ab") as f:
+                f.write(list_ids.tobytes())
+            with open(self._file("labels.i32"), "ab") as f:
+                f.write(labels.tobytes())
+            with open(self._file("refs.txt"), "ab") as f:
+                f.write("".join(f"{ref}\n" for ref in refs).encode())
+            if self.vectors is not None:
+                with open(self._file("vectors.f16"), "ab") as f:
+                    f.write(vectors.astype(np.float16).tobytes())
+            # Read our own rows back like anyone else's: remaps the files and extends the lists
+            self._sync()
+        return np.arange(start, start + len(vectors), dtype=np.int64)
+
+    @staticmethod
+    def _read_ref(f, offsets: np.ndarray, vector_id: int) -> str:
+        start, end = offsets[vector_id], offsets[vector_id + 1] - 1
+        f.seek(start)
+        return f.read(end - start).decode()
+
+    def ref(self, vector_id: int) -> str:
+        with self.lock, open(self._file("refs.txt"), "rb") as f:
+            return self._read_ref(f, self.ref_offsets, vector_id)
+
+    def search(self, query: np.ndarray, k: int = 10, nprobe: int = 32, refine: int = 16) -> List[Dict]:
+        """
+        Approximate k nearest neighbours of one embedding. With stored
+        vectors the best k * refine PQ candidates are re-ranked exactly.
+        """
+        query = normalize(query).reshape(-1)
+        if len(query) != self.dim:
+            raise ValueError(f"Index holds {self.dim}-d vectors, query is {len(query)}-d")
+        self.refresh()
+        # Consistent snapshot: add() and compact() replace these; the open refs.txt and
+        # the memmaps keep reading the files the snapshot was taken from
+        with self.lock:
+            lists, codes, labels, vectors = list(self.lists), self.codes, self.labels, self.vectors
+            ref_offsets = self.ref_offsets
+            refs_file = open(self._file("refs.txt"), "rb")
+        with refs_file:
+            return self._search(query, k, nprobe, refine, lists, codes, labels, vectors, ref_offsets, refs_file)
+
+    def _search(self, query, k, nprobe, refine, lists, codes, labels, vectors, ref_offsets, refs_file) -> List[Dict]:
+        coarse = self.centroid_norms - 2 * self.centroids @ query + 1  # ||q|| = 1
+        nprobe = min(nprobe, self.nlist)
+        probe = np.argpartition(coarse, nprobe - 1)[:nprobe]
+        probe = probe[[len(lists[list_id]) > 0 for list_id in probe]]
+        if not len(probe):
+            return []
+
+        # Distance tables from the query residual of each probed list to every codeword,
+        # ||r - c||^2 = ||r||^2 - 2 r.c + ||c||^2 with ||r||^2 (summed over subspaces) the coarse distance
+        residuals = (query - self.centroids[probe]).reshape(len(probe), self.m, self.dsub)
+        tables = self.codebook_norms - 2 * np.matmul(residuals.transpose(1, 0, 2), self.codebooks_t)
+        tables = np.ascontiguousarray(tables.transpose(1, 0, 2)).reshape(len(probe), -1)
+        candidates, distances = [], []
+        for p, list_id in enumerate(probe):
+            rows = lists[list_id]
+            if rows[-1] - rows[0] + 1 == len(rows):
+                block = np.asarray(codes[rows[0]:rows[-1] + 1])  # compacted list: one contiguous read
+            else:
+                block = np.asarray(codes[rows])
+            candidates.append(rows)
+            distances.append(tables[p].take(block + self.code_offsets).sum(1) + coarse[list_id])
+        candidates, distances = np.concatenate(candidates), np.concatenate(distances)
+
+        shortlist = min(len(candidates), k * refine if vectors is not None and refine else k)
+        top = np.argpartition(distances, shortlist - 1)[:shortlist]
+        candidates, distances = candidates[top], distances[top]
+        if vectors is not None and refine:
+            order = np.argsort(candidates)  # sorted rows read the memmap sequentially
+            exact = vectors[candidates[order]].astype(np.float32)
+            distances[order] = 2 - 2 * exact @ query
+        top = np.argsort(distances)[:k]
+
+        results = []
+        for i in top:
+            vector_id = int(candidates[i])
+            label = int(labels[vector_id])
+            results.append({
+                "id": vector_id,
+                "label": self.label_names[label] if 0 <= label < len(self.label_names) else None,
+                "ref": self._read_ref(refs_file, ref_offsets, vector_id),
+                # Normalised vectors: cosine similarity = 1 - d^2 / 2
+                "similarity": round(float(1 - distances[i] / 2), 4),
+            })
+        return results
+
+    def compact(self, chunk: int = 65536):
+        """
+        Rewrite the files grouped by inverted list so each probe reads a
+        contiguous block. Vector ids are renumbered; refs stay attached.
+        """
+        with self.lock, self._file_lock(exclusive=True):
+            self._sync()
+            order = np.concatenate(self.lists) if self.count else np.zeros(0, dtype=np.int64)
+            list_ids = np.repeat(np.arange(self.nlist, dtype=np.int32), [len(rows) for rows in self.lists])
+            with open(self._file("refs.txt"), "rb") as f:
+                refs = f.read()
+            arrays = {"codes.u8": self.codes, "labels.i32": self.labels}
+            if self.vectors is not None:
+                arrays["vectors.f16"] = self.vectors
+            # Stream in chunks so compaction never holds a whole file in memory
+            for name, array in arrays.items():
+                with open(self._file(name + ".tmp"), "wb") as f:
+                    for start in range(0, len(order), chunk):
+                        rows = order[start:start + chunk]
+                        sorter = np.argsort(rows)  # read the old file front to back
+                        block = np.empty((len(rows),) + array.shape[1:], dtype=array.dtype)
+                        block[sorter] = array[rows[sorter]]
+                        f.write(block.tobytes())
+            with open(self._file("refs.txt.tmp"), "wb") as f:
+                for i in order:
+                    f.write(refs[self.ref_offsets[i]:self.ref_offsets[i + 1]])
+            with open(self._file("lists.i32.tmp"), "wb") as f:
+                f.write(list_ids.tobytes())
+            self.codes = self.labels = self.vectors = None
+            for name in list(arrays) + ["refs.txt", "lists.i32"]:
+                os.replace(self._file(name + ".tmp"), self._file(name))
+            self._load()
+
+    def describe(self) -> Dict:
+        return {
+            "path": self.path,
+            "vectors": self.count,
+            "dim": self.dim,
+            "nlist": self.nlist,
+            "m": self.m,
+            "code_bytes": self.count * self.m,
+            "model": self.meta.get("model"),
+        }
+
+
+def embed_folder(model, folder: str, label_names: List[str], batch_size: int = 64):
+    """Yield (embeddings, labels, refs) batches for a folder of <label>/<photo> images"""
+    from PIL import Image
+    batch, labels, refs = [], [], []
+    for label in sorted(os.listdir(folder)):
+        label_dir = os.path.join(folder, label)
+        if not os.path.isdir(label_dir):
+            continue
+        class_id = label_names.index(label) if label in label_names else -1
+        for name in sorted(os.listdir(label_dir)):
+            try:
+                image = Image.open(os.path.join(label_dir, name)).convert("RGB")
+            except OSError:
+                continue
+            batch.append(model.embed_image(image))
+            labels.append(class_id)
+            refs.append(os.path.join(label, name))
+            if len(batch) == batch_size:
+                yield np.stack(batch), labels, refs
+                batch, labels, refs = [], [], []
+    if batch:
+        yield np.stack(batch), labels, refs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and maintain the similar-dish embedding index")
+    parser.add_argument("command", choices=["build", "add", "compact"])
+    parser.add_argument("--index", type=str, required=True, help="Index directory")
+    parser.add_argument("--images", type=str, help="Folder of <label>/<photo> reference images")
+    parser.add_argument("--model_path", type=str, default=None, help="Checkpoint to embed with (default: latest)")
+    parser.add_argument("--nlist", type=int, default=1024, help="Coarse lists (about sqrt(expected vectors))")
+    parser.add_argument("--m", type=int, default=32, help="PQ bytes per vector (must divide the embedding size)")
+    parser.add_argument("--train_size", type=int, default=100000, help="Vectors used to train the quantizers")
+    args = parser.parse_args()
+
+    if args.command == "compact":
+        index = IVFPQIndex(args.index)
+        index.compact()
+        print(f"Compacted: {index.describe()}")
+    else:
+        from recognizer import FoodRecognitionModel
+        model = FoodRecognitionModel(args.model_path)
+        batches = embed_folder(model, args.images, model.class_names)
+        if args.command == "build":
+            # Train on the first train_size vectors, then add them and everything after
+            pending, total = [], 0
+            for batch in batches:
+                pending.append(batch)
+                total += len(batch[0])
+                if total >= args.train_size:
+                    break
+            training = np.concatenate([vectors for vectors, _, _ in pending])
+            index = IVFPQIndex.create(args.index, training, args.nlist, args.m, model.class_names,
+                                      model={"arch": model.arch, "image_size": model.image_size})
+            for vectors, labels, refs in pending:
+                index.add(vectors, labels, refs)
+        else:
+            index = IVFPQIndex(args.index)
+        for vectors, labels, refs in batches:
+            index.add(vectors, labels, refs)
+            print(f"{index.count:,} vectors indexed")
+        index.compact()
+        print(f"Done: {index.describe()}")
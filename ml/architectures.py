@@ -0,0 +1,116 @@
+from typing import Dict, List, Optional, Tuple
+
+import torch
+import torch.nn as nn
+from torchvision.models import (
+    efficientnet_v2_s,
+    efficientnet_b0,
+    mobilenet_v3_large,
+    mobilenet_v3_small,
+)
+from torchvision.models.efficientnet import FusedMBConv, MBConv
+
+# Supported backbones: constructor, default input resolution and checkpoint tag
+ARCHITECTURES = {
+    "efficientnet_v2_s": {"builder": efficientnet_v2_s, "image_size": 384, "tag": "effnetv2s"},
+    "efficientnet_b0": {"builder": efficientnet_b0, "image_size": 224, "tag": "effnetb0"},
+    "mobilenet_v3_large": {"builder": mobilenet_v3_large, "image_size": 224, "tag": "mnv3l"},
+    "mobilenet_v3_small": {"builder": mobilenet_v3_small, "image_size": 224, "tag": "mnv3s"},
+}
+
+DEFAULT_ARCH = "efficientnet_v2_s"
+
+
+def classifier_head(model: nn.Module) -> nn.Linear:
+    """Return the final Linear layer of a torchvision classifier"""
+    linears = [m for m in model.classifier.modules() if isinstance(m, nn.Linear)]
+    return linears[-1]
+
+
+def build_model(arch: str = DEFAULT_ARCH, num_classes: int = 101, pretrained: bool = False) -> nn.Module:
+    """Build a backbone with its classifier head resized to num_classes"""
+    if arch not in ARCHITECTURES:
+        raise ValueError(f"Unknown architecture '{arch}'. Choose from: {', '.join(ARCHITECTURES)}")
+
+    model = ARCHITECTURES[arch]["builder"](weights='DEFAULT' if pretrained else None)
+
+    # Swap the last Linear of the classifier for one with our class count
+    for index, layer in enumerate(model.classifier):
+        if layer is classifier_head(model):
+            model.classifier[index] = nn.Linear(layer.in_features, num_classes)
+            break
+    return model
+
+
+def hidden_layers(block: nn.Module) -> Optional[Dict[str, nn.Module]]:
+    """
+    The layers around an EfficientNet block's expanded (hidden) channels:
+    the expand conv that produces them, the depthwise conv and SE that work
+    on them (MBConv only) and the project conv that consumes them. None for
+    blocks without an expansion. Only these channels are pruned: block
+    outputs feed residual connections and must keep their width.
+    """
+    layers = list(block.block)
+    if isinstance(block, MBConv) and len(layers) == 4:
+        expand, depthwise, se, project = layers
+        return {"expand": expand, "depthwise": depthwise, "se": se, "project": project}
+    if isinstance(block, FusedMBConv) and len(layers) == 2:
+        expand, project = layers
+        return {"expand": expand, "depthwise": None, "se": None, "project": project}
+    return None
+
+
+def prunable_blocks(model: nn.Module) -> List[Tuple[str, nn.Module]]:
+    return [(name, module) for name, module in model.named_modules()
+            if isinstance(module, (MBConv, FusedMBConv)) and hidden_layers(module) is not None]
+
+
+def _slice_conv(conv: nn.Conv2d, out_keep=None, in_keep=None) -> nn.Conv2d:
+    weight, bias = conv.weight.data, conv.bias.data if conv.bias is not None else None
+    depthwise = conv.groups > 1 and conv.groups == conv.in_channels
+    if out_keep is not None:
+        weight = weight[out_keep]
+        bias = bias[out_keep] if bias is not None else None
+    if in_keep is not None and not depthwise:
+        weight = weight[:, in_keep]
+    out_channels = weight.shape[0]
+    in_channels = out_channels if depthwise else weight.shape[1]
+    new = nn.Conv2d(in_channels, out_channels, conv.kernel_size, conv.stride, conv.padding, conv.dilation,
+                    groups=out_channels if depthwise else conv.groups, bias=bias is not None)
+    new.weight.data = weight.clone()
+    if bias is not None:
+        new.bias.data = bias.clone()
+    return new
+
+
+def _slice_bn(bn: nn.BatchNorm2d, keep) -> nn.BatchNorm2d:
+    new = nn.BatchNorm2d(len(keep), eps=bn.eps, momentum=bn.momentum)
+    new.weight.data, new.bias.data = bn.weight.data[keep].clone(), bn.bias.data[keep].clone()
+    new.running_mean, new.running_var = bn.running_mean[keep].clone(), bn.running_var[keep].clone()
+    return new
+
+
+def set_hidden_channels(block: nn.Module, keep: torch.Tensor):
+    """Physically keep only the hidden channels `keep` (indices) of one block"""
+    layers = hidden_layers(block)
+    expand, depthwise, se, project = layers["expand"], layers["depthwise"], layers["se"], layers["project"]
+    expand[0] = _slice_conv(expand[0], out_keep=keep)
+    expand[1] = _slice_bn(expand[1], keep)
+    if depthwise is not None:
+        depthwise[0] = _slice_conv(depthwise[0], out_keep=keep)
+        depthwise[1] = _slice_bn(depthwise[1], keep)
+    if se is not None:
+        se.fc1 = _slice_conv(se.fc1, in_keep=keep)
+        se.fc2 = _slice_conv(se.fc2, out_keep=keep)
+    project[0] = _slice_conv(project[0], in_keep=keep)
+
+
+def hidden_widths(model: nn.Module) -> Dict[str, int]:
+    return {name: hidden_layers(block)["expand"][0].out_channels for name, block in prunable_blocks(model)}
+
+
+def resize_hidden_channels(model: nn.Module, widths: Dict[str, int]):
+    """Give a freshly built model the hidden widths of a pruned checkpoint (weights come from its state dict)"""
+    for name, block in prunable_blocks(model):
+        if name in widths:
+            set_hidden_channels(block, torch.arange(widths[name]))
@@ -0,0 +1,318 @@
+"""
+Calibrate torch threading, batch size, memory format and precision per host.
+
+The sweep loads the checkpoint and times forward passes for each
+combination of intra-op threads, inter-op threads, batch size, memory format
+(contiguous / channels_last) and precision the host offers (fp32, plus bf16
+on CPUs with native support or fp16 on CUDA when asked for). Inter-op threads
+can only be set once per process, so every inter-op count is swept in its
+own spawned process. Batch sizes grow until the p95 batch latency breaks the
+SLO.
+
+Two settings are picked: the best images/s at batch size 1 within the
+SLO for the online service (one image per request), and the best images/s
+at any batch size for bulk_recognize.py. They are stored in AUTOTUNE_PATH
+under a fingerprint of the host (CPU model and flags, cores available to
+each worker, device, torch version) and the model (arch, input size,
+pruned widths). inference.py applies the stored profile at startup, with
+explicit TORCH_NUM_THREADS / MODEL_PRECISION etc. taking precedence. With
+AUTOTUNE=calibrate, a host without a profile is calibrated before the
+model loads.
+
+    python autotune.py --model_path models/best.pth --slo_ms 250
+    python autotune.py --model_path models/best.pth --precisions fp32 bf16 --workers 4
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import platform
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Dict, List, Optional
+
+import numpy as np
+import torch
+
+logger = logging.getLogger("foodfinder.ml.autotune")
+
+MEMORY_FORMATS = ("contiguous", "channels_last")
+PRECISIONS = ("fp32", "bf16", "fp16")
+CPU_FLAGS = ("avx2", "avx512f", "avx512_bf16", "amx_bf16", "amx_tile", "asimd", "sve")
+
+
+def cpu_description() -> Dict:
+    model, flags = platform.processor() or platform.machine(), set()
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                key = key.strip()
+                if key in ("model name", "Model name", "CPU part") and model in ("", platform.machine()):
+                    model = value.strip()
+                elif key in ("flags", "Features"):
+                    flags = set(value.split())
+                    break
+    except OSError:
+        pass
+    return {"model": model, "flags": sorted(flags & set(CPU_FLAGS))}
+
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def host_fingerprint(workers: int = 1) -> Dict:
+    """What the best settings depend on besides the model"""
+    device = torch.cuda.get_device_name(0) if torch.cuda.is_available() else "cpu"
+    return {
+        "cpu": cpu_description(),
+        "cores": available_cores(),
+        "workers": workers,
+        "device": device,
+        "torch": torch.__version__.split("+")[0],
+    }
+
+
+def checkpoint_model_key(path: str) -> str:
+    """arch@image_size (+ a hash of pruned widths) from the checkpoint's metadata"""
+    from architectures import ARCHITECTURES, DEFAULT_ARCH
+    checkpoint = torch.load(path, map_location="cpu", mmap=True)
+    arch = checkpoint.get("arch", DEFAULT_ARCH)
+    key = f"{arch}@{checkpoint.get('image_size', ARCHITECTURES[arch]['image_size'])}"
+    if checkpoint.get("channel_widths"):
+        key += "-" + hashlib.sha1(json.dumps(checkpoint["channel_widths"]).encode()).hexdigest()[:8]
+    return key
+
+
+def profile_key(host: Dict, model_key: str) -> str:
+    return hashlib.sha1(json.dumps(host, sort_keys=True).encode()).hexdigest()[:16] + ":" + model_key
+
+
+def available_precisions(device: torch.device) -> List[str]:
+    if device.type == "cuda":
+        return ["fp32", "fp16", "bf16"] if torch.cuda.is_bf16_supported() else ["fp32", "fp16"]
+    try:
+        native_bf16 = torch.ops.mkldnn._is_mkldnn_bf16_supported()
+    except (AttributeError, RuntimeError):
+        native_bf16 = False
+    return ["fp32", "bf16"] if native_bf16 else ["fp32"]
+
+
+def autocast(device: torch.device, precision: str):
+    """Context the forward pass runs in for `precision` (fp32 = no autocast)"""
+    if precision == "fp32":
+        return contextlib.nullcontext()
+    return torch.autocast(device.type, dtype=torch.bfloat16 if precision == "bf16" else torch.float16)
+
+
+def thread_options(limit: int) -> List[int]:
+    options, n = [], 1
+    while n < limit:
+        options.append(n)
+        n *= 2
+    return options + [limit]
+
+
+def time_batches(model, batch: torch.Tensor, device: torch.device, precision: str, runs: int,
+                 warmup: int = 2) -> List[float]:
+    timings = []
+    with torch.inference_mode(), autocast(device, precision):
+        for i in range(warmup + runs):
+            start = time.perf_counter()
+            model(batch)
+            if device.type == "cuda":
+                torch.cuda.synchronize()
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def sweep(model_path: str, interop: int, intra_options: List[int], batch_sizes: List[int],
+          memory_formats: List[str], precisions: List[str], slo_ms: float, runs: int, deadline: float) -> List[Dict]:
+    """Measure every setting for one inter-op count (run in a fresh process: inter-op is set once)"""
+    from recognizer import configure_threads, load_network
+    configure_threads(intra_options[-1], interop)
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    model, _, _, image_size = load_network(model_path, device)
+    rows = []
+    for memory_format in memory_formats:
+        if memory_format == "channels_last":
+            model = model.to(memory_format=torch.channels_last)
+        for precision in precisions:
+            for intra in intra_options:
+                torch.set_num_threads(intra)
+                for batch_size in batch_sizes:
+                    if time.time() > deadline:
+                        return rows
+                    batch = torch.randn(batch_size, 3, image_size, image_size, device=device)
+                    if memory_format == "channels_last":
+                        batch = batch.to(memory_format=torch.channels_last)
+                    try:
+                        timings = time_batches(model, batch, device, precision, runs)
+                    except RuntimeError as e:
+                        logger.warning("%s/%s unavailable: %s", memory_format, precision, e)
+                        break
+                    p50, p95 = float(np.percentile(timings, 50)), float(np.percentile(timings, 95))
+                    rows.append({
+                        "intra_op_threads": intra, "interop_threads": interop, "batch_size": batch_size,
+                        "memory_format": memory_format, "precision": precision,
+                        "p50_ms": round(p50, 2), "p95_ms": round(p95, 2),
+                        "images_per_second": round(batch_size * 1000 / p50, 2),
+                    })
+                    print(f"  interop={interop} intra={intra:2d} batch={batch_size:3d} {memory_format:13s} "
+                          f"{precision}: p50 {p50:8.1f} ms  p95 {p95:8.1f} ms  {batch_size * 1000 / p50:7.1f} img/s")
+                    # Larger batches only take longer
+                    if p95 > slo_ms:
+                        break
+    return rows
+
+
+def select(rows: List[Dict], slo_ms: float, batch_size: Optional[int] = None) -> Optional[Dict]:
+    """Highest images/s with p95 within the SLO (fewer threads on ties); the lowest p95 if none fits"""
+    rows = [r for r in rows if batch_size is None or r["batch_size"] == batch_size]
+    if not rows:
+        return None
+    within = [r for r in rows if r["p95_ms"] <= slo_ms]
+    if within:
+        best = max(within, key=lambda r: (r["images_per_second"], -r["intra_op_threads"] - r["interop_threads"]))
+        return {**best, "slo_met": True}
+    return {**min(rows, key=lambda r: r["p95_ms"]), "slo_met": False}
+
+
+def calibrate(model_path: str, slo_ms: float, workers: int = 1, batch_sizes: List[int] = None,
+              memory_formats: List[str] = None, precisions: List[str] = None, runs: int = 10,
+              budget: float = 600) -> Dict:
+    """Sweep the settings for `model_path` on this host and return the chosen profile"""
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    usable = available_precisions(device)
+    precisions = [p for p in (precisions or ["fp32"]) if p in usable]
+    limit = max(1, available_cores() // workers)
+    intra_options = thread_options(limit)
+    interop_options = [1, 2] if limit > 1 else [1]
+    batch_sizes = batch_sizes or [1, 2, 4, 8, 16, 32]
+    memory_formats = memory_formats or list(MEMORY_FORMATS)
+    deadline = time.time() + budget
+    logger.info("Calibrating %s: threads %s, inter-op %s, batches %s, %s, %s, SLO %.0f ms", model_path,
+                intra_options, interop_options, batch_sizes, memory_formats, precisions, slo_ms)
+
+    rows = []
+    for interop in interop_options:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+            rows += pool.submit(sweep, model_path, interop, intra_options, batch_sizes, memory_formats, precisions,
+                                slo_ms, runs, deadline).result()
+    if not rows:
+        raise RuntimeError("No setting could be measured within the budget")
+    return {
+        "tuned_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "checkpoint": os.path.abspath(model_path),
+        "slo_ms": slo_ms,
+        "serving": select(rows, slo_ms, batch_size=1),
+        "batch": select(rows, slo_ms),
+        "measurements": rows,
+    }
+
+
+def load_profiles(path: str) -> Dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_profile(path: str, key: str, host: Dict, profile: Dict):
+    profiles = load_profiles(path)
+    profiles[key] = {"host": host, **profile}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(profiles, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def lookup(path: str, model_path: str, workers: int = 1) -> Optional[Dict]:
+    """The stored profile for this host and checkpoint, if it was calibrated"""
+    return load_profiles(path).get(profile_key(host_fingerprint(workers), checkpoint_model_key(model_path)))
+
+
+def startup(config, model_path: Optional[str]) -> Optional[Dict]:
+    """
+    Resolve the service's threads, memory format and precision before the
+    model loads: explicit settings, then the host's stored profile
+    (calibrating first with AUTOTUNE=calibrate), then cores / workers
+    threads for multi-worker serving. Returns the profile used, if any.
+    """
+    from recognizer import configure_threads
+    profile = None
+    if config.autotune != "off" and model_path:
+        try:
+            host = host_fingerprint(config.workers)
+            key = profile_key(host, checkpoint_model_key(model_path))
+            profile = load_profiles(config.autotune_path).get(key)
+            if profile is None and config.autotune == "calibrate":
+                logger.info("No autotune profile for this host (%s); calibrating", key)
+                profile = calibrate(model_path, config.latency_slo_ms, workers=config.workers,
+                                    precisions=config.autotune_precisions, budget=config.autotune_budget)
+                save_profile(config.autotune_path, key, host, profile)
+        except (OSError, RuntimeError, KeyError, ValueError) as e:
+            logger.warning("Autotune skipped: %s", e)
+            profile = None
+
+    serving = (profile or {}).get("serving") or {}
+    if not serving and config.workers > 1:
+        serving = {"intra_op_threads": max(1, available_cores() // config.workers), "interop_threads": 1}
+    for field in ("intra_op_threads", "interop_threads"):
+        if not getattr(config, field) and serving.get(field):
+            setattr(config, field, serving[field])
+    for field in ("memory_format", "precision"):
+        if getattr(config, field) is None:
+            setattr(config, field, serving.get(field, MEMORY_FORMATS[0] if field == "memory_format" else "fp32"))
+    if profile:
+        logger.info("Autotune profile from %s: %s threads (inter-op %s), %s, %s; p95 %.1f ms at batch 1",
+                    profile["tuned_at"], config.intra_op_threads, config.interop_threads, config.memory_format,
+                    config.precision, serving.get("p95_ms", float("nan")))
+    configure_threads(config.intra_op_threads, config.interop_threads)
+    return profile
+
+
+if __name__ == "__main__":
+    from config import InferenceConfig
+    from recognizer import FoodRecognitionModel
+
+    logging.basicConfig(level=logging.INFO)
+    defaults = InferenceConfig()
+    parser = argparse.ArgumentParser(description="Calibrate threads, batch size and precision for this host")
+    parser.add_argument("--model_path", type=str, default=None, help="Checkpoint (default: latest in models/)")
+    parser.add_argument("--slo_ms", type=float, default=defaults.latency_slo_ms, help="p95 latency per batch")
+    parser.add_argument("--workers", type=int, default=defaults.workers, help="Service processes sharing the cores")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--memory_formats", nargs="+", default=list(MEMORY_FORMATS), choices=MEMORY_FORMATS)
+    parser.add_argument("--precisions", nargs="+", default=defaults.autotune_precisions, choices=PRECISIONS,
+                        help="Reduced precision changes the outputs slightly; check accuracy before enabling it")
+    parser.add_argument("--runs", type=int, default=10, help="Timed forward passes per setting")
+    parser.add_argument("--budget", type=float, default=600, help="Seconds for the whole sweep")
+    parser.add_argument("--output", type=str, default=defaults.autotune_path)
+    args = parser.parse_args()
+
+    model_path = args.model_path or FoodRecognitionModel.find_latest_model()
+    if model_path is None:
+        raise SystemExit("No checkpoint found")
+    host = host_fingerprint(args.workers)
+    key = profile_key(host, checkpoint_model_key(model_path))
+    profile = calibrate(model_path, args.slo_ms, args.workers, args.batch_sizes, args.memory_formats,
+                        args.precisions, args.runs, args.budget)
+    save_profile(args.output, key, host, profile)
+    for role in ("serving", "batch"):
+        best = profile[role]
+        print(f"{role:8s} {best['intra_op_threads']} threads, inter-op {best['interop_threads']}, "
+              f"batch {best['batch_size']}, {best['memory_format']}, {best['precision']}: "
+              f"{best['images_per_second']} img/s, p95 {best['p95_ms']} ms"
+              f"{'' if best['slo_met'] else ' (SLO not met)'}")
+    print(f"Profile {key} saved to {args.output}")
@@ -0,0 +1,288 @@
+"""
+Offline bulk recognition over a directory, glob or tar archives of images.
+
+Worker processes decode and resize images (the CPU-heavy part), the main
+process stacks them into batches for the model and streams top-k results to
+JSONL or Parquet. Input is read lazily and only a bounded window of images
+is in flight, so memory stays flat however many images there are.
+
+Without --batch_size, the batch size and torch threads come from the
+host's autotune profile (autotune.py) when there is one, else 64 and
+torch's defaults.
+
+Every --checkpoint_every images the output is flushed and the count of
+finished inputs is written to <output>.progress; a rerun with the same
+arguments skips those and appends the rest (--restart starts over).
+
+    python bulk_recognize.py photos/ --output labels.jsonl --workers 8 --batch_size 64
+    python bulk_recognize.py "archive/**/*.jpg" --output labels.parquet
+    python bulk_recognize.py shard-000.tar shard-001.tar --output labels.jsonl
+"""
+import argparse
+import glob
+import io
+import json
+import multiprocessing
+import os
+import tarfile
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+from PIL import Image
+
+import autotune
+from config import InferenceConfig
+from recognizer import FoodRecognitionModel, configure_threads
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+MEAN = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+STD = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+
+
+def is_image(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def walk_directory(root: str) -> Iterator[Tuple[str, str]]:
+    """Image paths under root in a stable order, one directory listing in memory at a time"""
+    entries = sorted(os.scandir(root), key=lambda e: e.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk_directory(entry.path)
+        elif is_image(entry.name):
+            yield entry.path, entry.path
+
+
+def iter_tar(path: str) -> Iterator[Tuple[str, bytes]]:
+    """(key, bytes) of the images in a tar, read as a stream"""
+    with tarfile.open(path, mode="r|*") as archive:
+        for member in archive:
+            if member.isfile() and is_image(member.name):
+                yield f"{path}:{member.name}", archive.extractfile(member).read()
+
+
+def iter_inputs(sources: List[str]) -> Iterator[Tuple[str, object]]:
+    """(key, path or bytes) for every image in the given directories, tars and globs"""
+    for source in sources:
+        if os.path.isdir(source):
+            yield from walk_directory(source)
+        elif source.endswith((".tar", ".tar.gz", ".tgz")) and os.path.isfile(source):
+            yield from iter_tar(source)
+        else:
+            for path in glob.iglob(source, recursive=True):
+                if os.path.isfile(path) and is_image(path):
+                    yield path, path
+
+
+def decode(item: Tuple[str, object], image_size: int) -> Tuple[str, Optional[np.ndarray], Optional[str]]:
+    """(key, HWC uint8 image at the model's size, error); runs in a worker process"""
+    key, source = item
+    try:
+        image = Image.open(io.BytesIO(source) if isinstance(source, bytes) else source)
+        # JPEG can decode straight at a reduced scale
+        image.draft("RGB", (image_size, image_size))
+        image = image.convert("RGB").resize((image_size, image_size), Image.BILINEAR)
+        return key, np.asarray(image), None
+    except Exception as e:
+        return key, None, f"{type(e).__name__}: {e}"
+
+
+class _Decoder:
+    """Picklable decode() bound to an image size, for Pool.imap"""
+    def __init__(self, image_size: int):
+        self.image_size = image_size
+
+    def __call__(self, item):
+        return decode(item, self.image_size)
+
+
+def bounded(items: Iterator, slots: threading.Semaphore) -> Iterator:
+    """Yield items only while a slot is free; Pool.imap would otherwise read the whole input ahead"""
+    for item in items:
+        slots.acquire()
+        yield item
+
+
+class ResultWriter:
+    """Appends result rows to JSONL, or to numbered Parquet parts in a directory"""
+    def __init__(self, path: str, parquet: bool, resume: bool, parts_done: int = 0, offset: int = 0):
+        self.path = path
+        self.parquet = parquet
+        self.rows = []
+        self.part = parts_done
+        if parquet:
+            import pyarrow  # noqa: F401  (fail early when Parquet output is unavailable)
+            os.makedirs(path, exist_ok=True)
+            # Parts past the checkpoint (or all of them on a fresh run) are rewritten
+            for name in os.listdir(path):
+                if name.startswith("part-") and int(name[5:10]) >= parts_done:
+                    os.remove(os.path.join(path, name))
+        else:
+            self.file = open(path, "r+b" if resume and os.path.exists(path) else "wb")
+            # Drop anything written after the last checkpoint; those inputs are redone
+            self.file.truncate(offset if resume else 0)
+            self.file.seek(0, os.SEEK_END)
+
+    def write(self, row: dict):
+        if self.parquet:
+            self.rows.append(row)
+        else:
+            self.file.write((json.dumps(row, ensure_ascii=False) + "\n").encode())
+
+    def flush(self) -> dict:
+        """Make everything written so far durable; returns the writer's resume state"""
+        if self.parquet:
+            if self.rows:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pylist([{
+                    "key": row["key"],
+                    "predictions": json.dumps(row["predictions"]) if "predictions" in row else None,
+                    "error": row.get("error"),
+                } for row in self.rows])
+                pq.write_table(table, os.path.join(self.path, f"part-{self.part:05d}.parquet"))
+                self.part += 1
+                self.rows = []
+            return {"parts": self.part}
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"offset": self.file.tell()}
+
+    def close(self):
+        if not self.parquet:
+            self.file.close()
+
+
+def load_progress(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"done": 0}
+
+
+def save_progress(path: str, progress: dict):
+    with open(path + ".tmp", "w") as f:
+        json.dump(progress, f)
+    os.replace(path + ".tmp", path)
+
+
+def tuned_batch_settings(model_path: str) -> dict:
+    """Batch size and threads of the host's autotune profile for batch work, if calibrated"""
+    try:
+        profile = autotune.lookup(InferenceConfig().autotune_path, model_path)
+    except (OSError, RuntimeError, KeyError, ValueError) as e:
+        print(f"No autotune profile: {e}")
+        return {}
+    return (profile or {}).get("batch") or {}
+
+
+def run(sources: List[str], output: str, model_path: str = None, workers: int = None, batch_size: int = None,
+        top_k: int = 5, checkpoint_every: int = 10000, restart: bool = False, report_every: float = 10.0):
+    model_path = model_path or FoodRecognitionModel.find_latest_model()
+    if batch_size is None:
+        tuned = tuned_batch_settings(model_path) if model_path else {}
+        batch_size = tuned.get("batch_size", 64)
+        if tuned:
+            print(f"Autotune profile: batch {batch_size}, {tuned['intra_op_threads']} threads")
+            configure_threads(tuned["intra_op_threads"], tuned["interop_threads"])
+    recognizer = FoodRecognitionModel(model_path)
+    model, class_names, device, image_size = recognizer.model, recognizer.class_names, recognizer.device, \
+        recognizer.image_size
+    parquet = output.endswith(".parquet")
+    progress_path = output.rstrip("/") + ".progress"
+    progress = {"done": 0} if restart else load_progress(progress_path)
+    skip = progress["done"]
+    writer = ResultWriter(output, parquet, resume=skip > 0, parts_done=progress.get("parts", 0) if skip else 0,
+                          offset=progress.get("offset", 0))
+    if skip:
+        print(f"Resuming after {skip:,} images")
+
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    # Decoded images waiting for or inside a batch; bounds memory to a few batches
+    slots = threading.Semaphore(workers * 4 + batch_size * 2)
+    inputs = iter_inputs(sources)
+    for _ in range(skip):
+        if next(inputs, None) is None:
+            break
+
+    done, errors, start = skip, 0, time.perf_counter()
+    last_report, processed = start, 0
+    batch_keys: List[str] = []
+    batch_images: List[np.ndarray] = []
+
+    def run_batch():
+        tensor = torch.from_numpy(np.stack(batch_images)).to(device).permute(0, 3, 1, 2).float().div_(255)
+        tensor = (tensor - MEAN.to(device)) / STD.to(device)
+        with torch.inference_mode():
+            probabilities = torch.softmax(model(tensor), dim=1)
+            top_probs, top_indices = torch.topk(probabilities, top_k)
+        for key, probs, indices in zip(batch_keys, top_probs.tolist(), top_indices.tolist()):
+            writer.write({"key": key, "predictions": [[i, class_names[i], round(p, 5)] for i, p in zip(indices, probs)]})
+        for _ in batch_images:
+            slots.release()
+        batch_keys.clear()
+        batch_images.clear()
+
+    # Spawned, not forked: the workers only decode and must not inherit torch's thread pools
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        for key, image, error in pool.imap(_Decoder(image_size), bounded(inputs, slots), chunksize=16):
+            if error is not None:
+                writer.write({"key": key, "error": error})
+                errors += 1
+                slots.release()
+            else:
+                batch_keys.append(key)
+                batch_images.append(image)
+            if len(batch_images) == batch_size:
+                run_batch()
+            done += 1
+            processed += 1
+
+            # Inputs finish in order, so after a flush the first `done` are all written
+            if done % checkpoint_every == 0:
+                if batch_images:
+                    run_batch()
+                save_progress(progress_path, {"done": done, **writer.flush()})
+            now = time.perf_counter()
+            if now - last_report >= report_every:
+                print(f"{done:,} images ({errors} failed), {processed / (now - start):.1f} images/s")
+                last_report = now
+
+        if batch_images:
+            run_batch()
+    save_progress(progress_path, {"done": done, "finished": True, **writer.flush()})
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    summary = {
+        "images": done,
+        "processed_this_run": processed,
+        "failed": errors,
+        "seconds": round(elapsed, 1),
+        "images_per_second": round(processed / elapsed, 1) if elapsed else None,
+        "workers": workers,
+        "batch_size": batch_size,
+        "output": output,
+    }
+    print(json.dumps(summary))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recognize dishes in a directory, glob or tar archives of images")
+    parser.add_argument("sources", nargs="+", help="Directories, glob patterns or .tar files")
+    parser.add_argument("--output", type=str, required=True, help="results.jsonl, or results.parquet (a directory)")
+    parser.add_argument("--model_path", type=str, default=None, help="Checkpoint (default: latest in models/)")
+    parser.add_argument("--workers", type=int, default=None, help="Decode processes (default: cores - 1)")
+    parser.add_argument("--batch_size", type=int, default=None, help="Default: the autotune profile's, else 64")
+    parser.add_argument("--top_k", type=int, default=5)
+    parser.add_argument("--checkpoint_every", type=int, default=10000, help="Images between resumable checkpoints")
+    parser.add_argument("--restart", action="store_true", help="Ignore an earlier run's progress")
+    args = parser.parse_args()
+
+    run(args.sources, args.output, args.model_path, args.workers, args.batch_size, args.top_k,
+        args.checkpoint_every, args.restart)
@@ -1,5 +1,5 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 @dataclass
 class TrainingConfig:
@@ -10,6 +10,8 @@ class TrainingConfig:
     weight_decay: float = 0.01
     epochs: int = 20
     model_save_dir: str = "./models"
+    arch: str = "efficientnet_v2_s"
+    image_size: int = 384
 
 @dataclass
 class InferenceConfig:
@@ -17,4 +19,31 @@ class InferenceConfig:
     top_k: int = 5
     image_size: int = 384
     host: str = "0.0.0.0"
-    port: int = 8001
\ No newline at end of file
+    port: int = 8001
+    # Cascade: a cheap first stage answers when it is confident enough,
+    # everything else escalates to the full model
+    cascade_enabled: bool = field(default_factory=lambda: os.getenv("CASCADE_ENABLED", "0") == "1")
+    # None = reuse the full model at cascade_image_size
+    cascade_model_path: str = field(default_factory=lambda: os.getenv("CASCADE_MODEL_PATH") or None)
+    cascade_image_size: int = field(default_factory=lambda: int(os.getenv("CASCADE_IMAGE_SIZE", "224")))
+    cascade_threshold: float = field(default_factory=lambda: float(os.getenv("CASCADE_THRESHOLD", "0.85")))
+    # Map checkpoint weights from the page cache instead of copying them, so
+    # several worker processes share one physical copy (CPU only)
+    mmap_weights: bool = field(default_factory=lambda: os.getenv("MODEL_MMAP", "1") == "1")
+    # Intra-op / inter-op threads per process; 0 keeps torch's defaults
+    intra_op_threads: int = field(default_factory=lambda: int(os.getenv("TORCH_NUM_THREADS", "0")))
+    interop_threads: int = field(default_factory=lambda: int(os.getenv("TORCH_INTEROP_THREADS", "0")))
+    # Worker processes sharing the cores (serve.py sets it)
+    workers: int = field(default_factory=lambda: int(os.getenv("ML_WORKERS", "1")))
+    # "contiguous" / "channels_last" and "fp32" / "bf16" / "fp16"; None = the autotune profile's choice
+    memory_format: str = field(default_factory=lambda: os.getenv("MODEL_MEMORY_FORMAT") or None)
+    precision: str = field(default_factory=lambda: os.getenv("MODEL_PRECISION") or None)
+    # Per-host settings from autotune.py: "apply" a stored profile, "calibrate" first if there is none, or "off"
+    autotune: str = field(default_factory=lambda: os.getenv("AUTOTUNE", "apply"))
+    autotune_path: str = field(default_factory=lambda: os.getenv("AUTOTUNE_PATH", "models/autotune.json"))
+    latency_slo_ms: float = field(default_factory=lambda: float(os.getenv("AUTOTUNE_SLO_MS", "250")))
+    autotune_precisions: list = field(default_factory=lambda: os.getenv("AUTOTUNE_PRECISIONS", "fp32").split(","))
+    autotune_budget: float = field(default_factory=lambda: float(os.getenv("AUTOTUNE_BUDGET_SECONDS", "300")))
+    # Similar-dish index (ann_index.py); unset disables /similar
+    embedding_index_path: str = field(default_factory=lambda: os.getenv("EMBEDDING_INDEX_PATH") or None)
+    similar_nprobe: int = field(default_factory=lambda: int(os.getenv("SIMILAR_NPROBE", "32")))
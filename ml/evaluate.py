@@ -0,0 +1,210 @@
+"""
+Score and rank every checkpoint in models/ on one fixed validation set.
+
+The validation images (a seeded, class-balanced sample of the Food-101 test
+split) are decoded and resized once per input resolution and cached as a
+uint8 array on disk, which every checkpoint of that resolution then reads
+instead of re-running the image pipeline. Logits are cached per checkpoint
+too, keyed by its size and mtime, so re-running after adding one checkpoint
+only evaluates the new one. Top-1/top-5, per-class accuracy and the
+confusion matrix are computed from the stored logits with array ops.
+
+CPU latency is measured per backend at batch size 1: eager, eager with
+channels_last memory format, and a frozen TorchScript trace.
+
+    python evaluate.py --models_dir models --per_class 20 --output eval_report.json
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List
+
+import numpy as np
+import torch
+from PIL import Image
+from torchvision.datasets import Food101
+
+from recognizer import load_network
+
+MEAN = torch.tensor([0.485, 0.456, 0.406]).view(1, 3, 1, 1)
+STD = torch.tensor([0.229, 0.224, 0.225]).view(1, 3, 1, 1)
+BACKENDS = ("eager", "channels_last", "torchscript")
+
+
+def validation_indices(dataset: Food101, per_class: int, seed: int) -> np.ndarray:
+    """`per_class` seeded images of every class, in a fixed order"""
+    labels = np.array(dataset._labels)
+    rng = np.random.default_rng(seed)
+    picked = [rng.choice(np.flatnonzero(labels == c), per_class, replace=False) for c in range(len(dataset.classes))]
+    return np.sort(np.concatenate(picked))
+
+
+def cached_images(dataset: Food101, indices: np.ndarray, image_size: int, cache_dir: str) -> np.ndarray:
+    """(N, 3, S, S) uint8 validation images at `image_size`, decoded once and memory-mapped afterwards"""
+    key = hashlib.sha1(indices.tobytes()).hexdigest()[:12]
+    path = os.path.join(cache_dir, f"val_{image_size}px_{len(indices)}_{key}.npy")
+    if not os.path.exists(path):
+        print(f"Decoding {len(indices)} validation images at {image_size}px -> {path}")
+        images = np.lib.format.open_memmap(path + ".tmp", mode="w+", dtype=np.uint8,
+                                           shape=(len(indices), 3, image_size, image_size))
+        for row, index in enumerate(indices):
+            # Same resize as the inference transform (transforms.Resize on a PIL image)
+            image = Image.open(dataset._image_files[index]).convert("RGB").resize((image_size, image_size),
+                                                                                 Image.BILINEAR)
+            images[row] = np.asarray(image).transpose(2, 0, 1)
+        images.flush()
+        del images
+        os.replace(path + ".tmp", path)
+    return np.load(path, mmap_mode="r")
+
+
+def checkpoint_key(path: str) -> str:
+    stat = os.stat(path)
+    return hashlib.sha1(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime}".encode()).hexdigest()[:12]
+
+
+def compute_logits(model, images: np.ndarray, batch_size: int) -> np.ndarray:
+    outputs = []
+    with torch.inference_mode():
+        for start in range(0, len(images), batch_size):
+            batch = torch.from_numpy(np.asarray(images[start:start + batch_size])).float().div_(255)
+            outputs.append(model((batch - MEAN) / STD).float().numpy())
+    return np.concatenate(outputs)
+
+
+def score(logits: np.ndarray, labels: np.ndarray, num_classes: int) -> Dict:
+    """Accuracy metrics and the confusion matrix from stored logits"""
+    top1 = logits.argmax(1)
+    top5 = np.argpartition(-logits, 5, axis=1)[:, :5]
+    confusion = np.bincount(labels * num_classes + top1, minlength=num_classes ** 2).reshape(num_classes, num_classes)
+    per_class = confusion.diagonal() / np.maximum(confusion.sum(1), 1)
+    off_diagonal = confusion - np.diag(confusion.diagonal())
+    worst = np.argsort(off_diagonal, axis=None)[::-1][:10]
+    return {
+        "top1": float((top1 == labels).mean()),
+        "top5": float((top5 == labels[:, None]).any(1).mean()),
+        "per_class": per_class,
+        "confusion": confusion,
+        "most_confused": [(int(i // num_classes), int(i % num_classes), int(off_diagonal.flat[i])) for i in worst
+                          if off_diagonal.flat[i] > 0],
+    }
+
+
+def backend_model(model, backend: str, image_size: int):
+    if backend == "channels_last":
+        return model.to(memory_format=torch.channels_last)
+    if backend == "torchscript":
+        example = torch.zeros(1, 3, image_size, image_size)
+        with torch.inference_mode():
+            return torch.jit.freeze(torch.jit.trace(model, example).eval())
+    return model
+
+
+def cpu_latency_ms(model, image_size: int, backend: str, runs: int, warmup: int = 5) -> float:
+    """Median batch-1 forward time"""
+    image = torch.randn(1, 3, image_size, image_size)
+    if backend == "channels_last":
+        image = image.to(memory_format=torch.channels_last)
+    timings = []
+    with torch.inference_mode():
+        for i in range(warmup + runs):
+            start = time.perf_counter()
+            model(image)
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def evaluate(checkpoints: List[str], data_path: str, per_class: int, seed: int, cache_dir: str,
+             batch_size: int, latency_runs: int, backends: List[str]) -> Dict:
+    os.makedirs(cache_dir, exist_ok=True)
+    dataset = Food101(root=data_path, split="test", download=True)
+    indices = validation_indices(dataset, per_class, seed)
+    labels = np.array(dataset._labels)[indices]
+    device = torch.device("cpu")
+    results = []
+
+    for path in checkpoints:
+        print(f"\nEvaluating {path}")
+        model, class_names, arch, image_size = load_network(path, device)
+        if class_names != dataset.classes:
+            print("  Skipped: trained on a different class list")
+            continue
+        key = f"{checkpoint_key(path)}_{os.path.basename(path)}"
+        logits_path = os.path.join(cache_dir, f"logits_{key}.npy")
+        confusion_path = os.path.join(cache_dir, f"confusion_{key}.npy")
+        images = cached_images(dataset, indices, image_size, cache_dir)
+        if os.path.exists(logits_path) and len(np.load(logits_path, mmap_mode="r")) == len(indices):
+            logits = np.load(logits_path)
+        else:
+            start = time.perf_counter()
+            logits = compute_logits(model, images, batch_size)
+            np.save(logits_path, logits)
+            print(f"  Logits for {len(logits)} images in {time.perf_counter() - start:.1f}s")
+
+        metrics = score(logits, labels, len(class_names))
+        np.save(confusion_path, metrics["confusion"])
+        latency = {}
+        for backend in backends:
+            try:
+                latency[backend] = round(cpu_latency_ms(backend_model(model, backend, image_size), image_size,
+                                                        backend, latency_runs), 2)
+            except Exception as e:
+                print(f"  {backend}: unavailable ({e})")
+        best_backend = min(latency, key=latency.get) if latency else None
+        row = {
+            "checkpoint": path,
+            "arch": arch,
+            "image_size": image_size,
+            "parameters": sum(p.numel() for p in model.parameters()),
+            "top1": round(metrics["top1"], 4),
+            "top5": round(metrics["top5"], 4),
+            "cpu_latency_ms": latency,
+            "best_backend": best_backend,
+            "worst_classes": [(class_names[c], round(float(metrics["per_class"][c]), 3))
+                              for c in np.argsort(metrics["per_class"])[:10]],
+            "most_confused": [(class_names[t], class_names[p], n) for t, p, n in metrics["most_confused"]],
+            "per_class_accuracy": {class_names[c]: round(float(a), 3) for c, a in enumerate(metrics["per_class"])},
+            "confusion_matrix": confusion_path,
+        }
+        print(f"  top-1 {row['top1']:.2%}  top-5 {row['top5']:.2%}  latency {latency}")
+        results.append(row)
+
+    results.sort(key=lambda r: (-r["top1"], min(r["cpu_latency_ms"].values(), default=float("inf"))))
+    for rank, row in enumerate(results, 1):
+        row["rank"] = rank
+    return {
+        "validation": {"split": "test", "per_class": per_class, "images": len(indices), "seed": seed},
+        "torch_threads": torch.get_num_threads(),
+        "checkpoints": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank checkpoints on a fixed validation set")
+    parser.add_argument("checkpoints", nargs="*", help="Checkpoints to score (default: every .pth in --models_dir)")
+    parser.add_argument("--models_dir", type=str, default="models")
+    parser.add_argument("--data_path", type=str, default="./data")
+    parser.add_argument("--per_class", type=int, default=20, help="Validation images per class")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache_dir", type=str, default="eval_cache", help="Decoded images and logits")
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--latency_runs", type=int, default=30)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--output", type=str, default="eval_report.json")
+    args = parser.parse_args()
+
+    checkpoints = args.checkpoints or sorted(glob.glob(os.path.join(args.models_dir, "**", "*.pth"), recursive=True))
+    report = evaluate(checkpoints, args.data_path, args.per_class, args.seed, args.cache_dir, args.batch_size,
+                      args.latency_runs, args.backends)
+
+    print(f"\n{'rank':>4s} {'top-1':>7s} {'top-5':>7s} {'ms':>8s}  checkpoint")
+    for row in report["checkpoints"]:
+        best = row["cpu_latency_ms"].get(row["best_backend"], float("nan"))
+        print(f"{row['rank']:4d} {row['top1']:7.2%} {row['top5']:7.2%} {best:8.2f}  {row['checkpoint']}")
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved: {args.output}")
@@ -0,0 +1,122 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+from torch.utils.data import Subset
+from torchvision.datasets import Food101
+
+from config import InferenceConfig
+from recognizer import FoodRecognitionModel
+
+
+def measure(model, tensor):
+    """Return (probabilities, cpu_seconds) for a single forward pass"""
+    start = time.process_time()
+    with torch.no_grad():
+        probabilities = torch.nn.functional.softmax(model(tensor), dim=1)
+    return probabilities, time.process_time() - start
+
+
+def evaluate(recognizer: FoodRecognitionModel, dataset, thresholds):
+    """
+    Score every image once with both stages, then derive the cascade
+    metrics for each threshold from the recorded confidences and costs.
+    """
+    cascade = recognizer.cascade
+    fast_conf, fast_pred, fast_cost = [], [], []
+    full_pred, full_cost, labels = [], [], []
+
+    for index, (image, label) in enumerate(dataset):
+        fast_tensor = cascade.transform(image).unsqueeze(0).to(recognizer.device)
+        full_tensor = recognizer.transform(image).unsqueeze(0).to(recognizer.device)
+
+        probabilities, cost = measure(cascade.model, fast_tensor)
+        confidence, prediction = probabilities.max(dim=1)
+        fast_conf.append(float(confidence))
+        fast_pred.append(int(prediction))
+        fast_cost.append(cost)
+
+        probabilities, cost = measure(recognizer.model, full_tensor)
+        full_pred.append(int(probabilities.argmax(dim=1)))
+        full_cost.append(cost)
+        labels.append(label)
+
+        if index % 50 == 0:
+            print(f"Scored {index + 1}/{len(dataset)} images")
+
+    fast_conf, fast_pred, fast_cost = np.array(fast_conf), np.array(fast_pred), np.array(fast_cost)
+    full_pred, full_cost, labels = np.array(full_pred), np.array(full_cost), np.array(labels)
+
+    report = {
+        "images": len(labels),
+        "fast_stage": {
+            "arch": cascade.arch,
+            "image_size": cascade.image_size,
+            "accuracy": float((fast_pred == labels).mean()),
+            "avg_cpu_ms": float(fast_cost.mean() * 1000),
+        },
+        "full_model": {
+            "arch": recognizer.arch,
+            "image_size": recognizer.image_size,
+            "accuracy": float((full_pred == labels).mean()),
+            "avg_cpu_ms": float(full_cost.mean() * 1000),
+        },
+        "cascade": [],
+    }
+
+    for threshold in thresholds:
+        escalated = fast_conf < threshold
+        predictions = np.where(escalated, full_pred, fast_pred)
+        cost = fast_cost + np.where(escalated, full_cost, 0.0)
+        report["cascade"].append({
+            "threshold": threshold,
+            "escalation_rate": float(escalated.mean()),
+            "accuracy": float((predictions == labels).mean()),
+            "avg_cpu_ms": float(cost.mean() * 1000),
+            "speedup_vs_full": float(full_cost.mean() / cost.mean()),
+        })
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Evaluate cascade inference on the Food101 validation subset')
+    parser.add_argument('--model_path', type=str, default=None, help='Full model checkpoint (default: latest)')
+    parser.add_argument('--cascade_model_path', type=str, default=None,
+                        help='Fast stage checkpoint (default: full model at lower resolution)')
+    parser.add_argument('--cascade_image_size', type=int, default=224, help='Fast stage resolution')
+    parser.add_argument('--thresholds', type=str, default='0.5,0.6,0.7,0.8,0.85,0.9,0.95')
+    parser.add_argument('--data_path', type=str, default='./data', help='Data directory')
+    parser.add_argument('--fraction', type=float, default=0.05, help='Fraction of the test split to use')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the subset')
+    parser.add_argument('--output', type=str, default='cascade_report.json')
+    args = parser.parse_args()
+
+    config = InferenceConfig(
+        cascade_enabled=True,
+        cascade_model_path=args.cascade_model_path,
+        cascade_image_size=args.cascade_image_size,
+    )
+    recognizer = FoodRecognitionModel(args.model_path, config=config)
+
+    # Raw PIL images: each stage applies its own transform
+    dataset = Food101(root=args.data_path, split='test', download=True,
+                      transform=lambda image: image.convert('RGB'))
+    rng = np.random.default_rng(args.seed)
+    indices = rng.choice(len(dataset), int(args.fraction * len(dataset)), replace=False)
+    subset = Subset(dataset, indices)
+
+    thresholds = [float(t) for t in args.thresholds.split(',')]
+    report = evaluate(recognizer, subset, thresholds)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nFull model: {report['full_model']['accuracy']*100:.2f}% @ {report['full_model']['avg_cpu_ms']:.1f} ms CPU/image")
+    print(f"Fast stage: {report['fast_stage']['accuracy']*100:.2f}% @ {report['fast_stage']['avg_cpu_ms']:.1f} ms CPU/image")
+    print(f"{'threshold':>10} {'escalated':>10} {'accuracy':>10} {'cpu ms':>10} {'speedup':>8}")
+    for row in report['cascade']:
+        print(f"{row['threshold']:>10.2f} {row['escalation_rate']*100:>9.1f}% {row['accuracy']*100:>9.2f}% "
+              f"{row['avg_cpu_ms']:>10.1f} {row['speedup_vs_full']:>7.2f}x")
+    print(f"Report written to {args.output}")
@@ -0,0 +1,52 @@
+"""
+Conditional, compressed responses for rarely changing JSON (e.g. /classes).
+
+The body is serialised once (orjson when installed) together with a strong
+ETag and a lazily built gzip copy; a request whose If-None-Match carries the
+ETag gets an empty 304.
+"""
+import gzip
+import hashlib
+import json
+import os
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class CachedJSON:
+    def __init__(self, content, cache_control: str = "public, max-age=300"):
+        self.body = dumps(content)
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        self.cache_control = cache_control
+        self._gzip: Optional[bytes] = None
+
+    def not_modified(self, if_none_match: str) -> bool:
+        tags = {tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")}
+        return "*" in tags or self.etag in tags or f"{self.etag}-gzip" in tags
+
+    def response(self, request: Request) -> Response:
+        headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding", "ETag": f'"{self.etag}"'}
+        if self.not_modified(request.headers.get("if-none-match", "")):
+            return Response(status_code=304, headers=headers)
+        accepts_gzip = "gzip" in request.headers.get("accept-encoding", "").lower()
+        if accepts_gzip and len(self.body) >= COMPRESS_MIN_BYTES:
+            if self._gzip is None:
+                self._gzip = gzip.compress(self.body, compresslevel=6)
+            headers.update({"Content-Encoding": "gzip", "ETag": f'"{self.etag}-gzip"'})
+            return Response(self._gzip, media_type="application/json", headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
@@ -1,24 +1,44 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Request, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
-import torch
-import torchvision.transforms as transforms
-from torchvision.models import efficientnet_v2_s
 from PIL import Image
+import hmac
 import io
 import json
 import os
-from typing import List, Dict
+import random
+from typing import Optional
+import logging
 import uvicorn
 import sys
+import time
+import torch
 from dotenv import load_dotenv
+from fastapi.responses import Response, FileResponse
+import autotune
+from ann_index import IVFPQIndex
+from config import InferenceConfig
+from http_cache import CachedJSON
+from observability import MetricsMiddleware, metrics_payload, setup_logging, stage
+from profiling import should_profile, store as profile_store, torch_profile
+from recognizer import FoodRecognitionModel
+from registry import ModelRegistry, timed
 
 # Load environment variables
 load_dotenv()
 
+setup_logging("ml")
+logger = logging.getLogger("foodfinder.ml")
+
 app = FastAPI(title="Food Recognition ML Service")
 
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "").split(",")
 
+# Fraction of /predict requests mirrored to the shadow version (if one is set)
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "1.0"))
+
+# Required in X-Admin-Token for the admin and model-management endpoints; without it they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 
 # CORS
 app.add_middleware(
@@ -27,218 +47,352 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
 
-class FoodRecognitionModel:
-    def __init__(self, model_path: str = None):
-        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = None
-        self.class_names = []
-        self.transform = None
-        self.load_model(model_path)
-    
-    def load_model(self, model_path: str = None):
-        """Load the trained model"""
-        print(" Loading food recognition model...")
-        
-        # If no specific model path, use the latest or default
-        if model_path is None:
-            model_path = self.find_latest_model()
-        
-        if model_path is None or not os.path.exists(model_path):
-            raise FileNotFoundError(f"Model file not found: {model_path}")
-        
-        print(f"Attempting to load model from: {model_path}")
-        
-        # Load checkpoint
-        checkpoint = torch.load(model_path, map_location=self.device)
-        print(f"Checkpoint keys: {list(checkpoint.keys())}")
-        
-        # Initialize model architecture
-        self.model = efficientnet_v2_s(pretrained=False)
-        in_features = self.model.classifier[1].in_features
-        self.model.classifier[1] = torch.nn.Linear(in_features, 101)
-        
-        # Load trained weights
-        self.model.load_state_dict(checkpoint['model_state_dict'])
-        self.model.to(self.device)
-        self.model.eval()
-        
-        # Load class names
-        self.class_names = checkpoint.get('class_names', [f"class_{i}" for i in range(101)])
-        
-        # Setup transforms (must match training)
-        self.transform = transforms.Compose([
-            transforms.Resize((384, 384)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], 
-                               std=[0.229, 0.224, 0.225])
-        ])
-        
-   
-        print(f"Sample class names: {self.class_names[:5] if self.class_names else 'None'}")
-    
-    def find_latest_model(self) -> str:
-        """Find the most recent model file in models directory"""
-        models_dir = "models"
-        if not os.path.exists(models_dir):
-            print(f"Models directory '{models_dir}' not found!")
-            return None
-        
-        model_files = [f for f in os.listdir(models_dir) if f.endswith('.pth')]
-        if not model_files:
-            print(f" No .pth files found in '{models_dir}'")
-            return None
-        
-        # Sort by modification time and return the latest
-        model_files.sort(key=lambda x: os.path.getmtime(os.path.join(models_dir, x)), reverse=True)
-        latest_model = os.path.join(models_dir, model_files[0])
-        print(f"Found latest model: {latest_model}")
-        return latest_model
-    
-    def preprocess_image(self, image: Image.Image) -> torch.Tensor:
-        """Preprocess image for model inference"""
-        print(f"Preprocessing image: {image.size} -> (384, 384)")
-        return self.transform(image).unsqueeze(0).to(self.device)
-    
-    def predict(self, image_tensor: torch.Tensor, top_k: int = 5) -> List[Dict]:
-        """Run model prediction"""
-        print(f" Running prediction with top_k={top_k}")
-        with torch.no_grad():
-            outputs = self.model(image_tensor)
-            print(f" Model outputs shape: {outputs.shape}")
-            probabilities = torch.nn.functional.softmax(outputs, dim=1)
-            top_probs, top_indices = torch.topk(probabilities, top_k)
-        
-        print("\n" + "="*60)
-        print("FOOD RECOGNITION PREDICTIONS:")
-        print("="*60)
-        
-        results = []
-        for i in range(top_k):
-            class_id = int(top_indices[0][i])
-            confidence = float(top_probs[0][i])
-            food_name = self.class_names[class_id] if class_id < len(self.class_names) else f"class_{class_id}"
-            confidence_percent = confidence * 100
-            
-            result = {
-                "class_id": class_id,
-                "food_name": food_name,
-                "confidence": confidence,
-                "description": f"This appears to be {food_name.replace('_', ' ')}"
-            }
-            results.append(result)
-            
-            # Print each prediction with clear formatting
-            print(f" #{i+1}: {food_name.replace('_', ' ').title()}")
-            print(f"   Confidence: {confidence_percent:.2f}%")
-            print(f"   Class ID: {class_id}")
-            print()
-        
-        print(f" TOP PREDICTION: {results[0]['food_name'].replace('_', ' ').title()} ({results[0]['confidence']*100:.2f}%)")
-        print("="*60 + "\n")
-        return results
+# Model registry: holds every loaded version and which one is active
+config = InferenceConfig()
+registry = ModelRegistry(loader=lambda path: FoodRecognitionModel(path, config=config))
+initial_model = os.getenv("MODEL_PATH") or FoodRecognitionModel.find_latest_model()
+# Threads, memory format and precision for this host, before the first forward pass
+autotune_profile = autotune.startup(config, initial_model)
 
-# Initialize model
 try:
-    print("🎬 Initializing food recognition service...")
-    model_service = FoodRecognitionModel()
-    print("Food recognition service initialized successfully!")
+    logger.info("Initializing food recognition service...")
+    if initial_model is None:
+        raise FileNotFoundError("No model checkpoint found")
+    registry.load(initial_model, activate=True)
+    logger.info("Food recognition service initialized successfully!")
 except Exception as e:
-    print(f"Failed to initialize model: {e}")
-    import traceback
-    traceback.print_exc()
-    model_service = None
+    logger.exception("Failed to initialize model: %s", e)
+
+# Similar-dish index of reference photo embeddings
+similar_index = None
+if config.embedding_index_path:
+    try:
+        similar_index = IVFPQIndex(config.embedding_index_path)
+        logger.info("Similar-dish index: %s", similar_index.describe())
+    except (OSError, ValueError, KeyError) as e:
+        logger.exception("Failed to open similar-dish index %s: %s", config.embedding_index_path, e)
+
+def get_version(model: Optional[str] = None):
+    """Resolve a model version or raise the matching HTTP error"""
+    try:
+        return registry.get(model)
+    except KeyError:
+        if model is None:
+            raise HTTPException(status_code=500, detail="Model not loaded")
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {model}")
+
+def run_shadow(shadow, image_pil: Image.Image, top_k: int, primary_top: int):
+    """Score an image with the shadow version; results are only recorded in metrics"""
+    try:
+        predictions = timed(shadow, shadow.model.predict_image, image_pil, top_k=top_k)
+        shadow.stats.record_shadow(predictions[0]["class_id"] == primary_top)
+    except Exception as e:
+        logger.warning("Shadow prediction failed for '%s': %s", shadow.name, e)
+
+def run_prediction(request: Request, background_tasks: BackgroundTasks, version, image_pil: Image.Image,
+                   top_k: int, model: Optional[str]):
+    """Predict with `version` (profiled if asked) and mirror to the shadow version"""
+    if should_profile(request.headers):
+        meta = {"endpoint": request.url.path, "model_version": version.name, "image_size": image_pil.size}
+        with torch_profile(meta, background_tasks):
+            predictions = timed(version, version.model.predict_image, image_pil, top_k=top_k)
+    else:
+        predictions = timed(version, version.model.predict_image, image_pil, top_k=top_k)
+    
+    shadow = registry.get_shadow() if model is None else None
+    if shadow is not None and shadow is not version and random.random() < SHADOW_SAMPLE_RATE:
+        background_tasks.add_task(run_shadow, shadow, image_pil, top_k, predictions[0]["class_id"])
+    return predictions
 
 @app.post("/predict")
-async def predict_food(image: UploadFile = File(...), top_k: int = 5):
+async def predict_food(request: Request, background_tasks: BackgroundTasks, image: UploadFile = File(...),
+                       top_k: int = 5, model: Optional[str] = None):
     """
-    Predict food from uploaded image
+    Predict food from uploaded image. `model` selects a specific loaded
+    version; by default the active version answers.
     """
-    print(f"\nNEW PREDICTION REQUEST RECEIVED!")
-    print(f"File: {image.filename}")
-    print(f"Content-type: {image.content_type}")
-    print(f"Top_k: {top_k}")
+    logger.info("Prediction request: file=%s content_type=%s top_k=%d model=%s",
+                image.filename, image.content_type, top_k, model)
     
-    if model_service is None:
-        error_msg = "Model not loaded"
-        print(f" ERROR: {error_msg}")
-        raise HTTPException(status_code=500, detail=error_msg)
+    version = get_version(model)
     
     if not image.content_type.startswith('image/'):
         error_msg = "File must be an image"
-        print(f" ERROR: {error_msg}")
+        logger.warning(error_msg)
         raise HTTPException(status_code=400, detail=error_msg)
     
     try:
         # Read and validate image
         image_data = await image.read()
-        print(f"Image size: {len(image_data)} bytes")
+        logger.debug("Image size: %d bytes", len(image_data))
         
         if len(image_data) == 0:
             error_msg = "Empty image file"
-            print(f"ERROR: {error_msg}")
+            logger.warning(error_msg)
             raise HTTPException(status_code=400, detail=error_msg)
         
-        image_pil = Image.open(io.BytesIO(image_data)).convert('RGB')
-        print(f"Image dimensions: {image_pil.size}, Mode: {image_pil.mode}")
+        with stage("decode"):
+            image_pil = Image.open(io.BytesIO(image_data)).convert('RGB')
+        logger.debug("Image dimensions: %s", image_pil.size)
         
-        # Preprocess and predict
-        image_tensor = model_service.preprocess_image(image_pil)
-        print(f"Image tensor shape: {image_tensor.shape}")
-        
-        predictions = model_service.predict(image_tensor, top_k=top_k)
+        predictions = run_prediction(request, background_tasks, version, image_pil, top_k, model)
         
         response = {
             "success": True,
             "predictions": predictions,
             "top_prediction": predictions[0] if predictions else None,
             "model": "efficientnetv2-small",
+            "model_version": version.name,
             "message": f"Found {len(predictions)} potential matches"
         }
         
-        print(f" Prediction completed successfully!: ")
-        
+        logger.info("Prediction completed: %s (%.2f%%) by %s",
+                    predictions[0]["food_name"], predictions[0]["confidence"] * 100, version.name)
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Prediction failed: {str(e)}"
-        print(f"ERROR: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
+@app.post("/predict/raw")
+async def predict_raw(request: Request, background_tasks: BackgroundTasks, top_k: int = 5,
+                      model: Optional[str] = None):
+    """
+    Internal fast path for the gateway: the body is an image already scaled
+    to the model's input size, as raw RGB bytes (application/octet-stream
+    with X-Image-Width / X-Image-Height) or a JPEG. Answers with a compact
+    [class_id, food_name, confidence] list.
+    """
+    version = get_version(model)
+    content_type = request.headers.get("content-type", "")
+    body = await request.body()
+    
+    with stage("decode"):
+        if content_type == "application/octet-stream":
+            try:
+                width, height = int(request.headers["x-image-width"]), int(request.headers["x-image-height"])
+            except (KeyError, ValueError):
+                raise HTTPException(status_code=400, detail="X-Image-Width and X-Image-Height are required")
+            if width <= 0 or height <= 0 or len(body) != width * height * 3:
+                raise HTTPException(status_code=400, detail=f"Expected {width}x{height}x3 bytes, got {len(body)}")
+            image_pil = Image.frombuffer("RGB", (width, height), body, "raw", "RGB", 0, 1)
+        elif content_type.startswith("image/"):
+            try:
+                image_pil = Image.open(io.BytesIO(body)).convert('RGB')
+            except OSError as e:
+                raise HTTPException(status_code=400, detail=f"Could not decode image: {e}")
+        else:
+            raise HTTPException(status_code=415, detail="Send application/octet-stream or an image/* body")
+    
+    try:
+        predictions = run_prediction(request, background_tasks, version, image_pil, top_k, model)
+    except Exception as e:
+        logger.exception("Prediction failed: %s", e)
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+    
+    logger.info("Raw prediction completed: %s (%.2f%%) by %s",
+                predictions[0]["food_name"], predictions[0]["confidence"] * 100, version.name)
+    return {
+        "model": version.model.arch,
+        "model_version": version.name,
+        "image_size": version.model.image_size,
+        "predictions": [[p["class_id"], p["food_name"], round(p["confidence"], 6)] for p in predictions],
+    }
+
+async def read_upload(image: UploadFile) -> Image.Image:
+    if not image.content_type.startswith('image/'):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    image_data = await image.read()
+    if len(image_data) == 0:
+        raise HTTPException(status_code=400, detail="Empty image file")
+    with stage("decode"):
+        try:
+            return Image.open(io.BytesIO(image_data)).convert('RGB')
+        except OSError as e:
+            raise HTTPException(status_code=400, detail=f"Could not decode image: {e}")
+
+def get_similar_index() -> IVFPQIndex:
+    if similar_index is None:
+        raise HTTPException(status_code=503, detail="Similar-dish index not configured (EMBEDDING_INDEX_PATH)")
+    return similar_index
+
+@app.post("/similar")
+async def similar_dishes(image: UploadFile = File(...), k: int = 10, nprobe: Optional[int] = None,
+                         model: Optional[str] = None):
+    """
+    Reference dish photos closest to the uploaded one by embedding, along
+    with the usual top-5 classes from the same forward pass.
+    """
+    index = get_similar_index()
+    version = get_version(model)
+    image_pil = await read_upload(image)
+    predictions, embedding = timed(version, version.model.predict_with_embedding, image_pil, top_k=5)
+    if len(embedding) != index.dim:
+        raise HTTPException(status_code=409, detail=f"Model {version.name} produces {len(embedding)}-d embeddings, "
+                                                    f"the index holds {index.dim}-d ones")
+    
+    start = time.perf_counter()
+    with stage("knn"):
+        neighbors = index.search(embedding, k=k, nprobe=nprobe or config.similar_nprobe)
+    search_ms = (time.perf_counter() - start) * 1000
+    logger.info("Similar: %d neighbours in %.2f ms (top class %s)", len(neighbors), search_ms,
+                predictions[0]["food_name"])
+    return {
+        "neighbors": neighbors,
+        "predictions": predictions,
+        "model_version": version.name,
+        "search_ms": round(search_ms, 3),
+    }
+
+@app.post("/embed")
+async def embed(image: UploadFile = File(...), model: Optional[str] = None):
+    """The image's L2-normalised embedding"""
+    version = get_version(model)
+    image_pil = await read_upload(image)
+    embedding = timed(version, version.model.embed_image, image_pil)
+    return {"model_version": version.name, "dim": len(embedding), "embedding": embedding.round(6).tolist()}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    status = "healthy" if model_service is not None else "unhealthy"
+    status = "healthy" if registry.is_ready() else "unhealthy"
+    active = registry.get() if registry.is_ready() else None
     response = {
         "status": status,
-        "model_loaded": model_service is not None,
-        "device": str(model_service.device) if model_service else "none"
+        "model_loaded": active is not None,
+        "model_version": active.name if active else None,
+        "image_size": active.model.image_size if active else None,
+        "device": str(active.model.device) if active else "none",
+        "similar_index_vectors": similar_index.count if similar_index else None
     }
-    print(f" Health check: {response}")
+    logger.debug("Health check: %s", response)
     return response
 
+# Serialised /classes per loaded version object (a reloaded version under the same name is a new object)
+classes_responses = {}
+
 @app.get("/classes")
-async def get_classes():
-    """Get list of all food classes"""
-    print(" Classes endpoint called")
-    
-    if model_service is None:
-        error_msg = "Model not loaded"
-        print(f"ERROR: {error_msg}")
-        raise HTTPException(status_code=500, detail=error_msg)
-    
-    response = {
-        "classes": model_service.class_names,
-        "total_classes": len(model_service.class_names)
+async def get_classes(request: Request, model: Optional[str] = None):
+    """Get list of all food classes (ETag / 304, gzip, Cache-Control)"""
+    version = get_version(model)
+    cached = classes_responses.get(version.name)
+    if cached is None or cached[0] is not version:
+        class_names = version.model.class_names
+        cached = (version, CachedJSON({
+            "classes": class_names,
+            "total_classes": len(class_names)
+        }))
+        classes_responses[version.name] = cached
+        logger.debug("Classes response: %d classes", len(class_names))
+    return cached[1].response(request)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/models")
+async def list_models():
+    """List loaded model versions with their latency metrics"""
+    return registry.describe()
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.post("/similar/add", dependencies=[Depends(require_admin)])
+async def add_similar_reference(image: UploadFile = File(...), label: Optional[str] = None,
+                                ref: Optional[str] = None):
+    """Insert a reference photo into the index (label: a class name, ref: where the photo lives)"""
+    index = get_similar_index()
+    version = get_version()
+    image_pil = await read_upload(image)
+    if label is not None and label not in index.label_names:
+        raise HTTPException(status_code=400, detail=f"Unknown label '{label}'")
+    embedding = timed(version, version.model.embed_image, image_pil)
+    try:
+        ids = index.add(embedding, labels=[index.label_names.index(label) if label else -1],
+                        refs=[ref or image.filename])
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"id": int(ids[0]), "vectors": index.count}
+
+@app.post("/models/load", status_code=202, dependencies=[Depends(require_admin)])
+async def load_model_version(path: str, version: Optional[str] = None, activate: bool = False):
+    """
+    Load a checkpoint in the background. It is warmed up before being
+    registered, and only swapped in when `activate` is set.
+    """
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"Model file not found: {path}")
+    try:
+        name = registry.load_async(path, name=version, activate=activate)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"version": name, "status": "loading", "activate": activate}
+
+@app.post("/models/{version}/activate", dependencies=[Depends(require_admin)])
+async def activate_model_version(version: str):
+    """Atomically switch traffic to an already loaded version"""
+    try:
+        registry.activate(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    return {"active": registry.active}
+
+@app.post("/models/shadow", dependencies=[Depends(require_admin)])
+async def set_shadow_version(version: Optional[str] = None):
+    """Mirror traffic to `version` for comparison; omit it to stop shadowing"""
+    try:
+        registry.set_shadow(version)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    return {"active": registry.active, "shadow": registry.shadow}
+
+@app.delete("/models/{version}", dependencies=[Depends(require_admin)])
+async def unload_model_version(version: str):
+    """Drop a loaded version; in-flight requests using it still complete"""
+    try:
+        registry.unload(version)
+        classes_responses.pop(version, None)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"unloaded": version}
+
+@app.get("/admin/autotune", dependencies=[Depends(require_admin)])
+async def autotune_state():
+    """Settings in effect and the autotune profile they came from"""
+    return {
+        "intra_op_threads": torch.get_num_threads(),
+        "interop_threads": torch.get_num_interop_threads(),
+        "memory_format": config.memory_format,
+        "precision": config.precision,
+        "profile": {k: v for k, v in autotune_profile.items() if k != "measurements"} if autotune_profile else None,
     }
-    print(f" Classes response: {len(model_service.class_names)} classes")
-    print(f" Sample classes: {model_service.class_names[:10]}")
-    return response
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Stored profiles, newest first"""
+    return {"profiles": profile_store.list()}
+
+@app.get("/admin/profiles/{profile_id}/{artifact}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str, artifact: str):
+    """Download one artifact of a profile (e.g. `trace.json` for chrome://tracing, `txt`)"""
+    path = profile_store.path(profile_id, artifact)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path)
 
 if __name__ == "__main__":
-    print("Starting FastAPI server on http://0.0.0.0:8001")
-    # Force flush to ensure prints appear immediately
-    sys.stdout.flush()
+    logger.info("Starting FastAPI server on http://0.0.0.0:8001")
     uvicorn.run(app, host="0.0.0.0", port=8001, reload=False, log_level="info")
\ No newline at end of file
@@ -0,0 +1,155 @@
+"""
+Metrics and logging for the ML service.
+
+Prometheus histograms cover each stage of a prediction (decode, preprocess,
+forward, top-k). Logging goes through a QueueHandler so request threads
+never block on stdout; LOG_LEVEL and LOG_SAMPLE_RATE control how much of
+the per-request chatter is emitted at all.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from starlette.routing import Match
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+STAGE_LATENCY = Histogram(
+    "foodfinder_ml_stage_seconds", "Time spent in each prediction stage",
+    ["stage"], buckets=STAGE_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "foodfinder_ml_request_seconds", "End-to-end request latency",
+    ["route", "status"], buckets=STAGE_BUCKETS,
+)
+IN_FLIGHT = Gauge("foodfinder_ml_inflight_requests", "Requests currently being processed", ["route"])
+LOG_QUEUE_DEPTH = Gauge("foodfinder_ml_log_queue_depth", "Log records waiting for the background writer")
+LOG_RECORDS_DROPPED = Counter("foodfinder_ml_log_records_dropped_total", "Log records dropped on a full queue")
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block of work into the stage histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+
+def metrics_payload():
+    """Body and content type for a /metrics endpoint"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware tracking in-flight requests and latency per route template.
+
+    `routes` (the app's route list) lets in-flight requests be labelled before
+    the router has run; without it they are counted under "unmatched".
+    """
+
+    def __init__(self, app, routes=None):
+        self.app = app
+        self.routes = routes if routes is not None else []
+
+    def route_template(self, scope) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        route = self.route_template(scope)
+        in_flight = IN_FLIGHT.labels(route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(route, str(status["code"])).observe(time.perf_counter() - start)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every WARNING and above, but only a fraction of lower-level records"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never block the caller: when the queue is full the record is dropped and counted"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_listener = None
+
+
+def setup_logging(service: str):
+    """Route all logging through a background queue listener (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(f"%(asctime)s {service} %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.Queue(maxsize=10000)
+    queue_handler = DroppingQueueHandler(log_queue)
+    LOG_QUEUE_DEPTH.set_function(log_queue.qsize)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
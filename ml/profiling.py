@@ -0,0 +1,125 @@
+"""
+Opt-in profiling of production predictions.
+
+A request is profiled when it carries `X-Profile: 1` plus an `X-Profile-Token`
+matching PROFILE_TOKEN (without a token the header is ignored), or is picked
+by PROFILE_SAMPLE_RATE. The forward pass then runs under torch.profiler and
+the Chrome trace and operator table land in a bounded on-disk ring buffer,
+readable through /admin/profiles. Exporting and storing them runs in the
+threadpool after the response, not on the event loop.
+
+The store and sampling rules mirror server/app/profiling.py on purpose: the
+two services are deployed separately with their own requirements and share
+no package, and the gateway's copy profiles with pyinstrument/cProfile plus
+a SQL tally instead of torch.profiler.
+"""
+import hmac
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import torch
+from fastapi import BackgroundTasks
+
+logger = logging.getLogger("foodfinder.ml.profiling")
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_ENTRIES = int(os.getenv("PROFILE_MAX_ENTRIES", "50"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+
+
+class ProfileStore:
+    """Ring buffer of profile artifacts on disk: the oldest entries are evicted first"""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_entries: int = PROFILE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _entries(self) -> List[str]:
+        metas = [f for f in os.listdir(self.directory) if f.endswith(".meta.json")]
+        return sorted(f[:-len(".meta.json")] for f in metas)
+
+    def save(self, kind: str, artifacts: Dict[str, bytes], meta: Dict) -> str:
+        """Store artifacts {extension: bytes} plus metadata; return the profile id"""
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            for ext, data in artifacts.items():
+                with open(os.path.join(self.directory, f"{profile_id}.{ext}"), "wb") as f:
+                    f.write(data)
+            meta = {**meta, "id": profile_id, "kind": kind, "artifacts": sorted(artifacts),
+                    "created_at": time.time()}
+            # Metadata is written last so readers never see a half-written entry
+            with open(os.path.join(self.directory, f"{profile_id}.meta.json"), "w") as f:
+                json.dump(meta, f)
+            for stale in self._entries()[:-self.max_entries]:
+                for name in os.listdir(self.directory):
+                    if name.startswith(stale + "."):
+                        os.remove(os.path.join(self.directory, name))
+        return profile_id
+
+    def list(self) -> List[Dict]:
+        result = []
+        for profile_id in reversed(self._entries()):
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.meta.json")) as f:
+                    result.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # evicted while listing
+        return result
+
+    def path(self, profile_id: str, ext: str) -> Optional[str]:
+        if os.path.basename(profile_id) != profile_id or os.path.basename(ext) != ext:
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{ext}")
+        return path if os.path.exists(path) else None
+
+
+def should_profile(headers) -> bool:
+    """Decide whether this request gets profiled"""
+    if headers.get("x-profile") == "1":
+        # Closed by default: forcing a profile needs PROFILE_TOKEN configured and presented
+        token = headers.get("x-profile-token")
+        return PROFILE_TOKEN is not None and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+store = ProfileStore()
+
+
+@contextmanager
+def torch_profile(meta: Dict, background_tasks: BackgroundTasks):
+    """Run the enclosed block under torch.profiler; the trace is stored by a background task"""
+    with torch.profiler.profile(
+        activities=[torch.profiler.ProfilerActivity.CPU],
+        record_shapes=True,
+        with_stack=False,
+    ) as prof:
+        yield
+    # Sync background tasks run in the threadpool once the response is sent
+    background_tasks.add_task(store_torch_profile, prof, meta)
+
+
+def store_torch_profile(prof, meta: Dict):
+    """Export the Chrome trace and operator table and save them (blocking)"""
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as tmp:
+            trace_path = tmp.name
+        prof.export_chrome_trace(trace_path)
+        with open(trace_path, "rb") as f:
+            trace = f.read()
+        os.remove(trace_path)
+        table = prof.key_averages().table(sort_by="cpu_time_total", row_limit=40).encode()
+        profile_id = store.save("torch", {"trace.json": trace, "txt": table}, meta)
+        logger.info("Stored torch profile %s", profile_id)
+    except Exception as e:
+        logger.warning("Failed to store torch profile: %s", e)
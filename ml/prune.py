@@ -0,0 +1,196 @@
+"""
+Structured channel pruning of a trained checkpoint to FLOPs budgets.
+
+The prunable channels are the expanded (hidden) channels inside each MBConv
+and FusedMBConv block; block outputs feed residual connections and keep
+their width. Channels are ranked by the |gamma| of the BatchNorm after the
+expand conv (`bn`) or by the L1 norm of the expand conv filters (`l1`),
+normalised per block so blocks are comparable. For every target a global
+importance threshold is binary-searched until the pruned network fits the
+FLOPs budget; kept widths are rounded up to multiples of 8.
+
+Pruned layers are rebuilt at their new size (not masked), fine-tuned briefly
+with Food101Trainer and saved with their widths in the checkpoint, which
+load_network restores. The report lists FLOPs, parameters, validation
+accuracy and CPU latency for the original model and every level.
+
+    python prune.py models/food101_effnetv2s_384px_...pth --targets 0.75 0.5 0.35 --epochs 2
+"""
+import argparse
+import copy
+import json
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from architectures import hidden_layers, hidden_widths, prunable_blocks, set_hidden_channels
+from recognizer import load_network
+from train import Food101Trainer, cpu_latency_ms
+
+CRITERIA = ("bn", "l1")
+MIN_WIDTH = 8
+
+
+def count_flops(model: nn.Module, image_size: int) -> int:
+    """FLOPs (2 x multiply-accumulates) of the conv and linear layers for one image"""
+    macs = []
+
+    def conv_hook(module, inputs, output):
+        kernel = module.kernel_size[0] * module.kernel_size[1] * module.in_channels // module.groups
+        macs.append(output.numel() * kernel)
+
+    def linear_hook(module, inputs, output):
+        macs.append(output.numel() * module.in_features)
+
+    hooks = [m.register_forward_hook(conv_hook if isinstance(m, nn.Conv2d) else linear_hook)
+             for m in model.modules() if isinstance(m, (nn.Conv2d, nn.Linear))]
+    model.eval()
+    with torch.inference_mode():
+        model(torch.zeros(1, 3, image_size, image_size, device=next(model.parameters()).device))
+    for hook in hooks:
+        hook.remove()
+    return 2 * sum(macs)
+
+
+def count_parameters(model: nn.Module) -> int:
+    return sum(p.numel() for p in model.parameters())
+
+
+def channel_importance(model: nn.Module, criterion: str) -> dict:
+    """Per-block hidden channel scores, divided by the block's mean score"""
+    scores = {}
+    for name, block in prunable_blocks(model):
+        expand = hidden_layers(block)["expand"]
+        if criterion == "bn":
+            score = expand[1].weight.detach().abs()
+        else:
+            score = expand[0].weight.detach().abs().flatten(1).sum(1)
+        scores[name] = (score / score.mean().clamp_min(1e-12)).cpu()
+    return scores
+
+
+def keep_indices(scores: dict, threshold: float) -> dict:
+    """Channels at or above threshold in every block, at least MIN_WIDTH, rounded up to a multiple of 8"""
+    keep = {}
+    for name, score in scores.items():
+        width = int((score >= threshold).sum())
+        width = min(len(score), max(MIN_WIDTH, -(-width // 8) * 8))
+        keep[name] = torch.sort(torch.topk(score, width).indices).values
+    return keep
+
+
+def prune(model: nn.Module, keep: dict) -> nn.Module:
+    pruned = copy.deepcopy(model)
+    for name, block in prunable_blocks(pruned):
+        set_hidden_channels(block, keep[name])
+    return pruned
+
+
+def prune_to_budget(model: nn.Module, scores: dict, budget: float, image_size: int, steps: int = 20):
+    """Least pruning whose FLOPs fit `budget`; returns (pruned model, its FLOPs)"""
+    low, high = 0.0, max(float(s.max()) for s in scores.values()) + 1
+    best = None
+    for _ in range(steps):
+        threshold = (low + high) / 2
+        candidate = prune(model, keep_indices(scores, threshold))
+        flops = count_flops(candidate, image_size)
+        if flops <= budget:
+            best, high = (candidate, flops), threshold
+        else:
+            low = threshold
+    if best is None:
+        candidate = prune(model, keep_indices(scores, high))
+        best = (candidate, count_flops(candidate, image_size))
+    return best
+
+
+def describe(model: nn.Module, image_size: int, accuracy: float, checkpoint: str) -> dict:
+    return {
+        "checkpoint": checkpoint,
+        "flops": count_flops(model, image_size),
+        "parameters": count_parameters(model),
+        "val_accuracy": round(accuracy, 2),
+        "cpu_latency_ms": round(cpu_latency_ms(copy.deepcopy(model), image_size), 2),
+    }
+
+
+def main(args):
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    model, class_names, arch, image_size = load_network(args.checkpoint, device)
+    trainer = Food101Trainer(data_path=args.data_path, batch_size=args.batch_size, num_workers=args.workers,
+                             arch=arch, image_size=image_size, save_dir=args.save_dir)
+    if trainer.class_names != class_names:
+        raise SystemExit("Checkpoint was trained on a different class list")
+
+    trainer.use_model(model, hidden_widths(model))
+    baseline = describe(model, image_size, trainer.validate(), args.checkpoint)
+    report = {"arch": arch, "image_size": image_size, "criterion": args.criterion, "epochs": args.epochs,
+              "torch_threads": torch.get_num_threads(), "baseline": baseline, "levels": []}
+    print(f"Baseline: {baseline['flops'] / 1e9:.2f} GFLOPs, {baseline['parameters']:,} parameters, "
+          f"{baseline['val_accuracy']:.2f}% val, {baseline['cpu_latency_ms']:.1f} ms")
+
+    scores = channel_importance(model, args.criterion)
+    for target in sorted(args.targets, reverse=True):
+        print(f"\nPruning to {target:.0%} of the original FLOPs ({args.criterion} criterion)...")
+        pruned, flops = prune_to_budget(model, scores, target * baseline["flops"], image_size)
+        widths = hidden_widths(pruned)
+        trainer.use_model(pruned, widths, lr=args.lr)
+        before = trainer.validate()
+        print(f"  {flops / 1e9:.2f} GFLOPs, {count_parameters(pruned):,} parameters, {before:.2f}% before fine-tuning")
+
+        trainer.save_dir = os.path.join(args.save_dir, f"pruned_{round(target * 100)}")
+        os.makedirs(trainer.save_dir, exist_ok=True)
+        path = trainer.train(epochs=args.epochs)
+
+        # Reload from disk: the exported checkpoint must rebuild at the pruned size
+        exported, _, _, _ = load_network(path, device)
+        assert count_parameters(exported) == count_parameters(pruned), "exported checkpoint is not the pruned size"
+        trainer.use_model(exported, widths)
+        row = describe(exported, image_size, trainer.validate(), path)
+        row.update({
+            "target": target,
+            "flops_ratio": round(row["flops"] / baseline["flops"], 3),
+            "accuracy_before_finetune": round(before, 2),
+            "speedup": round(baseline["cpu_latency_ms"] / row["cpu_latency_ms"], 2),
+            "hidden_channels": sum(widths.values()),
+        })
+        report["levels"].append(row)
+
+    print(f"\n{'target':>6s} {'GFLOPs':>7s} {'params':>12s} {'val acc':>8s} {'CPU ms':>8s} {'speedup':>8s}")
+    print(f"{'1.00':>6s} {baseline['flops'] / 1e9:7.2f} {baseline['parameters']:12,d} "
+          f"{baseline['val_accuracy']:7.2f}% {baseline['cpu_latency_ms']:8.2f} {'1.00x':>8s}")
+    for row in report["levels"]:
+        print(f"{row['target']:6.2f} {row['flops'] / 1e9:7.2f} {row['parameters']:12,d} "
+              f"{row['val_accuracy']:7.2f}% {row['cpu_latency_ms']:8.2f} {row['speedup']:7.2f}x")
+
+    output = args.output or os.path.join(args.save_dir, "prune_report.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved: {output}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prune a trained checkpoint to FLOPs budgets and fine-tune it")
+    parser.add_argument("checkpoint", type=str, help="Trained checkpoint to prune")
+    parser.add_argument("--targets", type=float, nargs="+", default=[0.75, 0.5, 0.35],
+                        help="FLOPs budgets as fractions of the original")
+    parser.add_argument("--criterion", type=str, default="bn", choices=CRITERIA,
+                        help="bn: |BatchNorm gamma| of the expanded channels; l1: L1 norm of their filters")
+    parser.add_argument("--epochs", type=int, default=2, help="Fine-tuning epochs per level")
+    parser.add_argument("--lr", type=float, default=1e-4, help="Fine-tuning learning rate")
+    parser.add_argument("--batch_size", type=int, default=32)
+    parser.add_argument("--data_path", type=str, default="./data")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save_dir", type=str, default="./models/pruned")
+    parser.add_argument("--output", type=str, default=None, help="Report path (default: save_dir/prune_report.json)")
+    args = parser.parse_args()
+    if args.epochs < 1:
+        parser.error("--epochs must be at least 1")
+
+    torch.manual_seed(args.seed)
+    np.random.seed(args.seed)
+    main(args)
@@ -0,0 +1,278 @@
+"""
+Food recognition model: checkpoint loading, preprocessing, the optional
+cascade stage and top-k formatting. Importable without starting the
+service (inference.py builds the API and registry on top of it).
+"""
+import contextlib
+import logging
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+import torch
+import torchvision.transforms as transforms
+from PIL import Image
+
+from architectures import ARCHITECTURES, DEFAULT_ARCH, build_model, resize_hidden_channels
+from config import InferenceConfig
+from observability import stage
+
+logger = logging.getLogger("foodfinder.ml.recognizer")
+
+def build_transform(image_size: int):
+    """Preprocessing pipeline (must match training)"""
+    return transforms.Compose([
+        transforms.Resize((image_size, image_size)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], 
+                           std=[0.229, 0.224, 0.225])
+    ])
+
+def configure_threads(intra_op: int = 0, interop: int = 0):
+    """Set torch's per-process thread pools (0 leaves the default); call before the first forward pass"""
+    if intra_op > 0:
+        torch.set_num_threads(intra_op)
+    if interop > 0:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError as e:
+            # Only allowed once, before any inter-op work has started
+            logger.warning("Could not set inter-op threads to %d: %s", interop, e)
+    logger.info("Torch threads: intra-op %d, inter-op %d", torch.get_num_threads(), torch.get_num_interop_threads())
+
+def load_network(model_path: str, device: torch.device, mmap: bool = False):
+    """
+    Load a checkpoint and return (model, class_names, arch, image_size).
+
+    With `mmap` (CPU only) the weight tensors stay backed by the checkpoint
+    file through the page cache, so processes loading the same file share
+    one physical copy; pages are copy-on-write and never written in eval.
+    """
+    if model_path is None or not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model file not found: {model_path}")
+    
+    logger.info("Attempting to load model from: %s", model_path)
+    mmap = mmap and device.type == "cpu"
+    try:
+        checkpoint = torch.load(model_path, map_location=device, mmap=mmap)
+    except RuntimeError as e:
+        if not mmap:
+            raise
+        # Legacy (pre-zipfile) checkpoints cannot be mapped
+        logger.warning("Cannot memory-map %s (%s); loading a private copy", model_path, e)
+        checkpoint = torch.load(model_path, map_location=device)
+        mmap = False
+    logger.info("Checkpoint keys: %s", list(checkpoint.keys()))
+    
+    # Older checkpoints predate the 'arch' key and are all EfficientNetV2-S
+    arch = checkpoint.get('arch', DEFAULT_ARCH)
+    class_names = checkpoint.get('class_names', [f"class_{i}" for i in range(101)])
+    image_size = checkpoint.get('image_size', ARCHITECTURES[arch]['image_size'])
+    
+    model = build_model(arch, num_classes=len(class_names))
+    if checkpoint.get('channel_widths'):
+        # Channel-pruned checkpoint (prune.py): shrink the blocks to the stored widths first
+        resize_hidden_channels(model, checkpoint['channel_widths'])
+    # assign=True adopts the mapped tensors instead of copying them into fresh parameters
+    model.load_state_dict(checkpoint['model_state_dict'], assign=mmap)
+    model.to(device)
+    model.eval()
+    return model, class_names, arch, image_size
+
+def forward_with_embedding(model, image_tensor: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+    """(logits, pooled backbone features) from a single forward pass"""
+    features = torch.flatten(model.avgpool(model.features(image_tensor)), 1)
+    return model.classifier(features), features
+
+class CascadeStage:
+    """Cheap first stage: answers alone when its top-1 confidence clears the threshold"""
+    def __init__(self, model, image_size: int, threshold: float, arch: str):
+        self.model = model
+        self.image_size = image_size
+        self.threshold = threshold
+        self.arch = arch
+        self.transform = build_transform(image_size)
+        self.requests = 0
+        self.escalations = 0
+        self.lock = threading.Lock()
+    
+    def record(self, escalated: bool):
+        with self.lock:
+            self.requests += 1
+            if escalated:
+                self.escalations += 1
+    
+    def describe(self) -> Dict:
+        return {
+            "arch": self.arch,
+            "image_size": self.image_size,
+            "threshold": self.threshold,
+            "requests": self.requests,
+            "escalations": self.escalations,
+            "escalation_rate": self.escalations / self.requests if self.requests else None,
+        }
+
+class FoodRecognitionModel:
+    def __init__(self, model_path: str = None, config: InferenceConfig = None):
+        self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        self.config = config or InferenceConfig()
+        self.model = None
+        self.arch = DEFAULT_ARCH
+        self.image_size = self.config.image_size
+        self.class_names = []
+        self.transform = None
+        self.cascade = None
+        self.load_model(model_path)
+        if self.config.cascade_enabled:
+            self.setup_cascade()
+    
+    def load_model(self, model_path: str = None):
+        """Load the trained model"""
+        logger.info("Loading food recognition model...")
+        
+        # If no specific model path, use the latest or default
+        if model_path is None:
+            model_path = self.find_latest_model()
+        
+        self.model, self.class_names, self.arch, self.image_size = load_network(
+            model_path, self.device, mmap=self.config.mmap_weights)
+        if self.config.memory_format == "channels_last":
+            # Converts the conv weights, so they no longer share the mapped checkpoint pages
+            self.model = self.model.to(memory_format=torch.channels_last)
+        self.transform = build_transform(self.image_size)
+        
+        logger.info("Architecture: %s @ %dpx", self.arch, self.image_size)
+        logger.info("Sample class names: %s", self.class_names[:5] if self.class_names else 'None')
+    
+    def setup_cascade(self):
+        """Prepare the fast first stage: a smaller checkpoint, or this model at lower resolution"""
+        config = self.config
+        if config.cascade_model_path:
+            model, class_names, arch, image_size = load_network(config.cascade_model_path, self.device,
+                                                                mmap=config.mmap_weights)
+            if class_names != self.class_names:
+                raise ValueError("Cascade model was trained on a different class list")
+            if config.memory_format == "channels_last":
+                model = model.to(memory_format=torch.channels_last)
+        else:
+            model, arch, image_size = self.model, self.arch, config.cascade_image_size
+        self.cascade = CascadeStage(model, image_size, config.cascade_threshold, arch)
+        logger.info("Cascade enabled: %s @ %dpx, threshold %.2f", arch, image_size, config.cascade_threshold)
+    
+    def describe(self) -> Dict:
+        return {
+            "arch": self.arch,
+            "image_size": self.image_size,
+            "memory_format": self.config.memory_format or "contiguous",
+            "precision": self.config.precision or "fp32",
+            "cascade": self.cascade.describe() if self.cascade else None,
+        }
+    
+    def autocast(self):
+        """Reduced-precision context for forward passes (MODEL_PRECISION / autotune profile)"""
+        precision = self.config.precision or "fp32"
+        if precision == "fp32":
+            return contextlib.nullcontext()
+        return torch.autocast(self.device.type, dtype=torch.bfloat16 if precision == "bf16" else torch.float16)
+    
+    def warmup(self, batches: int = 3):
+        """Run dummy forward passes so the first real request isn't slow"""
+        stages = [(self.model, self.image_size)]
+        if self.cascade is not None:
+            stages.append((self.cascade.model, self.cascade.image_size))
+        with torch.no_grad(), self.autocast():
+            for model, size in stages:
+                dummy = torch.zeros(1, 3, size, size, device=self.device)
+                for _ in range(batches):
+                    model(dummy)
+    
+    @staticmethod
+    def find_latest_model() -> str:
+        """Find the most recent model file in models directory"""
+        models_dir = "models"
+        if not os.path.exists(models_dir):
+            logger.warning("Models directory '%s' not found!", models_dir)
+            return None
+        
+        model_files = [f for f in os.listdir(models_dir) if f.endswith('.pth')]
+        if not model_files:
+            logger.warning("No .pth files found in '%s'", models_dir)
+            return None
+        
+        # Sort by modification time and return the latest
+        model_files.sort(key=lambda x: os.path.getmtime(os.path.join(models_dir, x)), reverse=True)
+        latest_model = os.path.join(models_dir, model_files[0])
+        logger.info("Found latest model: %s", latest_model)
+        return latest_model
+    
+    def preprocess_image(self, image: Image.Image) -> torch.Tensor:
+        """Preprocess image for model inference"""
+        logger.debug("Preprocessing image: %s -> (%d, %d)", image.size, self.image_size, self.image_size)
+        with stage("preprocess"):
+            return self.transform(image).unsqueeze(0).to(self.device)
+    
+    def predict(self, image_tensor: torch.Tensor, top_k: int = 5) -> List[Dict]:
+        """Run model prediction"""
+        logger.debug("Running prediction with top_k=%d", top_k)
+        with stage("forward"), torch.no_grad(), self.autocast():
+            outputs = self.model(image_tensor)
+            probabilities = torch.nn.functional.softmax(outputs.float(), dim=1)
+        return self.format_predictions(probabilities, top_k)
+    
+    def predict_with_embedding(self, image: Image.Image, top_k: int = 5) -> Tuple[List[Dict], np.ndarray]:
+        """Top-k predictions and the L2-normalised pooled embedding, from one full-model pass"""
+        image_tensor = self.preprocess_image(image)
+        with stage("forward"), torch.no_grad(), self.autocast():
+            outputs, features = forward_with_embedding(self.model, image_tensor)
+            probabilities = torch.nn.functional.softmax(outputs.float(), dim=1)
+            embedding = torch.nn.functional.normalize(features.float(), dim=1)[0].cpu().numpy()
+        return self.format_predictions(probabilities, top_k), embedding
+    
+    def embed_image(self, image: Image.Image) -> np.ndarray:
+        """Embedding (1280-d for EfficientNet) used by the similar-dish index"""
+        return self.predict_with_embedding(image, top_k=1)[1]
+    
+    def predict_image(self, image: Image.Image, top_k: int = 5) -> List[Dict]:
+        """
+        Predict from a PIL image. With the cascade enabled the fast stage
+        answers confident images and only the rest reach the full model.
+        """
+        if self.cascade is None:
+            return self.predict(self.preprocess_image(image), top_k=top_k)
+        
+        with stage("cascade_preprocess"):
+            fast_tensor = self.cascade.transform(image).unsqueeze(0).to(self.device)
+        with stage("cascade_forward"), torch.no_grad(), self.autocast():
+            probabilities = torch.nn.functional.softmax(self.cascade.model(fast_tensor).float(), dim=1)
+        
+        confidence = float(probabilities.max())
+        escalate = confidence < self.cascade.threshold
+        self.cascade.record(escalate)
+        if escalate:
+            logger.debug("Cascade: fast stage confidence %.2f below threshold, escalating", confidence)
+            return self.predict(self.preprocess_image(image), top_k=top_k)
+        
+        logger.debug("Cascade: fast stage answered with confidence %.2f", confidence)
+        return self.format_predictions(probabilities, top_k)
+    
+    def format_predictions(self, probabilities: torch.Tensor, top_k: int) -> List[Dict]:
+        """Turn a (1, num_classes) probability tensor into the top-k response list"""
+        with stage("topk"):
+            top_probs, top_indices = torch.topk(probabilities, top_k)
+            top_probs, top_indices = top_probs[0].tolist(), top_indices[0].tolist()
+        
+        results = []
+        for class_id, confidence in zip(top_indices, top_probs):
+            food_name = self.class_names[class_id] if class_id < len(self.class_names) else f"class_{class_id}"
+            results.append({
+                "class_id": class_id,
+                "food_name": food_name,
+                "confidence": confidence,
+                "description": f"This appears to be {food_name.replace('_', ' ')}"
+            })
+        
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Predictions: %s", ", ".join(
+                f"{r['food_name']} ({r['confidence']*100:.2f}%)" for r in results))
+        return results
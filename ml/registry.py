@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger("foodfinder.ml.registry")
+
+
+class LatencyStats:
+    """Rolling latency window and counters for a single model version"""
+
+    def __init__(self, window: int = 2048):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.errors = 0
+        self.shadow_count = 0
+        self.shadow_agreements = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool = True):
+        with self.lock:
+            self.count += 1
+            if ok:
+                self.samples.append(seconds)
+            else:
+                self.errors += 1
+
+    def record_shadow(self, agrees: bool):
+        with self.lock:
+            self.shadow_count += 1
+            if agrees:
+                self.shadow_agreements += 1
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            samples = sorted(self.samples)
+            count, errors = self.count, self.errors
+            shadow_count, shadow_agreements = self.shadow_count, self.shadow_agreements
+
+        def percentile(p):
+            if not samples:
+                return None
+            index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+            return round(samples[index] * 1000, 2)
+
+        return {
+            "requests": count,
+            "errors": errors,
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 2) if samples else None,
+            "p50_ms": percentile(50),
+            "p95_ms": percentile(95),
+            "p99_ms": percentile(99),
+            "shadow_requests": shadow_count,
+            "shadow_agreement": (shadow_agreements / shadow_count) if shadow_count else None,
+        }
+
+
+class ModelVersion:
+    """A loaded, warmed-up model together with its metadata and metrics"""
+
+    def __init__(self, name: str, model, path: str):
+        self.name = name
+        self.model = model
+        self.path = path
+        self.loaded_at = datetime.utcnow()
+        self.stats = LatencyStats()
+
+    def describe(self) -> Dict:
+        return {
+            "version": self.name,
+            "path": self.path,
+            "loaded_at": self.loaded_at.isoformat(),
+            "model": self.model.describe() if hasattr(self.model, "describe") else None,
+            "metrics": self.stats.snapshot(),
+        }
+
+
+class ModelRegistry:
+    """
+    Holds every loaded model version and which one serves traffic.
+
+    Loading and warmup happen outside the lock, so a new version can be
+    prepared in a background thread while the current one keeps serving.
+    Swapping the active version is a single reference assignment: requests
+    that already fetched a version keep using it until they finish.
+    """
+
+    def __init__(self, loader: Callable[[str], object], warmup_batches: int = 3):
+        self.loader = loader
+        self.warmup_batches = warmup_batches
+        self.versions: Dict[str, ModelVersion] = {}
+        self.active: Optional[str] = None
+        self.shadow: Optional[str] = None
+        self.loading: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def version_name(path: str) -> str:
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def _check_replace(self, name: str, activate: bool):
+        """Replacing a registered version swaps live traffic, so it must be explicit (lock held)"""
+        if name in self.versions and not activate:
+            raise ValueError(f"Version '{name}' is already loaded; pass activate=True to replace it")
+
+    def load(self, path: str, name: str = None, activate: bool = False) -> ModelVersion:
+        """Load, warm up and register a model version (blocking)"""
+        name = name or self.version_name(path)
+        with self._lock:
+            self._check_replace(name, activate)
+            self.loading[name] = "loading"
+        try:
+            model = self.loader(path)
+            with self._lock:
+                self.loading[name] = "warming_up"
+            if hasattr(model, "warmup"):
+                model.warmup(self.warmup_batches)
+            version = ModelVersion(name, model, path)
+            with self._lock:
+                # Another load may have registered the name in the meantime
+                self._check_replace(name, activate)
+                self.versions[name] = version
+                if activate or self.active is None:
+                    self.active = name
+                self.loading.pop(name, None)
+            logger.info("Model version '%s' ready (active: %s)", name, self.active)
+            return version
+        except Exception as e:
+            with self._lock:
+                self.loading[name] = f"failed: {e}"
+            raise
+
+    def load_async(self, path: str, name: str = None, activate: bool = False) -> str:
+        """Load a model version in a background thread and return its name"""
+        name = name or self.version_name(path)
+        with self._lock:
+            if self.loading.get(name) in ("loading", "warming_up"):
+                raise ValueError(f"Version '{name}' is already loading")
+            self._check_replace(name, activate)
+            self.loading[name] = "queued"
+
+        def run():
+            try:
+                self.load(path, name=name, activate=activate)
+            except Exception as e:
+                logger.exception("Background load of '%s' failed: %s", name, e)
+
+        threading.Thread(target=run, name=f"model-load-{name}", daemon=True).start()
+        return name
+
+    def activate(self, name: str):
+        with self._lock:
+            if name not in self.versions:
+                raise KeyError(name)
+            self.active = name
+            if self.shadow == name:
+                self.shadow = None
+
+    def set_shadow(self, name: Optional[str]):
+        with self._lock:
+            if name is not None and name not in self.versions:
+                raise KeyError(name)
+            self.shadow = name if name != self.active else None
+
+    def unload(self, name: str):
+        with self._lock:
+            if name == self.active:
+                raise ValueError("Cannot unload the active version")
+            if name not in self.versions:
+                raise KeyError(name)
+            del self.versions[name]
+            if self.shadow == name:
+                self.shadow = None
+
+    def get(self, name: str = None) -> ModelVersion:
+        """Return the requested version, or the active one"""
+        with self._lock:
+            key = name or self.active
+            if key is None or key not in self.versions:
+                raise KeyError(key)
+            return self.versions[key]
+
+    def get_shadow(self) -> Optional[ModelVersion]:
+        with self._lock:
+            return self.versions.get(self.shadow) if self.shadow else None
+
+    def is_ready(self) -> bool:
+        return self.active is not None
+
+    def describe(self) -> Dict:
+        with self._lock:
+            versions = list(self.versions.values())
+            loading = dict(self.loading)
+            active, shadow = self.active, self.shadow
+        return {
+            "active": active,
+            "shadow": shadow,
+            "versions": [v.describe() for v in versions],
+            "loading": loading,
+        }
+
+
+def timed(version: ModelVersion, fn, *args, **kwargs):
+    """Call fn, recording its latency against the version's stats"""
+    start = time.perf_counter()
+    try:
+        result = fn(*args, **kwargs)
+    except Exception:
+        version.stats.record(time.perf_counter() - start, ok=False)
+        raise
+    version.stats.record(time.perf_counter() - start)
+    return result
@@ -0,0 +1,48 @@
+"""
+Run the ML service as several worker processes sharing one copy of the weights.
+
+Each uvicorn worker imports inference.py and loads the checkpoint with
+MODEL_MMAP=1, so the weight tensors are mapped from the same file in the
+page cache rather than copied per worker. The cores are split between the
+workers (OMP_NUM_THREADS, and cores / workers intra-op threads with one
+inter-op thread each unless an autotune profile for this host and worker
+count says otherwise) so N workers do not each start a thread per core and
+oversubscribe the machine.
+
+    python serve.py --workers 4 --port 8001
+
+Prometheus metrics are per worker: /metrics shows whichever worker answers.
+"""
+import argparse
+import os
+
+import uvicorn
+
+
+def threads_per_worker(workers: int, cores: int = None) -> int:
+    cores = cores or os.cpu_count() or 1
+    return max(1, cores // workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-process ML service with shared weights")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--threads_per_worker", type=int, default=0, help="0 = cores / workers")
+    parser.add_argument("--host", type=str, default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--no_mmap", action="store_true", help="Give each worker a private copy (for comparison)")
+    args = parser.parse_args()
+
+    threads = args.threads_per_worker or threads_per_worker(args.workers)
+    # Inherited by the worker processes; must be in place before they import torch
+    os.environ["MODEL_MMAP"] = "0" if args.no_mmap else "1"
+    os.environ["ML_WORKERS"] = str(args.workers)
+    if args.threads_per_worker:
+        os.environ["TORCH_NUM_THREADS"] = str(args.threads_per_worker)
+    # Initial OpenMP pool size; each worker then sets its count from the autotune profile or cores / workers
+    os.environ.setdefault("OMP_NUM_THREADS", os.getenv("TORCH_NUM_THREADS", str(threads)))
+    os.environ.setdefault("MKL_NUM_THREADS", os.environ["OMP_NUM_THREADS"])
+
+    print(f"Starting {args.workers} workers with {os.environ['OMP_NUM_THREADS']} intra-op threads each by default "
+          f"(weights {'copied' if args.no_mmap else 'memory-mapped'})")
+    uvicorn.run("inference:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
@@ -1,33 +1,61 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 import torch.optim as optim
 from torch.utils.data import DataLoader, Subset
 import torchvision.transforms as transforms
 from torchvision.datasets import Food101
-from torchvision.models import efficientnet_v2_s
 import argparse
+import hashlib
+import json
 import os
+import time
 from datetime import datetime
 import numpy as np
+from architectures import ARCHITECTURES, DEFAULT_ARCH, build_model
+from recognizer import build_transform, load_network
+
+DEFAULT_STUDENT_ARCH = "mobilenet_v3_large"
+
+class IndexedSubset(Subset):
+    """Subset that also yields each sample's position, to look up its cached teacher logits"""
+    def __getitem__(self, position):
+        image, label = super().__getitem__(position)
+        return image, label, position
 
 class Food101Trainer:
-    def __init__(self, data_path="./data", batch_size=32, num_workers=4):
+    def __init__(self, data_path="./data", batch_size=32, num_workers=4,
+                 arch=DEFAULT_ARCH, image_size=None, save_dir="./models",
+                 teacher_path=None, temperature=4.0, alpha=0.7, logits_cache=None):
         self.data_path = data_path
         self.batch_size = batch_size
         self.num_workers = num_workers
+        self.arch = arch
+        self.image_size = image_size or ARCHITECTURES[arch]['image_size']
+        self.save_dir = save_dir
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+        # Distillation: soft targets from a trained teacher checkpoint
+        self.teacher_path = teacher_path
+        self.temperature = temperature
+        self.alpha = alpha
+        self.logits_cache = logits_cache
+        self.teacher_logits = None
+        # Hidden widths of a channel-pruned model (see use_model), saved with its checkpoints
+        self.channel_widths = None
         
         print(f"Using device: {self.device}")
         
         # Create model save directory
-        os.makedirs('./models', exist_ok=True)
+        os.makedirs(self.save_dir, exist_ok=True)
         
         self.setup_data()
         self.setup_model()
+        if self.teacher_path:
+            self.setup_teacher()
     
     def setup_data(self):
         """Setup data transforms with smaller images"""
-        image_size = 384
+        image_size = self.image_size
         
         self.train_transform = transforms.Compose([
             transforms.Resize((image_size, image_size)),
@@ -70,8 +98,11 @@ class Food101Trainer:
         train_indices = np.random.choice(train_size, train_subset_size, replace=False)
         val_indices = np.random.choice(val_size, val_subset_size, replace=False)
         
+        self.train_indices = train_indices
+        self.val_indices = val_indices
+        
         # Create subset datasets
-        self.train_subset = Subset(self.train_dataset, train_indices)
+        self.train_subset = IndexedSubset(self.train_dataset, train_indices)
         self.val_subset = Subset(self.val_dataset, val_indices)
         
         # DataLoader without mixed precision (since we're on CPU)
@@ -96,16 +127,14 @@ class Food101Trainer:
     
     def setup_model(self):
         """Initialize model with proper fine-tuning and better optimizer settings"""
-        print("Initializing EfficientNetV2-S model...")
-        self.model = efficientnet_v2_s(weights='DEFAULT')
+        print(f"Initializing {self.arch} model at {self.image_size}px...")
+        # ImageNet-pretrained backbone with the classifier replaced for 101 food classes
+        self.model = build_model(self.arch, num_classes=101, pretrained=True)
         
-        # Replace classifier for 101 food classes
-        in_features = self.model.classifier[1].in_features
-        self.model.classifier[1] = nn.Linear(in_features, 101)
-        
-        # FREEZE all layers except the classifier
+        # FREEZE all layers except the classifier; a distilled student is small
+        # enough to train end to end and needs it to follow the teacher
         for param in self.model.parameters():
-            param.requires_grad = False
+            param.requires_grad = bool(self.teacher_path)
         
         # UNFREEZE only the classifier
         for param in self.model.classifier.parameters():
@@ -115,18 +144,82 @@ class Food101Trainer:
         
         # Count parameters
         total_params = sum(p.numel() for p in self.model.parameters())
-        trainable_params = sum(p.numel() for p in self.model.classifier.parameters())
+        trainable_params = sum(p.numel() for p in self.model.parameters() if p.requires_grad)
         print(f"Total parameters: {total_params:,}")
         print(f"Trainable parameters: {trainable_params:,} ({trainable_params/total_params*100:.2f}%)")
         
+        # Higher learning rate and simpler optimizer for CPU (the whole student takes a gentler one)
+        self.setup_optimizer(lr=1e-3 if self.teacher_path else 1e-2)
+    
+    def setup_optimizer(self, lr):
         # MUCH BETTER OPTIMIZER SETTINGS FOR CPU
         trainable_params = filter(lambda p: p.requires_grad, self.model.parameters())
         self.criterion = nn.CrossEntropyLoss()
-        
-        # Higher learning rate and simpler optimizer for CPU
-        self.optimizer = optim.Adam(trainable_params, lr=1e-2, weight_decay=1e-4)  # 100x higher LR!
+        self.optimizer = optim.Adam(trainable_params, lr=lr, weight_decay=1e-4)
         self.scheduler = optim.lr_scheduler.StepLR(self.optimizer, step_size=3, gamma=0.5)
     
+    def use_model(self, model, channel_widths=None, lr=1e-4):
+        """Fine-tune an existing network (e.g. a pruned one) end to end instead of the fresh backbone"""
+        self.model = model.to(self.device)
+        self.channel_widths = channel_widths
+        for param in self.model.parameters():
+            param.requires_grad = True
+        self.setup_optimizer(lr)
+    
+    def teacher_cache_path(self, teacher_image_size):
+        """Cache file keyed by the teacher checkpoint, its resolution and the training subset"""
+        stat = os.stat(self.teacher_path)
+        key = hashlib.sha1()
+        key.update(f"{os.path.abspath(self.teacher_path)}:{stat.st_size}:{stat.st_mtime}:{teacher_image_size}".encode())
+        key.update(np.asarray(self.train_indices).tobytes())
+        return os.path.join(self.save_dir, f"teacher_logits_{key.hexdigest()[:12]}.pt")
+    
+    def setup_teacher(self):
+        """
+        Load the teacher and compute its logits for the training subset once.
+        
+        The logits are saved to disk (--logits_cache, or a file in save_dir
+        keyed by teacher and subset) and reused across epochs and runs, so the
+        teacher never runs during training. They are taken on the un-augmented
+        image at the teacher's own resolution.
+        """
+        teacher, class_names, teacher_arch, teacher_image_size = load_network(self.teacher_path, self.device)
+        if len(class_names) != len(self.class_names):
+            raise ValueError(f"Teacher has {len(class_names)} classes, the dataset {len(self.class_names)}")
+        print(f"Teacher: {teacher_arch} @ {teacher_image_size}px from {self.teacher_path}")
+        
+        cache_path = self.logits_cache or self.teacher_cache_path(teacher_image_size)
+        if os.path.exists(cache_path):
+            self.teacher_logits = torch.load(cache_path, map_location='cpu')
+            if self.teacher_logits.shape[0] == len(self.train_subset):
+                print(f"Loaded cached teacher logits: {cache_path}")
+                return
+            print(f"Cached teacher logits do not match the training subset, recomputing: {cache_path}")
+        
+        dataset = Food101(root=self.data_path, split='train', download=True,
+                          transform=build_transform(teacher_image_size))
+        loader = DataLoader(Subset(dataset, self.train_indices), batch_size=self.batch_size,
+                            shuffle=False, num_workers=self.num_workers)
+        start = time.perf_counter()
+        logits = []
+        with torch.inference_mode():
+            for batch_idx, (images, _) in enumerate(loader):
+                logits.append(teacher(images.to(self.device)).float().cpu())
+                if batch_idx % 50 == 0:
+                    print(f"Teacher logits: batch {batch_idx}/{len(loader)}")
+        self.teacher_logits = torch.cat(logits)
+        torch.save(self.teacher_logits, cache_path)
+        print(f"Teacher logits for {len(self.teacher_logits):,} images cached in "
+              f"{time.perf_counter() - start:.0f}s: {cache_path}")
+        del teacher
+    
+    def distillation_loss(self, outputs, labels, teacher_logits):
+        """Soft-target KL at `temperature` (scaled by T^2) blended with hard-label cross entropy"""
+        t = self.temperature
+        soft = F.kl_div(F.log_softmax(outputs / t, dim=1), F.softmax(teacher_logits / t, dim=1),
+                        reduction='batchmean') * t * t
+        return self.alpha * soft + (1 - self.alpha) * self.criterion(outputs, labels)
+    
     def train_epoch(self, epoch):
         """Train for one epoch - simplified for CPU"""
         self.model.train()
@@ -134,12 +227,15 @@ class Food101Trainer:
         correct = 0
         total = 0
         
-        for batch_idx, (images, labels) in enumerate(self.train_loader):
+        for batch_idx, (images, labels, positions) in enumerate(self.train_loader):
             images, labels = images.to(self.device), labels.to(self.device)
             
             self.optimizer.zero_grad()
             outputs = self.model(images)
-            loss = self.criterion(outputs, labels)
+            if self.teacher_logits is not None:
+                loss = self.distillation_loss(outputs, labels, self.teacher_logits[positions].to(self.device))
+            else:
+                loss = self.criterion(outputs, labels)
             loss.backward()
             self.optimizer.step()
             
@@ -178,14 +274,19 @@ class Food101Trainer:
     def save_model(self, epoch, accuracy):
         """Save model checkpoint"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"models/food101_effnetv2s_epoch{epoch}_acc{accuracy:.2f}_{timestamp}.pth"
+        tag = ARCHITECTURES[self.arch]['tag']
+        filename = os.path.join(self.save_dir, f"food101_{tag}_{self.image_size}px_epoch{epoch}_acc{accuracy:.2f}_{timestamp}.pth")
         
         torch.save({
             'epoch': epoch,
             'model_state_dict': self.model.state_dict(),
             'optimizer_state_dict': self.optimizer.state_dict(),
             'accuracy': accuracy,
-            'class_names': self.class_names
+            'class_names': self.class_names,
+            'arch': self.arch,
+            'image_size': self.image_size,
+            'teacher': os.path.basename(self.teacher_path) if self.teacher_path else None,
+            'channel_widths': self.channel_widths
         }, filename)
         
         print(f"Model saved: {filename}")
@@ -237,6 +338,56 @@ class Food101Trainer:
         
         return model_path
 
+def cpu_latency_ms(model, image_size, runs=50, warmup=5):
+    """Median single-image forward time on CPU"""
+    model = model.to('cpu').eval()
+    image = torch.randn(1, 3, image_size, image_size)
+    timings = []
+    with torch.inference_mode():
+        for i in range(warmup + runs):
+            start = time.perf_counter()
+            model(image)
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+def distillation_report(trainer, student_path, output=None):
+    """Validation accuracy and CPU latency of the teacher and the distilled student"""
+    rows = {}
+    for role, path in (("teacher", trainer.teacher_path), ("student", student_path)):
+        model, _, arch, image_size = load_network(path, trainer.device)
+        dataset = Food101(root=trainer.data_path, split='test', download=True, transform=build_transform(image_size))
+        loader = DataLoader(Subset(dataset, trainer.val_indices), batch_size=trainer.batch_size,
+                            shuffle=False, num_workers=trainer.num_workers)
+        correct = total = 0
+        with torch.inference_mode():
+            for images, labels in loader:
+                predicted = model(images.to(trainer.device)).argmax(1).cpu()
+                correct += predicted.eq(labels).sum().item()
+                total += labels.size(0)
+        rows[role] = {
+            "checkpoint": path,
+            "arch": arch,
+            "image_size": image_size,
+            "parameters": sum(p.numel() for p in model.parameters()),
+            "val_accuracy": round(100. * correct / total, 2),
+            "cpu_latency_ms": round(cpu_latency_ms(model, image_size), 2),
+        }
+    rows["speedup"] = round(rows["teacher"]["cpu_latency_ms"] / rows["student"]["cpu_latency_ms"], 2)
+    
+    print(f"\n{'':8s} {'arch':20s} {'px':>4s} {'params':>12s} {'val acc':>8s} {'CPU ms':>8s}")
+    for role in ("teacher", "student"):
+        row = rows[role]
+        print(f"{role:8s} {row['arch']:20s} {row['image_size']:4d} {row['parameters']:12,d} "
+              f"{row['val_accuracy']:7.2f}% {row['cpu_latency_ms']:8.2f}")
+    print(f"Student is {rows['speedup']}x faster on CPU (batch 1, {torch.get_num_threads()} threads)")
+    
+    output = output or os.path.splitext(student_path)[0] + "_distill_report.json"
+    with open(output, "w") as f:
+        json.dump(rows, f, indent=2)
+    print(f"Report saved: {output}")
+    return rows
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Fast Food101 Training on CPU')
     parser.add_argument('--epochs', type=int, default=10, help='Number of epochs')
@@ -244,7 +395,19 @@ if __name__ == "__main__":
     parser.add_argument('--data_path', type=str, default='./data', help='Data directory')
     parser.add_argument('--workers', type=int, default=4, help='Number of data loader workers')
     parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    parser.add_argument('--arch', type=str, default=None, choices=list(ARCHITECTURES),
+                        help=f'Backbone (smaller ones make a fast cascade stage; default {DEFAULT_ARCH}, '
+                             f'or {DEFAULT_STUDENT_ARCH} with --distill)')
+    parser.add_argument('--image_size', type=int, default=None, help='Input resolution (default: per-arch)')
+    parser.add_argument('--save_dir', type=str, default='./models', help='Where to write checkpoints')
+    parser.add_argument('--distill', type=str, default=None, metavar='TEACHER_CHECKPOINT',
+                        help='Train --arch as a student of this trained checkpoint')
+    parser.add_argument('--temperature', type=float, default=4.0, help='Distillation softmax temperature')
+    parser.add_argument('--alpha', type=float, default=0.7, help='Weight of the soft-target loss vs. hard labels')
+    parser.add_argument('--logits_cache', type=str, default=None,
+                        help='Teacher logits file (default: keyed by teacher and subset in save_dir)')
     args = parser.parse_args()
+    arch = args.arch or (DEFAULT_STUDENT_ARCH if args.distill else DEFAULT_ARCH)
     
     # Set random seed
     torch.manual_seed(args.seed)
@@ -256,7 +419,16 @@ if __name__ == "__main__":
     trainer = Food101Trainer(
         data_path=args.data_path,
         batch_size=args.batch_size,
-        num_workers=args.workers
+        num_workers=args.workers,
+        arch=arch,
+        image_size=args.image_size,
+        save_dir=args.save_dir,
+        teacher_path=args.distill,
+        temperature=args.temperature,
+        alpha=args.alpha,
+        logits_cache=args.logits_cache
     )
     
-    trainer.train(epochs=args.epochs)
\ No newline at end of file
+    model_path = trainer.train(epochs=args.epochs)
+    if args.distill:
+        distillation_report(trainer, model_path)
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Admission control and load shedding for the API gateway.
+
+Every route belongs to a class with its own concurrency limit, wait queue
+size and queue deadline; all classes also share one global limit. When a
+slot frees up the waiting request of the cheapest class goes first, so
+`/nearby` keeps flowing while `/recognize` is saturated. Requests that would
+wait in a full queue get 429 at once, and requests still queued at their
+class deadline get 503; both carry Retry-After. `/health`, `/ready` and `/metrics`
+are never queued so probes see the real state of the service.
+"""
+import asyncio
+import itertools
+import json
+import math
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from .observability import ADMISSION_QUEUED, ADMISSION_QUEUE_SECONDS, ADMISSION_REJECTED, match_route
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64"))
+
+
+@dataclass
+class RouteClass:
+    name: str
+    priority: int  # lower goes first
+    limit: int
+    max_queue: int
+    queue_timeout: float
+
+
+def route_class(name: str, priority: int, limit: int, max_queue: int, queue_timeout: float) -> RouteClass:
+    """A class with ADMISSION_<NAME>_LIMIT / _QUEUE / _TIMEOUT overrides from the environment"""
+    prefix = f"ADMISSION_{name.upper()}"
+    return RouteClass(
+        name, priority,
+        int(os.getenv(f"{prefix}_LIMIT", limit)),
+        int(os.getenv(f"{prefix}_QUEUE", max_queue)),
+        float(os.getenv(f"{prefix}_TIMEOUT", queue_timeout)),
+    )
+
+
+DEFAULT_CLASSES = [
+    route_class("cheap", 0, 48, 256, 0.5),
+    route_class("standard", 1, 24, 128, 2.0),
+    route_class("expensive", 2, 8, 32, 5.0),
+]
+
+# Route template -> class; unlisted routes are "standard", EXEMPT ones bypass admission
+ROUTE_CLASSES = {
+    "/": "cheap",
+    "/api/restaurants/nearby": "cheap",
+    "/api/restaurants/test": "cheap",
+    "/api/food/dishes": "cheap",
+    "/api/restaurants/search": "standard",
+    "/api/restaurants/database/stats": "standard",
+    "/api/food/recognize": "expensive",
+    "/api/food/recognize-and-find": "expensive",
+    "/api/food/similar": "expensive",
+}
+EXEMPT = {"/health", "/ready", "/metrics"}
+
+
+class Rejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(self, classes: List[RouteClass], total_limit: int = ADMISSION_MAX_CONCURRENCY):
+        self.classes = {c.name: c for c in classes}
+        self.total_limit = total_limit
+        self.running = {name: 0 for name in self.classes}
+        self.total_running = 0
+        self.waiters: List = []  # (priority, sequence, class name, future)
+        self.queued = {name: 0 for name in self.classes}
+        # Smoothed service time per class, for Retry-After
+        self.service_time = {name: 0.1 for name in self.classes}
+        self._sequence = itertools.count()
+
+    def _can_run(self, name: str) -> bool:
+        return self.running[name] < self.classes[name].limit and self.total_running < self.total_limit
+
+    def _start(self, name: str):
+        self.running[name] += 1
+        self.total_running += 1
+
+    def retry_after(self, name: str) -> int:
+        route = self.classes[name]
+        backlog = self.queued[name] + self.running[name]
+        return max(1, math.ceil(self.service_time[name] * backlog / max(route.limit, 1)))
+
+    async def acquire(self, name: str):
+        """Wait for a slot of class `name`; raises Rejected when shed"""
+        route = self.classes[name]
+        # Requests of the same class already waiting keep their place; waiters of other
+        # classes only exist while their own class limit (or the global one) is reached
+        if self.queued[name] == 0 and self._can_run(name):
+            self._start(name)
+            return
+        if self.queued[name] >= route.max_queue:
+            ADMISSION_REJECTED.labels(name, "queue_full").inc()
+            raise Rejected(429, f"Too many {name} requests waiting", self.retry_after(name))
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = (route.priority, next(self._sequence), name, future)
+        self.waiters.append(waiter)
+        self.queued[name] += 1
+        ADMISSION_QUEUED.labels(name).set(self.queued[name])
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), route.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                return  # granted at the last moment; the slot is ours
+            ADMISSION_REJECTED.labels(name, "queue_timeout").inc()
+            raise Rejected(503, f"Server busy: {name} request not started within {route.queue_timeout:.1f}s",
+                           self.retry_after(name))
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(name, 0.0)  # client went away after being granted
+            raise
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            self.queued[name] -= 1
+            ADMISSION_QUEUED.labels(name).set(self.queued[name])
+            ADMISSION_QUEUE_SECONDS.labels(name).observe(time.monotonic() - start)
+
+    def release(self, name: str, elapsed: float):
+        self.running[name] -= 1
+        self.total_running -= 1
+        self.service_time[name] = 0.8 * self.service_time[name] + 0.2 * elapsed
+        # Hand free slots to the highest priority waiters that fit their class limit
+        for waiter in sorted(self.waiters):
+            if self.total_running >= self.total_limit:
+                break
+            _, _, waiter_class, future = waiter
+            if not future.done() and self._can_run(waiter_class):
+                self._start(waiter_class)
+                self.waiters.remove(waiter)
+                future.set_result(None)
+
+    def describe(self) -> Dict:
+        return {
+            "total_running": self.total_running,
+            "total_limit": self.total_limit,
+            "classes": {name: {"running": self.running[name], "queued": self.queued[name],
+                               "limit": c.limit, "max_queue": c.max_queue, "queue_timeout": c.queue_timeout}
+                        for name, c in self.classes.items()},
+        }
+
+
+default_controller = AdmissionController(DEFAULT_CLASSES)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController per route template"""
+
+    def __init__(self, app, routes=None, controller: Optional[AdmissionController] = None,
+                 route_classes: Dict[str, str] = None, enabled: bool = ADMISSION_ENABLED):
+        self.app = app
+        self.routes = routes if routes is not None else []
+        self.controller = controller or default_controller
+        self.route_classes = ROUTE_CLASSES if route_classes is None else route_classes
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
+        route = match_route(self.routes, scope)
+        if route in EXEMPT:
+            await self.app(scope, receive, send)
+            return
+
+        name = self.route_classes.get(route, "standard")
+        try:
+            await self.controller.acquire(name)
+        except Rejected as e:
+            body = json.dumps({"detail": e.reason}).encode()
+            await send({"type": "http.response.start", "status": e.status, "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(e.retry_after).encode()),
+            ]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        start = time.monotonic()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(name, time.monotonic() - start)
@@ -1,9 +1,15 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, or_, text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+import itertools
 import os
+import threading
+import time
 from dotenv import load_dotenv
 import urllib.parse
+from typing import Dict, Iterable, List, Optional
+
+from .observability import DB_READS, REPLICA_LAG
 
 load_dotenv()
 
@@ -33,8 +39,22 @@ def fix_database_url(url):
 
 DATABASE_URL = fix_database_url(DATABASE_URL)
 
+# Read replicas (comma separated URLs). Read-only queries go to a healthy replica
+# whose lag is below REPLICA_MAX_LAG_SECONDS; everything else uses the primary.
+DATABASE_REPLICA_URLS = [fix_database_url(url.strip()) for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "10"))
+# A replica that fails its check is skipped for this long
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+# Reads of a geo cell written within this window go to the primary
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "10"))
+
+# SQLite is only used as a local stand-in (benchmarks); its connections
+# must be shareable across FastAPI's worker threads
+connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+
 try:
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, connect_args=connect_args)
 
     # Test the connection
     with engine.connect() as conn:
@@ -44,9 +64,157 @@ except Exception as e:
     print(f" Database connection failed: {e}")
     raise
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+class Replica:
+    def __init__(self, engine):
+        self.engine = engine
+        self.lag: Optional[float] = None
+        self.checked_at = 0.0
+        self.down_until = 0.0
+
+    def check(self):
+        """Measure replication lag; an unreachable replica is taken out of rotation"""
+        self.checked_at = time.monotonic()
+        try:
+            with self.engine.connect() as conn:
+                if self.engine.dialect.name == "postgresql":
+                    # Caught up when everything received has been replayed, whatever the last commit time
+                    self.lag = float(conn.execute(text(
+                        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+                        "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+                    )).scalar())
+                else:
+                    conn.execute(text("SELECT 1"))
+                    self.lag = 0.0
+        except Exception as e:
+            print(f" Replica {self.engine.url.host or self.engine.url.database} unavailable: {e}")
+            self.lag = None
+            self.down_until = self.checked_at + REPLICA_RETRY_SECONDS
+        REPLICA_LAG.labels(str(self.engine.url.host or self.engine.url.database)).set(-1 if self.lag is None else self.lag)
+
+
+class ReplicaSet:
+    """Round-robin over healthy replicas, with per-cell read-your-writes pinning to the primary"""
+
+    def __init__(self, engines: List, max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 check_interval: float = REPLICA_CHECK_INTERVAL, pin_seconds: float = READ_YOUR_WRITES_SECONDS):
+        self.replicas = [Replica(e) for e in engines]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.pin_seconds = pin_seconds
+        self.written: Dict[int, float] = {}  # geo cell -> monotonic time of the last write
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def mark_written(self, cells: Iterable[int]):
+        now = time.monotonic()
+        with self._lock:
+            for cell in cells:
+                self.written[cell] = now
+            if len(self.written) > 10000:
+                self.written = {c: t for c, t in self.written.items() if now - t < self.pin_seconds}
+
+    def pinned(self, cells: Optional[Iterable[int]]) -> bool:
+        if cells is None:
+            return False
+        now = time.monotonic()
+        return any(now - self.written.get(cell, float("-inf")) < self.pin_seconds for cell in cells)
+
+    def healthy(self) -> List[Replica]:
+        now = time.monotonic()
+        for replica in self.replicas:
+            if now >= replica.down_until and now - replica.checked_at >= self.check_interval:
+                with self._lock:
+                    if now - replica.checked_at >= self.check_interval:
+                        replica.check()
+        return [r for r in self.replicas
+                if r.lag is not None and r.lag <= self.max_lag and now >= r.down_until]
+
+    def pick(self, primary, cells: Optional[Iterable[int]] = None):
+        """Engine for a read; the primary if the data was just written or no replica qualifies"""
+        if self.pinned(cells):
+            DB_READS.labels("primary_pinned").inc()
+            return primary
+        healthy = self.healthy()
+        if not healthy:
+            DB_READS.labels("primary_fallback").inc()
+            return primary
+        DB_READS.labels("replica").inc()
+        return healthy[next(self._next) % len(healthy)].engine
+
+    def describe(self) -> List[Dict]:
+        now = time.monotonic()
+        return [{
+            "replica": str(r.engine.url.host or r.engine.url.database),
+            "lag_seconds": r.lag,
+            "in_rotation": r.lag is not None and r.lag <= self.max_lag and now >= r.down_until,
+        } for r in self.replicas]
+
+
+class RoutingSession(Session):
+    """
+    Sends flushes and sessions marked with use_primary() to the primary and
+    other queries to a replica. Sessions touch the primary as soon as they
+    write, so a request that reads and then saves still sees its own rows.
+    """
+
+    def __init__(self, primary=None, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.primary = primary
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, **kwargs):
+        if self.replicas is None or self._flushing or self.info.get("primary"):
+            return self.primary
+        return self.replicas.pick(self.primary, self.info.get("cells"))
+
+
+replica_engines = [create_engine(url, connect_args=connect_args) for url in DATABASE_REPLICA_URLS]
+replicas = ReplicaSet(replica_engines) if replica_engines else None
+if replicas:
+    print(f"Routing reads to {len(replica_engines)} replica(s)")
+
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False,
+                            primary=engine, replicas=replicas)
 Base = declarative_base()
 
+
+def use_primary(db: Session):
+    """Route every further query of this session to the primary (reads that must see the latest writes)"""
+    db.info["primary"] = True
+
+
+def read_cells(db: Session, cells: Iterable[int]):
+    """Record which geo cells this session reads, for read-your-writes pinning"""
+    db.info["cells"] = list(cells)
+
+
+# Rows stored before geo_cell existed stay NULL until partition_tables.py backfills them, and
+# cell filters must still match them until then. Afterwards the IS NULL branch is dropped:
+# on a partitioned table it would send every query to the DEFAULT partition as well.
+# GEO_CELLS_BACKFILLED=1/0 forces either; unset, detect_cell_backfill() checks at startup.
+GEO_CELLS_BACKFILLED = os.getenv("GEO_CELLS_BACKFILLED")
+cells_backfilled = GEO_CELLS_BACKFILLED == "1"
+
+def detect_cell_backfill(bind=None) -> bool:
+    """Whether every restaurant has a geo cell (new rows always get one on insert)"""
+    global cells_backfilled
+    if GEO_CELLS_BACKFILLED is not None:
+        return cells_backfilled
+    with (bind or engine).connect() as conn:
+        cells_backfilled = conn.execute(text("SELECT 1 FROM restaurants WHERE geo_cell IS NULL LIMIT 1")).first() is None
+    return cells_backfilled
+
+def in_cells(column, cells: Iterable[int]):
+    """Filter `column` to `cells`, plus unassigned rows while the backfill is outstanding"""
+    if cells_backfilled:
+        return column.in_(list(cells))
+    return or_(column.in_(list(cells)), column.is_(None))
+
+def mark_written(cells: Iterable[int]):
+    if replicas is not None:
+        replicas.mark_written(cells)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -56,3 +224,28 @@ def get_db():
 
 def create_tables():
     Base.metadata.create_all(bind=engine)
+
+
+def ensure_columns():
+    """Add columns introduced after a table was first created (create_all skips existing tables)"""
+    additions = {
+        "restaurant_dishes": [
+            ("dish_id", "VARCHAR(64)", "CREATE INDEX IF NOT EXISTS idx_restaurant_dishes_dish_id ON restaurant_dishes(dish_id)"),
+            ("geo_cell", "INTEGER", "CREATE INDEX IF NOT EXISTS idx_restaurant_dishes_geo_cell ON restaurant_dishes(geo_cell)"),
+        ],
+        "restaurants": [
+            ("geo_cell", "INTEGER", "CREATE INDEX IF NOT EXISTS idx_restaurants_geo_cell ON restaurants(geo_cell)"),
+        ],
+    }
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, columns in additions.items():
+            if not inspector.has_table(table):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            for name, ddl, index_ddl in columns:
+                if name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                    print(f" Added column {table}.{name}")
+                if index_ddl:
+                    conn.execute(text(index_ddl))
@@ -1,7 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+from urllib.parse import quote
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from app.database import engine, Base, detect_cell_backfill, ensure_columns
 from app.models.restaurant import Restaurant, RestaurantDish
+from app.models.fused_search import FusedSearch
+from app.admission import AdmissionMiddleware
+from app.observability import MetricsMiddleware, metrics_payload, register_cache, setup_logging
+from app.profiling import ProfilingMiddleware, install_sql_hooks
+from app.response_cache import ResponseCacheMiddleware
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -9,16 +17,30 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+setup_logging("api")
+
 print(" Starting FoodFinder API...")
 
 # Try to create tables, but don't crash if they already exist
 try:
     print("🗄️ Checking database tables...")
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    if not detect_cell_backfill():
+        print(" Some restaurants have no geo cell yet; run partition_tables.py to backfill them")
     print("Database tables are ready!")
 except Exception as e:
     print(f" Table creation note: {e}")
 
+# Compile the dish vocabulary and cuisine classifier once, before the first request needs them
+from app.services.dish_vocabulary import get_vocabulary
+print(f" Dish vocabulary ready: {len(get_vocabulary())} dishes")
+from app.services.cuisine import get_classifier
+print(f" Cuisine classifier ready: {len(get_classifier())} keywords")
+from app.services.dish_vocabulary import DishVocabulary
+register_cache("dish_vocabulary", DishVocabulary._resolve)
+register_cache("cuisine_categories", get_classifier().match_category)
+
 app = FastAPI(
     title="FoodFinder API",
     description="Backend API for food recognition and restaurant discovery",
@@ -27,20 +49,82 @@ app = FastAPI(
 
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "").split(",")
 
-# CORS middleware
+# Innermost, so CORS headers are added per request rather than replayed from the cache
+app.add_middleware(ResponseCacheMiddleware, routes=app.router.routes)
+
+app.add_middleware(ProfilingMiddleware)
+# Shed load before any work is done, but inside the metrics middleware so 429/503s are counted
+app.add_middleware(AdmissionMiddleware, routes=app.router.routes)
+app.add_middleware(MetricsMiddleware, routes=app.router.routes)
+# CORS outermost: preflights are answered before admission, and 429/503s still carry
+# Access-Control-Allow-Origin so browser clients can read the status and Retry-After
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
+install_sql_hooks(engine)
 
 # Import routers
-from app.routes import food, restaurants
+from app.routes import food, restaurants, admin
 
 app.include_router(food.router, prefix="/api/food", tags=["food"])
 app.include_router(restaurants.router, prefix="/api/restaurants", tags=["restaurants"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
+
+restaurant_index_task = None
+
+@app.on_event("startup")
+async def start_refresher():
+    from app.services.refresher import REFRESH_ENABLED
+    if REFRESH_ENABLED:
+        restaurants.refresher.start()
+
+@app.on_event("startup")
+async def start_restaurant_index():
+    from app.database import SessionLocal
+    from app.services import restaurant_index
+    if restaurant_index.RESTAURANT_INDEX_ENABLED:
+        global restaurant_index_task
+        restaurant_index_task = asyncio.create_task(restaurant_index.run(SessionLocal))
+
+@app.on_event("startup")
+async def start_warmup():
+    from app.services import warmup
+    from app.services.geo import geo_cell
+    if not warmup.WARMUP_ENABLED:
+        return
+
+    from app.services import restaurant_index
+
+    async def replay(pairs):
+        # Searches without a location use DEFAULT_LOCATION; replay those for dishes stocked around it
+        home = geo_cell(*restaurants.DEFAULT_LOCATION)
+        dishes = list(dict.fromkeys(p.dish for p in pairs if p.geo_cell == home))[:10]
+        await warmup.replay_gets(app, ["/api/food/dishes"] + [f"/api/restaurants/search?dish={quote(d)}" for d in dishes])
+
+    steps = {"restaurant_index": lambda pairs: restaurant_index.wait_ready()} \
+        if restaurant_index.RESTAURANT_INDEX_ENABLED else {}
+    restaurants.warmer.start({
+        **steps,
+        "db_pool": lambda pairs: warmup.warm_db_pool(),
+        "yandex": lambda pairs: warmup.warm_yandex(),
+        "ml": lambda pairs: warmup.warm_ml(),
+        "replay": replay,
+    })
+
+@app.on_event("shutdown")
+async def stop_background_work():
+    from app.services import ml_client, yandex
+    await restaurants.warmer.stop()
+    if restaurant_index_task is not None:
+        restaurant_index_task.cancel()
+    await restaurants.refresher.stop()
+    await yandex.close_client()
+    await ml_client.close_client()
 
 @app.get("/")
 async def root():
@@ -50,6 +134,20 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """503 until the startup warmup has finished or run out of its time budget"""
+    from app.services.warmup import WARMUP_ENABLED
+    if WARMUP_ENABLED and not restaurants.warmer.ready.is_set():
+        return JSONResponse({"status": "warming_up"}, status_code=503)
+    return {"status": "ready"}
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics"""
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/debug/db-check")
 async def debug_db_check():
     """Check database status"""
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, Text, DateTime
+from datetime import datetime
+from app.database import Base
+
+class FusedSearch(Base):
+    """An in-flight /recognize-and-find stream, so a cancel handled by any gateway worker reaches it"""
+    __tablename__ = "fused_searches"
+    
+    request_id = Column(String(32), primary_key=True)
+    dishes = Column(Text, nullable=False)  # JSON list of the dishes being searched
+    keep = Column(Text, nullable=True)  # JSON list of dishes still wanted once a cancel arrives
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,5 @@
 # This file makes the models directory a Python package
 from .restaurant import Restaurant, RestaurantDish
+from .fused_search import FusedSearch
 
-__all__ = ["Restaurant", "RestaurantDish"]
\ No newline at end of file
+__all__ = ["Restaurant", "RestaurantDish", "FusedSearch"]
\ No newline at end of file
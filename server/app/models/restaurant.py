@@ -1,18 +1,28 @@
-from sqlalchemy import Column, String, Float, Text, DateTime, ForeignKey
+from sqlalchemy import Column, String, Float, Integer, Text, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import uuid
 from app.database import Base
+from app.services.geo import geo_cell
+
+def generate_uuid():
+    return str(uuid.uuid4())
+
+def restaurant_geo_cell(context):
+    params = context.get_current_parameters()
+    return geo_cell(params["latitude"], params["longitude"])
 
 class Restaurant(Base):
     __tablename__ = "restaurants"
     
     # Match the manual table structure exactly
-    id = Column(String, primary_key=True)  # UUID as string
+    id = Column(String, primary_key=True, default=generate_uuid)  # UUID as string
     external_id = Column(String, unique=True, nullable=True)
     name = Column(String(255), nullable=False)
     address = Column(Text, nullable=False)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    geo_cell = Column(Integer, default=restaurant_geo_cell, index=True)  # partition key, see partition_tables.py
     cuisine_type = Column(String(100), default="Various")
     phone_number = Column(String(50), default="")
     opening_hours = Column(Text, default="")
@@ -27,9 +37,11 @@ class Restaurant(Base):
 class RestaurantDish(Base):
     __tablename__ = "restaurant_dishes"
     
-    id = Column(String, primary_key=True)  # UUID as string
+    id = Column(String, primary_key=True, default=generate_uuid)  # UUID as string
     restaurant_id = Column(String, ForeignKey("restaurants.id"), nullable=False)
     dish_name = Column(String(255), nullable=False)
+    dish_id = Column(String(64), nullable=True, index=True)  # canonical id from the dish vocabulary
+    geo_cell = Column(Integer, index=True)  # copied from the restaurant so both tables partition alike
     confidence_score = Column(Float, default=0.8)
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -0,0 +1,207 @@
+"""
+Metrics and logging for the API gateway.
+
+Prometheus histograms cover the slow stages of a request (ML service call,
+Yandex call, DB query, DB write). Logging goes through a QueueHandler so
+request handlers never block on stdout; LOG_LEVEL and LOG_SAMPLE_RATE control
+how much of the per-request chatter is emitted at all.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily
+from starlette.routing import Match
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_LATENCY = Histogram(
+    "foodfinder_api_stage_seconds", "Time spent in each request stage",
+    ["stage"], buckets=STAGE_BUCKETS,
+)
+REQUEST_LATENCY = Histogram(
+    "foodfinder_api_request_seconds", "End-to-end request latency",
+    ["route", "status"], buckets=STAGE_BUCKETS,
+)
+IN_FLIGHT = Gauge("foodfinder_api_inflight_requests", "Requests currently being processed", ["route"])
+LOG_QUEUE_DEPTH = Gauge("foodfinder_api_log_queue_depth", "Log records waiting for the background writer")
+YANDEX_REQUESTS = Counter("foodfinder_api_yandex_requests_total", "Yandex search calls by outcome", ["outcome"])
+SEARCH_PATH = Counter("foodfinder_api_search_path_total", "How restaurant searches were answered", ["path"])
+REFRESH_QUEUE_DEPTH = Gauge("foodfinder_api_refresh_queue_depth", "Tiles waiting for a background refresh")
+REFRESH_RUNS = Counter("foodfinder_api_refresh_runs_total", "Background tile refreshes by outcome", ["outcome"])
+EXTERNAL_API_QUEUE_SECONDS = Histogram(
+    "foodfinder_api_external_queue_seconds", "Time spent waiting for a rate limiter token",
+    ["api", "priority"], buckets=STAGE_BUCKETS,
+)
+EXTERNAL_API_COST = Counter("foodfinder_api_external_cost_total", "Accumulated cost of paid external API calls", ["api"])
+EXTERNAL_API_QUOTA_REMAINING = Gauge("foodfinder_api_external_quota_remaining", "Calls left in today's quota", ["api"])
+DB_READS = Counter("foodfinder_api_db_reads_total", "Read queries by the database they were routed to", ["target"])
+REPLICA_LAG = Gauge("foodfinder_api_replica_lag_seconds", "Measured replication lag (-1 when unreachable)", ["replica"])
+ADMISSION_QUEUED = Gauge("foodfinder_api_admission_queued", "Requests waiting for an admission slot", ["route_class"])
+ADMISSION_QUEUE_SECONDS = Histogram(
+    "foodfinder_api_admission_queue_seconds", "Time spent waiting for an admission slot",
+    ["route_class"], buckets=STAGE_BUCKETS,
+)
+ADMISSION_REJECTED = Counter("foodfinder_api_admission_rejected_total", "Requests shed by admission control", ["route_class", "reason"])
+ML_BYTES = Counter("foodfinder_api_ml_bytes_total", "Bytes exchanged with the ML service", ["direction"])
+RESPONSE_CACHE_LOOKUPS = Counter("foodfinder_api_response_cache_total", "Cacheable responses by outcome", ["route", "result"])
+RESPONSE_CACHE_BYTES = Gauge("foodfinder_api_response_cache_bytes", "Bytes held by the in-memory response cache")
+WARMUP_STEPS = Counter("foodfinder_api_warmup_steps_total", "Warmup steps by kind and outcome", ["step", "outcome"])
+WARMUP_SECONDS = Histogram("foodfinder_api_warmup_seconds", "Duration of a full warmup pass",
+                           buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300))
+RESTAURANT_INDEX_SIZE = Gauge("foodfinder_api_restaurant_index_restaurants", "Restaurants in the in-process dish/geo index")
+LOG_RECORDS_DROPPED = Counter("foodfinder_api_log_records_dropped_total", "Log records dropped on a full queue")
+
+
+class CacheCollector:
+    """Exports hits and misses of registered lru_caches, read from cache_info() at scrape time"""
+
+    def __init__(self):
+        self.caches = {}
+
+    def collect(self):
+        family = CounterMetricFamily("foodfinder_api_cache_lookups", "Cache lookups by outcome", labels=["cache", "result"])
+        for name, cached in self.caches.items():
+            info = cached.cache_info()
+            family.add_metric([name, "hit"], info.hits)
+            family.add_metric([name, "miss"], info.misses)
+        yield family
+
+
+_cache_collector = CacheCollector()
+REGISTRY.register(_cache_collector)
+
+
+def register_cache(name: str, cached):
+    """Report an lru_cache-wrapped function under `name` in the cache lookup metric"""
+    _cache_collector.caches[name] = cached
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block of work into the stage histogram"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+
+def match_route(routes, scope) -> str:
+    """Template of the route matching an ASGI scope, before the router has run"""
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+def metrics_payload():
+    """Body and content type for a /metrics endpoint"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware tracking in-flight requests and latency per route template.
+
+    `routes` (the app's route list) lets in-flight requests be labelled before
+    the router has run; without it they are counted under "unmatched".
+    """
+
+    def __init__(self, app, routes=None):
+        self.app = app
+        self.routes = routes if routes is not None else []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        route = match_route(self.routes, scope)
+        in_flight = IN_FLIGHT.labels(route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(route, str(status["code"])).observe(time.perf_counter() - start)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep every WARNING and above, but only a fraction of lower-level records"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1.0 or random.random() < self.rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never block the caller: when the queue is full the record is dropped and counted"""
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+_listener = None
+
+
+def setup_logging(service: str):
+    """Route all logging through a background queue listener (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(f"%(asctime)s {service} %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.Queue(maxsize=10000)
+    queue_handler = DroppingQueueHandler(log_queue)
+    LOG_QUEUE_DEPTH.set_function(log_queue.qsize)
+    queue_handler.addFilter(SamplingFilter(sample_rate))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
@@ -0,0 +1,211 @@
+"""
+Opt-in request profiling and per-request SQL accounting.
+
+Every request gets a SQL tally (statement count and time) collected through
+SQLAlchemy cursor events. A request carrying `X-Profile: 1` plus an
+`X-Profile-Token` matching PROFILE_TOKEN, or picked by PROFILE_SAMPLE_RATE,
+additionally runs under pyinstrument (when installed) or cProfile. Results
+go to a bounded on-disk ring buffer served by /admin/profiles.
+"""
+import contextvars
+import cProfile
+import io
+import hmac
+import json
+import logging
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+PROFILE_MAX_ENTRIES = int(os.getenv("PROFILE_MAX_ENTRIES", "50"))
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+# Statements slower than this are logged at WARNING with their SQL
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+
+try:
+    from pyinstrument import Profiler as PyinstrumentProfiler
+except ImportError:
+    PyinstrumentProfiler = None
+
+
+class ProfileStore:
+    """Ring buffer of profile artifacts on disk: the oldest entries are evicted first"""
+
+    def __init__(self, directory: str = PROFILE_DIR, max_entries: int = PROFILE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _entries(self) -> List[str]:
+        metas = [f for f in os.listdir(self.directory) if f.endswith(".meta.json")]
+        return sorted(f[:-len(".meta.json")] for f in metas)
+
+    def save(self, kind: str, artifacts: Dict[str, bytes], meta: Dict) -> str:
+        """Store artifacts {extension: bytes} plus metadata; return the profile id"""
+        profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        with self._lock:
+            for ext, data in artifacts.items():
+                with open(os.path.join(self.directory, f"{profile_id}.{ext}"), "wb") as f:
+                    f.write(data)
+            meta = {**meta, "id": profile_id, "kind": kind, "artifacts": sorted(artifacts),
+                    "created_at": time.time()}
+            # Metadata is written last so readers never see a half-written entry
+            with open(os.path.join(self.directory, f"{profile_id}.meta.json"), "w") as f:
+                json.dump(meta, f)
+            for stale in self._entries()[:-self.max_entries]:
+                for name in os.listdir(self.directory):
+                    if name.startswith(stale + "."):
+                        os.remove(os.path.join(self.directory, name))
+        return profile_id
+
+    def list(self) -> List[Dict]:
+        result = []
+        for profile_id in reversed(self._entries()):
+            try:
+                with open(os.path.join(self.directory, f"{profile_id}.meta.json")) as f:
+                    result.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # evicted while listing
+        return result
+
+    def path(self, profile_id: str, ext: str) -> Optional[str]:
+        if os.path.basename(profile_id) != profile_id or os.path.basename(ext) != ext:
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.{ext}")
+        return path if os.path.exists(path) else None
+
+
+store = ProfileStore()
+
+
+class SQLTally:
+    """Statements executed on behalf of one request"""
+
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.keep_statements = keep_statements
+        self.statements = []
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        if self.keep_statements:
+            self.statements.append({"sql": statement, "ms": round(seconds * 1000, 3)})
+
+
+current_sql = contextvars.ContextVar("current_sql", default=None)
+
+
+def install_sql_hooks(engine):
+    """Time every cursor execution and attribute it to the current request"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        tally = current_sql.get()
+        if tally is not None:
+            tally.add(statement, elapsed)
+        if elapsed * 1000 > SLOW_QUERY_MS:
+            logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, statement)
+
+
+def should_profile(headers: Dict[str, str]) -> bool:
+    """Decide whether this request gets a full profile"""
+    if headers.get("x-profile") == "1":
+        # Closed by default: forcing a profile needs PROFILE_TOKEN configured and presented
+        token = headers.get("x-profile-token")
+        return PROFILE_TOKEN is not None and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware: SQL tally for every request, a CPU profile for selected ones.
+
+    Only one request is profiled at a time. cProfile/pyinstrument follow the
+    event loop thread, so coroutines of other requests interleaving with the
+    profiled one can show up in its tree.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._profiling = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+        profile = should_profile(headers) and self._profiling.acquire(blocking=False)
+        tally = SQLTally(keep_statements=profile)
+        token = current_sql.set(tally)
+        start = time.perf_counter()
+        profiler = None
+        if profile and PyinstrumentProfiler:
+            profiler = PyinstrumentProfiler(async_mode="enabled")
+            profiler.start()
+        elif profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_sql.reset(token)
+            if profile:
+                try:
+                    if PyinstrumentProfiler:
+                        profiler.stop()
+                    else:
+                        profiler.disable()
+                    # Rendering and file writes stay off the event loop
+                    await run_in_threadpool(self._store, scope, profiler, tally, elapsed)
+                finally:
+                    self._profiling.release()
+            if tally.count:
+                logger.debug("%s %s: %d SQL statements in %.1f ms (request %.1f ms)",
+                             scope["method"], scope["path"], tally.count, tally.seconds * 1000, elapsed * 1000)
+
+    def _store(self, scope, profiler, tally: SQLTally, elapsed: float):
+        meta = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "duration_ms": round(elapsed * 1000, 2),
+            "sql_count": tally.count,
+            "sql_ms": round(tally.seconds * 1000, 2),
+        }
+        sql = json.dumps(tally.statements, indent=1).encode()
+        try:
+            if PyinstrumentProfiler:
+                artifacts = {"html": profiler.output_html().encode(),
+                             "txt": profiler.output_text(unicode=True).encode(),
+                             "sql.json": sql}
+                kind = "pyinstrument"
+            else:
+                text = io.StringIO()
+                pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(60)
+                artifacts = {"txt": text.getvalue().encode(), "sql.json": sql}
+                kind = "cprofile"
+            profile_id = store.save(kind, artifacts, meta)
+            logger.info("Stored %s profile %s for %s %s", kind, profile_id, scope["method"], scope["path"])
+        except Exception as e:
+            logger.warning("Failed to store profile: %s", e)
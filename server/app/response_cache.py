@@ -0,0 +1,291 @@
+"""
+HTTP caching for the gateway's read endpoints.
+
+Routes listed in ROUTE_POLICIES get a strong ETag, conditional GETs (304 on
+a matching If-None-Match), their Cache-Control policy and gzip or brotli
+(when installed) above COMPRESS_MIN_BYTES. Routes with a server-side TTL
+also keep the rendered response in a bounded in-memory LRU keyed by path and
+normalised query, so a repeated request is answered without running the
+route; compressed variants are made once per entry. Restaurant entries are
+dropped whenever new restaurants are saved.
+
+CompactJSONResponse serialises with orjson (compact json.dumps without it).
+"""
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.responses import JSONResponse
+
+from .observability import RESPONSE_CACHE_BYTES, RESPONSE_CACHE_LOOKUPS, match_route
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 2**20)))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+# Seconds a restaurant search or nearby listing is served from memory
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "30"))
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=str).encode()
+
+
+class CompactJSONResponse(JSONResponse):
+    """JSON response rendered by orjson; return it directly to also skip FastAPI's jsonable_encoder"""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+@dataclass
+class CachePolicy:
+    cache_control: str
+    ttl: float  # seconds kept in the server-side cache; 0 = ETag and compression only
+
+
+ROUTE_POLICIES = {
+    "/api/restaurants/nearby": CachePolicy(f"public, max-age={int(RESPONSE_CACHE_TTL)}", RESPONSE_CACHE_TTL),
+    "/api/restaurants/search": CachePolicy(f"public, max-age={int(RESPONSE_CACHE_TTL)}", RESPONSE_CACHE_TTL),
+    "/api/food/dishes": CachePolicy("public, max-age=3600", 3600),
+}
+
+# Headers that describe one encoding of the body and are set per response
+_PER_RESPONSE = {b"content-length", b"content-encoding", b"etag", b"cache-control", b"vary"}
+
+
+def normalize_query(query_string: bytes) -> str:
+    """Sorted parameters with numbers in one canonical form, so lat=55.70 and lat=55.7 share an entry"""
+    pairs = []
+    for key, value in parse_qsl(query_string.decode("latin-1")):
+        value = value.strip()
+        try:
+            value = repr(float(value))
+        except ValueError:
+            pass
+        pairs.append((key, value))
+    return urlencode(sorted(pairs))
+
+
+def negotiate(accept_encoding: str, size: int) -> Optional[str]:
+    """Best of br/gzip the client accepts (q > 0), or None for small bodies and identity"""
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+
+@dataclass
+class CachedResponse:
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    etag: str  # opaque tag without quotes; encoded variants append "-<encoding>"
+    cache_control: str
+    expires: float = 0.0
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, status, headers, body: bytes, cache_control: str, ttl: float) -> "CachedResponse":
+        kept = [(k, v) for k, v in headers if k.lower() not in _PER_RESPONSE]
+        return cls(status, kept, body, hashlib.sha1(body).hexdigest()[:20], cache_control, time.monotonic() + ttl)
+
+    def body_for(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        if encoding not in self.encoded:
+            self.encoded[encoding] = brotli.compress(self.body, quality=5) if encoding == "br" else \
+                gzip.compress(self.body, compresslevel=6)
+        return self.encoded[encoding]
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(b) for b in self.encoded.values())
+
+    def matches(self, if_none_match: str) -> bool:
+        """Weak comparison (RFC 9110 13.1.2) against every encoding of this body"""
+        for tag in if_none_match.split(","):
+            tag = tag.strip()
+            if tag == "*":
+                return True
+            tag = tag.removeprefix("W/").strip('"')
+            if tag == self.etag or tag.rsplit("-", 1)[0] == self.etag:
+                return True
+        return False
+
+
+class ResponseCache:
+    """LRU of rendered responses bounded by entry count and total bytes"""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_MAX_BYTES, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.bytes = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self._remove(key)
+            return None
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse):
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        self.bytes += entry.size
+        self.evict()
+
+    def grew(self, entry: CachedResponse, before: int):
+        """Account for a compressed variant added to a stored entry"""
+        self.bytes += entry.size - before
+        self.evict()
+
+    def evict(self):
+        while self.entries and (self.bytes > self.max_bytes or len(self.entries) > self.max_entries):
+            self._remove(next(iter(self.entries)))
+        RESPONSE_CACHE_BYTES.set(self.bytes)
+
+    def invalidate(self, prefix: str = "") -> int:
+        """Drop every entry whose path starts with prefix"""
+        stale = [key for key in self.entries if key.startswith(prefix)]
+        for key in stale:
+            self._remove(key)
+        RESPONSE_CACHE_BYTES.set(self.bytes)
+        return len(stale)
+
+    def _remove(self, key: str):
+        self.bytes -= self.entries.pop(key).size
+
+    def describe(self) -> Dict:
+        return {"entries": len(self.entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "max_entries": self.max_entries}
+
+
+default_cache = ResponseCache()
+
+
+def invalidate(prefix: str = "") -> int:
+    return default_cache.invalidate(prefix)
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware applying ROUTE_POLICIES to GET/HEAD requests"""
+
+    def __init__(self, app, routes=None, cache: Optional[ResponseCache] = None,
+                 policies: Dict[str, CachePolicy] = None, enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.app = app
+        self.routes = routes if routes is not None else []
+        self.cache = cache or default_cache
+        self.policies = ROUTE_POLICIES if policies is None else policies
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.enabled or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        route = match_route(self.routes, scope)
+        policy = self.policies.get(route)
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        key = f"{scope['path']}?{normalize_query(scope['query_string'])}"
+        entry = self.cache.get(key) if policy.ttl > 0 else None
+        stored = entry is not None
+        result = "hit" if stored else "miss"
+        if entry is None:
+            entry, passthrough = await self._render(scope, receive, policy)
+            if entry is None:
+                for message in passthrough:
+                    if scope["method"] == "HEAD" and message["type"] == "http.response.body":
+                        message = {**message, "body": b""}
+                    await send(message)
+                return
+            # A route can opt a response out (e.g. a degraded search) with Cache-Control: no-store
+            if policy.ttl > 0 and entry.cache_control == policy.cache_control:
+                self.cache.put(key, entry)
+                stored = True
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"]}
+        if entry.matches(headers.get("if-none-match", "")):
+            RESPONSE_CACHE_LOOKUPS.labels(route, "not_modified").inc()
+            await send({"type": "http.response.start", "status": 304, "headers": [
+                (b"etag", f'"{entry.etag}"'.encode()),
+                (b"cache-control", entry.cache_control.encode()),
+                (b"vary", b"Accept-Encoding"),
+            ]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        RESPONSE_CACHE_LOOKUPS.labels(route, result).inc()
+
+        encoding = negotiate(headers.get("accept-encoding", ""), len(entry.body))
+        before = entry.size
+        body = entry.body_for(encoding)
+        if stored and entry.size != before:
+            self.cache.grew(entry, before)
+        etag = entry.etag if encoding is None else f"{entry.etag}-{encoding}"
+        response_headers = entry.headers + [
+            (b"content-length", str(len(body)).encode()),
+            (b"etag", f'"{etag}"'.encode()),
+            (b"cache-control", entry.cache_control.encode()),
+            (b"vary", b"Accept-Encoding"),
+            (b"x-cache", result.upper().encode()),
+        ]
+        if encoding is not None:
+            response_headers.append((b"content-encoding", encoding.encode()))
+        await send({"type": "http.response.start", "status": entry.status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+    async def _render(self, scope, receive, policy: CachePolicy):
+        """Run the route and buffer its response: (entry, None) for a 200, else (None, messages to replay)"""
+        messages = []
+
+        async def capture(message):
+            messages.append(message)
+
+        # HEAD is rendered as GET so the stored entry carries the body
+        await self.app({**scope, "method": "GET"}, receive, capture)
+        start = next((m for m in messages if m["type"] == "http.response.start"), None)
+        if start is None or start["status"] != 200:
+            return None, messages
+        body = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+        cache_control = next((v.decode("latin-1") for k, v in start["headers"] if k.lower() == b"cache-control"),
+                             policy.cache_control)
+        return CachedResponse.build(200, start["headers"], body, cache_control, policy.ttl), None
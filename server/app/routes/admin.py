@@ -0,0 +1,78 @@
+from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi.responses import FileResponse
+from typing import Optional
+import hmac
+import os
+
+from ..admission import default_controller as admission
+from ..database import replicas
+from ..profiling import store as profile_store
+from ..response_cache import default_cache as response_cache
+from ..services import restaurant_index
+from ..services.rate_limit import _buckets
+from .restaurants import refresher, warmer
+
+# Required in X-Admin-Token for every /admin endpoint; without it they are disabled
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+@router.get("/profiles")
+async def list_profiles():
+    """Stored request profiles, newest first"""
+    return {"profiles": profile_store.list()}
+
+@router.get("/profiles/{profile_id}/{artifact}")
+async def get_profile(profile_id: str, artifact: str):
+    """Download one artifact of a profile (`txt`, `html`, `sql.json`)"""
+    path = profile_store.path(profile_id, artifact)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path)
+
+@router.get("/rate-limits")
+async def rate_limits():
+    """Token bucket state and quota left per external API key"""
+    return {"buckets": [{"api": bucket.name, **bucket.describe()} for bucket in _buckets.values()]}
+
+@router.get("/refresher")
+async def refresher_state():
+    """Background refresh queue"""
+    return refresher.describe()
+
+@router.get("/warmup")
+async def warmup_state():
+    """Readiness and the last warmup pass (per-step seconds, errors)"""
+    return warmer.describe()
+
+@router.get("/restaurant-index")
+async def restaurant_index_state():
+    """Size and memory of the in-process dish/geo bitmap index"""
+    index = restaurant_index.get_index()
+    return index.describe() if index else {"built": False}
+
+@router.get("/replicas")
+async def replica_state():
+    """Read replicas, their measured lag and whether they take reads"""
+    return {"replicas": replicas.describe() if replicas else []}
+
+@router.get("/admission")
+async def admission_state():
+    """Running and queued requests per admission class"""
+    return admission.describe()
+
+@router.get("/response-cache")
+async def response_cache_state():
+    """Entries and bytes held by the in-memory response cache"""
+    return response_cache.describe()
+
+@router.delete("/response-cache")
+async def clear_response_cache(prefix: str = ""):
+    """Drop cached responses whose path starts with `prefix` (all by default)"""
+    return {"dropped": response_cache.invalidate(prefix)}
@@ -1,17 +1,53 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, UploadFile, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import asyncio
 import httpx
-import os
-from typing import Dict, Any
+import json
+import uuid
+from typing import Dict, Any, List, Optional
 import logging
+from ..database import SessionLocal
+from ..response_cache import CompactJSONResponse
+from ..services import fused_cancel, ml_client
+from ..services.ml_client import ML_SERVICE_URL
+from .restaurants import DEFAULT_LOCATION, find_restaurants
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# ML service URL (could be environment variable)
-ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://localhost:8001")
+async def call_ml_service(image_data: bytes, filename: str, content_type: str, top_k: int = 5) -> Dict[str, Any]:
+    """Send an image to the ML service and return its prediction payload"""
+    try:
+        logger.info(f"Sending request to ML service: {ML_SERVICE_URL} ({ml_client.ML_TRANSPORT})")
+        result = await ml_client.recognize(image_data, filename, content_type, top_k=top_k)
+        logger.info(f"Recognition successful: {result.get('message', 'No message')}")
+        return result
+    except ml_client.MLServiceError as e:
+        logger.error(e.detail)
+        raise HTTPException(status_code=400 if e.status_code == 400 else 500, detail=e.detail)
+    except httpx.ConnectError:
+        error_msg = f"Cannot connect to ML service at {ML_SERVICE_URL}. Make sure it's running."
+        logger.error(error_msg)
+        raise HTTPException(status_code=503, detail=error_msg)
+    except httpx.TimeoutException:
+        error_msg = "ML service timeout. The request took too long."
+        logger.error(error_msg)
+        raise HTTPException(status_code=504, detail=error_msg)
+
+async def read_image(image: UploadFile) -> bytes:
+    """Validate an uploaded image and return its bytes"""
+    if not image.content_type.startswith('image/'):
+        logger.error(f"Invalid file type: {image.content_type}")
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    image_data = await image.read()
+    logger.info(f"Image size: {len(image_data)} bytes")
+    
+    if len(image_data) == 0:
+        raise HTTPException(status_code=400, detail="Empty image file")
+    return image_data
 
 @router.post("/recognize")
 async def recognize_food(image: UploadFile = File(...)):
@@ -20,63 +56,162 @@ async def recognize_food(image: UploadFile = File(...)):
     """
     logger.info(f"Received recognition request for file: {image.filename}")
     
-    # Validate image
-    if not image.content_type.startswith('image/'):
-        logger.error(f"Invalid file type: {image.content_type}")
-        raise HTTPException(status_code=400, detail="File must be an image")
+    image_data = await read_image(image)
     
     try:
-        # Read the image data first
-        image_data = await image.read()
-        logger.info(f"Image size: {len(image_data)} bytes")
-        
-        if len(image_data) == 0:
-            raise HTTPException(status_code=400, detail="Empty image file")
-        
-        # Reset file pointer for sending
-        files = {"image": (image.filename, image_data, image.content_type)}
-        
-        # Send image to ML service
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            logger.info(f"Sending request to ML service: {ML_SERVICE_URL}/predict")
-            
-            response = await client.post(
-                f"{ML_SERVICE_URL}/predict", 
-                files=files,
-                params={"top_k": 5}  
-            )
-            
-            logger.info(f"ML service response status: {response.status_code}")
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Recognition successful: {result.get('message', 'No message')}")
-                return JSONResponse(content=result)
-            else:
-                error_detail = f"ML service error: {response.status_code} - {response.text}"
-                logger.error(error_detail)
-                raise HTTPException(status_code=500, detail=error_detail)
-                
-    except httpx.ConnectError:
-        error_msg = f"Cannot connect to ML service at {ML_SERVICE_URL}. Make sure it's running."
-        logger.error(error_msg)
-        raise HTTPException(status_code=503, detail=error_msg)
-    except httpx.TimeoutException:
-        error_msg = "ML service timeout. The request took too long."
-        logger.error(error_msg)
-        raise HTTPException(status_code=504, detail=error_msg)
+        result = await call_ml_service(image_data, image.filename, image.content_type, top_k=5)
+        return JSONResponse(content=result)
+    except HTTPException:
+        raise
     except Exception as e:
         error_msg = f"Recognition failed: {str(e)}"
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
-@router.get("/dishes")
+@router.post("/similar")
+async def similar_dishes(image: UploadFile = File(...), k: int = Query(10, ge=1, le=100)):
+    """
+    Reference dish photos that look most like the upload (nearest neighbours
+    in the ML service's embedding index)
+    """
+    image_data = await read_image(image)
+    try:
+        return await ml_client.similar(image_data, image.filename, image.content_type, k=k)
+    except ml_client.MLServiceError as e:
+        logger.error(e.detail)
+        raise HTTPException(status_code=e.status_code if e.status_code in (400, 409, 503) else 500, detail=e.detail)
+    except httpx.ConnectError:
+        raise HTTPException(status_code=503, detail=f"Cannot connect to ML service at {ML_SERVICE_URL}")
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="ML service timeout. The request took too long.")
+
+# Speculative searches of in-flight fused requests served by this worker: request_id -> {dish: task}.
+# Cancels that land on another worker reach them through the fused_searches table (services/fused_cancel.py).
+fused_searches: Dict[str, Dict[str, asyncio.Task]] = {}
+
+async def search_for_dish(dish: str, lat: float, lon: float, radius: int) -> Dict[str, Any]:
+    """One speculative restaurant search, on its own session so searches can overlap"""
+    db = SessionLocal()
+    try:
+        return await find_restaurants(dish, lat, lon, radius, db)
+    finally:
+        db.close()
+
+def unregister_fused(request_id: str):
+    try:
+        fused_cancel.unregister(request_id)
+    except Exception as e:
+        logger.warning(f"Fused request {request_id}: could not drop its cancel row: {e}")
+
+def format_event(event: str, data: Dict[str, Any], fmt: str) -> str:
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    if fmt == "sse":
+        return f"event: {event}\ndata: {payload}\n\n"
+    return json.dumps({"event": event, "data": data}, ensure_ascii=False, default=str) + "\n"
+
+@router.post("/recognize-and-find")
+async def recognize_and_find(
+    request: Request,
+    image: UploadFile = File(...),
+    lat: Optional[float] = Query(None, description="Latitude"),
+    lon: Optional[float] = Query(None, description="Longitude"),
+    radius: int = Query(5000, description="Search radius in meters"),
+    searches: int = Query(3, ge=1, le=5, description="How many top predictions to search for"),
+    min_confidence: float = Query(0.05, description="Skip speculative searches below this confidence"),
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|sse)$", description="ndjson or sse"),
+):
+    """
+    Recognize the dish, then search restaurants for the top predictions
+    concurrently. Streams a `recognition` event first, one `restaurants`
+    event per dish as each search finishes, and `done` at the end. Searches
+    the client no longer needs can be stopped via the cancel endpoint, which
+    may be served by any worker.
+    """
+    image_data = await read_image(image)
+    result = await call_ml_service(image_data, image.filename, image.content_type, top_k=5)
+    
+    if lat is None or lon is None:
+        lat, lon = DEFAULT_LOCATION
+    
+    request_id = uuid.uuid4().hex
+    dishes = [p["food_name"] for p in result.get("predictions", [])[:searches]
+              if p["confidence"] >= min_confidence]
+    tasks = {dish: asyncio.create_task(search_for_dish(dish, lat, lon, radius)) for dish in dishes}
+    fused_searches[request_id] = tasks
+    logger.info(f"Fused request {request_id}: searching {dishes}")
+    shared = False
+    if tasks:
+        try:
+            await asyncio.to_thread(fused_cancel.register, request_id, dishes)
+            shared = True
+        except Exception as e:
+            logger.warning(f"Fused request {request_id}: cancels only work on this worker: {e}")
+    
+    async def stream():
+        dish_of = {task: dish for dish, task in tasks.items()}
+        pending = set(tasks.values())
+        polled = asyncio.get_running_loop().time()
+        try:
+            yield format_event("recognition", {**result, "request_id": request_id, "searching": dishes}, fmt)
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=min(0.5, fused_cancel.FUSED_CANCEL_POLL_SECONDS),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    dish = dish_of[task]
+                    if task.cancelled():
+                        yield format_event("cancelled", {"dish": dish}, fmt)
+                    elif task.exception() is not None:
+                        yield format_event("error", {"dish": dish, "detail": str(task.exception())}, fmt)
+                    else:
+                        yield format_event("restaurants", task.result(), fmt)
+                if await request.is_disconnected():
+                    logger.info(f"Fused request {request_id}: client went away")
+                    break
+                now = asyncio.get_running_loop().time()
+                if shared and pending and now - polled >= fused_cancel.FUSED_CANCEL_POLL_SECONDS:
+                    polled = now
+                    try:
+                        keep = await asyncio.to_thread(fused_cancel.requested_keep, request_id)
+                    except Exception as e:
+                        logger.warning(f"Fused request {request_id}: cancel poll failed: {e}")
+                        keep = None
+                    if keep is not None:
+                        for task in pending:
+                            if dish_of[task] not in keep:
+                                task.cancel()
+            yield format_event("done", {"request_id": request_id}, fmt)
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            fused_searches.pop(request_id, None)
+            if shared:
+                # Not awaited: the generator may be closing because the client went away
+                asyncio.get_running_loop().run_in_executor(None, unregister_fused, request_id)
+    
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@router.post("/recognize-and-find/{request_id}/cancel")
+async def cancel_speculative_searches(request_id: str, keep: List[str] = Query([], description="Dishes still needed")):
+    """Cancel the speculative searches of a fused request except those in `keep`"""
+    tasks = fused_searches.get(request_id)
+    if tasks is not None:
+        cancelled = [dish for dish, task in tasks.items() if dish not in keep and not task.done() and task.cancel()]
+        return {"request_id": request_id, "cancelled": cancelled}
+    
+    # Streamed by another worker: it picks the cancel up on its next poll
+    cancelled = await asyncio.to_thread(fused_cancel.request_cancel, request_id, keep)
+    if cancelled is None:
+        raise HTTPException(status_code=404, detail="Unknown or finished request")
+    return {"request_id": request_id, "cancelled": cancelled}
+
+@router.get("/dishes", response_class=CompactJSONResponse)
 async def get_popular_dishes():
     """
     Get list of popular dishes (could be from database)
     """
     logger.info("Fetching popular dishes")
-    return {
+    return CompactJSONResponse({
         "dishes": [
             {"id": 1, "name": "Pizza", "category": "Italian"},
             {"id": 2, "name": "Burger", "category": "American"},
@@ -84,7 +219,7 @@ async def get_popular_dishes():
             {"id": 4, "name": "Tacos", "category": "Mexican"},
             {"id": 5, "name": "Pasta", "category": "Italian"},
         ]
-    }
+    })
 
 @router.get("/health")
 async def health_check():
@@ -1,236 +1,306 @@
 from fastapi import APIRouter, HTTPException, Query, Depends
 from typing import List, Optional
-import httpx
-import os
-import math
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_, func
-from ..database import get_db
+from ..database import SessionLocal, get_db, in_cells, mark_written, read_cells, use_primary
 from ..models.restaurant import Restaurant, RestaurantDish
+from ..observability import SEARCH_PATH, stage
+from ..response_cache import CompactJSONResponse, invalidate as invalidate_responses
+from ..services import restaurant_index, yandex
+from ..services.dish_vocabulary import get_vocabulary
+from ..services.geo import calculate_distance, cells_in_radius, geo_cell, km_to_degrees
+from ..services.rate_limit import BACKGROUND, INTERACTIVE, RateLimited
+from ..services.refresher import REFRESH_ENABLED, REFRESH_MIN_LOCAL_RESULTS, REFRESH_TARGET_RESULTS, RefreshJob, Refresher
+from ..services.warmup import WARMUP_RADIUS, HotPair, Warmer, hot_pairs
+from datetime import datetime
 import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Yandex Maps API
 YANDEX_GEOCODE_API = "https://geocode-maps.yandex.ru/1.x/"
-YANDEX_SEARCH_API = "https://search-maps.yandex.ru/v1/"
 
-YANDEX_API_KEY = "04e6a38e-1a37-4e9b-b633-597e648e6462"
+DEFAULT_LOCATION = (55.7558, 37.6173)  # Moscow center
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance between two coordinates in km using Haversine formula"""
-    R = 6371  # Earth radius in km
-    
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    
-    a = (math.sin(dlat/2) * math.sin(dlat/2) + 
-         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * 
-         math.sin(dlon/2) * math.sin(dlon/2))
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
-
-async def search_yandex_restaurants(query: str, lat: float, lon: float, radius: int = 5000):
-    """Search restaurants using Yandex Maps Places API"""
-    if not YANDEX_API_KEY:
+async def search_yandex_restaurants(query: str, lat: float, lon: float, radius: int = 5000,
+                                    priority: int = INTERACTIVE):
+    """
+    Search restaurants using Yandex Maps Places API (fanned out over the radius
+    if YANDEX_FANOUT=1). Raises RateLimited when the call is not admitted.
+    """
+    if not yandex.YANDEX_API_KEY:
         raise Exception("Yandex API key not configured")
     
-    # Translate common food terms to Russian for better results
-    query_translations = {
-        'pizza': 'пицца',
-        'burger': 'бургер',
-        'sushi': 'суши',
-        'pasta': 'паста',
-        'salad': 'салат',
-        'steak': 'стейк',
-        'coffee': 'кофе',
-        'cake': 'торт',
-        'ice cream': 'мороженое',
-        'sandwich': 'сэндвич'
-    }
-    
-    # Use Russian translation if available, otherwise use original
-    russian_query = query_translations.get(query.lower(), query)
+    # Search in Russian for better results (the query itself if the dish is unknown)
+    russian_query = get_vocabulary().search_term(query)
     
-    params = {
-        "apikey": YANDEX_API_KEY,  # Your PLACES_HTTP_API key
-        "text": f"{russian_query} ресторан кафе",
-        "lang": "ru_RU",
-        "ll": f"{lon},{lat}",
-        "spn": "0.05,0.05",
-        "type": "biz",
-        "results": 20
-    }
+    logger.info("Searching Yandex for: %s at %s,%s", russian_query, lat, lon)
     
-    print(f"Searching Yandex for: {russian_query} at {lat},{lon}")
+    try:
+        if yandex.YANDEX_FANOUT:
+            restaurants = await yandex.search_fanout(russian_query, lat, lon, radius, priority=priority)
+        else:
+            restaurants = await yandex.search(russian_query, lat, lon, priority=priority)
+    except RateLimited:
+        raise
+    except Exception as e:
+        logger.warning("Yandex API error: %s", e)
+        raise
     
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(YANDEX_SEARCH_API, params=params, timeout=10.0)
-            
-            if response.status_code != 200:
-                print(f"Yandex API error: {response.status_code} - {response.text}")
-                raise Exception(f"Yandex API error: {response.status_code}")
-            
-            data = response.json()
-            restaurants = []
-            
-            for feature in data.get('features', []):
-                properties = feature.get('properties', {})
-                company_meta = properties.get('CompanyMetaData', {})
-                geometry = feature.get('geometry', {})
-                coordinates = geometry.get('coordinates', [])
-                
-                if not coordinates or len(coordinates) != 2:
-                    continue
-                
-                name = company_meta.get('name', 'Unknown Restaurant')
-                address = company_meta.get('address', 'Address not available')
-                
-                # Calculate distance
-                distance_km = calculate_distance(lat, lon, coordinates[1], coordinates[0])
-                
-                # Extract cuisine from categories
-                cuisine = "Various"
-                categories = company_meta.get('Categories', [])
-                for category in categories:
-                    category_name = category.get('name', '').lower()
-                    if any(word in category_name for word in ['итальянск', 'pizza', 'pasta']):
-                        cuisine = "Italian"
-                    elif any(word in category_name for word in ['японск', 'суши', 'sushi']):
-                        cuisine = "Japanese"
-                    elif any(word in category_name for word in ['китайск', 'chinese']):
-                        cuisine = "Chinese"
-                    elif any(word in category_name for word in ['русск', 'russian']):
-                        cuisine = "Russian"
-                    elif any(word in category_name for word in ['бургер', 'burger']):
-                        cuisine = "American"
-                
-                # Get rating if available
-                rating = company_meta.get('rating', 4.0 + (hash(name) % 10) / 10)
-                
-                restaurant = {
-                    "external_id": feature.get('id', ''),
-                    "name": name,
-                    "address": address,
-                    "cuisine": cuisine,
-                    "rating": float(rating),
-                    "price_range": "$" * (1 + (hash(name) % 3)),  # Yandex doesn't provide price info
-                    "distance": f"{distance_km:.1f} km",
-                    "coordinates": {"lat": coordinates[1], "lon": coordinates[0]},
-                    "phone": company_meta.get('Phones', [{}])[0].get('formatted', ''),
-                    "hours": company_meta.get('Hours', {}).get('text', ''),
-                    "source": "yandex",
-                    "url": company_meta.get('url', '')
-                }
-                restaurants.append(restaurant)
-            
-            print(f"Found {len(restaurants)} restaurants from Yandex")
-            return restaurants
-            
-        except httpx.TimeoutException:
-            print("Yandex API timeout")
-            raise Exception("Yandex API timeout")
-        except Exception as e:
-            print(f"Yandex API error: {str(e)}")
-            raise
+    logger.info("Found %d restaurants from Yandex", len(restaurants))
+    return restaurants
 
 
 async def save_restaurants_to_db(restaurants_data: List[dict], dish_name: str, db: Session):
     """Save restaurants to PostgreSQL database"""
-    saved_restaurants = []
-    
-    for rest_data in restaurants_data:
-        # Check if restaurant already exists by external_id or location
-        existing_rest = db.query(Restaurant).filter(
-            or_(
-                Restaurant.external_id == rest_data.get('external_id'),
-                and_(
-                    func.abs(Restaurant.latitude - rest_data['coordinates']['lat']) < 0.0001,
-                    func.abs(Restaurant.longitude - rest_data['coordinates']['lon']) < 0.0001,
-                    Restaurant.name == rest_data['name']
+    dish_id = get_vocabulary().resolve(dish_name)
+    # The duplicate checks below must see the latest rows, not a lagging replica
+    use_primary(db)
+    with stage("db_write"):
+        saved_restaurants = []
+
+        for rest_data in restaurants_data:
+            # Check if restaurant already exists by external_id or location
+            existing_rest = db.query(Restaurant).filter(
+                or_(
+                    Restaurant.external_id == rest_data.get('external_id'),
+                    and_(
+                        func.abs(Restaurant.latitude - rest_data['coordinates']['lat']) < 0.0001,
+                        func.abs(Restaurant.longitude - rest_data['coordinates']['lon']) < 0.0001,
+                        Restaurant.name == rest_data['name']
+                    )
                 )
-            )
-        ).first()
-        
-        if existing_rest:
-            # Update existing restaurant
-            existing_rest.rating = rest_data['rating']
-            existing_rest.price_range = rest_data['price_range']
-            existing_rest.phone_number = rest_data.get('phone', existing_rest.phone_number)
-            existing_rest.opening_hours = rest_data.get('hours', existing_rest.opening_hours)
-            existing_rest.updated_at = func.now()
-            restaurant = existing_rest
-        else:
-            # Create new restaurant
-            restaurant = Restaurant(
-                external_id=rest_data.get('external_id'),
-                name=rest_data['name'],
-                address=rest_data['address'],
-                latitude=rest_data['coordinates']['lat'],
-                longitude=rest_data['coordinates']['lon'],
-                cuisine_type=rest_data['cuisine'],
-                phone_number=rest_data.get('phone', ''),
-                opening_hours=rest_data.get('hours', ''),
-                rating=rest_data['rating'],
-                price_range=rest_data['price_range'],
-                source=rest_data['source']
-            )
-            db.add(restaurant)
-        
-        db.flush()  # Get the ID without committing
-        
-        # Check if dish association exists
-        existing_dish = db.query(RestaurantDish).filter(
-            RestaurantDish.restaurant_id == restaurant.id,
-            func.lower(RestaurantDish.dish_name) == func.lower(dish_name)
-        ).first()
-        
-        if not existing_dish:
-            restaurant_dish = RestaurantDish(
-                restaurant_id=restaurant.id,
-                dish_name=dish_name,
-                confidence_score=0.8
-            )
-            db.add(restaurant_dish)
-        
-        saved_restaurants.append(restaurant)
-    
-    db.commit()
-    return saved_restaurants
+            ).first()
+
+            if existing_rest:
+                # Update existing restaurant
+                existing_rest.rating = rest_data['rating']
+                existing_rest.price_range = rest_data['price_range']
+                existing_rest.phone_number = rest_data.get('phone', existing_rest.phone_number)
+                existing_rest.opening_hours = rest_data.get('hours', existing_rest.opening_hours)
+                existing_rest.updated_at = datetime.utcnow()
+                if existing_rest.geo_cell is None:
+                    existing_rest.geo_cell = geo_cell(existing_rest.latitude, existing_rest.longitude)
+                restaurant = existing_rest
+            else:
+                # Create new restaurant
+                restaurant = Restaurant(
+                    external_id=rest_data.get('external_id'),
+                    name=rest_data['name'],
+                    address=rest_data['address'],
+                    latitude=rest_data['coordinates']['lat'],
+                    longitude=rest_data['coordinates']['lon'],
+                    geo_cell=geo_cell(rest_data['coordinates']['lat'], rest_data['coordinates']['lon']),
+                    cuisine_type=rest_data['cuisine'],
+                    phone_number=rest_data.get('phone', ''),
+                    opening_hours=rest_data.get('hours', ''),
+                    rating=rest_data['rating'],
+                    price_range=rest_data['price_range'],
+                    source=rest_data['source']
+                )
+                db.add(restaurant)
+
+            db.flush()  # Get the ID without committing
+
+            # Check if dish association exists
+            same_dish = (RestaurantDish.dish_id == dish_id) if dish_id else \
+                (func.lower(RestaurantDish.dish_name) == func.lower(dish_name))
+            existing_dish = db.query(RestaurantDish).filter(
+                RestaurantDish.restaurant_id == restaurant.id,
+                same_dish
+            ).first()
+
+            if not existing_dish:
+                restaurant_dish = RestaurantDish(
+                    restaurant_id=restaurant.id,
+                    dish_name=dish_name,
+                    dish_id=dish_id,
+                    geo_cell=restaurant.geo_cell,
+                    confidence_score=0.8
+                )
+                db.add(restaurant_dish)
+
+            saved_restaurants.append(restaurant)
+
+        db.commit()
+        mark_written({r.geo_cell for r in saved_restaurants})
+        restaurant_index.record_saved(saved_restaurants, dish_name, dish_id)
+        invalidate_responses("/api/restaurants/")
+        return saved_restaurants
+
+async def refresh_tile(job: RefreshJob) -> int:
+    """Background re-fetch of one (dish, tile) through the regular Yandex search and save path"""
+    db = SessionLocal()
+    try:
+        restaurants = await search_yandex_restaurants(job.dish, job.lat, job.lon, job.radius, priority=BACKGROUND)
+        if restaurants:
+            await save_restaurants_to_db(restaurants, job.dish, db)
+        return len(restaurants)
+    finally:
+        db.close()
+
+refresher = Refresher(refresh_tile)
+
+def restaurant_result(rest: Restaurant, distance_km: float) -> dict:
+    return {
+        "id": rest.id,
+        "name": rest.name,
+        "address": rest.address,
+        "cuisine": rest.cuisine_type,
+        "rating": rest.rating,
+        "price_range": rest.price_range,
+        "distance": f"{distance_km:.1f} km",
+        "coordinates": {"lat": rest.latitude, "lon": rest.longitude},
+        "phone": rest.phone_number,
+        "hours": rest.opening_hours,
+        "source": "local_db",
+        "updated_at": rest.updated_at.isoformat() if rest.updated_at else None
+    }
 
 def search_local_restaurants(dish_name: str, lat: float, lon: float, radius: int, db: Session):
     """Search restaurants in local PostgreSQL database with location filtering"""
+    dish_id = get_vocabulary().resolve(dish_name)
+    index = restaurant_index.get_index()
+    if index is not None:
+        # Bitmap index: candidates and distances in memory, then only those rows by primary key
+        with stage("index_lookup"):
+            hits = dict(index.search(dish_name, dish_id, lat, lon, radius))
+        if not hits:
+            return []
+        read_cells(db, cells_in_radius(lat, lon, radius))
+        with stage("db_query"):
+            rows = db.query(Restaurant).filter(Restaurant.id.in_(list(hits))).all()
+        return [restaurant_result(rest, hits[rest.id]) for rest in rows]
+
     # PostgreSQL earthdistance extension would be better, but this works for now
-    restaurants = db.query(Restaurant).join(RestaurantDish).filter(
-        or_(
+    if dish_id:
+        # Known dish: indexed equality on the canonical id. Rows saved before the
+        # dish_id column existed keep matching by name until backfill_dish_ids.py runs.
+        match = or_(
+            RestaurantDish.dish_id == dish_id,
+            and_(RestaurantDish.dish_id.is_(None), RestaurantDish.dish_name.ilike(f"%{dish_name}%"))
+        )
+    else:
+        match = or_(
             RestaurantDish.dish_name.ilike(f"%{dish_name}%"),
             Restaurant.cuisine_type.ilike(f"%{dish_name}%")
         )
-    ).all()
+    # Only the geo cells (partitions) the radius overlaps; unassigned rows too until the backfill has run
+    cells = cells_in_radius(lat, lon, radius)
+    read_cells(db, cells)
+    with stage("db_query"):
+        restaurants = db.query(Restaurant).join(RestaurantDish).filter(
+            match, in_cells(Restaurant.geo_cell, cells)).distinct().all()
     
     results = []
     for rest in restaurants:
         distance_km = calculate_distance(lat, lon, rest.latitude, rest.longitude)
         if distance_km <= (radius / 1000):  # Filter by radius
-            results.append({
-                "id": rest.id,
-                "name": rest.name,
-                "address": rest.address,
-                "cuisine": rest.cuisine_type,
-                "rating": rest.rating,
-                "price_range": rest.price_range,
-                "distance": f"{distance_km:.1f} km",
-                "coordinates": {"lat": rest.latitude, "lon": rest.longitude},
-                "phone": rest.phone_number,
-                "hours": rest.opening_hours,
-                "source": "local_db"
-            })
+            results.append(restaurant_result(rest, distance_km))
     
     return results
 
-@router.get("/search")
+def _load_hot_pairs():
+    db = SessionLocal()
+    try:
+        return hot_pairs(db)
+    finally:
+        db.close()
+
+def _search_pair(pair: HotPair):
+    db = SessionLocal()
+    try:
+        search_local_restaurants(pair.dish, pair.lat, pair.lon, WARMUP_RADIUS, db)
+    finally:
+        db.close()
+
+async def load_hot_pairs():
+    return await asyncio.to_thread(_load_hot_pairs)
+
+async def warm_pair(pair: HotPair):
+    """Local search at the pair's centroid: its rows into the DB buffers, its dish into the vocabulary cache"""
+    await asyncio.to_thread(_search_pair, pair)
+
+warmer = Warmer(load_hot_pairs, warm_pair)
+
+async def find_restaurants(dish: str, lat: float, lon: float, radius: int, db: Session) -> dict:
+    """
+    Local database first; fall back to Yandex (and remember its results)
+    when there are too few local matches
+    """
+    # Search local database first
+    local_restaurants = search_local_restaurants(dish, lat, lon, radius, db)
+    
+    if REFRESH_ENABLED and len(local_restaurants) >= REFRESH_MIN_LOCAL_RESULTS:
+        # Stale-while-revalidate: answer now, refresh the tile in the background
+        newest = max((r['updated_at'] for r in local_restaurants if r['updated_at']), default=None)
+        stale = refresher.is_stale(datetime.fromisoformat(newest) if newest else None)
+        if stale or len(local_restaurants) < REFRESH_TARGET_RESULTS:
+            refresher.enqueue(dish, lat, lon, radius)
+        SEARCH_PATH.labels("local_stale" if stale else "local").inc()
+        local_restaurants.sort(key=lambda x: float(x['distance'].split()[0]))
+        return {
+            "dish": dish,
+            "location": {"lat": lat, "lon": lon},
+            "restaurants": local_restaurants[:15],
+            "total_results": len(local_restaurants),
+            "source": "local_database",
+            "stale": stale
+        }
+    
+    # If we have good local results, return them
+    if len(local_restaurants) >= 8:
+        SEARCH_PATH.labels("local").inc()
+        local_restaurants.sort(key=lambda x: float(x['distance'].split()[0]))
+        return {
+            "dish": dish,
+            "location": {"lat": lat, "lon": lon},
+            "restaurants": local_restaurants[:15],
+            "total_results": len(local_restaurants),
+            "source": "local_database"
+        }
+    
+    SEARCH_PATH.labels("hybrid").inc()
+    # Otherwise, use Yandex API
+    yandex_restaurants = []
+    try:
+        yandex_restaurants = await search_yandex_restaurants(dish, lat, lon, radius)
+        
+        # Save Yandex results to database
+        if yandex_restaurants:
+            await save_restaurants_to_db(yandex_restaurants, dish, db)
+    except RateLimited as e:
+        # Out of Yandex budget: answer from the local database alone
+        logger.info("Yandex call not admitted, serving local results only: %s", e)
+        local_restaurants.sort(key=lambda x: float(x['distance'].split()[0]))
+        return {
+            "dish": dish,
+            "location": {"lat": lat, "lon": lon},
+            "restaurants": local_restaurants[:15],
+            "total_results": len(local_restaurants),
+            "source": "local_database",
+            "degraded": True
+        }
+    except Exception as e:
+        logger.warning("Yandex API error: %s", e)
+        # Continue with local results only
+    
+    # Combine results
+    all_restaurants = local_restaurants + yandex_restaurants
+    all_restaurants.sort(key=lambda x: float(x['distance'].split()[0]))
+    
+    return {
+        "dish": dish,
+        "location": {"lat": lat, "lon": lon},
+        "restaurants": all_restaurants[:15],
+        "total_results": len(all_restaurants),
+        "source": "hybrid"
+    }
+
+@router.get("/search", response_class=CompactJSONResponse)
 async def search_restaurants(
     dish: str = Query(..., description="Dish name to search for"),
     lat: Optional[float] = Query(None, description="Latitude"),
@@ -244,45 +314,12 @@ async def search_restaurants(
     try:
         # Default location
         if lat is None or lon is None:
-            lat, lon = 55.7558, 37.6173  # Moscow center
-        
-        # Search local database first
-        local_restaurants = search_local_restaurants(dish, lat, lon, radius, db)
-        
-        # If we have good local results, return them
-        if len(local_restaurants) >= 8:
-            local_restaurants.sort(key=lambda x: float(x['distance'].split()[0]))
-            return {
-                "dish": dish,
-                "location": {"lat": lat, "lon": lon},
-                "restaurants": local_restaurants[:15],
-                "total_results": len(local_restaurants),
-                "source": "local_database"
-            }
+            lat, lon = DEFAULT_LOCATION
         
-        # Otherwise, use Yandex API
-        yandex_restaurants = []
-        try:
-            yandex_restaurants = await search_yandex_restaurants(dish, lat, lon, radius)
-            
-            # Save Yandex results to database
-            if yandex_restaurants:
-                await save_restaurants_to_db(yandex_restaurants, dish, db)
-        except Exception as e:
-            print(f"Yandex API error: {e}")
-            # Continue with local results only
-        
-        # Combine results
-        all_restaurants = local_restaurants + yandex_restaurants
-        all_restaurants.sort(key=lambda x: float(x['distance'].split()[0]))
-        
-        return {
-            "dish": dish,
-            "location": {"lat": lat, "lon": lon},
-            "restaurants": all_restaurants[:15],
-            "total_results": len(all_restaurants),
-            "source": "hybrid"
-        }
+        result = await find_restaurants(dish, lat, lon, radius, db)
+        # Local-only answers given while Yandex was out of budget are not worth caching
+        headers = {"Cache-Control": "no-store"} if result.get("degraded") else None
+        return CompactJSONResponse(result, headers=headers)
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
@@ -290,25 +327,28 @@ async def search_restaurants(
 @router.get("/database/stats")
 async def get_database_stats(db: Session = Depends(get_db)):
     """Get PostgreSQL database statistics"""
-    total_restaurants = db.query(Restaurant).count()
-    total_dish_associations = db.query(RestaurantDish).count()
-    unique_dishes = db.query(RestaurantDish.dish_name).distinct().count()
-    
-    # Popular dishes
-    popular_dishes = db.query(
-        RestaurantDish.dish_name,
-        func.count(RestaurantDish.id).label('count')
-    ).group_by(RestaurantDish.dish_name).order_by(func.count(RestaurantDish.id).desc()).limit(10).all()
+    with stage("db_query"):
+        total_restaurants = db.query(Restaurant).count()
+        total_dish_associations = db.query(RestaurantDish).count()
+        unique_dishes = db.query(RestaurantDish.dish_name).distinct().count()
+        
+        # Popular dishes
+        popular_dishes = db.query(
+            RestaurantDish.dish_name,
+            func.count(RestaurantDish.id).label('count')
+        ).group_by(RestaurantDish.dish_name).order_by(func.count(RestaurantDish.id).desc()).limit(10).all()
+        
+        sources = db.query(Restaurant.source, func.count(Restaurant.id)).group_by(Restaurant.source).all()
     
     return {
         "total_restaurants": total_restaurants,
         "total_dish_associations": total_dish_associations,
         "unique_dishes": unique_dishes,
         "popular_dishes": [{"dish": dish, "count": count} for dish, count in popular_dishes],
-        "sources": db.query(Restaurant.source, func.count(Restaurant.id)).group_by(Restaurant.source).all()
+        "sources": sources
     }
 
-@router.get("/nearby")
+@router.get("/nearby", response_class=CompactJSONResponse)
 async def get_nearby_restaurants(
     lat: float = Query(..., description="Latitude"),
     lon: float = Query(..., description="Longitude"),
@@ -316,7 +356,15 @@ async def get_nearby_restaurants(
     db: Session = Depends(get_db)
 ):
     """Get all restaurants near a location"""
-    all_restaurants = db.query(Restaurant).all()
+    cells = cells_in_radius(lat, lon, radius)
+    read_cells(db, cells)
+    span_lat, span_lon = km_to_degrees(radius / 1000, lat)
+    with stage("db_query"):
+        all_restaurants = db.query(Restaurant).filter(
+            in_cells(Restaurant.geo_cell, cells),
+            Restaurant.latitude.between(lat - span_lat, lat + span_lat),
+            Restaurant.longitude.between(lon - span_lon, lon + span_lon),
+        ).all()
     
     nearby_restaurants = []
     for rest in all_restaurants:
@@ -335,11 +383,11 @@ async def get_nearby_restaurants(
     
     nearby_restaurants.sort(key=lambda x: float(x['distance'].split()[0]))
     
-    return {
+    return CompactJSONResponse({
         "location": {"lat": lat, "lon": lon},
         "restaurants": nearby_restaurants[:20],
         "total_results": len(nearby_restaurants)
-    }
+    })
     
     
 @router.get("/test")
@@ -0,0 +1 @@
+# Server-side subsystems shared by the route modules
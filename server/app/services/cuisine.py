@@ -0,0 +1,122 @@
+"""
+Cuisine classification for Yandex business categories.
+
+The taxonomy is a table of (cuisine, priority, keywords). All keywords are
+compiled into one alternation regex, longest first, so a category string is
+scanned once no matter how many cuisines there are. Keywords are anchored at
+word boundaries: "белорусская" matches `белорусск*` but never `русск*`, and
+"Вокзал" or "Такой ресторан" match nothing.
+
+When several categories of a business match, the highest priority wins and
+ties go to the earlier category (Yandex lists the primary one first). Explicit
+"<nation> кухня" categories outrank dish-type hints such as "Суши-бар".
+Results are memoized per distinct category string.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_CUISINE = "Various"
+WORD_CHAR = "[0-9a-zа-яё]"
+
+# Priorities: a named national cuisine beats a regional family, which beats a dish hint
+NATIONAL = 100
+REGIONAL = 80
+DISH = 50
+
+# (cuisine, priority, keywords). A keyword ending in "*" matches any word starting
+# with it ("итальянск*" -> "итальянская"); the others match whole words only.
+CUISINE_TAXONOMY: List[Tuple[str, int, List[str]]] = [
+    ("Italian", NATIONAL, ["итальянск*", "italian", "trattoria", "траттори*", "osteria", "остери*"]),
+    ("Italian", DISH, ["пицц*", "pizz*", "паста", "pasta", "ризотто"]),
+    ("Japanese", NATIONAL, ["японск*", "japanese", "izakaya", "изакая"]),
+    ("Japanese", DISH, ["суши", "sushi", "роллы", "рамен", "ramen", "сашими"]),
+    ("Chinese", NATIONAL, ["китайск*", "chinese", "кантонск*", "сычуаньск*"]),
+    ("Chinese", DISH, ["утка по-пекински", "пекинская утка", "дим-сам", "dim sum"]),
+    ("Korean", NATIONAL, ["корейск*", "korean"]),
+    ("Korean", DISH, ["кимчи", "бибимбап"]),
+    ("Thai", NATIONAL, ["тайск*", "thai"]),
+    ("Vietnamese", NATIONAL, ["вьетнамск*", "vietnamese"]),
+    ("Vietnamese", DISH, ["фо бо", "фо-бо"]),
+    ("Indian", NATIONAL, ["индийск*", "indian"]),
+    ("Indian", DISH, ["тандур*", "tandoor*"]),
+    ("Pan-Asian", REGIONAL, ["паназиатск*", "азиатск*", "asian", "вок", "wok", "лапшичн*", "noodle*"]),
+    ("Russian", NATIONAL, ["русск*", "russian"]),
+    ("Russian", DISH, ["пельменн*", "блинн*", "столов*"]),
+    ("Belarusian", NATIONAL, ["белорусск*", "belarusian"]),
+    ("Ukrainian", NATIONAL, ["украинск*", "ukrainian"]),
+    ("Georgian", NATIONAL, ["грузинск*", "georgian"]),
+    ("Georgian", DISH, ["хинкал*", "хачапур*", "khachapuri"]),
+    ("Armenian", NATIONAL, ["армянск*", "armenian"]),
+    ("Azerbaijani", NATIONAL, ["азербайджанск*", "azerbaijani"]),
+    ("Caucasian", REGIONAL, ["кавказск*", "caucasian"]),
+    ("Uzbek", NATIONAL, ["узбекск*", "uzbek"]),
+    ("Central Asian", REGIONAL, ["среднеазиатск*", "восточн*", "чайхан*", "плов"]),
+    ("Turkish", NATIONAL, ["турецк*", "turkish"]),
+    ("Middle Eastern", REGIONAL, ["ливанск*", "lebanese", "израильск*", "арабск*", "ближневосточн*", "хумус", "hummus"]),
+    ("Middle Eastern", DISH, ["шаурм*", "шаверм*", "фалафел*", "falafel", "kebab*", "кебаб*"]),
+    ("Greek", NATIONAL, ["греческ*", "greek"]),
+    ("French", NATIONAL, ["французск*", "french", "brasserie", "брассери*"]),
+    ("Spanish", NATIONAL, ["испанск*", "spanish", "тапас", "tapas"]),
+    ("Mexican", NATIONAL, ["мексиканск*", "mexican", "текс-мекс", "tex-mex"]),
+    ("Mexican", DISH, ["тако", "такос", "taco*", "буррито", "burrito*"]),
+    ("Latin American", REGIONAL, ["латиноамериканск*", "перуанск*", "бразильск*", "аргентинск*", "latin american"]),
+    ("American", NATIONAL, ["американск*", "american"]),
+    ("American", DISH, ["бургер*", "burger*", "хот-дог*", "hot dog*", "стейк-хаус", "steakhouse", "барбекю", "bbq"]),
+    ("European", REGIONAL, ["европейск*", "european", "средиземноморск*", "mediterranean"]),
+    ("German", NATIONAL, ["немецк*", "german", "баварск*"]),
+    ("Seafood", DISH, ["рыбн*", "морепродукт*", "seafood", "устричн*", "oyster*"]),
+    ("Vegetarian", DISH, ["вегетарианск*", "веганск*", "vegetarian", "vegan"]),
+]
+
+
+class CuisineClassifier:
+    """Taxonomy compiled into a single regex plus a stem -> (priority, cuisine) table"""
+
+    def __init__(self, taxonomy: List[Tuple[str, int, List[str]]], default: str = DEFAULT_CUISINE):
+        self.default = default
+        self.rules = {}
+        prefixes = set()
+        for cuisine, priority, keywords in taxonomy:
+            for keyword in keywords:
+                stem = keyword.lower().rstrip("*")
+                if keyword.endswith("*"):
+                    prefixes.add(stem)
+                # A stem listed twice keeps its strongest reading
+                if stem not in self.rules or self.rules[stem][0] < priority:
+                    self.rules[stem] = (priority, cuisine)
+        # Every keyword starts at a word start ("вок" must not fire inside "вокзал");
+        # whole-word keywords must also end at a word end
+        alternation = "|".join(
+            re.escape(stem) + ("" if stem in prefixes else f"(?!{WORD_CHAR})")
+            for stem in sorted(self.rules, key=len, reverse=True)
+        )
+        self.pattern = re.compile(f"(?<!{WORD_CHAR})(?:{alternation})")
+        self.match_category = lru_cache(maxsize=4096)(self._match_category)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _match_category(self, category: str) -> Optional[Tuple[int, str]]:
+        """Best (priority, cuisine) found in one category string, None if nothing matches"""
+        best = None
+        for match in self.pattern.finditer(category.lower()):
+            hit = self.rules[match.group()]
+            if best is None or hit[0] > best[0]:
+                best = hit
+        return best
+
+    def classify(self, categories: Iterable[str]) -> str:
+        """Cuisine for a business given its category names"""
+        best = None
+        for category in categories:
+            hit = self.match_category(category or "")
+            if hit is not None and (best is None or hit[0] > best[0]):
+                best = hit
+        return best[1] if best else self.default
+
+
+@lru_cache(maxsize=1)
+def get_classifier() -> CuisineClassifier:
+    """The process-wide classifier, compiled on first use"""
+    return CuisineClassifier(CUISINE_TAXONOMY)
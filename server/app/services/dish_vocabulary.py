@@ -0,0 +1,257 @@
+"""
+Dish vocabulary bridging Food101 class names, free-text searches and stored dishes.
+
+Every dish has a canonical id (the Food101 class name, e.g. `beef_carpaccio`)
+plus English synonyms and Russian translations. The vocabulary is compiled
+once into three indexes over small integer dish numbers:
+
+- exact aliases: normalized alias -> dish (O(1))
+- tokens: word -> dishes containing it (O(tokens) lookup)
+- trigrams: character trigram -> dishes, a fuzzy fallback for typos and
+  Russian inflections ("пиццу", "бургеры")
+
+`restaurant_dishes.dish_id` stores the canonical id so searches become
+indexed equality lookups instead of `ILIKE '%...%'` scans.
+"""
+import re
+from collections import defaultdict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+# (canonical id, English synonyms, Russian names - the first one is used for Yandex searches)
+FOOD101_DISHES: List[Tuple[str, List[str], List[str]]] = [
+    ("apple_pie", ["apple tart"], ["яблочный пирог", "шарлотка"]),
+    ("baby_back_ribs", ["ribs", "pork ribs", "bbq ribs"], ["свиные ребрышки", "ребрышки барбекю", "ребрышки"]),
+    ("baklava", [], ["пахлава", "баклава"]),
+    ("beef_carpaccio", ["carpaccio"], ["карпаччо из говядины", "карпаччо"]),
+    ("beef_tartare", ["steak tartare", "tartare"], ["тартар из говядины", "тартар"]),
+    ("beet_salad", ["beetroot salad"], ["салат из свеклы", "свекольный салат"]),
+    ("beignets", ["beignet"], ["бенье", "пончики бенье"]),
+    ("bibimbap", [], ["пибимпап", "бибимбап"]),
+    ("bread_pudding", [], ["хлебный пудинг"]),
+    ("breakfast_burrito", ["burrito"], ["буррито на завтрак", "буррито"]),
+    ("bruschetta", [], ["брускетта", "брускетты"]),
+    ("caesar_salad", ["caesar"], ["салат цезарь", "цезарь"]),
+    ("cannoli", [], ["канноли"]),
+    ("caprese_salad", ["caprese"], ["салат капрезе", "капрезе"]),
+    ("carrot_cake", [], ["морковный торт", "морковный пирог"]),
+    ("ceviche", ["cebiche"], ["севиче"]),
+    ("cheese_plate", ["cheese board"], ["сырная тарелка", "сырное ассорти"]),
+    ("cheesecake", [], ["чизкейк"]),
+    ("chicken_curry", ["curry"], ["курица карри", "карри"]),
+    ("chicken_quesadilla", ["quesadilla"], ["кесадилья с курицей", "кесадилья"]),
+    ("chicken_wings", ["wings", "buffalo wings"], ["куриные крылышки", "крылышки"]),
+    ("chocolate_cake", [], ["шоколадный торт"]),
+    ("chocolate_mousse", [], ["шоколадный мусс"]),
+    ("churros", ["churro"], ["чуррос"]),
+    ("clam_chowder", ["chowder"], ["клэм чаудер", "чаудер"]),
+    ("club_sandwich", [], ["клаб сэндвич", "клубный сэндвич"]),
+    ("crab_cakes", ["crab cake"], ["крабовые котлеты", "крабкейк"]),
+    ("creme_brulee", ["crème brûlée"], ["крем брюле"]),
+    ("croque_madame", ["croque monsieur"], ["крок мадам", "крок месье"]),
+    ("cup_cakes", ["cupcake", "cupcakes"], ["капкейк", "капкейки"]),
+    ("deviled_eggs", ["stuffed eggs"], ["фаршированные яйца"]),
+    ("donuts", ["donut", "doughnut", "doughnuts"], ["пончики", "донаты", "пончик"]),
+    ("dumplings", ["dumpling"], ["пельмени", "дамплинги", "вареники"]),
+    ("edamame", [], ["эдамаме"]),
+    ("eggs_benedict", ["benedict"], ["яйца бенедикт", "бенедикт"]),
+    ("escargots", ["escargot", "snails"], ["эскарго", "улитки"]),
+    ("falafel", [], ["фалафель"]),
+    ("filet_mignon", ["tenderloin steak"], ["филе миньон"]),
+    ("fish_and_chips", ["fish n chips"], ["фиш энд чипс", "рыба с картофелем фри"]),
+    ("foie_gras", [], ["фуа гра"]),
+    ("french_fries", ["fries", "chips"], ["картофель фри", "картошка фри", "фри"]),
+    ("french_onion_soup", ["onion soup"], ["французский луковый суп", "луковый суп"]),
+    ("french_toast", [], ["французские тосты", "гренки"]),
+    ("fried_calamari", ["calamari", "squid rings"], ["жареные кальмары", "кальмары"]),
+    ("fried_rice", [], ["жареный рис"]),
+    ("frozen_yogurt", ["froyo"], ["замороженный йогурт"]),
+    ("garlic_bread", [], ["чесночный хлеб", "чесночные гренки"]),
+    ("gnocchi", [], ["ньокки", "ньоки"]),
+    ("greek_salad", [], ["греческий салат"]),
+    ("grilled_cheese_sandwich", ["grilled cheese"], ["сэндвич с сыром на гриле", "гриль сэндвич с сыром"]),
+    ("grilled_salmon", ["salmon"], ["лосось на гриле", "лосось", "семга"]),
+    ("guacamole", [], ["гуакамоле"]),
+    ("gyoza", [], ["гёдза", "гедза", "гёза"]),
+    ("hamburger", ["burger", "burgers", "cheeseburger"], ["бургер", "гамбургер", "чизбургер"]),
+    ("hot_and_sour_soup", [], ["кисло острый суп"]),
+    ("hot_dog", ["hotdog"], ["хот дог", "хотдог"]),
+    ("huevos_rancheros", [], ["уэвос ранчерос"]),
+    ("hummus", ["houmous"], ["хумус"]),
+    ("ice_cream", ["gelato"], ["мороженое", "джелато"]),
+    ("lasagna", ["lasagne"], ["лазанья"]),
+    ("lobster_bisque", ["bisque"], ["биск из лобстера", "биск"]),
+    ("lobster_roll_sandwich", ["lobster roll"], ["лобстер ролл"]),
+    ("macaroni_and_cheese", ["mac and cheese", "mac n cheese"], ["макароны с сыром", "мак энд чиз"]),
+    ("macarons", ["macaron"], ["макаруны", "макарон"]),
+    ("miso_soup", ["miso"], ["мисо суп", "мисо"]),
+    ("mussels", [], ["мидии"]),
+    ("nachos", [], ["начос"]),
+    ("omelette", ["omelet"], ["омлет"]),
+    ("onion_rings", [], ["луковые кольца"]),
+    ("oysters", ["oyster"], ["устрицы"]),
+    ("pad_thai", [], ["пад тай"]),
+    ("paella", [], ["паэлья"]),
+    ("pancakes", ["pancake"], ["панкейки", "блины", "оладьи"]),
+    ("panna_cotta", [], ["панна котта"]),
+    ("peking_duck", [], ["утка по пекински", "пекинская утка"]),
+    ("pho", ["pho bo"], ["фо бо", "фо"]),
+    ("pizza", ["pizzas"], ["пицца", "пиццерия"]),
+    ("pork_chop", [], ["свиная отбивная", "отбивная"]),
+    ("poutine", [], ["путин"]),
+    ("prime_rib", [], ["прайм риб", "ростбиф"]),
+    ("pulled_pork_sandwich", ["pulled pork"], ["сэндвич с рваной свининой", "рваная свинина"]),
+    ("ramen", [], ["рамен"]),
+    ("ravioli", [], ["равиоли"]),
+    ("red_velvet_cake", ["red velvet"], ["красный бархат"]),
+    ("risotto", [], ["ризотто"]),
+    ("samosa", [], ["самоса"]),
+    ("sashimi", [], ["сашими"]),
+    ("scallops", ["scallop"], ["морские гребешки", "гребешки"]),
+    ("seaweed_salad", ["wakame"], ["салат из водорослей", "салат чука", "чука"]),
+    ("shrimp_and_grits", [], ["креветки с кукурузной кашей"]),
+    ("spaghetti_bolognese", ["bolognese"], ["спагетти болоньезе", "болоньезе"]),
+    ("spaghetti_carbonara", ["carbonara"], ["спагетти карбонара", "карбонара"]),
+    ("spring_rolls", ["spring roll"], ["спринг роллы", "блинчики спринг ролл"]),
+    ("steak", ["steaks", "beef steak"], ["стейк", "стейки"]),
+    ("strawberry_shortcake", [], ["клубничный пирог", "клубничный торт"]),
+    ("sushi", ["rolls", "maki"], ["суши", "роллы"]),
+    ("tacos", ["taco"], ["тако"]),
+    ("takoyaki", [], ["такояки"]),
+    ("tiramisu", [], ["тирамису"]),
+    ("tuna_tartare", [], ["тартар из тунца"]),
+    ("waffles", ["waffle"], ["вафли", "бельгийские вафли"]),
+]
+
+# Common searches that are not Food101 classes but still deserve a canonical id
+GENERIC_DISHES: List[Tuple[str, List[str], List[str]]] = [
+    ("pasta", ["spaghetti"], ["паста", "спагетти"]),
+    ("salad", ["salads"], ["салат", "салаты"]),
+    ("sandwich", ["sandwiches", "sub"], ["сэндвич", "бутерброд"]),
+    ("cake", ["cakes"], ["торт", "пирожное"]),
+    ("coffee", ["espresso", "latte", "cappuccino"], ["кофе", "кофейня"]),
+    ("soup", ["soups"], ["суп", "супы"]),
+]
+
+_NON_WORD = re.compile(r"[^0-9a-zа-я]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, fold ё/accents we care about, and collapse separators to single spaces"""
+    text = text.lower().replace("ё", "е").replace("é", "e").replace("è", "e").replace("û", "u")
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DishVocabulary:
+    """Compiled alias, token and trigram indexes over the dish table"""
+
+    # Minimum trigram similarity for the typo fallback to accept a match
+    TRIGRAM_THRESHOLD = 0.45
+
+    def __init__(self, dishes: List[Tuple[str, List[str], List[str]]], broad: Tuple[str, ...] = ()):
+        self.dish_ids: List[str] = []
+        self.russian: List[str] = []
+        self.aliases: Dict[str, int] = {}
+        self.tokens: Dict[str, Tuple[int, ...]] = {}
+        self.trigrams: Dict[str, Tuple[int, ...]] = {}
+        self.alias_list: List[Tuple[str, int]] = []  # (alias, dish)
+        self.broad = set()  # dishes that only match queries they fully explain
+
+        tokens = defaultdict(set)
+        grams = defaultdict(set)
+        for number, (dish_id, english, russian) in enumerate(dishes):
+            self.dish_ids.append(dish_id)
+            if dish_id in broad:
+                self.broad.add(number)
+            self.russian.append(russian[0] if russian else dish_id.replace("_", " "))
+            for alias in {normalize(a) for a in [dish_id, *english, *russian]}:
+                if not alias:
+                    continue
+                # First dish to claim an alias keeps it (specific classes are listed before generics)
+                self.aliases.setdefault(alias, number)
+                self.alias_list.append((alias, number))
+                for word in alias.split():
+                    tokens[word].add(number)
+                for gram in trigrams(alias):
+                    grams[gram].add(number)
+
+        self.tokens = {word: tuple(sorted(numbers)) for word, numbers in tokens.items()}
+        self.trigrams = {gram: tuple(sorted(numbers)) for gram, numbers in grams.items()}
+        # Per dish: (alias words, alias trigrams) for scoring candidates
+        self._dish_aliases = defaultdict(list)
+        for alias, number in self.alias_list:
+            self._dish_aliases[number].append((frozenset(alias.split()), trigrams(alias)))
+
+    def __len__(self):
+        return len(self.dish_ids)
+
+    def resolve(self, query: str) -> Optional[str]:
+        """Canonical dish id for a free-text query, or None when nothing matches well"""
+        number = self._resolve(normalize(query or ""))
+        return self.dish_ids[number] if number is not None else None
+
+    @lru_cache(maxsize=8192)
+    def _resolve(self, text: str) -> Optional[int]:
+        if not text:
+            return None
+        if text in self.aliases:
+            return self.aliases[text]
+
+        # Token match: some alias of the dish must appear in full among the query
+        # words ("pizza margherita" -> pizza, but not "rice" -> fried rice). Broad
+        # dishes additionally have to explain every word, so "chicken soup" stays
+        # unresolved instead of becoming any soup.
+        words = set(text.split())
+        candidates = set()
+        for word in words:
+            candidates.update(self.tokens.get(word, ()))
+        scores = {}
+        for number in candidates:
+            matched = [alias_words for alias_words, _ in self._dish_aliases[number] if alias_words <= words]
+            if not matched:
+                continue
+            coverage = len(set().union(*matched)) / len(words)
+            if coverage == 1.0 or number not in self.broad:
+                scores[number] = coverage
+        if scores:
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+            best, best_score = ranked[0]
+            # A tie between dishes is ambiguous
+            tied = len(ranked) > 1 and ranked[1][1] == best_score
+            return None if tied else best
+
+        # Trigram similarity (Jaccard) for typos and inflections ("пиццу"): only
+        # against aliases with the same number of words
+        query_grams = trigrams(text)
+        word_count = len(text.split())
+        candidates = set()
+        for gram in query_grams:
+            candidates.update(self.trigrams.get(gram, ()))
+        best, best_score = None, 0.0
+        for number in candidates:
+            for alias_words, alias_grams in self._dish_aliases[number]:
+                if len(alias_words) != word_count:
+                    continue
+                score = len(query_grams & alias_grams) / len(query_grams | alias_grams)
+                if score > best_score:
+                    best, best_score = number, score
+        return best if best_score >= self.TRIGRAM_THRESHOLD else None
+
+    def search_term(self, query: str) -> str:
+        """Russian name to send to Yandex for a query (the query itself if unknown)"""
+        number = self._resolve(normalize(query or ""))
+        return self.russian[number] if number is not None else query
+
+    def display_name(self, dish_id: str) -> str:
+        return dish_id.replace("_", " ")
+
+
+@lru_cache(maxsize=1)
+def get_vocabulary() -> DishVocabulary:
+    """The process-wide vocabulary, built on first use (main.py builds it at startup)"""
+    return DishVocabulary(FOOD101_DISHES + GENERIC_DISHES, broad=tuple(dish_id for dish_id, _, _ in GENERIC_DISHES))
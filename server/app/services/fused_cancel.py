@@ -0,0 +1,77 @@
+"""
+Cancellation of speculative fused searches across gateway workers.
+
+The searches of a /recognize-and-find stream are asyncio tasks in the worker
+serving the stream, but the cancel call may land on any worker. Each stream
+registers a row in the fused_searches table; a cancel handled elsewhere
+records the dishes to keep on that row, and the stream polls it (on the
+primary, every FUSED_CANCEL_POLL_SECONDS) and cancels the rest itself. The
+row is deleted when the stream ends; rows left by a crashed worker are
+swept after FUSED_SEARCH_TTL_SECONDS.
+"""
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from ..database import SessionLocal, use_primary
+from ..models.fused_search import FusedSearch
+
+logger = logging.getLogger(__name__)
+
+FUSED_CANCEL_POLL_SECONDS = float(os.getenv("FUSED_CANCEL_POLL_SECONDS", "0.5"))
+FUSED_SEARCH_TTL_SECONDS = float(os.getenv("FUSED_SEARCH_TTL_SECONDS", "3600"))
+
+
+def register(request_id: str, dishes: List[str], session_factory=None):
+    """Record an in-flight stream (blocking)"""
+    db = (session_factory or SessionLocal)()
+    try:
+        use_primary(db)
+        stale = datetime.utcnow() - timedelta(seconds=FUSED_SEARCH_TTL_SECONDS)
+        db.query(FusedSearch).filter(FusedSearch.created_at < stale).delete(synchronize_session=False)
+        db.add(FusedSearch(request_id=request_id, dishes=json.dumps(dishes)))
+        db.commit()
+    finally:
+        db.close()
+
+
+def request_cancel(request_id: str, keep: List[str], session_factory=None) -> Optional[List[str]]:
+    """Ask the worker streaming `request_id` to cancel all but `keep` (blocking); the dishes asked to stop, None if unknown"""
+    db = (session_factory or SessionLocal)()
+    try:
+        use_primary(db)
+        row = db.get(FusedSearch, request_id)
+        if row is None:
+            return None
+        if row.keep is not None:
+            # Cancelled searches stay cancelled: an earlier cancel narrows this one
+            keep = [dish for dish in keep if dish in json.loads(row.keep)]
+        row.keep = json.dumps(keep)
+        db.commit()
+        return [dish for dish in json.loads(row.dishes) if dish not in keep]
+    finally:
+        db.close()
+
+
+def requested_keep(request_id: str, session_factory=None) -> Optional[List[str]]:
+    """Dishes to keep if a cancel was recorded for the stream, else None (blocking)"""
+    db = (session_factory or SessionLocal)()
+    try:
+        use_primary(db)
+        keep = db.query(FusedSearch.keep).filter(FusedSearch.request_id == request_id).scalar()
+        return None if keep is None else json.loads(keep)
+    finally:
+        db.close()
+
+
+def unregister(request_id: str, session_factory=None):
+    """Drop the stream's row once it has finished (blocking)"""
+    db = (session_factory or SessionLocal)()
+    try:
+        use_primary(db)
+        db.query(FusedSearch).filter(FusedSearch.request_id == request_id).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
@@ -0,0 +1,78 @@
+"""Distance and tiling helpers for location searches"""
+import math
+import os
+from typing import List, Tuple
+
+EARTH_RADIUS_KM = 6371
+KM_PER_DEGREE_LAT = 111.32
+
+# Size of the geo cells restaurants are partitioned by; changing it requires
+# re-running partition_tables.py so stored cells match
+GEO_CELL_DEG = float(os.getenv("GEO_CELL_DEG", "1.0"))
+
+
+def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Calculate distance between two coordinates in km using Haversine formula"""
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+
+    a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
+         math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
+         math.sin(dlon / 2) * math.sin(dlon / 2))
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_KM * c
+
+
+def km_to_degrees(km: float, lat: float) -> Tuple[float, float]:
+    """(latitude, longitude) degrees spanned by `km` at latitude `lat`"""
+    lon_km = KM_PER_DEGREE_LAT * max(math.cos(math.radians(lat)), 0.01)
+    return km / KM_PER_DEGREE_LAT, km / lon_km
+
+
+def tile_circle(lat: float, lon: float, radius_m: int, tile_km: float, max_tiles: int) -> List[Tuple[float, float, float, float]]:
+    """
+    Cover the circle around (lat, lon) with square tiles.
+
+    Returns (center lat, center lon, span lat, span lon) per tile. Tiles grow
+    beyond `tile_km` when needed to stay within `max_tiles`, and corner tiles
+    lying entirely outside the circle are dropped.
+    """
+    radius_km = radius_m / 1000
+    per_side = max(1, math.ceil(2 * radius_km / tile_km))
+    while per_side > 1 and per_side * per_side > max_tiles:
+        per_side -= 1
+    side_km = 2 * radius_km / per_side
+    span_lat, span_lon = km_to_degrees(side_km, lat)
+
+    tiles = []
+    for row in range(per_side):
+        for col in range(per_side):
+            # Offsets of the tile center from the search center, in km
+            dy = -radius_km + side_km * (row + 0.5)
+            dx = -radius_km + side_km * (col + 0.5)
+            # Distance from the search center to the closest point of the tile
+            nearest_y = max(abs(dy) - side_km / 2, 0)
+            nearest_x = max(abs(dx) - side_km / 2, 0)
+            if math.hypot(nearest_x, nearest_y) > radius_km:
+                continue
+            d_lat, d_lon = km_to_degrees(1, lat)
+            tiles.append((lat + dy * d_lat, lon + dx * d_lon, span_lat, span_lon))
+    return tiles
+
+
+def geo_cell(lat: float, lon: float, cell_deg: float = GEO_CELL_DEG) -> int:
+    """Integer id of the cell_deg x cell_deg cell containing (lat, lon)"""
+    columns = math.ceil(360 / cell_deg)
+    row = int(math.floor((lat + 90) / cell_deg))
+    col = int(math.floor((lon + 180) / cell_deg)) % columns
+    return row * columns + col
+
+
+def cells_in_radius(lat: float, lon: float, radius_m: int, cell_deg: float = GEO_CELL_DEG) -> List[int]:
+    """Cells overlapping the bounding box of the circle around (lat, lon)"""
+    span_lat, span_lon = km_to_degrees(radius_m / 1000, lat)
+    columns = math.ceil(360 / cell_deg)
+    rows = range(int(math.floor((lat - span_lat + 90) / cell_deg)), int(math.floor((lat + span_lat + 90) / cell_deg)) + 1)
+    cols = range(int(math.floor((lon - span_lon + 180) / cell_deg)), int(math.floor((lon + span_lon + 180) / cell_deg)) + 1)
+    return sorted({row * columns + col % columns for row in rows for col in cols})
@@ -0,0 +1,167 @@
+"""
+Client for the ML service.
+
+By default images are decoded once here, downscaled to the model's input
+size and sent to `/predict/raw` as raw RGB bytes (ML_TRANSPORT=raw) or a
+small JPEG (ML_TRANSPORT=jpeg) over one pooled keep-alive client; the
+service answers with a compact [class_id, name, confidence] list that is
+expanded into the usual prediction payload. ML_TRANSPORT=multipart keeps
+the old path that uploads the original file to `/predict`.
+"""
+import io
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from ..observability import ML_BYTES, stage
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+ML_SERVICE_URL = os.getenv("ML_SERVICE_URL", "http://localhost:8001")
+# A recognition not answered by then fails instead of holding its admission slot
+ML_SERVICE_TIMEOUT = float(os.getenv("ML_SERVICE_TIMEOUT", "10"))
+ML_TRANSPORT = os.getenv("ML_TRANSPORT", "raw")
+ML_JPEG_QUALITY = int(os.getenv("ML_JPEG_QUALITY", "90"))
+# Model input size; 0 asks the service (and follows it when the active model changes)
+ML_INPUT_SIZE = int(os.getenv("ML_INPUT_SIZE", "0"))
+ML_INPUT_SIZE_TTL = 60.0
+DEFAULT_INPUT_SIZE = 384
+
+
+class MLServiceError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+_client: Optional[httpx.AsyncClient] = None
+_input_size = {"size": ML_INPUT_SIZE, "checked_at": 0.0}
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared keep-alive client (created on first use, inside the running loop)"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(base_url=ML_SERVICE_URL, timeout=ML_SERVICE_TIMEOUT,
+                                    limits=httpx.Limits(max_connections=32, max_keepalive_connections=32))
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def input_size() -> int:
+    """The active model's input resolution, from the service's /health (cached)"""
+    if ML_INPUT_SIZE:
+        return ML_INPUT_SIZE
+    if not _input_size["size"] or time.monotonic() - _input_size["checked_at"] > ML_INPUT_SIZE_TTL:
+        try:
+            response = await get_client().get("/health")
+            health = response.json() if response.status_code == 200 else {}
+        except (httpx.HTTPError, ValueError) as e:
+            logger.warning("ML service /health unavailable: %s", e)
+            health = {}
+        if health.get("status") != "healthy" or not health.get("image_size"):
+            # Loading, unhealthy or unreachable: use the default without caching it, ask again next time
+            return _input_size["size"] or DEFAULT_INPUT_SIZE
+        _input_size["size"] = int(health["image_size"])
+        _input_size["checked_at"] = time.monotonic()
+    return _input_size["size"]
+
+
+def prepare_image(image_data: bytes, size: int, transport: str) -> Tuple[bytes, str, Dict[str, str]]:
+    """Decode once and downscale to size x size; returns (body, content type, extra headers)"""
+    image = Image.open(io.BytesIO(image_data))
+    # JPEG can decode straight at a reduced scale; keep 2x headroom for a clean resize
+    image.draft("RGB", (2 * size, 2 * size))
+    image = image.convert("RGB").resize((size, size), Image.BILINEAR)
+    if transport == "jpeg":
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=ML_JPEG_QUALITY)
+        return buffer.getvalue(), "image/jpeg", {}
+    return image.tobytes(), "application/octet-stream", {"X-Image-Width": str(size), "X-Image-Height": str(size)}
+
+
+def expand_predictions(compact: Dict) -> Dict[str, Any]:
+    """Compact /predict/raw answer -> the payload /predict returns"""
+    predictions = [{
+        "class_id": class_id,
+        "food_name": food_name,
+        "confidence": confidence,
+        "description": f"This appears to be {food_name.replace('_', ' ')}",
+    } for class_id, food_name, confidence in compact["predictions"]]
+    return {
+        "success": True,
+        "predictions": predictions,
+        "top_prediction": predictions[0] if predictions else None,
+        "model": compact.get("model"),
+        "model_version": compact.get("model_version"),
+        "message": f"Found {len(predictions)} potential matches",
+    }
+
+
+async def predict_multipart(image_data: bytes, filename: str, content_type: str, top_k: int) -> Dict[str, Any]:
+    files = {"image": (filename, image_data, content_type)}
+    ML_BYTES.labels("sent").inc(len(image_data))
+    with stage("ml_call"):
+        response = await get_client().post("/predict", files=files, params={"top_k": top_k})
+    ML_BYTES.labels("received").inc(len(response.content))
+    if response.status_code != 200:
+        raise MLServiceError(response.status_code, f"ML service error: {response.status_code} - {response.text}")
+    return response.json()
+
+
+async def recognize(image_data: bytes, filename: str, content_type: str, top_k: int = 5,
+                    transport: str = None) -> Dict[str, Any]:
+    """Top-k predictions for an uploaded image, over the configured transport"""
+    transport = transport or ML_TRANSPORT
+    if transport == "multipart" or Image is None:
+        return await predict_multipart(image_data, filename, content_type, top_k)
+
+    size = await input_size()
+    with stage("downscale"):
+        try:
+            body, body_type, headers = await run_in_threadpool(prepare_image, image_data, size, transport)
+        except (OSError, ValueError) as e:
+            raise MLServiceError(400, f"Could not decode image: {e}")
+
+    ML_BYTES.labels("sent").inc(len(body))
+    with stage("ml_call"):
+        response = await get_client().post("/predict/raw", content=body, params={"top_k": top_k},
+                                           headers={"Content-Type": body_type, **headers})
+    ML_BYTES.labels("received").inc(len(response.content))
+    if response.status_code != 200:
+        raise MLServiceError(response.status_code, f"ML service error: {response.status_code} - {response.text}")
+
+    compact = response.json()
+    if not ML_INPUT_SIZE and compact.get("image_size") and compact["image_size"] != size:
+        # A model with another resolution was activated; the next request scales for it
+        _input_size["size"] = compact["image_size"]
+        _input_size["checked_at"] = time.monotonic()
+    return expand_predictions(compact)
+
+
+async def similar(image_data: bytes, filename: str, content_type: str, k: int = 10) -> Dict[str, Any]:
+    """Reference dish photos nearest to the image in the service's embedding index"""
+    files = {"image": (filename, image_data, content_type)}
+    ML_BYTES.labels("sent").inc(len(image_data))
+    with stage("ml_call"):
+        response = await get_client().post("/similar", files=files, params={"k": k})
+    ML_BYTES.labels("received").inc(len(response.content))
+    if response.status_code != 200:
+        raise MLServiceError(response.status_code, f"ML service error: {response.status_code} - {response.text}")
+    return response.json()
@@ -0,0 +1,134 @@
+"""
+Token-bucket rate limiting and quota accounting for paid external APIs.
+
+Each API key gets one bucket refilled at a steady rate up to a burst size.
+Callers wait in a priority queue (interactive requests ahead of background
+refreshes) for at most their own timeout, and background callers may not
+drain the last `reserve` tokens so user-facing searches keep headroom. A
+daily quota caps the total; once it is spent every call is refused until
+UTC midnight.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from typing import Dict, Optional
+
+from ..observability import EXTERNAL_API_COST, EXTERNAL_API_QUEUE_SECONDS, EXTERNAL_API_QUOTA_REMAINING
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+YANDEX_RATE_PER_SEC = float(os.getenv("YANDEX_RATE_PER_SEC", "5"))
+YANDEX_BURST = float(os.getenv("YANDEX_BURST", "10"))
+YANDEX_BACKGROUND_RESERVE = float(os.getenv("YANDEX_BACKGROUND_RESERVE", "3"))
+YANDEX_DAILY_QUOTA = int(os.getenv("YANDEX_DAILY_QUOTA", "0"))  # 0 = unlimited
+YANDEX_COST_PER_REQUEST = float(os.getenv("YANDEX_COST_PER_REQUEST", "0"))
+# How long a call may wait for a token, per priority
+YANDEX_QUEUE_TIMEOUT = float(os.getenv("YANDEX_QUEUE_TIMEOUT", "1.0"))
+YANDEX_BACKGROUND_QUEUE_TIMEOUT = float(os.getenv("YANDEX_BACKGROUND_QUEUE_TIMEOUT", "30"))
+
+
+class RateLimited(Exception):
+    """The call was not admitted (no token before the deadline, or quota spent)"""
+
+
+class TokenBucket:
+    def __init__(self, name: str, rate: float, burst: float, reserve: float = 0.0,
+                 daily_quota: int = 0, cost_per_request: float = 0.0):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.reserve = min(reserve, burst - 1) if burst > 1 else 0.0
+        self.daily_quota = daily_quota
+        self.cost_per_request = cost_per_request
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.quota_day = None
+        self.quota_used = 0
+        self._waiters = []  # heap of (priority, sequence)
+        self._sequence = itertools.count()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _quota_left(self) -> Optional[int]:
+        if not self.daily_quota:
+            return None
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        if today != self.quota_day:
+            self.quota_day, self.quota_used = today, 0
+        return self.daily_quota - self.quota_used
+
+    async def acquire(self, priority: int = INTERACTIVE, timeout: float = None):
+        """Wait for a token in priority order; raise RateLimited past `timeout` seconds"""
+        if timeout is None:
+            timeout = YANDEX_QUEUE_TIMEOUT if priority == INTERACTIVE else YANDEX_BACKGROUND_QUEUE_TIMEOUT
+        label = PRIORITY_NAMES.get(priority, str(priority))
+        quota_left = self._quota_left()
+        if quota_left is not None and quota_left <= 0:
+            raise RateLimited(f"{self.name} daily quota of {self.daily_quota} calls spent")
+        # Reserve the quota slot now so concurrent waiters cannot overrun the cap
+        reserved_day = self.quota_day
+        if self.daily_quota:
+            self.quota_used += 1
+
+        start = time.monotonic()
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(self._waiters, ticket)
+        admitted = False
+        try:
+            while True:
+                self._refill()
+                floor = 0.0 if priority == INTERACTIVE else self.reserve
+                if self._waiters[0] == ticket and self.tokens - 1 >= floor:
+                    self.tokens -= 1
+                    admitted = True
+                    break
+                remaining = timeout - (time.monotonic() - start)
+                if remaining <= 0:
+                    raise RateLimited(f"{self.name} rate limit: no token within {timeout:.1f}s")
+                # Sleep until the next token is due (others may be ahead of us)
+                needed = max(floor + 1 - self.tokens, 0.0)
+                await asyncio.sleep(min(max(needed / self.rate, 0.005), remaining))
+        finally:
+            if ticket in self._waiters:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+            # Timed out or cancelled: give the slot back (unless the quota day rolled over meanwhile)
+            if not admitted and self.daily_quota and self.quota_day == reserved_day:
+                self.quota_used -= 1
+            EXTERNAL_API_QUEUE_SECONDS.labels(self.name, label).observe(time.monotonic() - start)
+
+        if self.daily_quota:
+            EXTERNAL_API_QUOTA_REMAINING.labels(self.name).set(self.daily_quota - self.quota_used)
+        if self.cost_per_request:
+            EXTERNAL_API_COST.labels(self.name).inc(self.cost_per_request)
+
+    def describe(self) -> Dict:
+        self._refill()
+        return {
+            "tokens": round(self.tokens, 2),
+            "rate_per_sec": self.rate,
+            "burst": self.burst,
+            "waiting": len(self._waiters),
+            "quota_left": self._quota_left(),
+        }
+
+
+_buckets: Dict[str, TokenBucket] = {}
+
+
+def yandex_bucket(api_key: str) -> TokenBucket:
+    """The shared bucket for a Yandex API key (one per key, per process)"""
+    bucket = _buckets.get(api_key)
+    if bucket is None:
+        bucket = _buckets[api_key] = TokenBucket(
+            "yandex", YANDEX_RATE_PER_SEC, YANDEX_BURST, YANDEX_BACKGROUND_RESERVE,
+            YANDEX_DAILY_QUOTA, YANDEX_COST_PER_REQUEST,
+        )
+    return bucket
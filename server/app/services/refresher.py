@@ -0,0 +1,153 @@
+"""
+Stale-while-revalidate refresh of restaurant data.
+
+Searches answer from the local database whenever it has results and only
+queue the (dish, geo tile) for a background re-fetch when the data is older
+than the freshness window or thin. The refresher drains that queue in small
+batches, at background priority on the Yandex rate limiter and only during
+off-peak hours if REFRESH_OFFPEAK_HOURS is set. A tile refreshed (or queued)
+recently is not queued again.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from ..observability import REFRESH_QUEUE_DEPTH, REFRESH_RUNS
+from .dish_vocabulary import get_vocabulary, normalize
+from .rate_limit import RateLimited
+
+logger = logging.getLogger(__name__)
+
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "1") == "1"
+REFRESH_MAX_AGE_HOURS = float(os.getenv("REFRESH_MAX_AGE_HOURS", "24"))
+# Fewer local results than this still take the synchronous Yandex path
+REFRESH_MIN_LOCAL_RESULTS = int(os.getenv("REFRESH_MIN_LOCAL_RESULTS", "1"))
+# Local results below this count are served but the tile is queued to fill up
+REFRESH_TARGET_RESULTS = int(os.getenv("REFRESH_TARGET_RESULTS", "8"))
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", "5"))
+REFRESH_INTERVAL = float(os.getenv("REFRESH_INTERVAL", "30"))
+REFRESH_MAX_QUEUE = int(os.getenv("REFRESH_MAX_QUEUE", "1000"))
+REFRESH_TILE_DEG = float(os.getenv("REFRESH_TILE_DEG", "0.02"))
+# UTC hour range such as "1-6" or "22-5"; empty means refresh at any time
+REFRESH_OFFPEAK_HOURS = os.getenv("REFRESH_OFFPEAK_HOURS", "")
+
+TileKey = Tuple[str, int, int]
+
+
+@dataclass
+class RefreshJob:
+    dish: str
+    lat: float
+    lon: float
+    radius: int
+
+
+def parse_hours(spec: str) -> Optional[Tuple[int, int]]:
+    if not spec:
+        return None
+    start, end = (int(part) for part in spec.split("-"))
+    return start, end
+
+
+class Refresher:
+    def __init__(self, refresh: Callable[[RefreshJob], Awaitable[int]],
+                 max_age_hours: float = REFRESH_MAX_AGE_HOURS, batch_size: int = REFRESH_BATCH_SIZE,
+                 interval: float = REFRESH_INTERVAL, max_queue: int = REFRESH_MAX_QUEUE,
+                 tile_deg: float = REFRESH_TILE_DEG, offpeak_hours: str = REFRESH_OFFPEAK_HOURS):
+        self.refresh = refresh
+        self.max_age = timedelta(hours=max_age_hours)
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_queue = max_queue
+        self.tile_deg = tile_deg
+        self.offpeak = parse_hours(offpeak_hours)
+        self.queue: "OrderedDict[TileKey, RefreshJob]" = OrderedDict()
+        self.recent: Dict[TileKey, float] = {}  # tile -> monotonic time it was last queued
+        self._task: Optional[asyncio.Task] = None
+
+    def tile_key(self, dish: str, lat: float, lon: float) -> TileKey:
+        dish_key = get_vocabulary().resolve(dish) or normalize(dish)
+        return dish_key, int(lat // self.tile_deg), int(lon // self.tile_deg)
+
+    def is_stale(self, updated_at: Optional[datetime]) -> bool:
+        return updated_at is None or datetime.utcnow() - updated_at > self.max_age
+
+    def enqueue(self, dish: str, lat: float, lon: float, radius: int) -> bool:
+        """Queue a tile for refresh unless it was queued within the freshness window"""
+        key = self.tile_key(dish, lat, lon)
+        queued_at = self.recent.get(key)
+        if key in self.queue or (queued_at is not None and time.monotonic() - queued_at < self.max_age.total_seconds()):
+            return False
+        if len(self.queue) >= self.max_queue:
+            REFRESH_RUNS.labels("dropped").inc()
+            return False
+        self.queue[key] = RefreshJob(dish, lat, lon, radius)
+        self.recent[key] = time.monotonic()
+        REFRESH_QUEUE_DEPTH.set(len(self.queue))
+        return True
+
+    def in_offpeak(self, now: datetime = None) -> bool:
+        if self.offpeak is None:
+            return True
+        hour = (now or datetime.utcnow()).hour
+        start, end = self.offpeak
+        return start <= hour < end if start <= end else hour >= start or hour < end
+
+    async def run_batch(self) -> int:
+        """Refresh up to batch_size queued tiles; returns how many were processed"""
+        processed = 0
+        while self.queue and processed < self.batch_size:
+            key, job = self.queue.popitem(last=False)
+            REFRESH_QUEUE_DEPTH.set(len(self.queue))
+            try:
+                found = await self.refresh(job)
+                REFRESH_RUNS.labels("ok").inc()
+                logger.info("Refreshed '%s' around %.4f,%.4f: %d restaurants", job.dish, job.lat, job.lon, found)
+            except RateLimited:
+                # Out of budget: put it back at the front and try again next round
+                self.queue[key] = job
+                self.queue.move_to_end(key, last=False)
+                REFRESH_QUEUE_DEPTH.set(len(self.queue))
+                REFRESH_RUNS.labels("rate_limited").inc()
+                break
+            except Exception as e:
+                REFRESH_RUNS.labels("error").inc()
+                logger.warning("Refresh of '%s' failed: %s", job.dish, e)
+            processed += 1
+        # Forget tiles older than the window so the map stays bounded
+        horizon = time.monotonic() - self.max_age.total_seconds()
+        self.recent = {k: t for k, t in self.recent.items() if t >= horizon or k in self.queue}
+        return processed
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.queue and self.in_offpeak():
+                await self.run_batch()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def describe(self) -> Dict:
+        return {
+            "enabled": REFRESH_ENABLED,
+            "queued": len(self.queue),
+            "tracked_tiles": len(self.recent),
+            "max_age_hours": self.max_age.total_seconds() / 3600,
+            "offpeak_hours": REFRESH_OFFPEAK_HOURS or None,
+        }
@@ -0,0 +1,549 @@
+"""
+In-process dish -> restaurant bitmap index intersected with geo cells.
+
+Every restaurant that serves at least one dish gets a dense integer id.
+Each dish name, each cuisine and each small geo cell (RESTAURANT_INDEX_CELL_DEG)
+maps to a roaring-style bitmap of those ids: ids are split by their high 16
+bits into containers that are a sorted uint16 array while sparse and a
+1024-word bitmap once they hold more than 4096 ids. A local search is then
+the union of the cell bitmaps the radius overlaps, intersected with the
+bitmaps of the matching dishes, followed by an exact distance check on the
+few candidates with the coordinates kept in NumPy arrays.
+
+The index is built from Postgres at startup (one ordered pass over
+restaurant_dishes joined to restaurants) and updated in place by
+save_restaurants_to_db. Every RESTAURANT_INDEX_SYNC_INTERVAL seconds it
+syncs from the database, which picks up writes made by other workers, bulk
+imports and reclassify_cuisines.py. The sync adds restaurant_dishes rows
+created since the last pass, and moves or recategorises restaurants whose
+updated_at is newer. Deleted restaurants and dish links leave no trace to
+sync from, so every RESTAURANT_INDEX_REBUILD_INTERVAL seconds a fresh index
+is built and swapped in; until then the primary-key lookup of the hits
+drops deleted restaurants. Until the first build finishes searches use the
+SQL path.
+"""
+import asyncio
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from ..models.restaurant import Restaurant, RestaurantDish
+from ..observability import RESTAURANT_INDEX_SIZE
+from .geo import EARTH_RADIUS_KM, cells_in_radius
+
+logger = logging.getLogger(__name__)
+
+RESTAURANT_INDEX_ENABLED = os.getenv("RESTAURANT_INDEX_ENABLED", "1") == "1"
+RESTAURANT_INDEX_CELL_DEG = float(os.getenv("RESTAURANT_INDEX_CELL_DEG", "0.02"))
+RESTAURANT_INDEX_SYNC_INTERVAL = float(os.getenv("RESTAURANT_INDEX_SYNC_INTERVAL", "60"))
+RESTAURANT_INDEX_REBUILD_INTERVAL = float(os.getenv("RESTAURANT_INDEX_REBUILD_INTERVAL", "21600"))
+
+ARRAY_MAX = 4096  # ids per container above which it becomes a bitmap
+BITMAP_WORDS = 1024  # 65536 bits
+_ONE = np.uint64(1)
+
+
+def _to_bitmap(values: np.ndarray) -> np.ndarray:
+    words = np.zeros(BITMAP_WORDS, dtype=np.uint64)
+    np.bitwise_or.at(words, values >> 6, _ONE << (values & 63).astype(np.uint64))
+    return words
+
+
+def _bitmap_values(words: np.ndarray) -> np.ndarray:
+    return np.flatnonzero(np.unpackbits(words.view(np.uint8), bitorder="little")).astype(np.uint16)
+
+
+def _compact(container: np.ndarray) -> np.ndarray:
+    """Use whichever container form the cardinality calls for"""
+    if container.dtype == np.uint64:
+        values = _bitmap_values(container)
+        return values if len(values) <= ARRAY_MAX else container
+    return container if len(container) <= ARRAY_MAX else _to_bitmap(container)
+
+
+def _intersect(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a_bitmap, b_bitmap = a.dtype == np.uint64, b.dtype == np.uint64
+    if a_bitmap and b_bitmap:
+        return _compact(a & b)
+    if a_bitmap:
+        a, b = b, a
+    if b.dtype == np.uint64:
+        return a[((b[a >> 6] >> (a & 63).astype(np.uint64)) & _ONE) != 0]
+    return np.intersect1d(a, b, assume_unique=True)
+
+
+class RoaringBitmap:
+    """Set of uint32 ids stored as 16-bit containers keyed by the high bits"""
+
+    __slots__ = ("keys", "containers")
+
+    def __init__(self):
+        self.keys: List[int] = []
+        self.containers: List[np.ndarray] = []
+
+    @classmethod
+    def from_sorted(cls, values: np.ndarray) -> "RoaringBitmap":
+        """Bitmap of sorted, unique ids"""
+        bitmap = cls()
+        values = np.asarray(values, dtype=np.uint32)
+        if len(values) == 0:
+            return bitmap
+        highs = values >> 16
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(highs)) + 1, [len(values)]])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            bitmap.keys.append(int(highs[start]))
+            bitmap.containers.append(_compact((values[start:end] & 0xFFFF).astype(np.uint16)))
+        return bitmap
+
+    @classmethod
+    def union(cls, bitmaps: Iterable["RoaringBitmap"]) -> "RoaringBitmap":
+        arrays = [b.to_array() for b in bitmaps]
+        if not arrays:
+            return cls()
+        return cls.from_sorted(np.unique(np.concatenate(arrays)))
+
+    def add(self, value: int):
+        high, low = value >> 16, value & 0xFFFF
+        i = bisect.bisect_left(self.keys, high)
+        if i == len(self.keys) or self.keys[i] != high:
+            self.keys.insert(i, high)
+            self.containers.insert(i, np.array([low], dtype=np.uint16))
+            return
+        container = self.containers[i]
+        if container.dtype == np.uint64:
+            container[low >> 6] |= _ONE << np.uint64(low & 63)
+            return
+        j = int(np.searchsorted(container, low))
+        if j < len(container) and container[j] == low:
+            return
+        self.containers[i] = _compact(np.insert(container, j, np.uint16(low)))
+
+    def remove(self, value: int):
+        high, low = value >> 16, value & 0xFFFF
+        i = bisect.bisect_left(self.keys, high)
+        if i == len(self.keys) or self.keys[i] != high:
+            return
+        container = self.containers[i]
+        if container.dtype == np.uint64:
+            container[low >> 6] &= ~(_ONE << np.uint64(low & 63))
+            container = _compact(container)
+        else:
+            j = int(np.searchsorted(container, low))
+            if j == len(container) or container[j] != low:
+                return
+            container = np.delete(container, j)
+        if len(container) == 0:
+            del self.keys[i], self.containers[i]
+        else:
+            self.containers[i] = container
+
+    def __contains__(self, value: int) -> bool:
+        high, low = value >> 16, value & 0xFFFF
+        i = bisect.bisect_left(self.keys, high)
+        if i == len(self.keys) or self.keys[i] != high:
+            return False
+        container = self.containers[i]
+        if container.dtype == np.uint64:
+            return bool((int(container[low >> 6]) >> (low & 63)) & 1)
+        j = int(np.searchsorted(container, low))
+        return j < len(container) and container[j] == low
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        result = RoaringBitmap()
+        if len(self.keys) > len(other.keys):
+            self, other = other, self
+        for key, container in zip(self.keys, self.containers):
+            i = bisect.bisect_left(other.keys, key)
+            if i < len(other.keys) and other.keys[i] == key:
+                both = _intersect(container, other.containers[i])
+                if len(both) and (both.dtype != np.uint64 or both.any()):
+                    result.keys.append(key)
+                    result.containers.append(both)
+        return result
+
+    def __len__(self) -> int:
+        return sum(int(np.unpackbits(c.view(np.uint8)).sum()) if c.dtype == np.uint64 else len(c)
+                   for c in self.containers)
+
+    def to_array(self) -> np.ndarray:
+        parts = [(_bitmap_values(c) if c.dtype == np.uint64 else c).astype(np.uint32) | np.uint32(key << 16)
+                 for key, c in zip(self.keys, self.containers)]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.uint32)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.containers)
+
+
+class IdMap:
+    """
+    Restaurant UUID <-> dense id without a Python object per restaurant: ids
+    are kept as fixed-width bytes, looked up in a sorted copy, and only ids
+    added since the last merge live in a small dict.
+    """
+
+    MERGE_AT = 65536
+
+    def __init__(self, width: int = 36):
+        self.width = width
+        self.keys = np.empty(0, dtype=f"S{width}")
+        self.count = 0
+        self.sorted_keys = np.empty(0, dtype=f"S{width}")
+        self.sorted_ids = np.empty(0, dtype=np.uint32)
+        self.pending: Dict[bytes, int] = {}
+
+    def extend(self, keys: List[str], merge: bool = True):
+        """Append restaurants (bulk load); their ids follow on from the current count"""
+        if keys and max(map(len, keys)) > self.width:
+            raise ValueError(f"Restaurant ids longer than {self.width} characters")
+        self._reserve(self.count + len(keys))
+        self.keys[self.count:self.count + len(keys)] = np.array(keys, dtype=self.keys.dtype)
+        self.count += len(keys)
+        if merge:
+            self._merge()
+
+    def get(self, key: str) -> Optional[int]:
+        raw = key.encode()
+        if raw in self.pending:
+            return self.pending[raw]
+        i = int(np.searchsorted(self.sorted_keys, raw))
+        if i < len(self.sorted_keys) and self.sorted_keys[i] == raw:
+            return int(self.sorted_ids[i])
+        return None
+
+    def add(self, key: str) -> int:
+        existing = self.get(key)
+        if existing is not None:
+            return existing
+        if len(key) > self.width:
+            raise ValueError(f"Restaurant id longer than {self.width} characters: {key}")
+        self._reserve(self.count + 1)
+        self.keys[self.count] = key.encode()
+        self.pending[key.encode()] = self.count
+        self.count += 1
+        if len(self.pending) >= self.MERGE_AT:
+            self._merge()
+        return self.count - 1
+
+    def key(self, restaurant: int) -> str:
+        return self.keys[restaurant].decode()
+
+    def _reserve(self, size: int):
+        if size > len(self.keys):
+            grown = np.empty(max(size, 2 * len(self.keys), 1024), dtype=self.keys.dtype)
+            grown[:self.count] = self.keys[:self.count]
+            self.keys = grown
+
+    def _merge(self):
+        order = np.argsort(self.keys[:self.count], kind="stable").astype(np.uint32)
+        self.sorted_keys = self.keys[order]
+        self.sorted_ids = order
+        self.pending = {}
+
+    @property
+    def nbytes(self) -> int:
+        return self.keys.nbytes + self.sorted_keys.nbytes + self.sorted_ids.nbytes + 120 * len(self.pending)
+
+
+def cell_keys(lat: np.ndarray, lon: np.ndarray, cell_deg: float) -> np.ndarray:
+    """Vectorised geo.geo_cell"""
+    columns = math.ceil(360 / cell_deg)
+    rows = np.floor((lat + 90) / cell_deg).astype(np.int64)
+    cols = np.floor((lon + 180) / cell_deg).astype(np.int64) % columns
+    return rows * columns + cols
+
+
+def distances_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Vectorised geo.calculate_distance (haversine)"""
+    dlat = np.radians(lats - lat)
+    dlon = np.radians(lons - lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(math.radians(lat)) * np.cos(np.radians(lats)) * np.sin(dlon / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+Row = Tuple[str, float, float, Optional[str], str, Optional[str]]  # restaurant id, lat, lon, cuisine, dish name, dish id
+
+
+class RestaurantIndex:
+    def __init__(self, cell_deg: float = RESTAURANT_INDEX_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.ids = IdMap()
+        self.lat = np.empty(0, dtype=np.float64)
+        self.lon = np.empty(0, dtype=np.float64)
+        self.dishes: Dict[Tuple[str, Optional[str]], RoaringBitmap] = {}  # (lowercased name, dish id) -> restaurants
+        self.cuisines: Dict[str, RoaringBitmap] = {}
+        self.cuisine_names: List[str] = []  # cuisine code -> lowercased cuisine
+        self.cuisine_of = np.empty(0, dtype=np.uint32)  # restaurant -> cuisine code
+        self.cells: Dict[int, RoaringBitmap] = {}
+        self.watermark: Optional[datetime] = None  # newest restaurant_dishes.created_at seen
+        self.updated_watermark: Optional[datetime] = None  # newest restaurants.updated_at seen
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return self.ids.count
+
+    def load(self, rows: Iterable[Row]):
+        """Bulk load an empty index from rows grouped by restaurant (consecutive rows of one restaurant id)"""
+        if self.count:
+            raise ValueError("load() fills an empty index; use add() for updates")
+        # Flat typed arrays while reading: no Python object per restaurant or link
+        keys: List[str] = []
+        lats, lons, cuisines = array("d"), array("d"), array("I")
+        cuisine_codes: Dict[str, int] = {}
+        links: Dict[Tuple[str, Optional[str]], array] = {}
+        previous, count = None, 0
+        for restaurant_id, lat, lon, cuisine, dish_name, dish_id in rows:
+            if restaurant_id != previous:
+                keys.append(restaurant_id)
+                if len(keys) == IdMap.MERGE_AT:
+                    self.ids.extend(keys, merge=False)
+                    keys = []
+                lats.append(lat)
+                lons.append(lon)
+                cuisines.append(cuisine_codes.setdefault((cuisine or "").lower(), len(cuisine_codes)))
+                previous, count = restaurant_id, count + 1
+            links.setdefault((dish_name.lower(), dish_id), array("I")).append(count - 1)
+        with self._lock:
+            self.ids.extend(keys)
+            self.lat, self.lon = np.frombuffer(lats, dtype=np.float64).copy(), np.frombuffer(lons, dtype=np.float64).copy()
+            ids = np.arange(count, dtype=np.uint32)
+            for cell, members in self._group(cell_keys(self.lat, self.lon, self.cell_deg), ids):
+                self.cells[int(cell)] = RoaringBitmap.from_sorted(members)
+            self.cuisine_names = sorted(cuisine_codes, key=cuisine_codes.get)
+            self.cuisine_of = np.frombuffer(cuisines, dtype=np.uint32).copy()
+            for code, members in self._group(self.cuisine_of, ids):
+                self.cuisines[self.cuisine_names[code]] = RoaringBitmap.from_sorted(members)
+            for dish, members in links.items():
+                self.dishes[dish] = RoaringBitmap.from_sorted(np.unique(np.frombuffer(members, dtype=np.uint32)))
+
+    @staticmethod
+    def _group(labels: np.ndarray, ids: np.ndarray):
+        if len(labels) == 0:
+            return
+        order = np.argsort(labels, kind="stable")
+        labels, ids = labels[order], ids[order]
+        bounds = np.concatenate([[0], np.flatnonzero(np.diff(labels)) + 1, [len(labels)]])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            yield labels[start], ids[start:end]
+
+    def add(self, restaurant_id: str, lat: float, lon: float, cuisine: Optional[str], dish_name: str,
+            dish_id: Optional[str] = None):
+        """Index one restaurant-dish link (idempotent)"""
+        with self._lock:
+            restaurant = self.ids.get(restaurant_id)
+            if restaurant is None:
+                restaurant = self.ids.add(restaurant_id)
+                if restaurant >= len(self.lat):
+                    size = max(restaurant + 1, 2 * len(self.lat), 1024)
+                    self.lat = np.resize(self.lat, size)
+                    self.lon = np.resize(self.lon, size)
+                    self.cuisine_of = np.resize(self.cuisine_of, size)
+                self.lat[restaurant], self.lon[restaurant] = lat, lon
+                self.cells.setdefault(self._cell(lat, lon), RoaringBitmap()).add(restaurant)
+                self.cuisine_of[restaurant] = self._cuisine_code(cuisine)
+                self.cuisines.setdefault((cuisine or "").lower(), RoaringBitmap()).add(restaurant)
+            self.dishes.setdefault((dish_name.lower(), dish_id), RoaringBitmap()).add(restaurant)
+
+    def update(self, restaurant_id: str, lat: float, lon: float, cuisine: Optional[str]) -> bool:
+        """Move or recategorise an indexed restaurant; True if anything changed"""
+        with self._lock:
+            restaurant = self.ids.get(restaurant_id)
+            if restaurant is None:
+                return False  # serves no indexed dish yet; add() places it with current values
+            changed = False
+            old_cell, new_cell = self._cell(self.lat[restaurant], self.lon[restaurant]), self._cell(lat, lon)
+            if old_cell != new_cell:
+                self.cells[old_cell].remove(restaurant)
+                if not len(self.cells[old_cell].keys):
+                    del self.cells[old_cell]
+                self.cells.setdefault(new_cell, RoaringBitmap()).add(restaurant)
+            if (self.lat[restaurant], self.lon[restaurant]) != (lat, lon):
+                self.lat[restaurant], self.lon[restaurant] = lat, lon
+                changed = True
+            code = self._cuisine_code(cuisine)
+            if code != self.cuisine_of[restaurant]:
+                self.cuisines[self.cuisine_names[self.cuisine_of[restaurant]]].remove(restaurant)
+                self.cuisines.setdefault(self.cuisine_names[code], RoaringBitmap()).add(restaurant)
+                self.cuisine_of[restaurant] = code
+                changed = True
+            return changed
+
+    def _cell(self, lat: float, lon: float) -> int:
+        return int(cell_keys(np.array([lat]), np.array([lon]), self.cell_deg)[0])
+
+    def _cuisine_code(self, cuisine: Optional[str]) -> int:
+        name = (cuisine or "").lower()
+        try:
+            return self.cuisine_names.index(name)
+        except ValueError:
+            self.cuisine_names.append(name)
+            return len(self.cuisine_names) - 1
+
+    def matching(self, query: str, dish_id: Optional[str]) -> List[RoaringBitmap]:
+        """
+        Bitmaps of the restaurants the SQL search would match: the canonical
+        dish id (or, for rows stored without one, the name containing the
+        query) for known dishes; dish name or cuisine containing the query otherwise
+        """
+        query = query.lower()
+        if dish_id:
+            return [bitmap for (name, stored), bitmap in self.dishes.items()
+                    if stored == dish_id or (stored is None and query in name)]
+        return [bitmap for (name, _), bitmap in self.dishes.items() if query in name] + \
+            [bitmap for cuisine, bitmap in self.cuisines.items() if query in cuisine]
+
+    def search(self, query: str, dish_id: Optional[str], lat: float, lon: float,
+               radius_m: int) -> List[Tuple[str, float]]:
+        """(restaurant id, distance km) within radius_m that serve the dish, nearest first"""
+        with self._lock:
+            cells = [self.cells[c] for c in cells_in_radius(lat, lon, radius_m, self.cell_deg) if c in self.cells]
+            dishes = self.matching(query, dish_id)
+            if not cells or not dishes:
+                return []
+            area = RoaringBitmap.union(cells)
+            parts = [(area & bitmap).to_array() for bitmap in dishes]
+            candidates = np.unique(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+            if len(candidates) == 0:
+                return []
+            distance = distances_km(lat, lon, self.lat[candidates], self.lon[candidates])
+            inside = distance <= radius_m / 1000
+            order = np.argsort(distance[inside], kind="stable")
+            hits, distance = candidates[inside][order], distance[inside][order]
+            return [(self.ids.key(int(i)), float(d)) for i, d in zip(hits, distance)]
+
+    def describe(self) -> Dict:
+        bitmaps = {name: sum(b.nbytes for b in group.values())
+                   for name, group in (("dishes", self.dishes), ("cuisines", self.cuisines), ("cells", self.cells))}
+        return {
+            "restaurants": self.count,
+            "dishes": len({name for name, _ in self.dishes}),
+            "cuisines": len(self.cuisines),
+            "cells": len(self.cells),
+            "cell_deg": self.cell_deg,
+            "bitmap_bytes": bitmaps,
+            "id_bytes": self.ids.nbytes,
+            "coordinate_bytes": self.lat.nbytes + self.lon.nbytes + self.cuisine_of.nbytes,
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "updated_watermark": self.updated_watermark.isoformat() if self.updated_watermark else None,
+        }
+
+
+_index: Optional[RestaurantIndex] = None
+_ready = asyncio.Event()
+
+
+def get_index() -> Optional[RestaurantIndex]:
+    """The built index, or None while it is disabled or still being built"""
+    return _index
+
+
+def _rows(db, since: Optional[datetime] = None, batch: int = 50000):
+    query = db.query(
+        RestaurantDish.restaurant_id, Restaurant.latitude, Restaurant.longitude, Restaurant.cuisine_type,
+        RestaurantDish.dish_name, RestaurantDish.dish_id, RestaurantDish.created_at,
+    ).join(Restaurant, Restaurant.id == RestaurantDish.restaurant_id)
+    if since is not None:
+        query = query.filter(RestaurantDish.created_at >= since)
+    return query.order_by(RestaurantDish.restaurant_id).yield_per(batch)
+
+
+def build(session_factory) -> RestaurantIndex:
+    """Build a fresh index from the database (blocking)"""
+    start = time.perf_counter()
+    index = RestaurantIndex()
+    db = session_factory()
+    try:
+        # Taken before the rows, so updates made while loading are re-applied by the next sync
+        index.updated_watermark = db.query(func.max(Restaurant.updated_at)).scalar()
+
+        def rows():
+            for restaurant_id, lat, lon, cuisine, dish_name, dish_id, created_at in _rows(db):
+                if created_at is not None and (index.watermark is None or created_at > index.watermark):
+                    index.watermark = created_at
+                yield restaurant_id, lat, lon, cuisine, dish_name, dish_id
+
+        index.load(rows())
+    finally:
+        db.close()
+    RESTAURANT_INDEX_SIZE.set(index.count)
+    logger.info("Restaurant index built: %d restaurants, %d dishes, %d cells in %.1fs",
+                index.count, len(index.dishes), len(index.cells), time.perf_counter() - start)
+    return index
+
+
+def sync(index: RestaurantIndex, session_factory) -> int:
+    """
+    Add links created and apply restaurant updates since the last build or
+    sync (blocking); returns how many rows changed the index
+    """
+    db = session_factory()
+    since, changed = index.watermark, 0
+    try:
+        # >= since: rows sharing the newest timestamp may have landed after the last pass (add is idempotent)
+        for restaurant_id, lat, lon, cuisine, dish_name, dish_id, created_at in _rows(db, since=since):
+            index.add(restaurant_id, lat, lon, cuisine, dish_name, dish_id)
+            if created_at is not None and (index.watermark is None or created_at > index.watermark):
+                index.watermark = created_at
+            changed += since is None or created_at is None or created_at > since
+        updates = db.query(Restaurant.id, Restaurant.latitude, Restaurant.longitude, Restaurant.cuisine_type,
+                           Restaurant.updated_at)
+        if index.updated_watermark is not None:
+            updates = updates.filter(Restaurant.updated_at >= index.updated_watermark)
+        for restaurant_id, lat, lon, cuisine, updated_at in updates.yield_per(10000):
+            changed += index.update(restaurant_id, lat, lon, cuisine)
+            if updated_at is not None and (index.updated_watermark is None or updated_at > index.updated_watermark):
+                index.updated_watermark = updated_at
+    finally:
+        db.close()
+    RESTAURANT_INDEX_SIZE.set(index.count)
+    return changed
+
+
+def record_saved(restaurants, dish_name: str, dish_id: Optional[str]):
+    """Index restaurants save_restaurants_to_db just committed"""
+    if _index is None:
+        return
+    for restaurant in restaurants:
+        _index.add(restaurant.id, restaurant.latitude, restaurant.longitude, restaurant.cuisine_type,
+                   dish_name, dish_id)
+    RESTAURANT_INDEX_SIZE.set(_index.count)
+
+
+async def wait_ready():
+    await _ready.wait()
+
+
+async def run(session_factory, interval: float = RESTAURANT_INDEX_SYNC_INTERVAL,
+              rebuild_interval: float = RESTAURANT_INDEX_REBUILD_INTERVAL):
+    """Build the index in a thread, then keep it in sync with the database and rebuild it now and then"""
+    global _index
+    try:
+        _index = await asyncio.to_thread(build, session_factory)
+    except Exception as e:
+        logger.warning("Restaurant index build failed, searches stay on SQL: %s", e)
+        return
+    finally:
+        _ready.set()
+    built = time.monotonic()
+    while interval > 0:
+        await asyncio.sleep(interval)
+        try:
+            if rebuild_interval > 0 and time.monotonic() - built >= rebuild_interval:
+                # Drops deleted restaurants and links; the sync below catches what landed during the build
+                fresh = await asyncio.to_thread(build, session_factory)
+                _index, built = fresh, time.monotonic()
+            changed = await asyncio.to_thread(sync, _index, session_factory)
+            if changed:
+                logger.info("Restaurant index synced %d rows", changed)
+        except Exception as e:
+            logger.warning("Restaurant index sync failed: %s", e)
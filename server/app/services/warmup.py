@@ -0,0 +1,195 @@
+"""
+Cache warmup after a deploy and on a schedule.
+
+The most common (dish, geo cell) pairs are read from the restaurant_dishes
+counts (the same grouping as /database/stats). For each pair the local
+search runs at the centroid of its restaurants, which pulls the rows into
+Postgres buffers and fills the dish vocabulary cache. Further steps open the
+database pool and the Yandex and ML connection pools, run dummy recognitions
+through the ML service and replay the hottest cacheable GETs so the response
+cache starts full.
+
+The service reports ready once the first pass has finished or
+WARMUP_BUDGET_SECONDS has run out, whichever comes first; an unfinished
+pass keeps going in the background. Later passes run every WARMUP_INTERVAL
+seconds (0 = only at startup).
+"""
+import asyncio
+import io
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy import func, text
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..models.restaurant import Restaurant, RestaurantDish
+from ..observability import WARMUP_SECONDS, WARMUP_STEPS
+from . import ml_client, yandex
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+WARMUP_BUDGET_SECONDS = float(os.getenv("WARMUP_BUDGET_SECONDS", "30"))
+WARMUP_INTERVAL = float(os.getenv("WARMUP_INTERVAL", "900"))
+WARMUP_PAIRS = int(os.getenv("WARMUP_PAIRS", "50"))
+WARMUP_RADIUS = int(os.getenv("WARMUP_RADIUS", "5000"))
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "5"))
+WARMUP_ML_PASSES = int(os.getenv("WARMUP_ML_PASSES", "3"))
+
+
+@dataclass
+class HotPair:
+    dish: str
+    geo_cell: Optional[int]
+    count: int
+    lat: float
+    lon: float
+
+
+def hot_pairs(db: Session, limit: int = WARMUP_PAIRS) -> List[HotPair]:
+    """Most common (dish, geo cell) pairs with the centroid of their restaurants"""
+    count = func.count(RestaurantDish.id)
+    rows = db.query(
+        RestaurantDish.dish_name, RestaurantDish.geo_cell, count,
+        func.avg(Restaurant.latitude), func.avg(Restaurant.longitude),
+    ).join(Restaurant, Restaurant.id == RestaurantDish.restaurant_id) \
+        .group_by(RestaurantDish.dish_name, RestaurantDish.geo_cell).order_by(count.desc()).limit(limit).all()
+    return [HotPair(dish, cell, n, float(lat), float(lon)) for dish, cell, n, lat, lon in rows]
+
+
+def _ping_database():
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+    finally:
+        db.close()
+
+
+async def warm_db_pool(connections: int = WARMUP_DB_CONNECTIONS):
+    """Open `connections` pooled connections at once so the first requests don't pay for the handshakes"""
+    await asyncio.gather(*(asyncio.to_thread(_ping_database) for _ in range(connections)))
+
+
+async def warm_yandex():
+    """Open the pooled Yandex connection (DNS and TLS) with a HEAD that uses no quota"""
+    await yandex.get_client().head(yandex.YANDEX_SEARCH_API)
+
+
+async def warm_ml(passes: int = WARMUP_ML_PASSES):
+    """Dummy recognitions through the regular ML path: connection pool, input size, model forward passes"""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (256, 256), (128, 96, 64)).save(buffer, "JPEG")
+    for _ in range(passes):
+        await ml_client.recognize(buffer.getvalue(), "warmup.jpg", "image/jpeg", top_k=1)
+
+
+async def replay_gets(app, paths: List[str]):
+    """GET each path through the whole app, so cacheable responses land in the response cache"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://warmup") as client:
+        for path in paths:
+            response = await client.get(path)
+            if response.status_code != 200:
+                logger.warning("Warmup GET %s: %d", path, response.status_code)
+
+
+class Warmer:
+    def __init__(self, load_pairs: Callable[[], Awaitable[List[HotPair]]],
+                 warm_pair: Callable[[HotPair], Awaitable[None]],
+                 steps: Dict[str, Callable[[List[HotPair]], Awaitable[None]]] = None,
+                 budget: float = WARMUP_BUDGET_SECONDS, interval: float = WARMUP_INTERVAL,
+                 concurrency: int = WARMUP_CONCURRENCY):
+        self.load_pairs = load_pairs
+        self.warm_pair = warm_pair
+        self.steps = steps or {}
+        self.budget = budget
+        self.interval = interval
+        self.concurrency = concurrency
+        self.ready = asyncio.Event()
+        self.passes = 0
+        self.last: Dict = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def _step(self, name: str, work: Awaitable, report: Dict):
+        start = time.perf_counter()
+        try:
+            await work
+            outcome = "ok"
+        except Exception as e:
+            outcome = "error"
+            report.setdefault("errors", []).append(f"{name}: {type(e).__name__}: {e}")
+            logger.warning("Warmup step %s failed: %s", name, e)
+        WARMUP_STEPS.labels(name.split(":")[0], outcome).inc()
+        report["steps"][name] = round(time.perf_counter() - start, 3)
+
+    async def warm(self) -> Dict:
+        """One full pass: hot pairs first (in parallel), then the other steps in order"""
+        start = time.perf_counter()
+        report = {"started": time.time(), "steps": {}}
+        self.last = report
+        try:
+            pairs = await self.load_pairs()
+        except Exception as e:
+            # Connection pools and the ML model are still worth warming
+            logger.warning("Could not load hot pairs: %s", e)
+            report.setdefault("errors", []).append(f"hot_pairs: {type(e).__name__}: {e}")
+            pairs = []
+        report["pairs"] = len(pairs)
+
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def warm_one(pair: HotPair):
+            async with slots:
+                await self._step(f"pair:{pair.dish}@{pair.geo_cell}", self.warm_pair(pair), report)
+
+        await asyncio.gather(*(warm_one(pair) for pair in pairs))
+        for name, step in self.steps.items():
+            await self._step(name, step(pairs), report)
+
+        report["seconds"] = round(time.perf_counter() - start, 2)
+        WARMUP_SECONDS.observe(report["seconds"])
+        self.passes += 1
+        logger.info("Warmup pass %d: %d pairs in %.1fs", self.passes, len(pairs), report["seconds"])
+        return report
+
+    async def run(self):
+        first = asyncio.create_task(self.warm())
+        done, _ = await asyncio.wait({first}, timeout=self.budget)
+        if not done:
+            logger.warning("Warmup still running after %.0fs budget; reporting ready", self.budget)
+        self.ready.set()
+        try:
+            await first
+        except Exception as e:
+            logger.warning("Warmup pass failed: %s", e)
+        while self.interval > 0:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.warm()
+            except Exception as e:
+                logger.warning("Warmup pass failed: %s", e)
+
+    def start(self, steps: Dict[str, Callable[[List[HotPair]], Awaitable[None]]] = None):
+        """Begin warming in the background; `steps` adds steps that need the app"""
+        self.steps.update(steps or {})
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def describe(self) -> Dict:
+        return {"ready": self.ready.is_set(), "passes": self.passes, "budget_seconds": self.budget,
+                "interval_seconds": self.interval, "last": self.last}
@@ -0,0 +1,222 @@
+"""
+Yandex Places search client.
+
+All calls share one pooled AsyncClient. `search` sends the single
+"<dish> ресторан кафе" query around the user; `search_fanout` splits the
+requested radius into tiles, crosses them with query variants and runs the
+calls concurrently under a concurrency cap and an overall deadline. Calls
+still running at the deadline are cancelled and the results gathered so far
+are returned.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from ..observability import YANDEX_REQUESTS, stage
+from .cuisine import get_classifier
+from .geo import calculate_distance, tile_circle
+from .rate_limit import INTERACTIVE, RateLimited, yandex_bucket
+
+logger = logging.getLogger(__name__)
+
+YANDEX_SEARCH_API = os.getenv("YANDEX_SEARCH_API", "https://search-maps.yandex.ru/v1/")
+YANDEX_API_KEY = os.getenv("YANDEX_API_KEY", "04e6a38e-1a37-4e9b-b633-597e648e6462")
+
+YANDEX_TIMEOUT = float(os.getenv("YANDEX_TIMEOUT", "10"))
+# Fan-out mode
+YANDEX_FANOUT = os.getenv("YANDEX_FANOUT", "0") == "1"
+YANDEX_MAX_CONCURRENCY = int(os.getenv("YANDEX_MAX_CONCURRENCY", "6"))
+YANDEX_DEADLINE = float(os.getenv("YANDEX_DEADLINE", "2.5"))
+YANDEX_TILE_KM = float(os.getenv("YANDEX_TILE_KM", "2.0"))
+YANDEX_MAX_TILES = int(os.getenv("YANDEX_MAX_TILES", "9"))
+YANDEX_RESULTS_PER_QUERY = int(os.getenv("YANDEX_RESULTS_PER_QUERY", "50"))  # API maximum
+
+# Query templates for the Russian dish name; the first one is the classic single query
+QUERY_VARIANTS = ["{} ресторан кафе", "{}"]
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared pooled client (created on first use, inside the running loop)"""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=YANDEX_TIMEOUT,
+            limits=httpx.Limits(max_connections=max(YANDEX_MAX_CONCURRENCY, 10),
+                                max_keepalive_connections=max(YANDEX_MAX_CONCURRENCY, 10)),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def base_params(text: str, lat: float, lon: float, span_lat: float, span_lon: float, results: int) -> Dict:
+    return {
+        "apikey": YANDEX_API_KEY,  # Your PLACES_HTTP_API key
+        "text": text,
+        "lang": "ru_RU",
+        "ll": f"{lon},{lat}",
+        "spn": f"{span_lon:.5f},{span_lat:.5f}",
+        "type": "biz",
+        "results": results,
+    }
+
+
+def parse_restaurants(data: Dict, lat: float, lon: float) -> List[Dict]:
+    """Restaurant dicts from a Yandex FeatureCollection, with distances from (lat, lon)"""
+    classifier = get_classifier()
+    restaurants = []
+
+    for feature in data.get('features', []):
+        properties = feature.get('properties', {})
+        company_meta = properties.get('CompanyMetaData', {})
+        geometry = feature.get('geometry', {})
+        coordinates = geometry.get('coordinates', [])
+
+        if not coordinates or len(coordinates) != 2:
+            continue
+
+        name = company_meta.get('name', 'Unknown Restaurant')
+        address = company_meta.get('address', 'Address not available')
+
+        # Calculate distance
+        distance_km = calculate_distance(lat, lon, coordinates[1], coordinates[0])
+
+        # Extract cuisine from categories
+        categories = company_meta.get('Categories', [])
+        cuisine = classifier.classify(category.get('name', '') for category in categories)
+
+        # Get rating if available
+        rating = company_meta.get('rating', 4.0 + (hash(name) % 10) / 10)
+
+        restaurants.append({
+            "external_id": feature.get('id', ''),
+            "name": name,
+            "address": address,
+            "cuisine": cuisine,
+            "rating": float(rating),
+            "price_range": "$" * (1 + (hash(name) % 3)),  # Yandex doesn't provide price info
+            "distance": f"{distance_km:.1f} km",
+            "coordinates": {"lat": coordinates[1], "lon": coordinates[0]},
+            "phone": company_meta.get('Phones', [{}])[0].get('formatted', ''),
+            "hours": company_meta.get('Hours', {}).get('text', ''),
+            "source": "yandex",
+            "url": company_meta.get('url', '')
+        })
+
+    return restaurants
+
+
+def merge_restaurants(batches: Iterable[List[Dict]]) -> List[Dict]:
+    """Concatenate result batches, dropping repeats by external id or by position plus name"""
+    seen_ids = set()
+    seen_places = set()
+    merged = []
+    for batch in batches:
+        for restaurant in batch:
+            place = (round(restaurant['coordinates']['lat'], 4), round(restaurant['coordinates']['lon'], 4),
+                     restaurant['name'].strip().lower())
+            external_id = restaurant.get('external_id')
+            if (external_id and external_id in seen_ids) or place in seen_places:
+                continue
+            if external_id:
+                seen_ids.add(external_id)
+            seen_places.add(place)
+            merged.append(restaurant)
+    return merged
+
+
+async def fetch(params: Dict, priority: int = INTERACTIVE) -> Dict:
+    """One rate-limited Yandex call on the shared client; non-200 answers raise"""
+    try:
+        await yandex_bucket(YANDEX_API_KEY).acquire(priority)
+    except RateLimited:
+        YANDEX_REQUESTS.labels("rate_limited").inc()
+        raise
+    try:
+        response = await get_client().get(YANDEX_SEARCH_API, params=params)
+    except httpx.TimeoutException:
+        YANDEX_REQUESTS.labels("timeout").inc()
+        raise Exception("Yandex API timeout")
+    if response.status_code != 200:
+        YANDEX_REQUESTS.labels("error").inc()
+        logger.warning("Yandex API error: %s - %s", response.status_code, response.text)
+        raise Exception(f"Yandex API error: {response.status_code}")
+    YANDEX_REQUESTS.labels("ok").inc()
+    return response.json()
+
+
+async def search(russian_query: str, lat: float, lon: float, priority: int = INTERACTIVE) -> List[Dict]:
+    """The single classic query: 20 results in a fixed 0.05 degree box"""
+    params = base_params(QUERY_VARIANTS[0].format(russian_query), lat, lon, 0.05, 0.05, 20)
+    with stage("yandex_call"):
+        data = await fetch(params, priority)
+    return parse_restaurants(data, lat, lon)
+
+
+async def search_fanout(russian_query: str, lat: float, lon: float, radius: int,
+                        deadline: float = YANDEX_DEADLINE, priority: int = INTERACTIVE) -> List[Dict]:
+    """
+    Tiles x query variants, fetched concurrently and merged.
+
+    Calls are queued nearest tile first with the primary variant ahead of the
+    others, so a deadline cut keeps the most relevant results.
+    """
+    tiles = tile_circle(lat, lon, radius, YANDEX_TILE_KM, YANDEX_MAX_TILES)
+    tiles.sort(key=lambda tile: calculate_distance(lat, lon, tile[0], tile[1]))
+    calls = [base_params(variant.format(russian_query), t_lat, t_lon, span_lat, span_lon, YANDEX_RESULTS_PER_QUERY)
+             for variant in QUERY_VARIANTS
+             for t_lat, t_lon, span_lat, span_lon in tiles]
+
+    semaphore = asyncio.Semaphore(YANDEX_MAX_CONCURRENCY)
+
+    async def limited(params):
+        async with semaphore:
+            return await fetch(params, priority)
+
+    start = time.perf_counter()
+    tasks = [asyncio.create_task(limited(params)) for params in calls]
+    try:
+        with stage("yandex_call"):
+            done, pending = await asyncio.wait(tasks, timeout=deadline)
+    finally:
+        # Also reached when the caller itself is cancelled: never leave calls behind
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+    if pending:
+        YANDEX_REQUESTS.labels("cancelled").inc(len(pending))
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    # Merge in submission order so the nearest tiles and primary query win duplicates
+    batches, errors, limited_out = [], 0, 0
+    for task in tasks:
+        if task not in done:
+            continue
+        if task.exception() is not None:
+            errors += 1
+            limited_out += isinstance(task.exception(), RateLimited)
+            continue
+        batches.append([r for r in parse_restaurants(task.result(), lat, lon)
+                        if calculate_distance(lat, lon, r['coordinates']['lat'], r['coordinates']['lon']) <= radius / 1000])
+
+    if not batches and errors and limited_out == errors and not pending:
+        raise RateLimited("Yandex fan-out: every call was refused by the rate limiter")
+    if not batches:
+        raise Exception(f"Yandex fan-out failed: {errors} errors, {len(pending)} calls past the deadline")
+
+    restaurants = merge_restaurants(batches)
+    logger.info("Yandex fan-out: %d tiles x %d variants, %d ok, %d failed, %d cut at the deadline, "
+                "%d unique restaurants in %.0f ms", len(tiles), len(QUERY_VARIANTS), len(batches), errors,
+                len(pending), len(restaurants), (time.perf_counter() - start) * 1000)
+    return restaurants
@@ -0,0 +1,31 @@
+from sqlalchemy import text
+from app.database import engine, ensure_columns
+from app.services.dish_vocabulary import get_vocabulary
+
+def backfill_dish_ids():
+    """Resolve every distinct stored dish_name to its canonical dish_id"""
+    ensure_columns()
+    vocabulary = get_vocabulary()
+    
+    with engine.begin() as conn:
+        names = [row[0] for row in conn.execute(text(
+            "SELECT DISTINCT dish_name FROM restaurant_dishes WHERE dish_id IS NULL"
+        ))]
+        print(f"Resolving {len(names)} distinct dish names...")
+        
+        resolved = 0
+        for name in names:
+            dish_id = vocabulary.resolve(name)
+            if dish_id is None:
+                print(f" No canonical dish for '{name}'")
+                continue
+            conn.execute(
+                text("UPDATE restaurant_dishes SET dish_id = :dish_id WHERE dish_name = :name AND dish_id IS NULL"),
+                {"dish_id": dish_id, "name": name}
+            )
+            resolved += 1
+    
+    print(f"Backfilled {resolved}/{len(names)} dish names")
+
+if __name__ == "__main__":
+    backfill_dish_ids()
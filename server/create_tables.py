@@ -31,6 +31,7 @@ def create_tables_manual():
                     address TEXT NOT NULL,
                     latitude FLOAT NOT NULL,
                     longitude FLOAT NOT NULL,
+                    geo_cell INTEGER,
                     cuisine_type VARCHAR(100) DEFAULT 'Various',
                     phone_number VARCHAR(50) DEFAULT '',
                     opening_hours TEXT DEFAULT '',
@@ -49,16 +50,27 @@ def create_tables_manual():
                     id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
                     restaurant_id UUID NOT NULL REFERENCES restaurants(id) ON DELETE CASCADE,
                     dish_name VARCHAR(255) NOT NULL,
+                    dish_id VARCHAR(64),
+                    geo_cell INTEGER,
                     confidence_score FLOAT DEFAULT 0.8,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """))
             print(" Created 'restaurant_dishes' table")
             
+            # Tables created before the dish vocabulary lack the canonical dish id
+            conn.execute(text("ALTER TABLE restaurant_dishes ADD COLUMN IF NOT EXISTS dish_id VARCHAR(64)"))
+            # ...and the geo cell both tables are partitioned by (filled by partition_tables.py)
+            conn.execute(text("ALTER TABLE restaurants ADD COLUMN IF NOT EXISTS geo_cell INTEGER"))
+            conn.execute(text("ALTER TABLE restaurant_dishes ADD COLUMN IF NOT EXISTS geo_cell INTEGER"))
+            
             # Create indexes
             conn.execute(text("CREATE INDEX IF NOT EXISTS idx_restaurants_location ON restaurants(latitude, longitude)"))
             conn.execute(text("CREATE INDEX IF NOT EXISTS idx_restaurants_cuisine ON restaurants(cuisine_type)"))
             conn.execute(text("CREATE INDEX IF NOT EXISTS idx_restaurant_dishes_name ON restaurant_dishes(dish_name)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_restaurant_dishes_dish_id ON restaurant_dishes(dish_id)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_restaurants_geo_cell ON restaurants(geo_cell)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_restaurant_dishes_geo_cell ON restaurant_dishes(geo_cell)"))
             print("Created indexes")
             
             # Add some test data
@@ -71,14 +83,14 @@ def create_tables_manual():
             """))
             
             conn.execute(text("""
-                INSERT INTO restaurant_dishes (restaurant_id, dish_name, confidence_score) 
-                SELECT id, 'pizza', 0.9 FROM restaurants WHERE name = 'Test Pizza Place'
+                INSERT INTO restaurant_dishes (restaurant_id, dish_name, dish_id, confidence_score) 
+                SELECT id, 'pizza', 'pizza', 0.9 FROM restaurants WHERE name = 'Test Pizza Place'
                 ON CONFLICT DO NOTHING
             """))
             
             conn.execute(text("""
-                INSERT INTO restaurant_dishes (restaurant_id, dish_name, confidence_score) 
-                SELECT id, 'sushi', 0.95 FROM restaurants WHERE name = 'Sushi Garden'
+                INSERT INTO restaurant_dishes (restaurant_id, dish_name, dish_id, confidence_score) 
+                SELECT id, 'sushi', 'sushi', 0.95 FROM restaurants WHERE name = 'Sushi Garden'
                 ON CONFLICT DO NOTHING
             """))
             
@@ -0,0 +1,297 @@
+"""
+Bulk import of restaurants and their dishes from CSV, JSONL or GeoJSON.
+
+Input is parsed as a stream and loaded in batches: each batch is copied into
+temporary staging tables (Postgres `COPY`, plain inserts on the SQLite
+stand-in) and merged into `restaurants` / `restaurant_dishes` with a few
+set-based statements, so memory stays constant and re-running an import
+updates rows instead of duplicating them. Restaurants are matched on
+`external_id`; rows without one get a stable id derived from source, name
+and coordinates.
+
+Fields (CSV columns, JSON keys or GeoJSON properties): external_id, name,
+address, lat, lon (or a GeoJSON Point), cuisine, categories, phone, hours,
+rating, price_range, source, dishes (a list, or "|"-separated in CSV).
+"""
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+
+from sqlalchemy import text
+from app.services.cuisine import DEFAULT_CUISINE, get_classifier
+from app.services.dish_vocabulary import get_vocabulary
+from app.services.geo import geo_cell
+
+RESTAURANT_COLUMNS = ["id", "external_id", "name", "address", "latitude", "longitude", "geo_cell", "cuisine_type",
+                      "phone_number", "opening_hours", "rating", "price_range", "source", "created_at", "updated_at"]
+DISH_COLUMNS = ["id", "external_id", "dish_name", "dish_id", "confidence_score", "created_at"]
+
+# Update everything the source knows about; keep id and created_at
+UPDATED_COLUMNS = [c for c in RESTAURANT_COLUMNS if c not in ("id", "external_id", "created_at")]
+
+
+def iter_csv(f) -> Iterator[Dict]:
+    for row in csv.DictReader(f):
+        if row.get("dishes"):
+            row["dishes"] = row["dishes"].split("|")
+        if row.get("categories"):
+            row["categories"] = row["categories"].split("|")
+        yield row
+
+
+def iter_jsonl(f) -> Iterator[Dict]:
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_geojson(f, chunk_size: int = 1 << 16) -> Iterator[Dict]:
+    """Features of a FeatureCollection, decoded one at a time from the `features` array"""
+    decoder = json.JSONDecoder()
+    buffer, position, in_features = "", 0, False
+    while True:
+        chunk = f.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        if not in_features:
+            start = buffer.find('"features"')
+            bracket = buffer.find("[", start) if start >= 0 else -1
+            if bracket < 0:
+                if not chunk:
+                    return
+                continue
+            position, in_features = bracket + 1, True
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                feature, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                break  # the feature continues in the next chunk
+            position = end
+            properties = dict(feature.get("properties") or {})
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") == "Point":
+                properties["lon"], properties["lat"] = geometry["coordinates"][:2]
+            if feature.get("id") is not None:
+                properties.setdefault("external_id", str(feature["id"]))
+            yield properties
+        if not chunk:
+            if buffer[position:].strip():
+                raise ValueError("Truncated GeoJSON feature at end of file")
+            return
+
+
+READERS = {".csv": iter_csv, ".jsonl": iter_jsonl, ".ndjson": iter_jsonl,
+           ".geojson": iter_geojson, ".json": iter_geojson}
+
+
+def normalize_record(record: Dict, now: str) -> Tuple[Dict, List[Dict]]:
+    """One input record -> (restaurant row, dish rows), keyed by external_id"""
+    lat, lon = float(record["lat"]), float(record["lon"])
+    source = record.get("source") or "import"
+    name = record["name"].strip()
+    external_id = record.get("external_id") or "import:" + hashlib.sha1(
+        f"{source}|{name}|{lat:.4f}|{lon:.4f}".encode("utf-8")).hexdigest()
+
+    cuisine = record.get("cuisine")
+    if not cuisine:
+        cuisine = get_classifier().classify(record.get("categories") or [name])
+    restaurant = {
+        "id": str(uuid.uuid4()),
+        "external_id": external_id,
+        "name": name,
+        "address": record.get("address") or "",
+        "latitude": lat,
+        "longitude": lon,
+        "geo_cell": geo_cell(lat, lon),
+        "cuisine_type": cuisine or DEFAULT_CUISINE,
+        "phone_number": record.get("phone") or "",
+        "opening_hours": record.get("hours") or "",
+        "rating": float(record.get("rating") or 4.0),
+        "price_range": record.get("price_range") or "$$",
+        "source": source,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+    vocabulary = get_vocabulary()
+    dishes = []
+    for dish_name in record.get("dishes") or []:
+        dish_name = dish_name.strip()
+        if dish_name:
+            dishes.append({
+                "id": str(uuid.uuid4()),
+                "external_id": external_id,
+                "dish_name": dish_name,
+                "dish_id": vocabulary.resolve(dish_name),
+                "confidence_score": 0.8,
+                "created_at": now,
+            })
+    return restaurant, dishes
+
+
+class BulkLoader:
+    """Staging tables plus the set-based merge, on one raw DBAPI connection"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.postgres = engine.dialect.name == "postgresql"
+        self.conn = engine.raw_connection()
+
+    def _execute(self, sql: str) -> int:
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(sql)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def prepare(self):
+        """Temporary staging tables with the target tables' column types"""
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_restaurant_dishes_restaurant ON restaurant_dishes(restaurant_id)"))
+        self._drop_staging()
+        self._execute(f"CREATE TEMP TABLE import_restaurants AS SELECT {', '.join(RESTAURANT_COLUMNS)} "
+                      f"FROM restaurants WHERE 1 = 0")
+        self._execute("CREATE TEMP TABLE import_dishes AS SELECT rd.id, r.external_id, rd.dish_name, rd.dish_id, "
+                      "rd.confidence_score, rd.created_at FROM restaurant_dishes rd "
+                      "JOIN restaurants r ON r.id = rd.restaurant_id WHERE 1 = 0")
+        self.conn.commit()
+
+    def _copy(self, table: str, columns: List[str], rows: List[Dict]):
+        cursor = self.conn.cursor()
+        try:
+            if self.postgres:
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in rows:
+                    # COPY's CSV format reads an unquoted empty field as NULL
+                    writer.writerow(["" if row[c] is None else row[c] for c in columns])
+                buffer.seek(0)
+                cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+            else:
+                placeholders = ", ".join("?" for _ in columns)
+                cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                                   [tuple(row[c] for c in columns) for row in rows])
+        finally:
+            cursor.close()
+
+    def load_batch(self, restaurants: List[Dict], dishes: List[Dict]) -> Dict[str, int]:
+        """Stage one batch and merge it; committed as one transaction"""
+        try:
+            self._copy("import_restaurants", RESTAURANT_COLUMNS, restaurants)
+            self._copy("import_dishes", DISH_COLUMNS, dishes)
+            assignments = ", ".join(f"{c} = s.{c}" for c in UPDATED_COLUMNS)
+            updated = self._execute(
+                f"UPDATE restaurants SET {assignments} FROM import_restaurants s "
+                f"WHERE restaurants.external_id = s.external_id")
+            inserted = self._execute(
+                f"INSERT INTO restaurants ({', '.join(RESTAURANT_COLUMNS)}) "
+                f"SELECT {', '.join('s.' + c for c in RESTAURANT_COLUMNS)} FROM import_restaurants s "
+                f"WHERE NOT EXISTS (SELECT 1 FROM restaurants r WHERE r.external_id = s.external_id)")
+            dishes_inserted = self._execute(
+                "INSERT INTO restaurant_dishes (id, restaurant_id, dish_name, dish_id, geo_cell, confidence_score, created_at) "
+                "SELECT d.id, r.id, d.dish_name, d.dish_id, r.geo_cell, d.confidence_score, d.created_at "
+                "FROM import_dishes d JOIN restaurants r ON r.external_id = d.external_id "
+                "WHERE NOT EXISTS (SELECT 1 FROM restaurant_dishes rd WHERE rd.restaurant_id = r.id AND "
+                "(rd.dish_id = d.dish_id OR (d.dish_id IS NULL AND lower(rd.dish_name) = lower(d.dish_name))))")
+            self._execute("DELETE FROM import_restaurants")
+            self._execute("DELETE FROM import_dishes")
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return {"inserted": inserted, "updated": updated, "dishes": dishes_inserted}
+
+    def _drop_staging(self):
+        # Pooled connections keep their temp tables between checkouts
+        self._execute("DROP TABLE IF EXISTS import_restaurants")
+        self._execute("DROP TABLE IF EXISTS import_dishes")
+
+    def close(self):
+        try:
+            self.conn.rollback()
+            self._drop_staging()
+            self.conn.commit()
+        finally:
+            self.conn.close()
+
+
+def import_file(path: str, engine, batch_size: int = 50000, fmt: str = None, progress_every: int = 100000) -> Dict:
+    """Stream `path` into the database in batches; returns counts and throughput"""
+    fmt = fmt or os.path.splitext(path)[1].lower()
+    reader = READERS.get(fmt if fmt.startswith(".") else "." + fmt)
+    if reader is None:
+        raise ValueError(f"Unsupported input format '{fmt}' (use csv, jsonl or geojson)")
+
+    # A plain timestamp string is accepted by both COPY and SQLite
+    now = datetime.utcnow().isoformat(sep=" ")
+    totals = {"rows": 0, "skipped": 0, "inserted": 0, "updated": 0, "dishes": 0}
+    loader = BulkLoader(engine)
+    start = time.perf_counter()
+    next_report = progress_every
+
+    def flush(restaurants, dishes):
+        counts = loader.load_batch(list(restaurants.values()), list(dishes.values()))
+        for key, value in counts.items():
+            totals[key] += value
+
+    try:
+        loader.prepare()
+        # Dedup within the batch (last record for a restaurant wins); the merge handles repeats across batches
+        restaurants, dishes = {}, {}
+        with open(path, encoding="utf-8", newline="") as f:
+            for record in reader(f):
+                try:
+                    restaurant, restaurant_dishes = normalize_record(record, now)
+                except (KeyError, TypeError, ValueError) as e:
+                    totals["skipped"] += 1
+                    print(f" Skipping record {totals['rows'] + totals['skipped']}: {e!r}")
+                    continue
+                restaurants[restaurant["external_id"]] = restaurant
+                for dish in restaurant_dishes:
+                    dishes.setdefault((dish["external_id"], dish["dish_id"] or dish["dish_name"].lower()), dish)
+                totals["rows"] += 1
+                if len(restaurants) >= batch_size:
+                    flush(restaurants, dishes)
+                    restaurants, dishes = {}, {}
+                if totals["rows"] >= next_report:
+                    elapsed = time.perf_counter() - start
+                    print(f" {totals['rows']} rows, {totals['rows'] / elapsed:.0f} rows/s")
+                    next_report += progress_every
+        if restaurants:
+            flush(restaurants, dishes)
+    finally:
+        loader.close()
+
+    totals["seconds"] = round(time.perf_counter() - start, 2)
+    totals["rows_per_sec"] = round(totals["rows"] / max(totals["seconds"], 1e-9))
+    return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import restaurants from CSV, JSONL or GeoJSON")
+    parser.add_argument("path", type=str)
+    parser.add_argument("--format", type=str, default=None, help="csv, jsonl or geojson (default: from the extension)")
+    parser.add_argument("--batch_size", type=int, default=50000)
+    parser.add_argument("--progress_every", type=int, default=100000)
+    args = parser.parse_args()
+
+    from app.database import create_tables, engine, ensure_columns
+    import app.models.restaurant  # noqa: F401  (registers the tables for create_tables)
+    create_tables()
+    ensure_columns()
+    result = import_file(args.path, engine, args.batch_size, args.format, args.progress_every)
+    print(f"Imported {result['rows']} rows ({result['inserted']} new, {result['updated']} updated restaurants, "
+          f"{result['dishes']} dish links, {result['skipped']} skipped) in {result['seconds']}s, "
+          f"{result['rows_per_sec']} rows/s")
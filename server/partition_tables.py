@@ -0,0 +1,155 @@
+"""
+Assign geo cells to stored restaurants and (on Postgres) partition
+`restaurants` / `restaurant_dishes` by them.
+
+Every row gets `geo_cell` from its coordinates (GEO_CELL_DEG degrees per
+cell; dish rows copy their restaurant's cell). With --partition both tables
+are rebuilt as LIST partitions: one per cell holding at least --min_rows
+restaurants plus a DEFAULT partition for the rest, so nearby queries, which
+filter on the cells their radius overlaps, scan only those partitions. On an
+already partitioned table --partition instead moves busy cells out of the
+DEFAULT partition into their own.
+
+Partitioned tables need the partition key in their primary key and in every
+unique constraint, and cannot be the target of a foreign key. So the primary
+keys become (id, geo_cell), UNIQUE (external_id) becomes UNIQUE (external_id,
+geo_cell), and the restaurant_dishes -> restaurants foreign key is dropped.
+The database then only stops duplicate external ids within one cell, so
+uniqueness across cells is enforced on write. save_restaurants_to_db looks a
+restaurant up by external_id before inserting it. import_restaurants.py
+UPDATEs rows matched by external_id, which moves a relocated restaurant to
+its new partition, and inserts only ids that do not exist yet. A writer that
+inserted by (external_id, geo_cell) alone, e.g. ON CONFLICT on that pair,
+would leave a duplicate row when a restaurant moves to another cell. The
+original tables are kept as *_unpartitioned until you drop them.
+
+Once every row has a cell the gateway drops the `geo_cell IS NULL` branch of
+its cell filters (it would send every query to the DEFAULT partition as
+well). It checks at startup, so restart it after the first backfill.
+"""
+import argparse
+from typing import List
+
+from sqlalchemy import text
+from app.database import engine, ensure_columns
+from app.services.geo import GEO_CELL_DEG, geo_cell
+
+# Unique constraints of the original tables, rebuilt with the partition key added
+UNIQUE = {
+    "restaurants": ["external_id"],
+    "restaurant_dishes": [],
+}
+INDEXES = {
+    "restaurants": ["latitude, longitude", "cuisine_type"],  # external_id: covered by the unique index
+    "restaurant_dishes": ["restaurant_id", "dish_id", "dish_name"],
+}
+
+
+def backfill_cells(recompute: bool = False, batch_size: int = 10000):
+    """Fill geo_cell from the coordinates (all rows with --recompute after changing GEO_CELL_DEG)"""
+    where = "" if recompute else " WHERE geo_cell IS NULL"
+    with engine.begin() as conn:
+        rows = conn.execute(text(f"SELECT id, latitude, longitude FROM restaurants{where}")).fetchall()
+        print(f"Assigning {GEO_CELL_DEG}° cells to {len(rows)} restaurants...")
+        for start in range(0, len(rows), batch_size):
+            conn.execute(
+                text("UPDATE restaurants SET geo_cell = :cell WHERE id = :id"),
+                [{"cell": geo_cell(lat, lon), "id": row_id} for row_id, lat, lon in rows[start:start + batch_size]]
+            )
+        updated = conn.execute(text(
+            f"UPDATE restaurant_dishes SET geo_cell = (SELECT r.geo_cell FROM restaurants r "
+            f"WHERE r.id = restaurant_dishes.restaurant_id){where}"
+        )).rowcount
+        print(f"Copied cells to {updated} dish rows")
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :table)"
+    ), {"table": table}).scalar()
+
+
+def busy_cells(conn, table: str, min_rows: int) -> List[int]:
+    return [cell for cell, in conn.execute(text(
+        f"SELECT geo_cell FROM {table} GROUP BY geo_cell HAVING COUNT(*) >= :min_rows ORDER BY geo_cell"
+    ), {"min_rows": min_rows})]
+
+
+def partition_statements(table: str, cells: List[int]) -> List[str]:
+    """DDL rebuilding `table` as LIST partitions over `cells` plus DEFAULT"""
+    new = f"{table}_partitioned"
+    statements = [
+        f"CREATE TABLE {new} (LIKE {table} INCLUDING DEFAULTS) PARTITION BY LIST (geo_cell)",
+        f"ALTER TABLE {new} ALTER COLUMN geo_cell SET NOT NULL",
+        f"ALTER TABLE {new} ADD PRIMARY KEY (id, geo_cell)",
+    ]
+    statements += [f"CREATE TABLE {table}_cell_{cell} PARTITION OF {new} FOR VALUES IN ({cell})" for cell in cells]
+    statements.append(f"CREATE TABLE {table}_cell_default PARTITION OF {new} DEFAULT")
+    statements += [f"ALTER TABLE {new} ADD UNIQUE ({columns}, geo_cell)" for columns in UNIQUE[table]]
+    statements += [f"CREATE INDEX ON {new} ({columns})" for columns in INDEXES[table]]
+    statements += [
+        f"INSERT INTO {new} SELECT * FROM {table}",
+        f"ALTER TABLE {table} RENAME TO {table}_unpartitioned",
+        f"ALTER TABLE {new} RENAME TO {table}",
+    ]
+    return statements
+
+
+def split_default_statements(table: str, cells: List[int]) -> List[str]:
+    """Move cells that outgrew the DEFAULT partition into partitions of their own"""
+    statements = []
+    for cell in cells:
+        partition = f"{table}_cell_{cell}"
+        statements += [
+            f"CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)",
+            f"INSERT INTO {partition} SELECT * FROM {table}_cell_default WHERE geo_cell = {cell}",
+            f"DELETE FROM {table}_cell_default WHERE geo_cell = {cell}",
+            f"ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES IN ({cell})",
+        ]
+    return statements
+
+
+def partition_tables(min_rows: int, dry_run: bool = False):
+    if engine.dialect.name != "postgresql":
+        print(f"Partitioning needs Postgres (connected to {engine.dialect.name}); geo cells are assigned")
+        return
+
+    with engine.connect() as conn:
+        statements = []
+        cells_only = is_partitioned(conn, "restaurants")
+        if cells_only:
+            cells = busy_cells(conn, "restaurants_cell_default", min_rows)
+            print(f"{len(cells)} cells in the DEFAULT partition now have at least {min_rows} restaurants")
+            for table in ("restaurants", "restaurant_dishes"):
+                statements += split_default_statements(table, cells)
+        else:
+            cells = busy_cells(conn, "restaurants", min_rows)
+            print(f"{len(cells)} cells with at least {min_rows} restaurants")
+            statements.append("ALTER TABLE restaurant_dishes DROP CONSTRAINT IF EXISTS restaurant_dishes_restaurant_id_fkey")
+            for table in ("restaurants", "restaurant_dishes"):
+                statements += partition_statements(table, cells)
+
+        for statement in statements:
+            print(f" {statement}")
+            if not dry_run:
+                conn.execute(text(statement))
+        if not dry_run:
+            conn.commit()
+
+    if not dry_run and statements and not cells_only:
+        print("Done. Drop restaurants_unpartitioned / restaurant_dishes_unpartitioned once verified.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Assign geo cells and partition restaurant tables by them")
+    parser.add_argument("--recompute", action="store_true", help="Recompute every cell (after changing GEO_CELL_DEG)")
+    parser.add_argument("--partition", action="store_true", help="Create LIST partitions (Postgres only)")
+    parser.add_argument("--min_rows", type=int, default=1000, help="Restaurants a cell needs for its own partition")
+    parser.add_argument("--dry_run", action="store_true", help="Print the partitioning DDL without running it")
+    args = parser.parse_args()
+
+    ensure_columns()
+    backfill_cells(args.recompute)
+    if args.partition:
+        partition_tables(args.min_rows, args.dry_run)
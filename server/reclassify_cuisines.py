@@ -0,0 +1,67 @@
+import argparse
+import glob
+import json
+from datetime import datetime
+from sqlalchemy import text
+from app.database import engine
+from app.services.cuisine import DEFAULT_CUISINE, get_classifier
+
+def load_recorded_categories(directory: str) -> dict:
+    """external_id -> category names from recorded Yandex responses (*.json FeatureCollections)"""
+    categories = {}
+    for path in sorted(glob.glob(f"{directory}/*.json")):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        for feature in data.get('features', []):
+            company_meta = feature.get('properties', {}).get('CompanyMetaData', {})
+            names = [c.get('name', '') for c in company_meta.get('Categories', [])]
+            if feature.get('id') and names:
+                categories[feature['id']] = names
+    return categories
+
+def reclassify_cuisines(responses_dir: str = None, dry_run: bool = False):
+    """
+    Re-derive restaurants.cuisine_type with the current taxonomy.
+
+    Rows found in recorded Yandex responses are classified from their real
+    categories. Other rows only have a name and the old label, so they are
+    upgraded from "Various" when the name itself names a cuisine ("Суши Wok").
+    """
+    classifier = get_classifier()
+    recorded = load_recorded_categories(responses_dir) if responses_dir else {}
+    print(f"Loaded categories for {len(recorded)} recorded businesses")
+
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, external_id, name, cuisine_type FROM restaurants")).fetchall()
+        print(f"Checking {len(rows)} restaurants...")
+
+        changes = {}
+        for row_id, external_id, name, cuisine_type in rows:
+            if external_id in recorded:
+                cuisine = classifier.classify(recorded[external_id])
+            elif cuisine_type in (None, "", DEFAULT_CUISINE):
+                cuisine = classifier.classify([name or ""])
+            else:
+                continue
+            if cuisine != cuisine_type:
+                changes.setdefault((cuisine_type, cuisine), []).append(row_id)
+
+        now = datetime.utcnow()
+        for (old, new), ids in sorted(changes.items(), key=lambda item: -len(item[1])):
+            print(f" {old} -> {new}: {len(ids)} rows")
+            if not dry_run:
+                conn.execute(
+                    # updated_at so the gateways' restaurant index picks the change up
+                    text("UPDATE restaurants SET cuisine_type = :cuisine, updated_at = :now WHERE id = :id"),
+                    [{"cuisine": new, "now": now, "id": row_id} for row_id in ids]
+                )
+
+    total = sum(len(ids) for ids in changes.values())
+    print(f"{'Would update' if dry_run else 'Updated'} {total} restaurants")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-classify stored restaurant cuisines")
+    parser.add_argument("--responses", type=str, default=None, help="Directory of recorded Yandex JSON responses")
+    parser.add_argument("--dry_run", action="store_true")
+    args = parser.parse_args()
+    reclassify_cuisines(args.responses, args.dry_run)
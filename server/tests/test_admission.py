@@ -0,0 +1,100 @@
+"""Admission control: per-class limits, priority hand-off and fast rejections"""
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.admission import AdmissionController, AdmissionMiddleware, Rejected, RouteClass  # noqa: E402
+
+
+def make_controller(total_limit=10, **limits):
+    return AdmissionController([
+        RouteClass("cheap", 0, limits.get("cheap", 10), 10, 1.0),
+        RouteClass("expensive", 2, limits.get("expensive", 1), 1, 0.05),
+    ], total_limit=total_limit)
+
+
+def test_full_queue_gets_429_and_expired_wait_gets_503():
+    async def scenario():
+        controller = make_controller()
+        await controller.acquire("expensive")
+        waiting = asyncio.create_task(controller.acquire("expensive"))
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as full:
+            await controller.acquire("expensive")
+        assert full.value.status == 429 and full.value.retry_after >= 1
+        with pytest.raises(Rejected) as expired:
+            await waiting
+        assert expired.value.status == 503
+        # Other classes are unaffected by the saturated one
+        await asyncio.wait_for(controller.acquire("cheap"), 0.1)
+        assert controller.running == {"cheap": 1, "expensive": 1}
+
+    asyncio.run(scenario())
+
+
+def test_freed_slot_goes_to_the_cheaper_class():
+    async def scenario():
+        controller = make_controller(total_limit=1, expensive=2)
+        await controller.acquire("expensive")
+        order = []
+
+        async def wait(name):
+            await controller.acquire(name)
+            order.append(name)
+
+        expensive = asyncio.create_task(wait("expensive"))
+        await asyncio.sleep(0)
+        cheap = asyncio.create_task(wait("cheap"))
+        await asyncio.sleep(0)
+        controller.release("expensive", 0.01)
+        await cheap
+        assert order == ["cheap"] and not expensive.done()
+        controller.release("cheap", 0.01)
+        await expensive
+        assert order == ["cheap", "expensive"]
+
+    asyncio.run(scenario())
+
+
+def test_middleware_rejects_with_retry_after_but_never_sheds_health():
+    app = FastAPI()
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    @app.get("/api/food/recognize")
+    async def recognize():
+        return {}
+
+    controller = AdmissionController([RouteClass("expensive", 2, 0, 0, 0.1)])
+    app.add_middleware(AdmissionMiddleware, routes=app.router.routes, controller=controller,
+                       route_classes={"/api/food/recognize": "expensive"}, enabled=True)
+    client = TestClient(app)
+    response = client.get("/api/food/recognize")
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+    assert client.get("/health").status_code == 200
+
+
+def test_rejections_from_the_gateway_carry_cors_headers(monkeypatch):
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    os.environ.setdefault("ALLOWED_ORIGINS", "http://localhost:8081")
+    from app import admission
+    from app.main import allowed_origins, app
+
+    async def reject(name):
+        raise Rejected(429, "queue full", 2)
+
+    monkeypatch.setattr(admission.default_controller, "acquire", reject)
+    origin = allowed_origins[0]
+    response = TestClient(app).get("/api/food/dishes", headers={"Origin": origin})
+    assert response.status_code == 429
+    assert response.headers["access-control-allow-origin"] == origin
+    assert "retry-after" in response.headers["access-control-expose-headers"].lower()
@@ -0,0 +1,25 @@
+"""Cuisine classification of Yandex category names"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.cuisine import get_classifier  # noqa: E402
+
+
+@pytest.mark.parametrize("categories, cuisine", [
+    (["Белорусская кухня"], "Belarusian"),
+    (["Китайская кухня"], "Chinese"),
+    (["Тайская кухня"], "Thai"),
+    (["Пиццерия", "Ресторан"], "Italian"),
+    (["Бургерная", "Итальянская кухня"], "Italian"),
+    (["Суши-бар", "Паназиатская кухня"], "Pan-Asian"),
+    (["Бистро", "Суши-бар"], "Japanese"),
+    (["Вокзал"], "Various"),
+    (["Такой ресторан"], "Various"),
+    (["Кафе"], "Various"),
+])
+def test_classify(categories, cuisine):
+    assert get_classifier().classify(categories) == cuisine
@@ -0,0 +1,98 @@
+"""Replica routing (read-your-writes, lag and failover) and geo cells, on SQLite stand-ins"""
+import os
+import sys
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import database  # noqa: E402
+from app.database import Base, ReplicaSet, RoutingSession, read_cells, use_primary  # noqa: E402
+from app.models.restaurant import Restaurant  # noqa: E402
+from app.services.geo import cells_in_radius, geo_cell  # noqa: E402
+
+
+def make_db(path, name):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(Restaurant(name=name, address="", latitude=55.75, longitude=37.61))
+        db.commit()
+    return engine
+
+
+@pytest.fixture
+def databases(tmp_path):
+    primary = make_db(tmp_path / "primary.db", "on primary")
+    replicas = ReplicaSet([make_db(tmp_path / "replica.db", "on replica")], max_lag=5, check_interval=0, pin_seconds=60)
+    return primary, replicas, sessionmaker(class_=RoutingSession, primary=primary, replicas=replicas)
+
+
+def names(db):
+    return sorted(r.name for r in db.query(Restaurant).all())
+
+
+def test_reads_go_to_replica_and_writes_to_primary(databases):
+    primary, replicas, Session = databases
+    with Session() as db:
+        assert names(db) == ["on replica"]
+        db.add(Restaurant(name="new", address="", latitude=55.0, longitude=37.0))
+        db.commit()
+        use_primary(db)
+        assert names(db) == ["new", "on primary"]
+    with Session() as db:
+        assert names(db) == ["on replica"]
+
+
+def test_recently_written_cells_read_from_primary(databases):
+    primary, replicas, Session = databases
+    cell = geo_cell(55.75, 37.61)
+    replicas.mark_written([cell])
+    with Session() as db:
+        read_cells(db, [cell])
+        assert names(db) == ["on primary"]
+    with Session() as db:
+        read_cells(db, [cell + 1])
+        assert names(db) == ["on replica"]
+
+
+def test_lagging_or_failed_replicas_fall_back_to_primary(databases, tmp_path):
+    primary, replicas, Session = databases
+    replica = replicas.replicas[0]
+    replicas.check_interval = 3600
+    replica.lag, replica.checked_at = 30.0, time.monotonic()
+    with Session() as db:
+        assert names(db) == ["on primary"]
+
+    broken = ReplicaSet([create_engine(f"sqlite:///{tmp_path}/missing/replica.db")], check_interval=0)
+    with sessionmaker(class_=RoutingSession, primary=primary, replicas=broken)() as db:
+        assert names(db) == ["on primary"]
+    assert broken.replicas[0].down_until > time.monotonic()
+
+
+def test_radius_cells_cover_the_circle():
+    cells = cells_in_radius(55.99, 37.99, 5000, cell_deg=1.0)
+    # Moscow's north-east corner of a 1° cell: the 5 km circle spills into the neighbours
+    assert geo_cell(55.99, 37.99, 1.0) in cells
+    assert geo_cell(56.03, 38.03, 1.0) in cells
+    assert len(cells) == 4
+    assert cells_in_radius(55.5, 37.5, 5000, cell_deg=1.0) == [geo_cell(55.5, 37.5, 1.0)]
+
+
+def test_null_cells_are_only_matched_until_the_backfill(tmp_path, monkeypatch):
+    engine = make_db(tmp_path / "cells.db", "no cell")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE restaurants SET geo_cell = NULL")
+    monkeypatch.setattr(database, "GEO_CELLS_BACKFILLED", None)
+    monkeypatch.setattr(database, "cells_backfilled", False)
+    assert database.detect_cell_backfill(engine) is False
+    assert "IS NULL" in str(database.in_cells(Restaurant.geo_cell, [1, 2]))
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("UPDATE restaurants SET geo_cell = 7")
+    assert database.detect_cell_backfill(engine) is True
+    assert "IS NULL" not in str(database.in_cells(Restaurant.geo_cell, [1, 2]))
@@ -0,0 +1,29 @@
+"""Dish vocabulary resolution: exact aliases, full-alias token matches and typo fallback"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.dish_vocabulary import get_vocabulary  # noqa: E402
+
+
+@pytest.mark.parametrize("query, dish_id", [
+    ("beef carpaccio", "beef_carpaccio"),
+    ("pizza margherita", "pizza"),
+    ("пиццу", "pizza"),
+    ("sushi rolls", "sushi"),
+    ("hot dogs", "hot_dog"),
+    ("caesar salad", "caesar_salad"),
+    ("beef carpacio", "beef_carpaccio"),
+    ("soup", "soup"),
+])
+def test_resolves(query, dish_id):
+    assert get_vocabulary().resolve(query) == dish_id
+
+
+@pytest.mark.parametrize("query", ["rice", "cream", "chicken soup", "noodles", "pie", "chicken"])
+def test_partial_or_ambiguous_queries_stay_unresolved(query):
+    assert get_vocabulary().resolve(query) is None
+    assert get_vocabulary().search_term(query) == query
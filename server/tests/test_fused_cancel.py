@@ -0,0 +1,64 @@
+"""Cancelling speculative fused searches from another gateway worker"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.database import Base  # noqa: E402
+from app.routes import food  # noqa: E402
+from app.services import fused_cancel  # noqa: E402
+
+
+def shared_store(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fused.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(fused_cancel, "SessionLocal", sessionmaker(bind=engine))
+
+
+def test_cancel_rows_narrow_and_disappear(tmp_path, monkeypatch):
+    shared_store(tmp_path, monkeypatch)
+    fused_cancel.register("r1", ["pizza", "sushi", "ramen"])
+    assert fused_cancel.requested_keep("r1") is None
+    assert fused_cancel.request_cancel("r1", ["sushi", "ramen"]) == ["pizza"]
+    # A later cancel cannot bring pizza back
+    assert fused_cancel.request_cancel("r1", ["pizza", "ramen"]) == ["pizza", "sushi"]
+    assert fused_cancel.requested_keep("r1") == ["ramen"]
+    fused_cancel.unregister("r1")
+    assert fused_cancel.request_cancel("r1", []) is None
+
+
+def test_stream_stops_searches_cancelled_on_another_worker(tmp_path, monkeypatch):
+    shared_store(tmp_path, monkeypatch)
+    monkeypatch.setattr(fused_cancel, "FUSED_CANCEL_POLL_SECONDS", 0.05)
+
+    async def call_ml_service(image_data, filename, content_type, top_k=5):
+        return {"predictions": [{"food_name": "pizza", "confidence": 0.6}, {"food_name": "sushi", "confidence": 0.3}]}
+
+    async def search_for_dish(dish, lat, lon, radius):
+        await asyncio.sleep(5 if dish == "pizza" else 0.1)
+        # The cancel endpoint as served by a worker that does not hold the tasks
+        request_id = next(iter(food.fused_searches))
+        await asyncio.to_thread(fused_cancel.request_cancel, request_id, ["sushi"])
+        return {"dish": dish, "restaurants": []}
+
+    monkeypatch.setattr(food, "call_ml_service", call_ml_service)
+    monkeypatch.setattr(food, "search_for_dish", search_for_dish)
+    app = FastAPI()
+    app.include_router(food.router)
+
+    start = time.monotonic()
+    response = TestClient(app).post("/recognize-and-find", files={"image": ("a.jpg", b"jpeg", "image/jpeg")})
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert time.monotonic() - start < 2
+    assert [e["event"] for e in events] == ["recognition", "restaurants", "cancelled", "done"]
+    assert events[2]["data"] == {"dish": "pizza"}
+    assert food.fused_searches == {}
@@ -0,0 +1,76 @@
+"""Bulk importer on the SQLite stand-in: streaming readers, staging merge and re-import"""
+import json
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.database import Base  # noqa: E402
+import app.models.restaurant  # noqa: E402,F401
+from import_restaurants import import_file, iter_geojson  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'import.db'}")
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def counts(engine):
+    with engine.connect() as conn:
+        return (conn.execute(text("SELECT COUNT(*) FROM restaurants")).scalar(),
+                conn.execute(text("SELECT COUNT(*) FROM restaurant_dishes")).scalar())
+
+
+def test_csv_import_merges_on_reimport(engine, tmp_path):
+    path = tmp_path / "restaurants.csv"
+    rows = ["external_id,name,address,lat,lon,cuisine,rating,dishes"]
+    rows += [f"ext-{i},Place {i},Street {i},55.7{i % 10},37.6{i % 7},,4.{i % 10},pizza|пицца|sushi"
+             for i in range(25)]
+    path.write_text("\n".join(rows) + "\n", encoding="utf-8")
+
+    result = import_file(str(path), engine, batch_size=10)
+    assert (result["rows"], result["inserted"], result["updated"]) == (25, 25, 0)
+    # "pizza" and "пицца" are the same canonical dish
+    assert counts(engine) == (25, 50)
+
+    result = import_file(str(path), engine, batch_size=7)
+    assert (result["inserted"], result["updated"], result["dishes"]) == (0, 25, 0)
+    assert counts(engine) == (25, 50)
+
+
+def test_jsonl_and_geojson_imports(engine, tmp_path):
+    jsonl = tmp_path / "restaurants.jsonl"
+    jsonl.write_text("\n".join(json.dumps({
+        "name": f"Суши {i}", "lat": 55.75, "lon": 37.61 + i / 1000, "dishes": ["ramen"],
+    }, ensure_ascii=False) for i in range(3)) + "\n{\"name\": \"no coordinates\"}\n", encoding="utf-8")
+    result = import_file(str(jsonl), engine)
+    assert (result["rows"], result["skipped"]) == (3, 1)
+
+    geojson = tmp_path / "restaurants.geojson"
+    geojson.write_text(json.dumps({"type": "FeatureCollection", "features": [
+        {"type": "Feature", "id": f"geo-{i}", "geometry": {"type": "Point", "coordinates": [37.6, 55.7 + i / 100]},
+         "properties": {"name": f"Trattoria {i}", "categories": ["Итальянская кухня"], "dishes": ["pasta"]}}
+        for i in range(4)
+    ]}), encoding="utf-8")
+    result = import_file(str(geojson), engine)
+    assert result["inserted"] == 4
+    assert counts(engine) == (7, 7)
+    with engine.connect() as conn:
+        cuisines = {row[0] for row in conn.execute(text("SELECT cuisine_type FROM restaurants WHERE source = 'import'"))}
+    assert {"Japanese", "Italian"} <= cuisines
+
+
+def test_geojson_reader_spans_chunk_boundaries(tmp_path):
+    path = tmp_path / "big.geojson"
+    features = [{"type": "Feature", "id": i, "geometry": {"type": "Point", "coordinates": [37.0, 55.0]},
+                 "properties": {"name": "x" * (i % 50)}} for i in range(200)]
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}), encoding="utf-8")
+    with open(path, encoding="utf-8") as f:
+        parsed = list(iter_geojson(f, chunk_size=64))
+    assert [p["external_id"] for p in parsed] == [str(i) for i in range(200)]
@@ -0,0 +1,93 @@
+"""Gateway-side downscaling and the compact /predict/raw exchange"""
+import asyncio
+import io
+import json
+import os
+import sys
+
+import httpx
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import ml_client  # noqa: E402
+
+
+def jpeg(width=1600, height=1200) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 120, 40)).save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def test_raw_transport_sends_model_sized_rgb():
+    body, content_type, headers = ml_client.prepare_image(jpeg(), 224, "raw")
+    assert content_type == "application/octet-stream"
+    assert headers == {"X-Image-Width": "224", "X-Image-Height": "224"}
+    assert len(body) == 224 * 224 * 3
+
+
+def test_jpeg_transport_is_smaller_than_the_upload():
+    original = jpeg()
+    body, content_type, _ = ml_client.prepare_image(original, 224, "jpeg")
+    assert content_type == "image/jpeg"
+    assert Image.open(io.BytesIO(body)).size == (224, 224)
+    assert len(body) < len(original)
+
+
+def test_recognize_expands_compact_answer(monkeypatch):
+    seen = {}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen["path"] = request.url.path
+        seen["length"] = len(request.content)
+        seen["width"] = request.headers.get("x-image-width")
+        return httpx.Response(200, content=json.dumps({
+            "model": "efficientnet_v2_s", "model_version": "v1", "image_size": 256,
+            "predictions": [[76, "pizza", 0.9], [55, "hot_dog", 0.05]],
+        }))
+
+    client = httpx.AsyncClient(base_url="http://ml", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ml_client, "_client", client)
+    monkeypatch.setattr(ml_client, "ML_INPUT_SIZE", 0)
+    monkeypatch.setattr(ml_client, "_input_size", {"size": 224, "checked_at": float("inf")})
+
+    result = asyncio.run(ml_client.recognize(jpeg(), "a.jpg", "image/jpeg", top_k=2, transport="raw"))
+    assert seen == {"path": "/predict/raw", "length": 224 * 224 * 3, "width": "224"}
+    assert result["top_prediction"]["food_name"] == "pizza"
+    assert result["predictions"][1]["description"] == "This appears to be hot dog"
+    # The service reported another resolution; the next request follows it
+    assert ml_client._input_size["size"] == 256
+
+
+def test_undecodable_upload_is_a_client_error(monkeypatch):
+    monkeypatch.setattr(ml_client, "ML_INPUT_SIZE", 224)
+    try:
+        asyncio.run(ml_client.recognize(b"not an image", "a.jpg", "image/jpeg", transport="raw"))
+    except ml_client.MLServiceError as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("expected MLServiceError")
+
+
+def test_input_size_is_only_cached_from_a_healthy_answer(monkeypatch):
+    answers = [
+        httpx.Response(503, content=b"<html>upstream unavailable</html>"),
+        httpx.Response(200, content=json.dumps({"status": "unhealthy", "image_size": None})),
+        httpx.Response(200, content=json.dumps({"status": "healthy", "image_size": 288})),
+    ]
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return answers[len(calls) - 1]
+
+    client = httpx.AsyncClient(base_url="http://ml", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(ml_client, "_client", client)
+    monkeypatch.setattr(ml_client, "ML_INPUT_SIZE", 0)
+    monkeypatch.setattr(ml_client, "_input_size", {"size": 0, "checked_at": 0.0})
+
+    async def sizes():
+        return [await ml_client.input_size() for _ in range(4)]
+    # Default while the service is down or loading, then the reported size, cached
+    assert asyncio.run(sizes()) == [ml_client.DEFAULT_INPUT_SIZE, ml_client.DEFAULT_INPUT_SIZE, 288, 288]
+    assert len(calls) == 3
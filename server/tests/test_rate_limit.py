@@ -0,0 +1,95 @@
+"""Token bucket admission, priorities and quota"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.rate_limit import BACKGROUND, INTERACTIVE, RateLimited, TokenBucket  # noqa: E402
+
+
+def test_burst_is_admitted_then_calls_are_refused():
+    async def scenario():
+        bucket = TokenBucket("test", rate=1, burst=3)
+        for _ in range(3):
+            await bucket.acquire(INTERACTIVE, timeout=0.01)
+        with pytest.raises(RateLimited):
+            await bucket.acquire(INTERACTIVE, timeout=0.05)
+    asyncio.run(scenario())
+
+
+def test_waiting_caller_gets_the_next_token():
+    async def scenario():
+        bucket = TokenBucket("test", rate=20, burst=1)
+        await bucket.acquire(INTERACTIVE, timeout=0.01)
+        start = time.monotonic()
+        await bucket.acquire(INTERACTIVE, timeout=1.0)
+        return time.monotonic() - start
+    assert 0.02 < asyncio.run(scenario()) < 0.5
+
+
+def test_background_cannot_drain_the_reserve():
+    async def scenario():
+        bucket = TokenBucket("test", rate=0.01, burst=3, reserve=2)
+        await bucket.acquire(BACKGROUND, timeout=0.01)
+        with pytest.raises(RateLimited):
+            await bucket.acquire(BACKGROUND, timeout=0.05)
+        # Interactive calls may still use the reserved tokens
+        await bucket.acquire(INTERACTIVE, timeout=0.01)
+        await bucket.acquire(INTERACTIVE, timeout=0.01)
+    asyncio.run(scenario())
+
+
+def test_interactive_waiters_go_first():
+    async def scenario():
+        bucket = TokenBucket("test", rate=20, burst=1)
+        await bucket.acquire(INTERACTIVE, timeout=0.01)
+        order = []
+
+        async def call(priority, label):
+            await bucket.acquire(priority, timeout=2.0)
+            order.append(label)
+
+        background = asyncio.create_task(call(BACKGROUND, "background"))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(call(INTERACTIVE, "interactive"))
+        await asyncio.gather(background, interactive)
+        return order
+    assert asyncio.run(scenario()) == ["interactive", "background"]
+
+
+def test_daily_quota():
+    async def scenario():
+        bucket = TokenBucket("test", rate=100, burst=100, daily_quota=2)
+        await bucket.acquire(INTERACTIVE)
+        await bucket.acquire(INTERACTIVE)
+        with pytest.raises(RateLimited, match="quota"):
+            await bucket.acquire(INTERACTIVE)
+    asyncio.run(scenario())
+
+
+def test_waiters_reserve_quota_and_return_it_on_timeout_or_cancel():
+    async def scenario():
+        bucket = TokenBucket("test", rate=20, burst=1, daily_quota=3)
+        await bucket.acquire(INTERACTIVE, timeout=0.01)
+        # Two callers queue for the next token; the remaining slot is theirs, so a third is refused up front
+        first = asyncio.create_task(bucket.acquire(INTERACTIVE, timeout=1.0))
+        second = asyncio.create_task(bucket.acquire(INTERACTIVE, timeout=1.0))
+        await asyncio.sleep(0)
+        assert bucket.quota_used == 3
+        with pytest.raises(RateLimited, match="quota"):
+            await bucket.acquire(INTERACTIVE, timeout=1.0)
+        second.cancel()
+        await first
+        with pytest.raises(asyncio.CancelledError):
+            await second
+        assert bucket.quota_used == 2
+        # Timing out gives the slot back as well
+        bucket.tokens, bucket.rate = 0, 0.001
+        with pytest.raises(RateLimited, match="rate limit"):
+            await bucket.acquire(INTERACTIVE, timeout=0.02)
+        assert bucket.quota_used == 2
+    asyncio.run(scenario())
@@ -0,0 +1,56 @@
+"""Stale-while-revalidate queue: dedup per tile, batching and off-peak windows"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.rate_limit import RateLimited  # noqa: E402
+from app.services.refresher import Refresher  # noqa: E402
+
+
+def make_refresher(refresh=None, **kwargs):
+    async def noop(job):
+        return 0
+    return Refresher(refresh or noop, batch_size=2, tile_deg=0.02, **kwargs)
+
+
+def test_tile_is_queued_once_per_window():
+    refresher = make_refresher()
+    assert refresher.enqueue("pizza", 55.751, 37.611, 5000)
+    # Same dish (another spelling) in the same tile
+    assert not refresher.enqueue("Pizza", 55.752, 37.612, 5000)
+    assert refresher.enqueue("sushi", 55.751, 37.611, 5000)
+    assert refresher.enqueue("pizza", 55.90, 37.611, 5000)
+    assert len(refresher.queue) == 3
+
+
+def test_batches_and_rate_limited_requeue():
+    calls = []
+
+    async def refresh(job):
+        calls.append(job.dish)
+        if job.dish == "ramen":
+            raise RateLimited("no budget")
+        return 3
+
+    refresher = make_refresher(refresh)
+    for dish in ["pizza", "sushi", "ramen", "steak"]:
+        refresher.enqueue(dish, 55.75, 37.61, 5000)
+
+    assert asyncio.run(refresher.run_batch()) == 2
+    assert calls == ["pizza", "sushi"]
+    # The rate-limited job stays at the front of the queue
+    assert asyncio.run(refresher.run_batch()) == 0
+    assert list(job.dish for job in refresher.queue.values()) == ["ramen", "steak"]
+
+
+def test_staleness_and_offpeak_window():
+    refresher = make_refresher(max_age_hours=24, offpeak_hours="22-5")
+    assert refresher.is_stale(None)
+    assert refresher.is_stale(datetime.utcnow() - timedelta(hours=25))
+    assert not refresher.is_stale(datetime.utcnow() - timedelta(hours=1))
+    assert refresher.in_offpeak(datetime(2024, 1, 1, 23))
+    assert refresher.in_offpeak(datetime(2024, 1, 1, 3))
+    assert not refresher.in_offpeak(datetime(2024, 1, 1, 12))
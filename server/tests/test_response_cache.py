@@ -0,0 +1,91 @@
+"""Response cache: stored hits, ETag revalidation, compression and opt-outs"""
+import gzip
+import os
+import sys
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.response_cache import (  # noqa: E402
+    CachePolicy, CompactJSONResponse, ResponseCache, ResponseCacheMiddleware, normalize_query,
+)
+
+
+def make_client(cache=None):
+    app = FastAPI()
+    calls = {"items": 0}
+
+    @app.get("/items")
+    async def items(n: int = 3, degraded: bool = False):
+        calls["items"] += 1
+        headers = {"Cache-Control": "no-store"} if degraded else None
+        return CompactJSONResponse({"items": [{"id": i, "name": f"item {i}"} for i in range(n)]}, headers=headers)
+
+    @app.get("/missing")
+    async def missing():
+        return CompactJSONResponse({"detail": "nope"}, status_code=404)
+
+    cache = cache or ResponseCache()
+    app.add_middleware(ResponseCacheMiddleware, routes=app.router.routes, cache=cache, enabled=True, policies={
+        "/items": CachePolicy("public, max-age=30", 30),
+        "/missing": CachePolicy("public, max-age=30", 30),
+    })
+    return TestClient(app), calls, cache
+
+
+def test_equivalent_queries_share_one_entry():
+    assert normalize_query(b"lon=37.60&lat=55.7") == normalize_query(b"lat=55.70&lon=37.6")
+    client, calls, _ = make_client()
+    first = client.get("/items?n=3")
+    second = client.get("/items?n=3.0")
+    assert first.json() == second.json()
+    assert calls["items"] == 1
+    assert (first.headers["x-cache"], second.headers["x-cache"]) == ("MISS", "HIT")
+    assert first.headers["cache-control"] == "public, max-age=30"
+
+
+def test_matching_etag_gets_304_without_body():
+    client, _, _ = make_client()
+    etag = client.get("/items").headers["etag"]
+    revalidated = client.get("/items", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    assert client.get("/items", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_large_bodies_are_gzipped_once_and_share_the_etag():
+    client, _, cache = make_client()
+    plain = client.get("/items?n=200", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/items?n=200", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.json() == plain.json()
+    assert compressed.headers["etag"] != plain.headers["etag"]
+    # The compressed variant's tag still revalidates the same body
+    assert client.get("/items?n=200", headers={"If-None-Match": compressed.headers["etag"]}).status_code == 304
+    entry = next(iter(cache.entries.values()))
+    assert len(gzip.decompress(entry.encoded["gzip"])) == len(entry.body)
+    assert cache.bytes == entry.size
+    # Small bodies go out as they are
+    assert "content-encoding" not in client.get("/items?n=1", headers={"Accept-Encoding": "gzip"}).headers
+
+
+def test_errors_and_no_store_responses_are_not_cached():
+    client, calls, cache = make_client()
+    assert client.get("/missing").status_code == 404
+    client.get("/items?degraded=true")
+    response = client.get("/items?degraded=true")
+    assert calls["items"] == 2 and response.headers["cache-control"] == "no-store"
+    assert len(cache.entries) == 0
+
+
+def test_cache_is_bounded_and_invalidated_by_prefix():
+    cache = ResponseCache(max_bytes=10**6, max_entries=2)
+    client, calls, _ = make_client(cache)
+    for n in (1, 2, 3):
+        client.get(f"/items?n={n}")
+    assert len(cache.entries) == 2 and "/items?n=1.0" not in cache.entries
+    assert cache.invalidate("/items") == 2 and cache.bytes == 0
+    client.get("/items?n=3")
+    assert calls["items"] == 4
@@ -0,0 +1,152 @@
+"""Restaurant index: bitmap containers, id map, search parity with SQL and incremental sync"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.database import Base  # noqa: E402
+from app.models.restaurant import Restaurant, RestaurantDish  # noqa: E402
+from app.routes import restaurants as routes  # noqa: E402
+from app.services import restaurant_index  # noqa: E402
+from app.services.restaurant_index import ARRAY_MAX, IdMap, RoaringBitmap  # noqa: E402
+
+
+def test_bitmap_operations_match_numpy():
+    rng = np.random.default_rng(0)
+    # Dense and sparse containers in the same bitmaps
+    a = np.unique(np.concatenate([rng.integers(0, 65536, 20000), rng.integers(65536, 300000, 300)]))
+    b = np.unique(np.concatenate([rng.integers(0, 65536, 500), rng.integers(65536, 300000, 9000)]))
+    left, right = RoaringBitmap.from_sorted(a), RoaringBitmap.from_sorted(b)
+    assert left.containers[0].dtype == np.uint64 and left.containers[1].dtype == np.uint16
+    both = left & right
+    assert np.array_equal(both.to_array(), np.intersect1d(a, b))
+    assert len(both) == len(np.intersect1d(a, b))
+    assert np.array_equal(RoaringBitmap.union([left, right]).to_array(), np.union1d(a, b))
+
+
+def test_adding_grows_an_array_container_into_a_bitmap():
+    bitmap = RoaringBitmap()
+    for value in range(0, 2 * (ARRAY_MAX + 1), 2):
+        bitmap.add(value)
+    bitmap.add(10)
+    assert len(bitmap) == ARRAY_MAX + 1 and bitmap.containers[0].dtype == np.uint64
+    assert 8 in bitmap and 9 not in bitmap and 70000 not in bitmap
+    bitmap.add(70000)
+    assert bitmap.keys == [0, 1] and 70000 in bitmap
+
+
+def test_removing_shrinks_containers_and_drops_empty_ones():
+    bitmap = RoaringBitmap.from_sorted(np.concatenate([np.arange(ARRAY_MAX + 1), [70000]]))
+    assert bitmap.containers[0].dtype == np.uint64
+    bitmap.remove(5)
+    assert 5 not in bitmap and len(bitmap) == ARRAY_MAX + 1 and bitmap.containers[0].dtype == np.uint16
+    bitmap.remove(70000)
+    bitmap.remove(70001)
+    assert bitmap.keys == [0] and len(bitmap) == ARRAY_MAX
+
+
+def test_id_map_resolves_loaded_and_added_ids():
+    ids = IdMap(width=8)
+    ids.extend(["b", "a", "c"])
+    assert [ids.get(k) for k in "abc"] == [1, 0, 2]
+    assert ids.add("d") == 3 and ids.add("a") == 1
+    assert ids.get("d") == 3 and ids.key(3) == "d" and ids.get("zz") is None
+
+
+def seed(db):
+    now = datetime.utcnow()
+    places = [("r0", 55.750, 37.600, "Italian"), ("r1", 55.760, 37.620, "Japanese"),
+              ("r2", 55.900, 37.900, "Italian"), ("r3", 55.751, 37.601, "Georgian")]
+    for rid, lat, lon, cuisine in places:
+        db.add(Restaurant(id=rid, name=rid.upper(), address="-", latitude=lat, longitude=lon, cuisine_type=cuisine))
+    db.add_all([
+        RestaurantDish(restaurant_id="r0", dish_name="Pizza", dish_id="pizza", created_at=now - timedelta(hours=2)),
+        RestaurantDish(restaurant_id="r1", dish_name="Sushi", dish_id="sushi", created_at=now - timedelta(hours=2)),
+        RestaurantDish(restaurant_id="r2", dish_name="Pizza", dish_id="pizza", created_at=now - timedelta(hours=2)),
+        RestaurantDish(restaurant_id="r3", dish_name="pizza margherita", dish_id=None, created_at=now - timedelta(hours=1)),
+    ])
+    db.commit()
+
+
+def test_index_search_matches_the_sql_path(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'index.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)
+    db = session()
+    seed(db)
+    index = restaurant_index.build(session)
+    assert index.count == 4 and index.watermark is not None
+
+    def sql(query, dish_id, radius):
+        rows = routes.search_local_restaurants(query, 55.75, 37.6, radius, db)
+        return sorted(r["id"] for r in rows)
+
+    for query, dish_id in (("pizza", "pizza"), ("sushi", "sushi"), ("italian", None), ("marg", None)):
+        for radius in (500, 3000, 50000):
+            hits = [rid for rid, _ in index.search(query, dish_id, 55.75, 37.6, radius)]
+            assert sorted(hits) == sql(query, dish_id, radius), (query, radius)
+    # Nearest first with exact distances
+    hits = index.search("pizza", "pizza", 55.75, 37.6, 50000)
+    assert [rid for rid, _ in hits] == ["r0", "r3", "r2"] and hits[0][1] < 0.01
+
+
+def test_sync_and_record_saved_extend_the_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)
+    db = session()
+    seed(db)
+    index = restaurant_index.build(session)
+
+    db.add(Restaurant(id="r4", name="R4", address="-", latitude=55.752, longitude=37.602, cuisine_type="Thai"))
+    db.add(RestaurantDish(restaurant_id="r4", dish_name="Pad Thai", dish_id="pad_thai"))
+    db.commit()
+    assert restaurant_index.sync(index, session) == 1
+    assert restaurant_index.sync(index, session) == 0
+    assert [rid for rid, _ in index.search("pad thai", "pad_thai", 55.75, 37.6, 1000)] == ["r4"]
+
+    restaurant_index._index = index
+    try:
+        saved = Restaurant(id="r5", name="R5", address="-", latitude=55.753, longitude=37.603, cuisine_type="Thai")
+        restaurant_index.record_saved([saved], "Pad Thai", "pad_thai")
+    finally:
+        restaurant_index._index = None
+    assert [rid for rid, _ in index.search("pad thai", "pad_thai", 55.75, 37.6, 1000)] == ["r4", "r5"]
+    assert index.describe()["restaurants"] == 6
+
+
+def test_sync_applies_moves_and_cuisine_changes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'update.db'}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)
+    db = session()
+    seed(db)
+    index = restaurant_index.build(session)
+
+    # r2 moves next to r0 and becomes Japanese, as reclassify_cuisines.py would write it
+    db.query(Restaurant).filter(Restaurant.id == "r2").update(
+        {"latitude": 55.7505, "longitude": 37.6005, "cuisine_type": "Japanese",
+         "updated_at": datetime.utcnow() + timedelta(seconds=1)})
+    db.commit()
+    assert restaurant_index.sync(index, session) == 1
+    assert restaurant_index.sync(index, session) == 0
+    for query, dish_id in (("pizza", "pizza"), ("italian", None), ("japanese", None)):
+        for radius in (500, 50000):
+            hits = sorted(rid for rid, _ in index.search(query, dish_id, 55.75, 37.6, radius))
+            expected = sorted(r["id"] for r in routes.search_local_restaurants(query, 55.75, 37.6, radius, db))
+            assert hits == expected, (query, radius)
+    assert [rid for rid, _ in index.search("pizza", "pizza", 55.9, 37.9, 1000)] == []
+    assert "r2" in [rid for rid, _ in index.search("japanese", None, 55.75, 37.6, 500)]
+
+
+def test_empty_database_builds_an_empty_index(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'empty.db'}")
+    Base.metadata.create_all(bind=engine)
+    index = restaurant_index.build(sessionmaker(bind=engine))
+    assert index.count == 0 and index.search("pizza", "pizza", 55.75, 37.6, 5000) == []
@@ -0,0 +1,80 @@
+"""Warmup: hot pair selection, readiness within the budget and step failures"""
+import asyncio
+import os
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.database import Base  # noqa: E402
+from app.models.restaurant import Restaurant, RestaurantDish  # noqa: E402
+from app.services.geo import geo_cell  # noqa: E402
+from app.services.warmup import HotPair, Warmer, hot_pairs  # noqa: E402
+
+
+def test_hot_pairs_are_ranked_by_count_with_centroids(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'warm.db'}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    for i, (lat, lon) in enumerate([(55.70, 37.60), (55.80, 37.70), (59.9, 30.3)]):
+        db.add(Restaurant(id=f"r{i}", name=f"R{i}", address="-", latitude=lat, longitude=lon))
+    moscow, petersburg = geo_cell(55.7, 37.6), geo_cell(59.9, 30.3)
+    db.add_all([RestaurantDish(restaurant_id="r0", dish_name="pizza", geo_cell=moscow),
+                RestaurantDish(restaurant_id="r1", dish_name="pizza", geo_cell=moscow),
+                RestaurantDish(restaurant_id="r2", dish_name="pizza", geo_cell=petersburg),
+                RestaurantDish(restaurant_id="r2", dish_name="sushi", geo_cell=petersburg)])
+    db.commit()
+
+    pairs = hot_pairs(db, limit=2)
+    assert [(p.dish, p.geo_cell, p.count) for p in pairs[:1]] == [("pizza", moscow, 2)]
+    assert (pairs[1].dish, pairs[1].count) in {("pizza", 1), ("sushi", 1)}
+    assert abs(pairs[0].lat - 55.75) < 1e-9 and abs(pairs[0].lon - 37.65) < 1e-9
+
+
+def test_ready_after_the_budget_even_if_a_pass_is_still_running():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def load_pairs():
+            return [HotPair("pizza", 1, 3, 55.7, 37.6)]
+
+        async def slow_pair(pair):
+            await release.wait()
+
+        warmer = Warmer(load_pairs, slow_pair, budget=0.05, interval=0)
+        warmer.start()
+        await asyncio.wait_for(warmer.ready.wait(), 1)
+        assert warmer.passes == 0
+        release.set()
+        await asyncio.sleep(0.01)
+        assert warmer.passes == 1
+        await warmer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failed_steps_are_reported_and_do_not_block_readiness():
+    async def scenario():
+        warmed = []
+
+        async def load_pairs():
+            return [HotPair("pizza", 1, 3, 55.7, 37.6), HotPair("sushi", 1, 2, 55.7, 37.6)]
+
+        async def warm_pair(pair):
+            warmed.append(pair.dish)
+
+        async def broken(pairs):
+            raise ConnectionError("ml service down")
+
+        warmer = Warmer(load_pairs, warm_pair, budget=1, interval=0)
+        warmer.start({"ml": broken})
+        await asyncio.wait_for(warmer.ready.wait(), 1)
+        assert sorted(warmed) == ["pizza", "sushi"]
+        assert warmer.last["errors"] == ["ml: ConnectionError: ml service down"]
+        assert set(warmer.last["steps"]) == {"pair:pizza@1", "pair:sushi@1", "ml"}
+        await warmer.stop()
+
+    asyncio.run(scenario())
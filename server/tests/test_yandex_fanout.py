@@ -0,0 +1,95 @@
+"""Yandex fan-out against the local mock Places server from benchmarks/"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(ROOT, "server"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from mock_yandex import MockYandexHandler  # noqa: E402
+from app.services import rate_limit, yandex  # noqa: E402
+from app.services.geo import calculate_distance  # noqa: E402
+
+LAT, LON = 55.7558, 37.6173
+
+
+@pytest.fixture(scope="module")
+def mock_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockYandexHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def yandex_endpoint(mock_server, monkeypatch):
+    monkeypatch.setattr(yandex, "YANDEX_SEARCH_API", mock_server)
+    monkeypatch.setattr(yandex, "YANDEX_MAX_TILES", 9)
+    monkeypatch.setattr(MockYandexHandler, "latency", 0.0)
+    # Fan-out tests measure tiling and deadlines, not the rate limiter
+    monkeypatch.setitem(rate_limit._buckets, yandex.YANDEX_API_KEY, rate_limit.TokenBucket("yandex", 1000, 1000))
+
+
+def run(coro):
+    """Run on a fresh loop; the pooled client is bound to its loop, so close it after"""
+    async def wrapper():
+        try:
+            return await coro
+        finally:
+            await yandex.close_client()
+    return asyncio.run(wrapper())
+
+
+def test_fanout_covers_radius_with_tiles():
+    served = MockYandexHandler.requests_served
+    single = run(yandex.search("пицца", LAT, LON))
+    fanned = run(yandex.search_fanout("пицца", LAT, LON, 5000))
+
+    # 3x3 tiles x 2 query variants, plus the single call
+    assert MockYandexHandler.requests_served - served == 1 + 9 * len(yandex.QUERY_VARIANTS)
+    assert len(fanned) > len(single)
+    for restaurant in fanned:
+        coords = restaurant["coordinates"]
+        assert calculate_distance(LAT, LON, coords["lat"], coords["lon"]) <= 5.0
+
+
+def test_fanout_deduplicates_overlapping_calls():
+    fanned = run(yandex.search_fanout("пицца", LAT, LON, 3000))
+    ids = [r["external_id"] for r in fanned]
+    assert len(ids) == len(set(ids))
+
+
+def test_merge_drops_repeated_ids_and_places():
+    a = {"external_id": "1", "name": "Pizza", "coordinates": {"lat": 55.1, "lon": 37.1}}
+    same_id = {"external_id": "1", "name": "Pizza (copy)", "coordinates": {"lat": 55.2, "lon": 37.2}}
+    same_place = {"external_id": "2", "name": " pizza ", "coordinates": {"lat": 55.10001, "lon": 37.10001}}
+    other = {"external_id": "3", "name": "Sushi", "coordinates": {"lat": 55.1, "lon": 37.1}}
+    merged = yandex.merge_restaurants([[a, same_id], [same_place, other]])
+    assert [r["external_id"] for r in merged] == ["1", "3"]
+
+
+def test_deadline_returns_partial_results(monkeypatch):
+    monkeypatch.setattr(MockYandexHandler, "latency", 0.4)
+    monkeypatch.setattr(yandex, "YANDEX_MAX_CONCURRENCY", 6)
+    served = MockYandexHandler.requests_served
+
+    start = time.perf_counter()
+    partial = run(yandex.search_fanout("пицца", LAT, LON, 5000, deadline=0.6))
+    elapsed = time.perf_counter() - start
+
+    # Only the first wave of 6 of the 18 calls fits before the deadline
+    assert elapsed < 1.0
+    assert partial
+    assert MockYandexHandler.requests_served - served < 9 * len(yandex.QUERY_VARIANTS)
+
+
+def test_deadline_with_no_answers_raises(monkeypatch):
+    monkeypatch.setattr(MockYandexHandler, "latency", 0.5)
+    with pytest.raises(Exception, match="fan-out failed"):
+        run(yandex.search_fanout("пицца", LAT, LON, 1000, deadline=0.1))